@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from socket import timeout as SocketTimeout
 from typing import Callable
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, session, url_for
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from urllib.request import Request
+
+from blueprints.auth import login_required
+from forms import cnpj_valido
+from models import db, RenderJob
+from utils import clientes, cnpj_cache, cnpj_receita, http_pool, mx_cache, render_jobs, tempos_render
+from utils.resiliencia import CircuitoAbertoError, Disjuntor, SingleFlight
 
 api_bp = Blueprint('api_bp', __name__, url_prefix='/api')   # ← prefixo único
 
@@ -19,10 +28,13 @@ class _CNPJServiceError(Exception):
     """Erro genérico para falhas na comunicação/decodificação da API."""
 
 
+CNPJ_API_URL = 'https://publica.cnpj.ws/cnpj/{cnpj}'
+
+
 def _fetch_cnpj_payload(
     cnpj: str,
     *,
-    opener: Callable[[Request, float], object] = urlopen,
+    opener: Callable[[Request, float], object] | None = None,
     timeout: float = 6,
 ) -> dict:
     """Consulta a API de CNPJ usando apenas a biblioteca padrão.
@@ -33,6 +45,7 @@ def _fetch_cnpj_payload(
         Número do CNPJ normalizado (somente dígitos).
     opener:
         Função compatível com ``urllib.request.urlopen`` usada para facilitar testes.
+        Se omitida, usa o pool de conexões persistentes (``utils.http_pool``).
     timeout:
         Tempo limite da requisição, em segundos.
 
@@ -43,9 +56,11 @@ def _fetch_cnpj_payload(
     """
 
     req = Request(
-        f'https://publica.cnpj.ws/cnpj/{cnpj}',
+        CNPJ_API_URL.format(cnpj=cnpj),
         headers={'Accept': 'application/json'}
     )
+    if opener is None:
+        opener = http_pool.obter_opener()
 
     try:
         with opener(req, timeout=timeout) as resp:  # type: ignore[arg-type]
@@ -75,6 +90,62 @@ def _fetch_cnpj_payload(
         raise _CNPJServiceError from exc
 
 
+# Uma chamada por CNPJ em andamento; circuito aberto após falhas seguidas da API
+_voos_cnpj = SingleFlight()
+_disjuntor_cnpj = Disjuntor('publica.cnpj.ws', erros=(_CNPJServiceError,))
+
+
+@api_bp.record_once
+def _configurar_disjuntor(state):
+    cfg = state.app.config
+    _disjuntor_cnpj.configurar(
+        limite_falhas=cfg.get('CNPJ_DISJUNTOR_FALHAS', 5),
+        espera=cfg.get('CNPJ_DISJUNTOR_ESPERA', 30),
+        sondas=cfg.get('CNPJ_DISJUNTOR_SONDAS', 1),
+    )
+
+
+def _consultar_api_cnpj(cnpj: str) -> dict | None:
+    try:
+        return _fetch_cnpj_payload(cnpj)
+    except _CNPJNotFoundError:
+        return None
+
+
+def _buscar_cnpj(cnpj: str) -> dict | None:
+    """Consulta à API no formato do cache (``None`` = não encontrado).
+
+    Consultas simultâneas do mesmo CNPJ compartilham uma requisição, e com o
+    circuito aberto falha na hora com ``CircuitoAbertoError``.
+    """
+    return _voos_cnpj.executar(
+        cnpj, lambda: _disjuntor_cnpj.chamar(_consultar_api_cnpj, cnpj)
+    )
+
+
+def _dados_empresa(data: dict) -> dict:
+    return {
+        'company': data.get('razao_social', ''),
+        'cnpj': data.get('cnpj', ''),
+        'email': data.get('email', ''),
+        'telefone': data.get('ddd_telefone_1', ''),
+    }
+
+
+def _status_cache(res) -> str:
+    if res.origem == 'local':
+        return 'LOCAL'
+    return 'MISS' if res.origem == 'api' else ('STALE' if res.stale else 'HIT')
+
+
+def _consultar_cnpj(cnpj: str) -> cnpj_cache.ResultadoCNPJ:
+    """Base local da Receita primeiro; só o que não está nela vai ao cache/API."""
+    payload = cnpj_receita.obter_base().consultar(cnpj)
+    if payload is not None:
+        return cnpj_cache.ResultadoCNPJ(payload, 'local')
+    return cnpj_cache.obter_cache().consultar(cnpj, _buscar_cnpj)
+
+
 @api_bp.route('/cnpj/<cnpj>', methods=['GET'])
 def consultar_cnpj(cnpj):
     cnpj = ''.join(filter(str.isdigit, cnpj))
@@ -82,15 +153,306 @@ def consultar_cnpj(cnpj):
         return jsonify(error='CNPJ inválido (14 dígitos).'), 400
 
     try:
-        data = _fetch_cnpj_payload(cnpj)
-    except _CNPJNotFoundError:
-        return jsonify(error='CNPJ não encontrado.'), 404
+        res = _consultar_cnpj(cnpj)
     except _CNPJServiceError:
         return jsonify(error='Erro ao consultar API externa.'), 502
+    except CircuitoAbertoError as exc:
+        resp = jsonify(error='Consulta de CNPJ temporariamente indisponível.')
+        resp.status_code = 503
+        resp.headers['Retry-After'] = str(max(1, int(exc.tentar_em)))
+        return resp
+
+    data = res.payload
+    if data is None:
+        resp = jsonify(error='CNPJ não encontrado.')
+        resp.status_code = 404
+    else:
+        resp = jsonify(**_dados_empresa(data))
+    resp.headers['X-Cache'] = _status_cache(res)
+    return resp
+
+
+# ------------------------------------------------------------------
+# Consulta de CNPJs em lote (uma linha NDJSON por CNPJ, na ordem em que
+# os resultados chegam)
+# ------------------------------------------------------------------
+_SEPARADORES_CNPJ = re.compile(r'[\s,;]+')
 
-    return jsonify(
-        company=data.get('razao_social', ''),
-        cnpj=data.get('cnpj', ''),
-        email=data.get('email', ''),
-        telefone=data.get('ddd_telefone_1', '')
+
+def _entradas_lote(corpo) -> list[str] | None:
+    """Lista de CNPJs do corpo: ``[...]``, ``{"cnpjs": [...]}`` ou texto colado."""
+    if isinstance(corpo, dict):
+        corpo = corpo.get('cnpjs')
+    if isinstance(corpo, str):
+        corpo = [c for c in _SEPARADORES_CNPJ.split(corpo) if c]
+    if not isinstance(corpo, list):
+        return None
+    return ['' if c is None else str(c).strip() for c in corpo]
+
+
+def _resultado_cnpj(cnpj: str) -> dict:
+    """Consulta um CNPJ (lote/validação); falhas do serviço viram ``status``/``error``."""
+    try:
+        res = _consultar_cnpj(cnpj)
+    except CircuitoAbertoError as exc:
+        return {'status': 'indisponivel', 'error': 'Consulta de CNPJ temporariamente indisponível.',
+                'retry_after': max(1, int(exc.tentar_em))}
+    except _CNPJServiceError:
+        return {'status': 'erro', 'error': 'Erro ao consultar API externa.'}
+    if res.payload is None:
+        return {'status': 'nao_encontrado', 'error': 'CNPJ não encontrado.', 'cache': _status_cache(res)}
+    return {'status': 'ok', 'cache': _status_cache(res), 'dados': _dados_empresa(res.payload)}
+
+
+@api_bp.route('/cnpj/batch', methods=['POST'])
+@login_required
+def consultar_cnpj_lote():
+    """Consulta vários CNPJs de uma vez e responde em NDJSON (``application/x-ndjson``).
+
+    Cada linha traz ``indice`` e ``entrada`` (posição e valor enviados), o
+    ``cnpj`` normalizado e ``status``: ``ok`` (com ``dados``), ``invalido``,
+    ``nao_encontrado``, ``erro`` ou ``indisponivel``. Entradas inválidas saem
+    primeiro; as demais são consultadas por no máximo ``CNPJ_LOTE_CONCORRENCIA``
+    threads e cada linha é enviada assim que o resultado fica pronto. CNPJs
+    repetidos são consultados uma vez só.
+    """
+    entradas = _entradas_lote(request.get_json(silent=True))
+    if entradas is None:
+        return jsonify(error='Envie uma lista de CNPJs (JSON: {"cnpjs": [...]}).'), 400
+    if not entradas:
+        return jsonify(error='Nenhum CNPJ informado.'), 400
+    limite = current_app.config.get('CNPJ_LOTE_MAX', 200)
+    if len(entradas) > limite:
+        return jsonify(error=f'Máximo de {limite} CNPJs por lote.'), 413
+    concorrencia = max(1, int(current_app.config.get('CNPJ_LOTE_CONCORRENCIA', 4)))
+    logger = current_app.logger
+
+    invalidos, por_cnpj = [], {}
+    for i, entrada in enumerate(entradas):
+        cnpj = ''.join(filter(str.isdigit, entrada))
+        if cnpj_valido(cnpj):
+            por_cnpj.setdefault(cnpj, []).append(i)
+        else:
+            invalidos.append({'indice': i, 'entrada': entrada, 'cnpj': cnpj,
+                              'status': 'invalido', 'error': 'CNPJ inválido.'})
+
+    def linha(dados: dict) -> str:
+        return json.dumps(dados, ensure_ascii=False) + '\n'
+
+    def gerar():
+        for item in invalidos:
+            yield linha(item)
+        if not por_cnpj:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(concorrencia, len(por_cnpj)),
+                                      thread_name_prefix='cnpj-lote')
+        try:
+            futuros = {executor.submit(_resultado_cnpj, cnpj): cnpj for cnpj in por_cnpj}
+            for futuro in as_completed(futuros):
+                cnpj = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception:   # erro inesperado afeta só esta linha
+                    logger.exception('Falha ao consultar o CNPJ %s no lote', cnpj)
+                    resultado = {'status': 'erro', 'error': 'Erro interno ao consultar o CNPJ.'}
+                for i in por_cnpj[cnpj]:
+                    yield linha({'indice': i, 'entrada': entradas[i], 'cnpj': cnpj, **resultado})
+        finally:
+            # cliente desconectou: não inicia as consultas que ainda estão na fila
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    resp = Response(gerar(), mimetype='application/x-ndjson')
+    resp.headers['Cache-Control'] = 'no-store'
+    resp.headers['X-Accel-Buffering'] = 'no'    # nginx: não segurar o stream
+    return resp
+
+
+# ------------------------------------------------------------------
+# Clientes já atendidos (autocompletar do formulário de proposta)
+# ------------------------------------------------------------------
+@api_bp.route('/clientes', methods=['GET'])
+@login_required
+def buscar_clientes():
+    """``?q=`` prefixo da razão social ou do CNPJ; até ``limite`` (máx. 50) resultados."""
+    termo = request.args.get('q', '').strip()
+    limite = min(max(request.args.get('limite', 10, type=int) or 10, 1), 50)
+    if len(termo) < 2:
+        return jsonify(clientes=[])
+    return jsonify(clientes=[c.to_json() for c in clientes.buscar(termo, limite)])
+
+
+# ------------------------------------------------------------------
+# Validação do cliente (CNPJ + MX do e-mail em paralelo, com prazo único)
+# ------------------------------------------------------------------
+_executor_validacao = ThreadPoolExecutor(max_workers=8, thread_name_prefix='validar-cliente')
+
+
+def _resultado_mx(dominio: str) -> dict:
+    res = mx_cache.obter_cache().consultar(dominio)
+    return {'status': 'erro' if res.erro else 'ok', 'dominio': dominio,
+            'mx': None if res.erro else res.tem_mx, 'hosts': res.hosts, 'origem': res.origem}
+
+
+@api_bp.route('/validar_cliente', methods=['GET'])
+@login_required
+def validar_cliente():
+    """Valida CNPJ e e-mail do cliente de uma vez (``?cnpj=...&email=...``).
+
+    O dígito verificador é conferido na hora; a consulta do CNPJ e a do MX
+    rodam ao mesmo tempo e a resposta sai em até ``VALIDACAO_CLIENTE_PRAZO``
+    segundos. O que não terminar a tempo volta com ``status: "timeout"`` (e
+    ``completo: false``) — a consulta segue em segundo plano e aquece o
+    cache. Um resultado de MX definitivo fica na sessão para o envio do
+    formulário reaproveitar (ver ``propostas.nova_proposta``).
+    """
+    prazo = float(current_app.config.get('VALIDACAO_CLIENTE_PRAZO', 3.0))
+    entrada_cnpj = request.args.get('cnpj', '').strip()
+    entrada_email = request.args.get('email', '').strip()
+    if not entrada_cnpj and not entrada_email:
+        return jsonify(error='Informe cnpj e/ou email.'), 400
+
+    resposta = {'cnpj': None, 'email': None}
+    tarefas = {}
+    if entrada_cnpj:
+        cnpj = ''.join(filter(str.isdigit, entrada_cnpj))
+        if cnpj_valido(cnpj):
+            tarefas['cnpj'] = _executor_validacao.submit(_resultado_cnpj, cnpj)
+        else:
+            resposta['cnpj'] = {'status': 'invalido', 'error': 'CNPJ inválido.'}
+    if entrada_email:
+        dominio = mx_cache.normalizar_dominio(entrada_email) if '@' in entrada_email else None
+        if dominio:
+            tarefas['email'] = _executor_validacao.submit(_resultado_mx, dominio)
+        else:
+            resposta['email'] = {'status': 'invalido', 'mx': False, 'error': 'E-mail inválido.'}
+
+    wait(tarefas.values(), timeout=prazo)
+    for parte, futuro in tarefas.items():
+        if not futuro.done():
+            resposta[parte] = {'status': 'timeout'}
+            continue
+        try:
+            resposta[parte] = futuro.result()
+        except Exception:
+            current_app.logger.exception('Falha na validação do cliente (%s)', parte)
+            resposta[parte] = {'status': 'erro', 'error': 'Erro interno na validação.'}
+    if resposta['cnpj'] is not None:
+        resposta['cnpj']['valido'] = resposta['cnpj']['status'] != 'invalido'
+
+    email = resposta['email']
+    if email and email.get('mx') is not None and email.get('dominio'):
+        session['validacao_cliente'] = {'dominio': email['dominio'], 'mx': email['mx'],
+                                        'em': time.time()}
+    resposta['completo'] = all(p is None or p['status'] != 'timeout'
+                               for p in (resposta['cnpj'], resposta['email']))
+    return jsonify(resposta)
+
+
+# ------------------------------------------------------------------
+# Registro MX do domínio de e-mail (o formulário aquece o cache)
+# ------------------------------------------------------------------
+@api_bp.route('/mx/<dominio>', methods=['GET'])
+@login_required
+def consultar_mx(dominio):
+    normalizado = mx_cache.normalizar_dominio(dominio)
+    if not normalizado:
+        return jsonify(error='Domínio inválido.'), 400
+    res = mx_cache.obter_cache().consultar(normalizado)
+    resp = jsonify(res.to_json())
+    if res.erro:
+        resp.status_code = 503
+    return resp
+
+
+# ------------------------------------------------------------------
+# Jobs de renderização (geração assíncrona de PDF)
+# ------------------------------------------------------------------
+def _carregar_job(job_id):
+    """Retorna ``(job, None)`` ou ``(None, resposta_de_erro)``."""
+    job = db.session.get(RenderJob, job_id)
+    if job is None:
+        return None, (jsonify(error='Job não encontrado.'), 404)
+    if session.get('tipo') not in ('admin', 'gestor') and job.usuario_id != session.get('usuario_id'):
+        return None, (jsonify(error='Acesso não autorizado.'), 403)
+    return job, None
+
+
+def _job_json(job):
+    data = render_jobs.status_json(job)
+    data['status_url'] = url_for('api_bp.status_render_job', job_id=job.id)
+    if job.status == RenderJob.CONCLUIDO:
+        data['result_url'] = url_for('api_bp.resultado_render_job', job_id=job.id)
+    return data
+
+
+@api_bp.route('/render_jobs/<job_id>', methods=['GET'])
+@login_required
+def status_render_job(job_id):
+    job, erro = _carregar_job(job_id)
+    if erro:
+        return erro
+    return jsonify(_job_json(job))
+
+
+@api_bp.route('/render_jobs/<job_id>/result', methods=['GET'])
+@login_required
+def resultado_render_job(job_id):
+    job, erro = _carregar_job(job_id)
+    if erro:
+        return erro
+    if job.status != RenderJob.CONCLUIDO:
+        return jsonify(_job_json(job)), 409
+
+    caminho = render_jobs.caminho_resultado(job)
+    if caminho is None:
+        # resultado saiu do cache (retenção/invalidação): gera de novo
+        render_jobs.reenviar(job)
+        return jsonify(_job_json(job)), 202
+
+    nome = job.proposta.filename or 'proposta'
+    return send_file(
+        caminho,
+        download_name=f'{nome}.{job.formato}',
+        as_attachment=request.args.get('download') == '1',
     )
+
+
+@api_bp.route('/render_jobs/<job_id>/retry', methods=['POST'])
+@login_required
+def reenviar_render_job(job_id):
+    job, erro = _carregar_job(job_id)
+    if erro:
+        return erro
+    if job.status != RenderJob.FALHOU:
+        return jsonify(error='Apenas jobs com falha podem ser reenviados.'), 409
+    render_jobs.reenviar(job)
+    return jsonify(_job_json(job)), 202
+
+
+# ------------------------------------------------------------------
+# Métricas de renderização (histogramas por etapa, só administradores)
+# ------------------------------------------------------------------
+@api_bp.route('/admin/metricas/render', methods=['GET', 'DELETE'])
+@login_required
+def metricas_render():
+    if session.get('tipo') != 'admin':
+        return jsonify(error='Acesso restrito aos administradores.'), 403
+    if request.method == 'DELETE':
+        tempos_render.histogramas.limpar()
+    return jsonify(tempos_render.histogramas.to_json())
+
+
+@api_bp.route('/admin/metricas/cnpj', methods=['GET', 'DELETE'])
+@login_required
+def metricas_cnpj():
+    if session.get('tipo') != 'admin':
+        return jsonify(error='Acesso restrito aos administradores.'), 403
+    cache = cnpj_cache.obter_cache()
+    if request.method == 'DELETE':
+        cache.zerar_estatisticas()
+    return jsonify({
+        **cache.estatisticas(),
+        'base_local': cnpj_receita.obter_base().estatisticas(),
+        'disjuntor': _disjuntor_cnpj.estatisticas(),
+        'consultas_compartilhadas': _voos_cnpj.estatisticas(),
+    })
@@ -1,6 +1,13 @@
 # app.py
+import os
+
+import click
 from flask import Flask, redirect, url_for
 from models import db
+from utils import (
+    artifact_store, clientes, cnpj_cache, cnpj_receita, derivados, email_outbox, exportacao,
+    http_pool, image_index, imagens, mx_cache, pdf_converter, render_jobs, renderizadores,
+)
 
 # Blueprints
 from blueprints.auth import auth_bp, login_required
@@ -9,6 +16,20 @@ from blueprints.equipamentos import equipamentos_bp
 from blueprints.parametros import parametros_bp
 from api import api_bp
 
+# Efeitos colaterais de subir o servidor: threads, filas e varreduras. Um
+# ``flask db upgrade`` ou ``flask imagens gc`` não deve disparar nenhum deles.
+_SO_NO_SERVIDOR = (
+    "PDF_POOL_WARMUP", "MAIL_OUTBOX_DISPATCHER", "RENDER_JOBS_RECOVER",
+    "IMAGENS_RECUPERAR", "DERIVADOS_REGISTRAR",
+)
+
+
+def em_comando_cli() -> bool:
+    """``create_app`` chamado por um comando ``flask ...`` (exceto ``flask run``)."""
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name != "run"
+
+
 def create_app():
     app = Flask(__name__, static_folder="static", template_folder="templates")
 
@@ -37,6 +58,102 @@ def create_app():
     app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
     app.config.setdefault("SECRET_KEY", "dev-change-me")
 
+    # Pool de conversão DOCX → PDF (LibreOffice)
+    app.config.setdefault("PDF_POOL_SIZE", 2)
+    app.config.setdefault("PDF_POOL_MAX_CONVERSOES", 200)
+    app.config.setdefault("PDF_POOL_TIMEOUT", 60)
+    app.config.setdefault("PDF_POOL_WARMUP", True)
+    app.config.setdefault("PDF_POOL_DIR", os.path.join(app.instance_path, "soffice"))
+    # arquivos temporários de cada conversão (tmpfs quando disponível)
+    app.config.setdefault("PDF_POOL_IO_DIR", pdf_converter.diretorio_io_padrao())
+
+    # Cache em disco dos documentos gerados (DOCX/PDF)
+    app.config.setdefault("ARTIFACT_STORE_ENABLED", True)
+    app.config.setdefault("ARTIFACT_STORE_DIR", os.path.join(app.instance_path, "artefatos"))
+    app.config.setdefault("ARTIFACT_STORE_MAX_BYTES", 512 * 1024 * 1024)
+    app.config.setdefault("ARTIFACT_STORE_MAX_AGE", 30 * 24 * 3600)
+
+    # Jobs de renderização em segundo plano
+    app.config.setdefault("RENDER_JOBS_WORKERS", 2)
+    app.config.setdefault("RENDER_JOBS_RECOVER", True)
+    app.config.setdefault("RENDER_JOBS_TIMEOUT", 900)     # s: "executando" além disso volta à fila
+
+    # Exportação em lote do histórico (ZIP de PDFs)
+    app.config.setdefault("EXPORT_PROCESSOS", None)   # None → nº de CPUs
+    app.config.setdefault("EXPORT_MAX_PROPOSTAS", 500)
+    # andamento compartilhado entre workers (GET /exportar_propostas/<id>/progresso)
+    app.config.setdefault("EXPORT_PROGRESSO_DIR", os.path.join(app.instance_path, "exportacoes"))
+
+    # Cache das imagens de equipamentos usadas nas propostas
+    app.config.setdefault("IMAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+
+    # Processamento das imagens enviadas (letterbox 160×180 num pool de processos)
+    app.config.setdefault("IMAGENS_PROCESSOS", 2)
+    app.config.setdefault("IMAGENS_DIR", None)           # None → static/images
+    app.config.setdefault("IMAGENS_UPLOAD_DIR", None)    # None → instance/uploads/imagens
+    app.config.setdefault("IMAGENS_RECUPERAR", True)     # reagenda as "processando" ao subir
+    app.config.setdefault("IMAGENS_TIMEOUT", 600)        # s: "processando" além disso é retomada
+    # Derivados por perfil (DOCX, miniaturas WebP), gerados sob demanda e nomeados por hash
+    app.config.setdefault("DERIVADOS_ENABLED", True)
+    app.config.setdefault("DERIVADOS_DIR", os.path.join(app.instance_path, "derivados"))
+    app.config.setdefault("DERIVADOS_REGISTRAR", True)   # registra as imagens ao subir
+
+    # Preferência de renderizador de PDF por template (LibreOffice × nativo)
+    app.config.setdefault("RENDERIZADOR_CACHE_TTL", 30)
+
+    # Fila de e-mails das propostas (envio em segundo plano, com retentativas)
+    app.config.setdefault("MAIL_OUTBOX_DISPATCHER", True)
+    app.config.setdefault("MAIL_OUTBOX_INTERVALO", 30)        # s entre varreduras da fila
+    app.config.setdefault("MAIL_OUTBOX_MAX_TENTATIVAS", 5)
+    app.config.setdefault("MAIL_OUTBOX_BACKOFF", 60)          # s; dobra a cada falha
+    app.config.setdefault("MAIL_OUTBOX_BACKOFF_MAX", 3600)
+    app.config.setdefault("MAIL_OUTBOX_TIMEOUT", 600)         # "enviando" além disso volta à fila
+
+    # Pool de conexões SMTP (sessões autenticadas reaproveitadas entre envios)
+    app.config.setdefault("MAIL_POOL_TAMANHO", 2)
+    app.config.setdefault("MAIL_TIMEOUT_CONEXAO", 10)         # s: conexão, STARTTLS e login
+    app.config.setdefault("MAIL_TIMEOUT_ENVIO", 60)           # s: cada comando do envio
+    app.config.setdefault("MAIL_POOL_OCIOSIDADE", 60)         # s parada antes de ser fechada
+    app.config.setdefault("MAIL_POOL_VERIFICAR_APOS", 5)      # s parada antes de um NOOP
+    app.config.setdefault("MAIL_POOL_MAX_MENSAGENS", 100)     # por conexão
+
+    # Cache das consultas MX (validação do e-mail do cliente)
+    app.config.setdefault("MX_CACHE_DB", os.path.join(app.instance_path, "mx_cache.sqlite"))  # "" = só memória
+    app.config.setdefault("MX_TIMEOUT", 2.0)          # s por servidor DNS
+    app.config.setdefault("MX_LIFETIME", 4.0)         # s no total da consulta
+    app.config.setdefault("MX_TTL_MIN", 60)
+    app.config.setdefault("MX_TTL_MAX", 86400)
+    app.config.setdefault("MX_TTL_NEGATIVO", 300)     # NXDOMAIN / sem MX
+
+    # Cache das consultas de CNPJ (LRU em memória + SQLite compartilhado)
+    app.config.setdefault("CNPJ_CACHE_DB", os.path.join(app.instance_path, "cnpj_cache.sqlite"))  # "" = só memória
+    app.config.setdefault("CNPJ_CACHE_TTL", 7 * 24 * 3600)
+    app.config.setdefault("CNPJ_CACHE_JANELA_STALE", 30 * 24 * 3600)   # servido enquanto atualiza
+    app.config.setdefault("CNPJ_CACHE_TTL_NEGATIVO", 24 * 3600)        # CNPJ não encontrado
+    app.config.setdefault("CNPJ_CACHE_MAX_MEMORIA", 2048)
+    # Base local importada dos dados abertos da Receita (flask cnpj importar); "" = desativada
+    app.config.setdefault("CNPJ_BASE_DB", os.path.join(app.instance_path, "cnpj_receita.sqlite"))
+    # /api/validar_cliente: prazo total da validação e por quanto tempo o envio reaproveita o MX
+    app.config.setdefault("VALIDACAO_CLIENTE_PRAZO", 3.0)
+    app.config.setdefault("VALIDACAO_CLIENTE_VALIDADE", 300)
+    # Disjuntor da API de CNPJ: abre após N falhas seguidas e testa de novo após a espera
+    app.config.setdefault("CNPJ_DISJUNTOR_FALHAS", 5)
+    app.config.setdefault("CNPJ_DISJUNTOR_ESPERA", 30)
+    app.config.setdefault("CNPJ_DISJUNTOR_SONDAS", 1)
+    # POST /api/cnpj/batch
+    app.config.setdefault("CNPJ_LOTE_MAX", 200)
+    app.config.setdefault("CNPJ_LOTE_CONCORRENCIA", 4)   # consultas simultâneas por lote
+
+    # Cliente HTTP com keep-alive para APIs externas (CNPJ)
+    app.config.setdefault("HTTP_POOL_HOSTS", 4)               # pools (hosts) mantidos
+    app.config.setdefault("HTTP_POOL_CONEXOES_POR_HOST", 4)
+    app.config.setdefault("HTTP_TIMEOUT_CONEXAO", 3.0)
+    app.config.setdefault("HTTP_TIMEOUT_LEITURA", 6.0)
+
+    # Comandos da CLI não aquecem o soffice, não despacham e-mails nem retomam filas
+    if em_comando_cli():
+        app.config.update(dict.fromkeys(_SO_NO_SERVIDOR, False))
+
     # DB
     db.init_app(app)
 
@@ -47,6 +164,19 @@ def create_app():
     except Exception:
         pass
 
+    # Conversor PDF (aquece os workers em segundo plano)
+    pdf_converter.init_app(app)
+    artifact_store.init_app(app)
+    image_index.init_app(app)
+    derivados.init_app(app)
+    renderizadores.init_app(app)
+    mx_cache.init_app(app)
+    cnpj_cache.init_app(app)
+    cnpj_receita.init_app(app)
+    clientes.init_app(app)
+    exportacao.init_app(app)
+    http_pool.init_app(app)
+
     # Blueprints
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(propostas_bp)
@@ -65,6 +195,15 @@ def create_app():
     def tickets_dashboard():
         return redirect(url_for("propostas_bp.nova_proposta"))
 
+    # Reagenda jobs de renderização interrompidos por um reinício
+    render_jobs.init_app(app)
+
+    # Despachante da fila de e-mails
+    email_outbox.init_app(app)
+
+    # Imagens de equipamentos que ficaram na fila
+    imagens.init_app(app)
+
     # Cria admin padrão se sua função existir
     try:
         from blueprints.auth import criar_admin_padrao  # noqa
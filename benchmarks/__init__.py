@@ -0,0 +1 @@
+"""Benchmarks da geração de propostas (ver ``python -m benchmarks.render --help``)."""
@@ -0,0 +1,79 @@
+"""Propostas e equipamentos sintéticos para os benchmarks.
+
+Usa os próprios modelos (``Proposal``/``Equipment``) como objetos
+transientes — nada é gravado no banco. Os atributos efêmeros que as rotas
+colocam nos itens (``quantity``, ``discount_percent``) são preenchidos do
+mesmo jeito. As imagens são geradas em ``<base>/static/images`` de uma
+pasta temporária (o benchmark aponta ``utils.image_index`` para ela): uma
+foto JPEG e um PNG com transparência, no tamanho que o upload produz.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+
+from PIL import Image, ImageDraw
+
+from models import Equipment, ModalidadeType, Proposal, ServicoType
+
+
+TAMANHO_IMAGEM = (160, 180)
+
+
+def criar_imagens(base_dir: str) -> list[str]:
+    """Grava as imagens em ``base_dir/static/images``; devolve os nomes."""
+    pasta = os.path.join(base_dir, "static", "images")
+    os.makedirs(pasta, exist_ok=True)
+    jpg = os.path.join(pasta, "equipamento.jpg")
+    png = os.path.join(pasta, "equipamento.png")
+
+    foto = Image.new("RGB", TAMANHO_IMAGEM, (235, 235, 235))
+    desenho = ImageDraw.Draw(foto)
+    for i in range(0, TAMANHO_IMAGEM[1], 6):
+        desenho.line((0, i, TAMANHO_IMAGEM[0], TAMANHO_IMAGEM[1] - i), fill=(i, 80, 160), width=3)
+    foto.save(jpg, "JPEG", quality=85)
+
+    recorte = Image.new("RGBA", TAMANHO_IMAGEM, (0, 0, 0, 0))
+    ImageDraw.Draw(recorte).ellipse((20, 30, 140, 150), fill=(30, 30, 30, 255))
+    recorte.save(png, "PNG")
+    return [os.path.basename(jpg), os.path.basename(png)]
+
+
+def proposta_sintetica() -> Proposal:
+    return Proposal(
+        id=1,
+        company="Empresa de Benchmark Ltda",
+        cnpj="04.252.011/0001-10",
+        client_name="Fulano de Tal",
+        email="compras@exemplo.com.br",
+        telefone="+55 21 912345678",
+        pagamento="30/60/90 dias",
+        prazo_entrega="15 dias úteis",
+        frete="CIF",
+        validade="30 dias",
+        garantia="12 meses",
+        garantia_sistema="6 meses",
+        servico_type=ServicoType.PONTO,
+        modalidade_type=ModalidadeType.AQUISICAO,
+        data_criacao=datetime(2025, 1, 2),
+        usuario_id=1,
+        filename="PROPOSTA COMERCIAL BM01",
+    )
+
+
+def itens_sinteticos(quantidade: int, *, desconto: bool, imagens: list[str] | None) -> list:
+    """``quantidade`` equipamentos; com ``desconto``, um a cada três tem 10%."""
+    itens = []
+    for i in range(quantidade):
+        eq = Equipment(
+            id=i + 1,
+            name=f"Equipamento {i + 1}",
+            description=f"Relógio de ponto modelo {i + 1} com leitor biométrico e proximidade",
+            unit_price=1500.0 + i,
+        )
+        eq.illustration_path = imagens[i % len(imagens)] if imagens else None
+        eq.quantity = 1 + i % 5
+        eq.discount_percent = 10.0 if desconto and i % 3 == 0 else 0.0
+        itens.append(eq)
+    return itens
@@ -0,0 +1,271 @@
+"""Benchmark da geração de propostas (DOCX, tabela e PDF).
+
+Mede, para propostas sintéticas de 1 a 1000 itens (com/sem desconto e
+imagens), o tempo de parede, o pico de memória Python e o tamanho do
+arquivo gerado, e compara com uma baseline JSON::
+
+    python -m benchmarks.render                          # roda e imprime
+    python -m benchmarks.render --salvar-baseline        # grava a baseline
+    python -m benchmarks.render --limite 0.25            # falha se piorar >25%
+    python -m benchmarks.render --itens 1,10 --alvos docx,tabela -r 5
+
+Alvos:
+    docx            ``gerar_proposta_docx(..., "docx")``
+    tabela          só ``_inserir_tabela_equipamentos`` num documento vazio
+    pdf_libreoffice conversão pelo pool do LibreOffice (pulado sem soffice)
+    pdf_nativo      renderizador nativo (``utils.pdf_nativo``)
+    template_clone  só o clone do template em cache (``CompiledTemplate.clone``)
+    template_reabrir
+                    ``Document()`` sobre os bytes do template já lidos — a
+                    alternativa ao clone (estes dois não variam com os itens)
+
+O tempo é a mediana de ``--repeticoes`` execuções após um aquecimento; o
+pico de memória vem de uma execução separada com ``tracemalloc`` (só
+alocações Python — o processo do LibreOffice não entra). Sai com código 1
+se algum caso piorar além do limite em relação à baseline.
+
+Tempos dependem da máquina: a baseline guarda o ambiente em que foi gerada
+e deve ser regravada (``--salvar-baseline``) ao trocar de máquina de CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from docx import Document
+
+import gerar_proposta
+from benchmarks.fixtures import criar_imagens, itens_sinteticos, proposta_sintetica
+from utils import image_index, pdf_converter
+
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "render.json")
+
+ALVOS = ("docx", "tabela", "pdf_libreoffice", "pdf_nativo", "template_clone", "template_reabrir")
+SEM_ITENS = ("template_clone", "template_reabrir")
+ITENS = (1, 10, 100, 1000)
+VARIANTES = {
+    "simples": dict(desconto=False, imagens=False),
+    "desconto": dict(desconto=True, imagens=False),
+    "imagens": dict(desconto=False, imagens=True),
+    "completa": dict(desconto=True, imagens=True),
+}
+
+# Diferenças menores que isto não contam como regressão (ruído de medição)
+TOLERANCIA_MS = 2.0
+TOLERANCIA_KB = 64.0
+
+
+# --------------------------------------------------------------------------- #
+# Execução dos casos
+# --------------------------------------------------------------------------- #
+_BYTES_TEMPLATE: dict[str, bytes] = {}
+
+
+def _bytes_template(path: str) -> bytes:
+    if path not in _BYTES_TEMPLATE:
+        with open(path, "rb") as fp:
+            _BYTES_TEMPLATE[path] = fp.read()
+    return _BYTES_TEMPLATE[path]
+
+
+def _executar(alvo: str, proposta, itens) -> int:
+    """Roda o alvo uma vez; devolve o tamanho da saída em bytes."""
+    colab = dict(nome_colaborador="Benchmark", email_colaborador="bench@exemplo.com",
+                 proposta_cod="BM01")
+    if alvo == "docx":
+        return len(gerar_proposta.gerar_proposta_docx(proposta, itens, "docx", **colab).getbuffer())
+    if alvo == "template_clone":
+        gerar_proposta._template_da_proposta(proposta).clone()
+        return 0
+    if alvo == "template_reabrir":
+        Document(io.BytesIO(_bytes_template(gerar_proposta._template_da_proposta(proposta).path)))
+        return 0
+    if alvo == "tabela":
+        doc = Document()
+        gerar_proposta._inserir_tabela_equipamentos(doc, itens, ancora=None)
+        buf = io.BytesIO()
+        doc.save(buf)
+        return buf.tell()
+    renderizador = "nativo" if alvo == "pdf_nativo" else "libreoffice"
+    return len(gerar_proposta.gerar_proposta_docx(
+        proposta, itens, "pdf", renderizador=renderizador, **colab
+    ).getbuffer())
+
+
+def medir(alvo: str, proposta, itens, repeticoes: int) -> dict:
+    _executar(alvo, proposta, itens)  # aquecimento: template, imagens, pool
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = _executar(alvo, proposta, itens)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    try:
+        _executar(alvo, proposta, itens)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "tempo_ms": round(statistics.median(tempos), 3),
+        "tempo_min_ms": round(min(tempos), 3),
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "tamanho_bytes": tamanho,
+    }
+
+
+def casos(alvos, itens, variantes):
+    for alvo in alvos:
+        if alvo in SEM_ITENS:
+            yield alvo, alvo, next(iter(variantes)), min(itens)
+            continue
+        for nome in variantes:
+            for n in itens:
+                yield f"{alvo}/{nome}/{n}", alvo, nome, n
+
+
+def rodar(alvos=ALVOS, itens=ITENS, variantes=tuple(VARIANTES), repeticoes: int = 3,
+          saida=sys.stdout) -> dict:
+    if "pdf_libreoffice" in alvos and not pdf_converter._soffice_bin():
+        print("LibreOffice não encontrado: pdf_libreoffice ignorado", file=saida)
+        alvos = [a for a in alvos if a != "pdf_libreoffice"]
+
+    resultados = {}
+    index_original = image_index.index
+    with tempfile.TemporaryDirectory(prefix="bench_propostas_") as tmp:
+        imagens = criar_imagens(tmp)
+        image_index.index = image_index.ImageIndex(tmp)
+        image_index.cache.descartar()
+        try:
+            proposta = proposta_sintetica()
+            for caso, alvo, variante, n in casos(alvos, itens, variantes):
+                cfg = VARIANTES[variante]
+                lista = itens_sinteticos(
+                    n, desconto=cfg["desconto"], imagens=imagens if cfg["imagens"] else None
+                )
+                resultados[caso] = medir(alvo, proposta, lista, repeticoes)
+                r = resultados[caso]
+                print(f"{caso:<32} {r['tempo_ms']:>10.1f} ms {r['memoria_pico_kb']:>10.0f} KB "
+                      f"{r['tamanho_bytes']:>10} B", file=saida)
+        finally:
+            image_index.index = index_original
+            image_index.cache.descartar()
+            if "pdf_libreoffice" in alvos:
+                pdf_converter.obter_pool().shutdown()
+
+    return {
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "repeticoes": repeticoes,
+        "casos": resultados,
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Baseline
+# --------------------------------------------------------------------------- #
+def comparar(atual: dict, baseline: dict, limite: float) -> list[dict]:
+    """Casos em que tempo ou memória pioraram mais que ``limite`` (ex.: 0.2 = 20%)."""
+    regressoes = []
+    base_casos = baseline.get("casos", {})
+    for caso, r in atual.get("casos", {}).items():
+        b = base_casos.get(caso)
+        if b is None:
+            continue
+        for metrica, tolerancia in (("tempo_ms", TOLERANCIA_MS), ("memoria_pico_kb", TOLERANCIA_KB)):
+            antes, depois = b.get(metrica), r.get(metrica)
+            if not antes or depois is None:
+                continue
+            if depois > antes * (1 + limite) and depois - antes > tolerancia:
+                regressoes.append({
+                    "caso": caso,
+                    "metrica": metrica,
+                    "baseline": antes,
+                    "atual": depois,
+                    "variacao": round(depois / antes - 1, 3),
+                })
+    return regressoes
+
+
+def carregar(path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def salvar(path: str, dados: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump(dados, fp, indent=2, sort_keys=True, ensure_ascii=False)
+        fp.write("\n")
+
+
+def _lista(texto: str, tipo=str) -> list:
+    return [tipo(p.strip()) for p in texto.split(",") if p.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alvos", default=",".join(ALVOS))
+    parser.add_argument("--itens", default=",".join(map(str, ITENS)))
+    parser.add_argument("--variantes", default=",".join(VARIANTES))
+    parser.add_argument("-r", "--repeticoes", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PADRAO)
+    parser.add_argument("--limite", type=float, default=0.2,
+                        help="piora relativa tolerada antes de acusar regressão (0.2 = 20%%)")
+    parser.add_argument("--saida", help="grava o resultado desta execução neste JSON")
+    parser.add_argument("--salvar-baseline", action="store_true",
+                        help="substitui a baseline pelo resultado desta execução")
+    args = parser.parse_args(argv)
+
+    alvos = _lista(args.alvos)
+    variantes = _lista(args.variantes)
+    invalidos = [a for a in alvos if a not in ALVOS] + [v for v in variantes if v not in VARIANTES]
+    if invalidos:
+        parser.error(f"opção desconhecida: {', '.join(invalidos)}")
+
+    atual = rodar(alvos, _lista(args.itens, int), variantes, args.repeticoes)
+    if args.saida:
+        salvar(args.saida, atual)
+
+    baseline = carregar(args.baseline)
+    if args.salvar_baseline:
+        if baseline:  # mantém casos que não foram rodados agora
+            atual = dict(atual, casos={**baseline.get("casos", {}), **atual["casos"]})
+        salvar(args.baseline, atual)
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"Sem baseline em {args.baseline} (use --salvar-baseline)")
+        return 0
+
+    regressoes = comparar(atual, baseline, args.limite)
+    for r in regressoes:
+        print(f"REGRESSÃO {r['caso']} {r['metrica']}: {r['baseline']} → {r['atual']} "
+              f"(+{r['variacao']:.0%})")
+    if not regressoes:
+        print(f"Nenhuma regressão acima de {args.limite:.0%} em relação à baseline.")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,83 +1,43 @@
 # blueprints/equipamentos/equipamentos.py
-import os
-import uuid
 from flask import (
+    abort,
+    current_app,
     render_template,
     redirect,
     url_for,
     flash,
     request,
     jsonify,
+    send_file,
 )
-from werkzeug.utils import secure_filename
-from PIL import Image, UnidentifiedImageError
 
 from . import equipamentos_bp
 from blueprints.auth import login_required
 from models import db, Equipment
 from forms import EquipmentForm
+from utils import derivados, image_index, imagens
 
-# Configurações de imagem
-ALLOWED_EXTS = {"png", "jpg", "jpeg", "webp"}
-TARGET_W, TARGET_H = 160, 180
-IMAGES_DIR = os.path.join("static", "images")
-
-
-def _ensure_images_dir():
-    os.makedirs(IMAGES_DIR, exist_ok=True)
-
-
-def _save_image_letterbox(file_storage, filename_hint="eq"):
-    """
-    Valida a extensão, abre a imagem e a salva como PNG 160x180,
-    usando letterbox (contain): sem cortes, centralizada e com
-    preenchimento transparente (ou branco, se preferir).
-    Retorna o caminho relativo "static/images/<arquivo>.png".
-    """
-    if not file_storage or not getattr(file_storage, "filename", ""):
-        raise ValueError("Nenhuma imagem enviada.")
-
-    # Extensão
-    _, ext = os.path.splitext(file_storage.filename)
-    ext = ext.lower().lstrip(".")
-    if ext not in ALLOWED_EXTS:
-        raise ValueError(
-            "Formato de imagem não aceito. Use PNG, JPG, JPEG ou WEBP."
-        )
-
-    # Abre com Pillow
-    try:
-        img = Image.open(file_storage.stream)
-    except UnidentifiedImageError:
-        raise ValueError("Arquivo de imagem inválido ou corrompido.")
-
-    # Converte para RGBA para manter transparência (se houver)
-    if img.mode not in ("RGB", "RGBA"):
-        img = img.convert("RGBA")
-
-    # Redimensiona para CABER (contain), sem cortar
-    img_copy = img.copy()
-    img_copy.thumbnail((TARGET_W, TARGET_H), Image.LANCZOS)
-
-    # Lona 160x180 — escolha o fundo:
-    # fundo transparente:
-    canvas = Image.new("RGBA", (TARGET_W, TARGET_H), (255, 255, 255, 0))
-    # (se preferir branco: (255,255,255,255))
-
-    # Centraliza
-    off_x = (TARGET_W - img_copy.width) // 2
-    off_y = (TARGET_H - img_copy.height) // 2
-    canvas.paste(img_copy, (off_x, off_y), img_copy if img_copy.mode == "RGBA" else None)
-
-    # Nome do arquivo final (PNG, compatível com Word/Docx)
-    _ensure_images_dir()
-    fname = f"{filename_hint}_{uuid.uuid4().hex}.png"
-    rel_path = os.path.join("static", "images", fname)
-    abs_path = os.path.join(IMAGES_DIR, fname)
-
-    # Salva otimizado
-    canvas.save(abs_path, format="PNG", optimize=True)
-    return rel_path  # guardamos caminho relativo (resolvido no gerador)
+# --------------------------------------------------------------------------- #
+# Derivados das imagens (miniaturas com nome por hash)
+# --------------------------------------------------------------------------- #
+@equipamentos_bp.app_template_global("imagem_derivada")
+def imagem_derivada(pth, perfil="lista"):
+    """URL da imagem ``pth`` no perfil; sem derivados, o arquivo em static/images."""
+    nome = derivados.nome(pth, perfil) if pth else None
+    if nome:
+        return url_for("equipamentos_bp.servir_derivado", perfil=perfil, nome=nome)
+    return url_for("static", filename=f"images/{pth or imagens.PLACEHOLDER}")
+
+
+@equipamentos_bp.route("/imagens/<perfil>/<nome>", methods=["GET"])
+def servir_derivado(perfil, nome):
+    # O nome muda junto com o conteúdo: pode ficar em cache para sempre
+    path = derivados.arquivo(perfil, nome)
+    if path is None:
+        abort(404)
+    resp = send_file(path, mimetype=derivados.mimetype(nome), conditional=True)
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
 
 
 # --------------------------------------------------------------------------- #
@@ -88,12 +48,15 @@ def _save_image_letterbox(file_storage, filename_hint="eq"):
 def cadastro_equipamentos():
     form = EquipmentForm()
     if form.validate_on_submit():
-        # Processa imagem (opcional)
+        app = current_app._get_current_object()
+        eq = Equipment()
+
+        # Imagem (opcional): grava o original e processa fora da requisição
         illustration = form.illustration.data
-        saved_path = None
+        origem = None
         if illustration and getattr(illustration, "filename", ""):
             try:
-                saved_path = _save_image_letterbox(illustration, filename_hint="eq")
+                origem = imagens.receber_upload(app, eq, illustration, filename_hint="eq")
             except ValueError as e:
                 flash(str(e), "danger")
                 # Mantém os dados preenchidos e não cria o registro
@@ -111,15 +74,14 @@ def cadastro_equipamentos():
         except ValueError:
             preco_float = 0.0
 
-        eq = Equipment(
-            name=form.name.data,
-            description=form.description.data,
-            unit_price=preco_float,
-            quantity=int(form.quantity.data),
-            illustration_path=saved_path,  # já relativo a static/images
-        )
+        eq.name = form.name.data
+        eq.description = form.description.data
+        eq.unit_price = preco_float
+        eq.quantity = int(form.quantity.data)
         db.session.add(eq)
         db.session.commit()
+        if origem:
+            imagens.agendar(app, eq.id, origem)
         flash("Equipamento cadastrado com sucesso.", "success")
         return redirect(url_for("equipamentos_bp.cadastro_equipamentos"))
 
@@ -146,6 +108,9 @@ def get_equipamento(id):
             "imagem": eq.illustration_path or "",
             "preco": eq.unit_price,
             "quantidade": eq.quantity,
+            "miniatura": imagem_derivada(eq.illustration_path, "lista"),
+            "miniatura_2x": imagem_derivada(eq.illustration_path, "lista2x"),
+            **imagens.status_json(eq),
         }
     )
 
@@ -177,42 +142,36 @@ def upload_imagem_equipamento(id):
     if not imagem:
         return jsonify({"success": False, "error": "Nenhuma imagem enviada."}), 400
 
+    app = current_app._get_current_object()
     try:
-        new_rel_path = _save_image_letterbox(imagem, filename_hint=f"eq{id}")
+        origem = imagens.receber_upload(app, eq, imagem, filename_hint=f"eq{id}")
     except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-    # Remove a antiga (se estiver em static/images)
-    old_rel = eq.illustration_path
-    eq.illustration_path = new_rel_path
+    # Até o processamento terminar o equipamento aponta para o placeholder; a
+    # imagem antiga só é apagada quando a nova fica pronta (imagens._concluir)
     db.session.commit()
+    # a resposta descreve o upload recebido, mesmo que o worker conclua antes dela
+    resposta = {"success": True, "imagem": eq.illustration_path, **imagens.status_json(eq)}
+    imagens.agendar(app, id, origem)
 
-    try:
-        if old_rel and old_rel.startswith("static/images"):
-            old_abs = os.path.join(os.getcwd(), old_rel)
-            if os.path.exists(old_abs):
-                os.remove(old_abs)
-    except Exception:
-        # falha de limpeza não deve quebrar o fluxo
-        pass
-
-    return jsonify({"success": True, "imagem": new_rel_path})
+    return jsonify(resposta), 202
 
 
 @equipamentos_bp.route("/equipamentos/<int:id>", methods=["DELETE"])
 @login_required
 def excluir_equipamento(id):
     eq = Equipment.query.get_or_404(id)
-
-    # Apaga imagem associada
-    try:
-        if eq.illustration_path and eq.illustration_path.startswith("static/images"):
-            abs_path = os.path.join(os.getcwd(), eq.illustration_path)
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
-    except Exception:
-        pass
+    antigas = [eq.illustration_path, eq.imagem_anterior]
 
     db.session.delete(eq)
     db.session.commit()
+
+    # Apaga as imagens associadas (se não forem compartilhadas com outro equipamento)
+    for rel in antigas:
+        try:
+            imagens.remover_se_orfa(current_app, rel)
+        except Exception:
+            current_app.logger.exception("Não foi possível remover a imagem %s", rel)
+    image_index.invalidar()
     return jsonify({"success": True})
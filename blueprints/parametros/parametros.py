@@ -1,6 +1,7 @@
 # blueprints/parametros/parametros.py
 """
-CRUD de parâmetros de proposta (visível a administradores e gestores).
+CRUD de parâmetros de proposta (visível a administradores e gestores) e
+escolha do renderizador de PDF de cada template (só administradores).
 """
 
 from functools import wraps
@@ -9,11 +10,13 @@ from flask import (
     request, session
 )
 
-from blueprints.auth import login_required          # ← usa seu decorator
+from blueprints.auth import login_required, admin_required   # ← usa seu decorator
 from blueprints.parametros import parametros_bp
 
-from models import db, ParamOption, ParamCategory, User
-from forms import ParamOptionForm
+from models import db, ParamOption, ParamCategory, User, TemplateConfig
+from forms import ParamOptionForm, TemplateRendererForm
+from utils import renderizadores
+from utils.docx_templates import registry as templates_registry
 
 
 # ------------------------------------------------------------------
@@ -72,3 +75,35 @@ def deletar_parametro(id):
     db.session.commit()
     flash('Opção removida.', 'info')
     return redirect(url_for('.listar_parametros'))
+
+
+# ------------------------------------------------------------------
+# Renderizador de PDF por template (LibreOffice × nativo)
+# ------------------------------------------------------------------
+@parametros_bp.route('/parametros/templates', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def renderizadores_templates():
+    arquivos = templates_registry.arquivos()
+    form = TemplateRendererForm()
+    form.renderizador.choices = list(renderizadores.OPCOES.items())
+
+    if form.validate_on_submit():
+        if form.arquivo.data not in arquivos:
+            flash('Template não encontrado.', 'danger')
+        else:
+            renderizadores.definir_renderizador(
+                form.arquivo.data, form.renderizador.data, session.get("usuario_id")
+            )
+            flash('Renderizador atualizado.', 'success')
+        return redirect(url_for('.renderizadores_templates'))
+
+    configs = {c.arquivo: c for c in TemplateConfig.query.all()}
+    return render_template(
+        'admin_templates.html',
+        form=form,
+        arquivos=arquivos,
+        configs=configs,
+        opcoes=renderizadores.OPCOES,
+        padrao=renderizadores.PADRAO,
+    )
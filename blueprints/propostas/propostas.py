@@ -3,10 +3,9 @@
 #  IMPORTS E CONFIGURAÇÃO GERAL
 # ===========================================================
 from datetime import datetime, timezone
-from email.message import EmailMessage
+import io
 import re
-import smtplib
-from typing import Sequence
+import time
 
 from flask import (
     current_app, render_template, redirect, url_for, flash,
@@ -16,14 +15,14 @@ from flask import (
 from . import propostas_bp
 from blueprints.auth import login_required
 from models import (
-    db, Equipment, Proposal, User,
+    db, EmailOutbox, Equipment, Proposal, User,
     ParamOption, ParamCategory,
     ServicoType, ModalidadeType
 )
 from forms import ProposalForm, cnpj_valido
-from gerar_proposta import gerar_proposta_docx
+from gerar_proposta import chave_render, gerar_proposta_docx, renderizar_proposta
+from utils import artifact_store, clientes, email_outbox, exportacao, mx_cache, render_jobs, tempos_render
 from utils.timezone import get_local_timezone
-import dns.resolver
 
 LOCAL_TZ = get_local_timezone()
 
@@ -31,12 +30,23 @@ LOCAL_TZ = get_local_timezone()
 #  HELPERS
 # ===========================================================
 def email_domain_has_mx(email: str) -> bool:
-    try:
-        domain = email.split("@")[-1]
-        dns.resolver.resolve(domain, "MX")
-        return True
-    except Exception:
-        return False
+    # cache com TTL compartilhado (ver utils.mx_cache / rota /api/mx/<dominio>)
+    return mx_cache.dominio_tem_mx(email)
+
+
+def _mx_validado(email: str) -> bool | None:
+    """MX já verificado por /api/validar_cliente nesta sessão (``None`` = consultar)."""
+    validacao = session.get("validacao_cliente") or {}
+    dominio = mx_cache.normalizar_dominio(email)
+    validade = current_app.config.get("VALIDACAO_CLIENTE_VALIDADE", 300)
+    if (not dominio or validacao.get("dominio") != dominio
+            or time.time() - validacao.get("em", 0) > validade):
+        return None
+    return validacao.get("mx")
+
+
+def _requisicao_ajax() -> bool:
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
 
 def _usuario_atual():
@@ -99,27 +109,52 @@ def _fill_selects(form: ProposalForm):
     form.garantia_sys.choices  = opts(ParamCategory.GARANTIA_SYS)
 
 
-def _gerar_pdf_stream(proposta, equipamentos):
+def _pdf_da_proposta(proposta, equipamentos):
+    """PDF da proposta: caminho no ``ArtifactStore`` ou buffer em memória.
+
+    Devolver o caminho deixa o ``send_file`` enviar direto do arquivo (sem
+    carregar o PDF inteiro na memória da requisição).
+    """
     nome_colab, email_colab = _dados_colaborador()
-    cod = proposta.filename.split()[-1]
-    return gerar_proposta_docx(
-        proposta, equipamentos,
-        formato="pdf",
+    colab = dict(
         nome_colaborador=nome_colab,
         email_colaborador=email_colab,
-        proposta_cod=cod,
+        proposta_cod=proposta.filename.split()[-1],
     )
 
+    store = artifact_store.obter_store()
+    if store is None:
+        return gerar_proposta_docx(proposta, equipamentos, formato="pdf", **colab)
+
+    # Mesmo conteúdo → mesma chave: serve o PDF já gerado
+    with tempos_render.etapa("cache"):
+        chave = chave_render(proposta, equipamentos, **colab)
+        caminho = store.path(chave, "pdf")
+    if caminho is not None:
+        return caminho
+
+    artefatos = renderizar_proposta(proposta, equipamentos, **colab)
+    try:
+        store.put(chave, artefatos)
+    except OSError:
+        current_app.logger.warning("Não foi possível gravar o PDF no cache", exc_info=True)
+    return io.BytesIO(artefatos["pdf"])
+
 
 def _gerar_e_enviar_pdf(proposta, equipamentos):
-    output = _gerar_pdf_stream(proposta, equipamentos)
-    return send_file(
+    with tempos_render.medir_render() as tempos:
+        output = _pdf_da_proposta(proposta, equipamentos)
+    resp = send_file(
         output,
+        mimetype="application/pdf",
         download_name=f"{proposta.filename}.pdf",
         as_attachment=False,
     )
+    resp.headers["Server-Timing"] = tempos_render.server_timing(tempos)
+    return resp
 
 
+EXPORT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
 EMAIL_SPLIT_RE = re.compile(r"[;,\n]+")
 
 
@@ -140,75 +175,6 @@ def _parse_emails_list(raw: str) -> list[str]:
     return emails
 
 
-def _enviar_email_proposta(
-    proposta: Proposal,
-    equipamentos: Sequence[Equipment],
-    corpo_email: str,
-    cc_list: Sequence[str],
-):
-    config = current_app.config
-    host = config.get("MAIL_SERVER") or config.get("EMAIL_SMTP_SERVER")
-    if not host:
-        raise RuntimeError("Configuração MAIL_SERVER ausente para envio de e-mail.")
-
-    sender = config.get("MAIL_SENDER") or config.get("MAIL_DEFAULT_SENDER")
-    if not sender:
-        raise RuntimeError("Configuração MAIL_SENDER ausente para envio de e-mail.")
-
-    use_ssl = bool(config.get("MAIL_USE_SSL", False))
-    use_tls = bool(config.get("MAIL_USE_TLS", not use_ssl))
-    port = config.get("MAIL_PORT")
-    if not port:
-        port = 465 if use_ssl else (587 if use_tls else 25)
-
-    username = config.get("MAIL_USERNAME")
-    password = config.get("MAIL_PASSWORD")
-
-    pdf_stream = _gerar_pdf_stream(proposta, equipamentos)
-    pdf_stream.seek(0)
-    attachment = pdf_stream.read()
-
-    msg = EmailMessage()
-    msg["Subject"] = proposta.filename or "Proposta Comercial"
-    msg["From"] = sender
-    msg["To"] = proposta.email
-    if cc_list:
-        msg["Cc"] = ", ".join(cc_list)
-    reply_to = config.get("MAIL_REPLY_TO")
-    if reply_to:
-        msg["Reply-To"] = reply_to
-
-    corpo = corpo_email.strip() or (
-        f"Olá {proposta.client_name},\n\n"
-        "Segue em anexo a proposta comercial referente ao nosso atendimento.\n\n"
-        "Fico à disposição para dúvidas."
-    )
-    msg.set_content(corpo)
-
-    msg.add_attachment(
-        attachment,
-        maintype="application",
-        subtype="pdf",
-        filename=f"{proposta.filename}.pdf",
-    )
-
-    if use_ssl:
-        server = smtplib.SMTP_SSL(host, port)
-    else:
-        server = smtplib.SMTP(host, port)
-
-    try:
-        if use_tls and not use_ssl:
-            server.starttls()
-        if username:
-            server.login(username, password or "")
-        server.send_message(msg)
-    finally:
-        try:
-            server.quit()
-        except Exception:
-            pass
-
 # ===========================================================
 #  NOVA PROPOSTA
 # ===========================================================
@@ -233,7 +199,10 @@ def nova_proposta():                    # ← NENHUM espaço antes desta linha
     if form.validate_on_submit():
         # Validação rápida do domínio de e-mail
         email = form.email.data.strip()
-        if not email_domain_has_mx(email):
+        tem_mx = _mx_validado(email)
+        if tem_mx is None:
+            tem_mx = email_domain_has_mx(email)
+        if not tem_mx:
             flash("Domínio de e-mail sem registro MX.", "danger")
             return render_template(
                 "nova_proposta.html",
@@ -308,6 +277,7 @@ def nova_proposta():                    # ← NENHUM espaço antes desta linha
             email_cc=cc_raw if enviar_email else "",
         )
         db.session.add(proposta)
+        clientes.registrar_proposta(proposta)
         db.session.commit()  # garante ID para usar nos buffers
 
         # ----------------------------------------------------------
@@ -349,15 +319,39 @@ def nova_proposta():                    # ← NENHUM espaço antes desta linha
         )
 
         acao = request.form.get("acao")
+        if acao in ("baixar", "visualizar") and _requisicao_ajax():
+            # Geração assíncrona: a tela acompanha o job em /api/render_jobs/<id>
+            job = render_jobs.enfileirar(
+                proposta, eqs,
+                usuario_id=usuario_logado.id,
+                nome_colaborador=user.nome_completo or "",
+                email_colaborador=user.email or "",
+                proposta_cod=filename.split()[-1],
+            )
+            _limpar_buffers_proposta()
+            return jsonify(
+                job_id=job.id,
+                status=job.status,
+                status_url=url_for("api_bp.status_render_job", job_id=job.id),
+                result_url=url_for("api_bp.resultado_render_job", job_id=job.id),
+            ), 202
         if acao == "baixar":
             return redirect(url_for("propostas_bp.baixar_proposta"))
         if acao == "visualizar":
             return redirect(url_for("propostas_bp.visualizar_proposta"))
         if acao == "enviar_email" and enviar_email:
+            # O envio (PDF + SMTP) fica com o despachante da fila de e-mails;
+            # o status aparece no histórico de propostas.
             try:
-                _enviar_email_proposta(proposta, eqs, corpo_email, cc_list)
-            except Exception as exc:
-                current_app.logger.exception("Falha ao enviar e-mail da proposta")
+                email_outbox.enfileirar(
+                    proposta, eqs, corpo_email, cc_list,
+                    usuario_id=usuario_logado.id,
+                    nome_colaborador=user.nome_completo or "",
+                    email_colaborador=user.email or "",
+                    proposta_cod=filename.split()[-1],
+                )
+            except RuntimeError as exc:   # SMTP não configurado
+                current_app.logger.error("E-mail da proposta não enfileirado: %s", exc)
                 flash(f"Não foi possível enviar o e-mail: {exc}", "danger")
                 return render_template(
                     "nova_proposta.html",
@@ -366,7 +360,7 @@ def nova_proposta():                    # ← NENHUM espaço antes desta linha
                     form_data=request.form,
                 )
             _limpar_buffers_proposta()
-            flash("Proposta enviada por e-mail com sucesso.", "success")
+            flash("Proposta criada; o e-mail foi colocado na fila de envio.", "success")
             return redirect(url_for("propostas_bp.nova_proposta"))
 
         flash("Proposta criada com sucesso.", "success")
@@ -510,6 +504,7 @@ def editar_proposta(id):
                     pass
             prop.equipamentos.append(eq)
 
+        clientes.registrar_proposta(prop)
         db.session.commit()
         return jsonify({"success": True})
 
@@ -560,15 +555,13 @@ def excluir_proposta(id):
     return redirect(url_for("propostas_bp.historico_propostas"))
 
 
-@propostas_bp.route("/historico_propostas")
-@login_required
-def historico_propostas():
+def _consulta_historico(args):
+    """Aplica os filtros do histórico (data, usuário, serviço, modalidade)."""
     tipo = session.get("tipo")
-    data_filter = request.args.get("data")
-    page = request.args.get("page", 1, type=int)
-    serv_filter = request.args.get("servico_type")
-    mod_filter = request.args.get("modalidade_type")
-    user_filter = request.args.get("usuario_id", type=int)
+    data_filter = args.get("data")
+    serv_filter = args.get("servico_type")
+    mod_filter = args.get("modalidade_type")
+    user_filter = args.get("usuario_id", type=int)
 
     q = Proposal.query
     if tipo not in ["admin", "gestor"]:
@@ -587,7 +580,19 @@ def historico_propostas():
         q = q.filter_by(servico_type=ServicoType[serv_filter])
     if mod_filter:
         q = q.filter_by(modalidade_type=ModalidadeType[mod_filter])
+    return q
+
 
+@propostas_bp.route("/historico_propostas")
+@login_required
+def historico_propostas():
+    data_filter = request.args.get("data")
+    page = request.args.get("page", 1, type=int)
+    serv_filter = request.args.get("servico_type")
+    mod_filter = request.args.get("modalidade_type")
+    user_filter = request.args.get("usuario_id", type=int)
+
+    q = _consulta_historico(request.args)
     propostas = q.order_by(Proposal.data_criacao.desc()).paginate(page=page, per_page=10)
 
     # Ajuste de fuso horário
@@ -602,6 +607,8 @@ def historico_propostas():
         User.query.filter(User.tipo != "admin").order_by(User.nome_completo).all()
     )
 
+    emails = email_outbox.ultimos_por_proposta(p.id for p in propostas.items)
+
     # >>> envia a lista de equipamentos para o modal de edição
     equipamentos_disp = Equipment.query.order_by(Equipment.name).all()
 
@@ -618,4 +625,81 @@ def historico_propostas():
         ParamOption=ParamOption,
         ParamCategory=ParamCategory,
         equipments=equipamentos_disp,  # <<< necessário para popular o <select> do modal
+        emails=emails,
+        EmailOutbox=EmailOutbox,
     )
+
+
+@propostas_bp.route("/reenviar_email/<int:id>", methods=["POST"])
+@login_required
+def reenviar_email(id):
+    prop = Proposal.query.get_or_404(id)
+    if session.get("tipo") not in ["admin", "gestor"] and prop.usuario_id != session.get("usuario_id"):
+        return jsonify({"error": "Acesso não autorizado."}), 403
+
+    email = email_outbox.ultimos_por_proposta([prop.id]).get(prop.id)
+    if email is None or email.status != EmailOutbox.FALHOU:
+        flash("Não há e-mail com falha para reenviar.", "warning")
+    else:
+        email_outbox.reenviar(email)
+        flash("E-mail recolocado na fila de envio.", "success")
+    return redirect(request.referrer or url_for("propostas_bp.historico_propostas"))
+
+
+# ===========================================================
+#  EXPORTAÇÃO EM LOTE (ZIP de PDFs)
+# ===========================================================
+@propostas_bp.route("/exportar_propostas")
+@login_required
+def exportar_propostas():
+    filtros = {k: v for k, v in request.args.items() if k != "export_id" and v}
+    props = (_consulta_historico(request.args)
+             .order_by(Proposal.data_criacao.desc()).all())
+
+    limite = current_app.config.get("EXPORT_MAX_PROPOSTAS", 500)
+    if not props:
+        flash("Nenhuma proposta encontrada para exportar.", "warning")
+        return redirect(url_for("propostas_bp.historico_propostas", **filtros))
+    if len(props) > limite:
+        flash(f"Refine os filtros: no máximo {limite} propostas por exportação.", "warning")
+        return redirect(url_for("propostas_bp.historico_propostas", **filtros))
+
+    tarefas = []
+    for prop in props:
+        usr = prop.usuario
+        tarefas.append(exportacao.montar_tarefa(
+            prop, prop.equipamentos.all(),
+            nome_colaborador=(usr.nome_completo or "") if usr else "",
+            email_colaborador=(usr.email or "") if usr else "",
+            proposta_cod=prop.filename.split()[-1] if prop.filename else "",
+        ))
+
+    export_id = request.args.get("export_id", "")
+    prog = exportacao.novo_progresso(
+        len(tarefas), export_id if EXPORT_ID_RE.match(export_id) else None
+    )
+    corpo = exportacao.stream_zip(
+        tarefas,
+        executor=exportacao.obter_executor(current_app),
+        progresso=prog,
+        store=artifact_store.obter_store(),
+        janela=2 * exportacao.num_processos(current_app),
+    )
+
+    nome = f"propostas_{datetime.now(LOCAL_TZ):%Y%m%d_%H%M}.zip"
+    resp = current_app.response_class(corpo, mimetype="application/zip")
+    resp.headers["Content-Disposition"] = f'attachment; filename="{nome}"'
+    resp.headers["X-Export-Id"] = prog.id
+    resp.headers["X-Export-Progress"] = url_for(
+        "propostas_bp.progresso_exportacao", export_id=prog.id
+    )
+    return resp
+
+
+@propostas_bp.route("/exportar_propostas/<export_id>/progresso")
+@login_required
+def progresso_exportacao(export_id):
+    prog = exportacao.progresso(export_id)
+    if prog is None:
+        return jsonify(error="Exportação não encontrada."), 404
+    return jsonify(prog.to_json())
@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField, PasswordField, SelectField, SelectMultipleField,
-    TextAreaField, SubmitField, IntegerField, BooleanField
+    TextAreaField, SubmitField, IntegerField, BooleanField, HiddenField
 )
 from wtforms.validators import (
     DataRequired, NumberRange, Email, ValidationError, Optional
@@ -142,3 +142,11 @@ class ParamOptionForm(FlaskForm):
     )
     label    = StringField('Valor', validators=[DataRequired()])
     submit   = SubmitField('Salvar')
+
+# =========================
+#  Renderizador dos Templates
+# =========================
+class TemplateRendererForm(FlaskForm):
+    arquivo      = HiddenField(validators=[DataRequired()])
+    renderizador = SelectField('Renderizador de PDF', coerce=str)
+    submit       = SubmitField('Salvar')
@@ -1,15 +1,17 @@
 # gerar_proposta.py
-from docx import Document
-import io, os, uuid
+import copy, io, logging, os, uuid
 from tempfile import TemporaryDirectory
-from shutil import copyfile
 from docx.shared import Inches
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.enum.table import WD_ALIGN_VERTICAL
-from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-import docx.opc.constants
-import subprocess, shutil  # para converter via LibreOffice no Linux/macOS
+
+from utils import derivados, image_index, pdf_nativo, renderizadores
+from utils.tempos_render import etapa, medir_render
+from utils.artifact_store import hash_conteudo
+from utils.docx_campos import iter_paragrafos, substituir_campos
+from utils.docx_templates import obter_template
+from utils.pdf_converter import converter_docx_para_pdf
 
 # ─── helpers PDF ─────────────────────────────────────────────────────────────
 try:
@@ -27,6 +29,10 @@ except ImportError:
     _PDFKIT_AVAILABLE = False
 # ─────────────────────────────────────────────────────────────────────────────
 
+log = logging.getLogger(__name__)
+
+W_R = qn("w:r")
+
 # Base do projeto (para resolver caminhos relativos de imagens)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -35,64 +41,10 @@ def _resolve_img_path(pth: str):
     """
     Resolve um caminho absoluto para a imagem do equipamento,
     normalizando separadores e tentando algumas pastas comuns
-    (CWD, BASE_DIR, BASE_DIR/static[/images]).
+    (CWD, BASE_DIR, BASE_DIR/static[/images]). Consulta o índice de
+    ``static/images`` antes de ir ao disco (ver ``utils.image_index``).
     """
-    if not pth:
-        return None
-
-    text = str(pth).strip()
-    if not text:
-        return None
-
-    # Se já for absoluto e existir, ok
-    if os.path.isabs(text) and os.path.exists(text):
-        return text
-
-    # Normaliza separadores vindos de Windows e remove prefixos redundantes
-    normalized = text.replace("\\", "/").lstrip("/")
-    parts = [p for p in normalized.split("/") if p and p not in (".", "..")]
-
-    trimmed = parts[:]
-    if trimmed and trimmed[0].lower() == "static":
-        trimmed = trimmed[1:]
-    if trimmed and trimmed[0].lower() == "images":
-        trimmed = trimmed[1:]
-
-    joined = os.path.join(*parts) if parts else ""
-    trimmed_joined = os.path.join(*trimmed) if trimmed else ""
-    basename = trimmed[-1] if trimmed else (parts[-1] if parts else "")
-
-    candidates = []
-    seen_rel = set()
-    for rel in (joined, trimmed_joined):
-        if not rel or rel in seen_rel:
-            continue
-        seen_rel.add(rel)
-        candidates.extend([
-            rel,
-            os.path.join(os.getcwd(), rel),
-            os.path.join(BASE_DIR, rel),
-        ])
-
-    if trimmed_joined:
-        candidates.extend([
-            os.path.join(BASE_DIR, "static", trimmed_joined),
-            os.path.join(BASE_DIR, "static", "images", trimmed_joined),
-        ])
-
-    if basename:
-        candidates.append(os.path.join(BASE_DIR, "static", "images", basename))
-
-    seen = set()
-    for candidate in candidates:
-        candidate_path = os.path.normpath(candidate)
-        if candidate_path in seen:
-            continue
-        seen.add(candidate_path)
-        if os.path.exists(candidate_path):
-            return os.path.abspath(candidate_path)
-
-    return None
+    return image_index.resolver(pth)
 
 
 # --------------------------------------------------------------------------- #
@@ -108,117 +60,58 @@ def _valid_phone(digits: str) -> bool:
     return len(digits) >= 12
 
 
-def _add_hyperlink(paragraph, url, text):
-    """Insere hyperlink preservando estilo."""
-    part = paragraph.part
-    r_id = part.relate_to(
-        url,
-        docx.opc.constants.RELATIONSHIP_TYPE.HYPERLINK,
-        is_external=True,
-    )
-    hl = OxmlElement("w:hyperlink")
-    hl.set(qn("r:id"), r_id)
-
-    new_run = OxmlElement("w:r")
-    rPr = OxmlElement("w:rPr")  # mantém formatação corrente
-    new_run.append(rPr)
-    t = OxmlElement("w:t")
-    t.text = text
-    new_run.append(t)
-    hl.append(new_run)
-    paragraph._p.append(hl)
-    return hl
-
-
-def _linkify_phone(doc: Document, raw_phone: str, digits: str):
-    """Procura texto 'Telefone: <raw_phone>' e transforma em link WhatsApp."""
-    wa_url = f"https://wa.me/{digits}"
-    for para in doc.paragraphs:
-        if raw_phone in para.text:
-            # divide texto mantendo prefixo/sufixo
-            parts = para.text.split(raw_phone)
-            # limpa runs
-            for r in para.runs:
-                r.text = ""
-            # reconstrói com hyperlink no meio
-            if parts[0]:
-                para.add_run(parts[0])
-            _add_hyperlink(para, wa_url, raw_phone)
-            if len(parts) > 1 and parts[1]:
-                para.add_run(parts[1])
-            break
+def _wa_url(digits: str) -> str:
+    return f"https://wa.me/{digits}"
 
 
 # --------------------------------------------------------------------------- #
 # Substituição de {{ campos }}
 # --------------------------------------------------------------------------- #
-def _substituir_campos(doc, mapa):
-    for p in doc.paragraphs:
-        _replace(p, mapa)
-    for t in doc.tables:
-        for row in t.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    _replace(p, mapa)
-
-
-def _replace(paragraph, mapa):
-    txt = paragraph.text
-    for k, v in mapa.items():
-        token = f"{{{{ {k} }}}}"
-        if token in txt:
-            txt = txt.replace(token, str(v))
-    if txt != paragraph.text:
-        for r in paragraph.runs:
-            r.text = ""
-        (paragraph.runs[0] if paragraph.runs else paragraph.add_run()).text = txt
+def _substituir_campos(doc, mapa, paragrafos=None, *, link=None):
+    """
+    Substitui os campos do documento numa única passada (ver
+    ``utils.docx_campos``). Se ``paragrafos`` vier do registro de templates
+    (já sabemos onde estão os campos), só eles são visitados; sem ele,
+    percorre corpo, cabeçalhos, rodapés e tabelas aninhadas.
+
+    ``link=(telefone, url)`` aplica o link do WhatsApp na mesma passada.
+    """
+    if paragrafos is None:
+        paragrafos = iter_paragrafos(doc)
+    substituir_campos(paragrafos, mapa, link=link)
 
 
 # --------------------------------------------------------------------------- #
 # Tabela de equipamentos
 # --------------------------------------------------------------------------- #
-def _inserir_tabela_equipamentos(doc, equipamentos):
+_BUSCAR_ANCORA = object()
+
+
+def _carregar_imagem(pth):
+    with etapa("imagens"):
+        # fotos grandes entram no DOCX já reduzidas (perfil "docx")
+        return image_index.carregar(derivados.para_docx(pth))
+
+
+def _dados_tabela(equipamentos):
     """
-    Cria tabela, adiciona coluna de desconto só se houver, e insere após a
-    âncora 'INVESTIMENTO' (tolerante: aceita 'INVESTIMENTO:' e
-    'INVESTIMENTO (AQUISIÇÃO):', case-insensitive).
+    Conteúdo da tabela de investimento, compartilhado pelo DOCX e pelo PDF
+    nativo: ``(cabecalho, linhas, colunas_centralizadas)``. A coluna de
+    desconto só existe se algum item tiver desconto; a célula de imagem é
+    uma ``ImagemCacheada`` (ou ``None`` se o item não tiver imagem).
     """
     # há algum item com desconto?
     has_discount = any((getattr(eq, "discount_percent", 0) or 0) != 0 for eq in equipamentos)
 
-    # procura âncora
-    texto_alvo = ("INVESTIMENTO:", "INVESTIMENTO (AQUISIÇÃO):")
-    anchor_i = next(
-        (i for i, p in enumerate(doc.paragraphs)
-         if any(t in (p.text or "").upper() for t in texto_alvo)),
-        None
-    )
-
-    # cria a tabela (por padrão, vai para o fim)
-    cols = 6 if has_discount else 5
-    table = doc.add_table(rows=1, cols=cols)
-    table.style = "Table Grid"
-
-    hdr = table.rows[0].cells
-    hdr[0].text = "Descrição"
-    hdr[1].text = "Imagem"
-    hdr[2].text = "Quantidade"
-    hdr[3].text = "Preço Unitário"
+    cabecalho = ["Descrição", "Imagem", "Quantidade", "Preço Unitário"]
     if has_discount:
-        hdr[4].text = "Preço c/ desconto"
-        hdr[5].text = "Total"
+        cabecalho += ["Preço c/ desconto", "Total"]
         cent_cols = (1, 2, 3, 4, 5)
     else:
-        hdr[4].text = "Total"
+        cabecalho += ["Total"]
         cent_cols = (1, 2, 3, 4)
 
-    # centraliza cabeçalho
-    for c in hdr:
-        c.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-        for p in c.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-    # linhas
+    linhas = []
     for eq in equipamentos:
         pct   = float(getattr(eq, "discount_percent", 0) or 0.0)
         cheio = float(getattr(eq, "unit_price", 0) or 0.0)
@@ -226,36 +119,102 @@ def _inserir_tabela_equipamentos(doc, equipamentos):
         desc  = cheio * (1 - pct/100.0)
         sub   = desc * qtd
 
-        row = table.add_row().cells
-        row[0].text = (getattr(eq, "description", None) or getattr(eq, "name", "") or "")
-
-        # imagem (resolve caminho absoluto de forma robusta)
-        img_path = _resolve_img_path(getattr(eq, "illustration_path", None))
-        if img_path:
-            run = row[1].paragraphs[0].add_run()
-            # 160 px ~ 1.67" @96dpi (a imagem já vem cortada para 160x180 pelo upload)
-            run.add_picture(img_path, width=Inches(1.67))
+        linha = [
+            getattr(eq, "description", None) or getattr(eq, "name", "") or "",
+            # imagem (resolve caminho absoluto de forma robusta)
+            _carregar_imagem(getattr(eq, "illustration_path", None)),
+            str(qtd),
+            _fmt(cheio),
+        ]
+        if has_discount:
+            linha += [_fmt(desc) if pct else "", _fmt(sub)]
         else:
-            row[1].text = "—"
+            linha += [_fmt(sub)]
+        linhas.append(linha)
 
-        row[2].text = str(qtd)
-        row[3].text = _fmt(cheio)
+    return cabecalho, linhas, cent_cols
 
-        if has_discount:
-            row[4].text = _fmt(desc) if pct else ""
-            row[5].text = _fmt(sub)
-        else:
-            row[4].text = _fmt(sub)
 
-        # centraliza colunas numéricas
-        for i in cent_cols:
-            row[i].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-            for p in row[i].paragraphs:
-                p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+def _linha_modelo(table, cent_cols):
+    """
+    ``w:tr`` com a mesma estrutura de ``table.add_row()`` + ``cell.text``:
+    larguras da grade, uma run vazia por célula e as colunas ``cent_cols``
+    centralizadas. É removida da tabela e serve de molde para as linhas.
+    """
+    row = table.add_row()
+    for i, cell in enumerate(row.cells):
+        p = cell.paragraphs[0]
+        p._p.add_r()
+        if i in cent_cols:
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    tr = row._tr
+    tr.getparent().remove(tr)
+    return tr
+
+
+def _inserir_tabela_equipamentos(doc, equipamentos, ancora=_BUSCAR_ANCORA, dados=None):
+    """
+    Cria tabela, adiciona coluna de desconto só se houver, e insere após a
+    âncora 'INVESTIMENTO' (tolerante: aceita 'INVESTIMENTO:' e
+    'INVESTIMENTO (AQUISIÇÃO):', case-insensitive).
+
+    ``ancora`` é o elemento ``w:p`` já localizado pelo registro de templates
+    (``None`` = template sem âncora); se omitido, a âncora é procurada aqui.
+    ``dados`` reaproveita o resultado de ``_dados_tabela``.
+
+    As linhas são cópias de uma linha-modelo (``_linha_modelo``) e as
+    imagens entram por ``InseridorImagens``, então o custo cresce linear com
+    o número de itens. Meta: 1000 itens com imagem em menos de 1 s
+    (``PROPOSTAS_BENCH=1 pytest tests/test_tabela_equipamentos.py``).
+    """
+    cabecalho, linhas, cent_cols = dados or _dados_tabela(equipamentos)
+
+    # procura âncora
+    if ancora is _BUSCAR_ANCORA:
+        texto_alvo = ("INVESTIMENTO:", "INVESTIMENTO (AQUISIÇÃO):")
+        ancora = next(
+            (p._element for p in doc.paragraphs
+             if any(t in (p.text or "").upper() for t in texto_alvo)),
+            None
+        )
+
+    # cria a tabela (por padrão, vai para o fim)
+    table = doc.add_table(rows=1, cols=len(cabecalho))
+    table.style = "Table Grid"
+
+    hdr = table.rows[0].cells
+    for c, titulo in zip(hdr, cabecalho):
+        c.text = titulo
+
+    # centraliza cabeçalho
+    for c in hdr:
+        c.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+        for p in c.paragraphs:
+            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # linhas: uma linha-modelo já formatada é clonada para cada item, e o
+    # texto/imagem vai direto nas runs (sem recalcular a grade da tabela)
+    modelo = _linha_modelo(table, cent_cols)
+    imagens = image_index.InseridorImagens(doc, width=Inches(1.67))
+    tbl = table._tbl
+    for valores in linhas:
+        tr = copy.deepcopy(modelo)
+        # uma run por célula, na ordem das colunas
+        for i, (r, valor) in enumerate(zip(tr.iter(W_R), valores)):
+            if i != 1:
+                r.text = valor
+            elif valor:
+                # 160 px ~ 1.67" @96dpi (a imagem já vem cortada para 160x180 pelo upload)
+                with etapa("imagens"):
+                    imagens.inserir(r, valor)
+            else:
+                r.text = "—"
+        tbl.append(tr)
 
     # insere a tabela logo após a âncora, se ela existir
-    if anchor_i is not None and 0 <= anchor_i < len(doc.paragraphs):
-        doc.paragraphs[anchor_i]._element.addnext(table._element)
+    if ancora is not None:
+        ancora.addnext(table._element)
     # se não achou, a tabela já ficou no fim do documento
 
 
@@ -264,20 +223,61 @@ def _fmt(num):
 
 
 # --------------------------------------------------------------------------- #
-# Função principal
+# Montagem do documento
 # --------------------------------------------------------------------------- #
-def gerar_proposta_docx(
-    proposta,
-    equipamentos,
-    formato: str = "docx",
-    *,
-    nome_colaborador: str = "",
-    proposta_cod: str = "",
-    email_colaborador: str = "",
-):
-    template_path = "docs_templates/proposta_template.docx"
-    if not os.path.exists(template_path):
-        raise FileNotFoundError("Template DOCX não encontrado.")
+def _montar_mapa(proposta, tel_raw, *, nome_colaborador="", proposta_cod="", email_colaborador=""):
+    data = proposta.data_criacao.strftime("%d/%m/%Y") if proposta.data_criacao else ""
+    dados_topo = (
+        f"{proposta.company} / {proposta.cnpj} / {proposta.client_name} / {data}\n"
+        f"Telefone: {tel_raw}  E-mail: {proposta.email}"
+    )
+    condicoes = (
+        "CONDIÇÕES COMERCIAIS:\n"
+        f". Condições de Pagamento (Equipamento): {proposta.pagamento or ''}\n"
+        f". Prazo de entrega: {proposta.prazo_entrega or ''}\n"
+        f". Frete: {proposta.frete or ''}\n"
+        f". Validade da Proposta: {proposta.validade or ''}\n"
+        f". Garantia do Equipamento: {proposta.garantia or ''}\n"
+        f". Garantia do Sistema: {proposta.garantia_sistema or ''}"
+    )
+    return {
+        "empresa": proposta.company,
+        "cnpj": proposta.cnpj,
+        "cliente": proposta.client_name,
+        "email": proposta.email,
+        "telefone": tel_raw,
+        "numero": tel_raw,
+        "pagamento": proposta.pagamento,
+        "prazo_entrega": proposta.prazo_entrega,
+        "frete": proposta.frete,
+        "validade": proposta.validade,
+        "garantia": proposta.garantia,
+        "garantia_sistema": proposta.garantia_sistema,
+        "proposta_cod": proposta_cod,
+        "condicoes_comerciais": condicoes,
+        "nome_colaborador": nome_colaborador,
+        "email_colaborador": email_colaborador,
+        "data": data,
+        "dados_topo": dados_topo,
+    }
+
+
+def _template_da_proposta(proposta):
+    # template já interpretado (cache em memória, recarrega se o arquivo mudar)
+    return obter_template(
+        getattr(proposta, "servico_type", None),
+        getattr(proposta, "modalidade_type", None),
+    )
+
+
+def renderizador_da_proposta(proposta) -> str:
+    """Renderizador de PDF escolhido pelo admin para o template da proposta."""
+    arquivo = os.path.basename(_template_da_proposta(proposta).path)
+    return renderizadores.renderizador_do_template(arquivo)
+
+
+def _preencher(proposta, **colaborador):
+    """Clona o template e substitui os campos; a tabela ainda não entra."""
 
     # --- valida telefone ---------------------------------------------------
     tel_raw   = proposta.telefone or ""
@@ -288,89 +288,202 @@ def gerar_proposta_docx(
             "por exemplo: +55 11 912345678"
         )
 
-    with TemporaryDirectory() as tmp:
-        tmp_docx = os.path.join(tmp, f"{uuid.uuid4()}.docx")
-        tmp_pdf  = os.path.join(tmp, f"{uuid.uuid4()}.pdf")
-        copyfile(template_path, tmp_docx)
-        doc = Document(tmp_docx)
-
-        dados_topo = (
-            f"{proposta.company} / {proposta.cnpj} / {proposta.client_name} / "
-            f"{proposta.data_criacao.strftime('%d/%m/%Y') if proposta.data_criacao else ''}\n"
-            f"Telefone: {tel_raw}  E-mail: {proposta.email}"
-        )
-        condicoes = (
-            "CONDIÇÕES COMERCIAIS:\n"
-            f". Condições de Pagamento (Equipamento): {proposta.pagamento or ''}\n"
-            f". Prazo de entrega: {proposta.prazo_entrega or ''}\n"
-            f". Frete: {proposta.frete or ''}\n"
-            f". Validade da Proposta: {proposta.validade or ''}\n"
-            f". Garantia do Equipamento: {proposta.garantia or ''}\n"
-            f". Garantia do Sistema: {proposta.garantia_sistema or ''}"
+    with etapa("template"):
+        alvo = _template_da_proposta(proposta).clone()
+
+    with etapa("campos"):
+        mapa = _montar_mapa(proposta, tel_raw, **colaborador)
+        # telefone vira link do WhatsApp, se válido
+        link = (tel_raw, _wa_url(tel_clean)) if _valid_phone(tel_clean) else None
+        _substituir_campos(alvo.document, mapa, alvo.paragrafos, link=link)
+    return alvo
+
+
+def _salvar(doc) -> io.BytesIO:
+    buf = io.BytesIO()
+    with etapa("salvar_docx"):
+        doc.save(buf)
+    buf.seek(0)
+    return buf
+
+
+def _gerar_docx(proposta, equipamentos, **colaborador) -> io.BytesIO:
+    """Renderiza o DOCX direto num buffer em memória (posicionado no início)."""
+    alvo = _preencher(proposta, **colaborador)
+    with etapa("tabela"):
+        _inserir_tabela_equipamentos(alvo.document, equipamentos, ancora=alvo.ancora)
+    return _salvar(alvo.document)
+
+
+def _gerar_pdf_nativo(proposta, equipamentos, **colaborador):
+    """
+    PDF desenhado por ``utils.pdf_nativo`` a partir do documento preenchido.
+    Retorna ``(alvo, dados, pdf)``; ``pdf`` é ``None`` se o renderizador
+    nativo falhar (usa-se o LibreOffice). A tabela do DOCX ainda não entra:
+    ``_completar_docx(alvo, equipamentos, dados)`` a monta só se o DOCX for
+    necessário.
+    """
+    alvo = _preencher(proposta, **colaborador)
+    with etapa("tabela"):
+        dados = _dados_tabela(equipamentos)
+    try:
+        with etapa("pdf"):
+            pdf = pdf_nativo.renderizar_pdf(alvo.document, dados, alvo.ancora)
+    except Exception:
+        log.exception("Renderizador nativo falhou; convertendo com o LibreOffice")
+        pdf = None
+    return alvo, dados, pdf
+
+
+def _completar_docx(alvo, equipamentos, dados) -> io.BytesIO:
+    """Insere a tabela (com os ``dados`` já calculados) e salva o DOCX."""
+    with etapa("tabela"):
+        _inserir_tabela_equipamentos(
+            alvo.document, equipamentos, ancora=alvo.ancora, dados=dados
         )
-        mapa = {
-            "empresa": proposta.company,
-            "cnpj": proposta.cnpj,
-            "cliente": proposta.client_name,
-            "email": proposta.email,
-            "telefone": tel_raw,
-            "numero": tel_raw,
-            "pagamento": proposta.pagamento,
-            "prazo_entrega": proposta.prazo_entrega,
-            "frete": proposta.frete,
-            "validade": proposta.validade,
-            "garantia": proposta.garantia,
-            "garantia_sistema": proposta.garantia_sistema,
-            "proposta_cod": proposta_cod,
-            "condicoes_comerciais": condicoes,
-            "nome_colaborador": nome_colaborador,
-            "email_colaborador": email_colaborador,
-            "data": proposta.data_criacao.strftime("%d/%m/%Y") if proposta.data_criacao else "",
-            "dados_topo": dados_topo,
-        }
+    return _salvar(alvo.document)
+
 
-        _substituir_campos(doc, mapa)
-        _inserir_tabela_equipamentos(doc, equipamentos)
+def _converter_pdf(docx_bytes) -> bytes:
+    """``docx_bytes`` pode ser ``bytes`` ou ``memoryview`` (sem cópia)."""
+    # Windows: usa Word (docx2pdf), que só trabalha com arquivos
+    if os.name == "nt" and _DOCX2PDF_AVAILABLE:
+        with TemporaryDirectory() as tmp:
+            tmp_docx = os.path.join(tmp, f"{uuid.uuid4()}.docx")
+            tmp_pdf  = os.path.join(tmp, f"{uuid.uuid4()}.pdf")
+            with open(tmp_docx, "wb") as f:
+                f.write(docx_bytes)
+            pythoncom.CoInitialize()
+            convert(tmp_docx, tmp_pdf)
+            pythoncom.CoUninitialize()
+            with open(tmp_pdf, "rb") as f:
+                return f.read()
 
-        # transforma telefone em link WhatsApp, se válido
-        if _valid_phone(tel_clean):
-            _linkify_phone(doc, tel_raw, tel_clean)
+    # Linux/macOS: pool de LibreOffice headless (wkhtmltopdf não lê DOCX)
+    return converter_docx_para_pdf(docx_bytes)
 
-        doc.save(tmp_docx)
 
+# --------------------------------------------------------------------------- #
+# Chave de conteúdo (cache de artefatos)
+# --------------------------------------------------------------------------- #
+# Incrementar quando a renderização mudar de forma a invalidar o cache.
+VERSAO_RENDER = 1
+VERSAO_RENDER_NATIVO = 1
+
+_CAMPOS_PROPOSTA = (
+    "company", "cnpj", "client_name", "email", "telefone",
+    "pagamento", "prazo_entrega", "frete", "validade",
+    "garantia", "garantia_sistema",
+)
+
+
+def chave_render(
+    proposta,
+    equipamentos,
+    *,
+    nome_colaborador: str = "",
+    proposta_cod: str = "",
+    email_colaborador: str = "",
+    renderizador: str | None = None,
+) -> str:
+    """
+    Hash de tudo o que influencia o documento gerado: campos da proposta,
+    itens, dados do colaborador, o digest do template em uso e o
+    renderizador de PDF (``None`` = o configurado para o template).
+    """
+    def _nome(enum_val):
+        return getattr(enum_val, "name", enum_val)
+
+    renderizador = renderizador or renderizador_da_proposta(proposta)
+    dados = {
+        "versao": VERSAO_RENDER,
+        "template": _template_da_proposta(proposta).digest,
+        "proposta": {c: getattr(proposta, c, None) for c in _CAMPOS_PROPOSTA},
+        "data": proposta.data_criacao.strftime("%d/%m/%Y") if proposta.data_criacao else "",
+        "servico": _nome(getattr(proposta, "servico_type", None)),
+        "modalidade": _nome(getattr(proposta, "modalidade_type", None)),
+        "colaborador": [nome_colaborador, email_colaborador, proposta_cod],
+        "renderizador": (
+            [renderizador, VERSAO_RENDER_NATIVO]
+            if renderizador == renderizadores.NATIVO else renderizador
+        ),
+        "itens": [
+            {
+                "id": getattr(eq, "id", None),
+                "descricao": getattr(eq, "description", None) or getattr(eq, "name", "") or "",
+                "imagem": getattr(eq, "illustration_path", None),
+                "preco": float(getattr(eq, "unit_price", 0) or 0.0),
+                "qtd": int(getattr(eq, "quantity", 1) or 1),
+                "desconto": float(getattr(eq, "discount_percent", 0) or 0.0),
+            }
+            for eq in equipamentos
+        ],
+    }
+    return hash_conteudo(dados)
+
+
+# --------------------------------------------------------------------------- #
+# Função principal
+# --------------------------------------------------------------------------- #
+def _pdf_convertido(docx_bytes) -> bytes:
+    with etapa("pdf"):
+        return _converter_pdf(docx_bytes)
+
+
+def renderizar_proposta(
+    proposta, equipamentos, *, pdf: bool = True, renderizador: str | None = None, **colaborador
+) -> dict:
+    """Gera o DOCX (e, opcionalmente, o PDF) numa única renderização.
+
+    ``renderizador``: ``"libreoffice"``/``"nativo"``; ``None`` usa o que o
+    admin configurou para o template. Retorna ``{"docx": bytes, "pdf": bytes | None}``.
+    Os tempos de cada etapa vão para ``utils.tempos_render``.
+    """
+    with medir_render():
+        renderizador = renderizador or renderizador_da_proposta(proposta)
+        if pdf and renderizador == renderizadores.NATIVO:
+            alvo, dados, pdf_bytes = _gerar_pdf_nativo(proposta, equipamentos, **colaborador)
+            docx_bytes = _completar_docx(alvo, equipamentos, dados).getvalue()
+            return {
+                "docx": docx_bytes,
+                "pdf": pdf_bytes if pdf_bytes is not None else _pdf_convertido(docx_bytes),
+            }
+
+        docx_bytes = _gerar_docx(proposta, equipamentos, **colaborador).getvalue()
+        return {
+            "docx": docx_bytes,
+            "pdf": _pdf_convertido(docx_bytes) if pdf else None,
+        }
+
+
+def gerar_proposta_docx(
+    proposta,
+    equipamentos,
+    formato: str = "docx",
+    *,
+    nome_colaborador: str = "",
+    proposta_cod: str = "",
+    email_colaborador: str = "",
+    renderizador: str | None = None,
+):
+    colaborador = dict(
+        nome_colaborador=nome_colaborador,
+        proposta_cod=proposta_cod,
+        email_colaborador=email_colaborador,
+    )
+
+    with medir_render():
         if formato.lower() == "pdf":
-            # Windows: usa Word (docx2pdf)
-            if os.name == "nt" and _DOCX2PDF_AVAILABLE:
-                pythoncom.CoInitialize()
-                convert(tmp_docx, tmp_pdf)
-                pythoncom.CoUninitialize()
-                with open(tmp_pdf, "rb") as f:
-                    return io.BytesIO(f.read())
-
-            # Linux/macOS: usa LibreOffice headless (wkhtmltopdf não lê DOCX)
-            soffice = shutil.which("soffice") or shutil.which("libreoffice")
-            if not soffice:
-                raise RuntimeError(
-                    "Conversão para PDF indisponível. Instale o LibreOffice:\n"
-                    "sudo apt-get install -y libreoffice-core libreoffice-writer"
-                )
-            cmd = [
-                soffice, "--headless",
-                "--convert-to", "pdf:writer_pdf_Export",
-                "--outdir", tmp, tmp_docx,
-            ]
-            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if proc.returncode != 0:
-                raise RuntimeError(
-                    "Falha ao converter DOCX → PDF via LibreOffice.\n"
-                    f"stdout:\n{proc.stdout.decode(errors='ignore')}\n\n"
-                    f"stderr:\n{proc.stderr.decode(errors='ignore')}"
-                )
-
-            produced_pdf = os.path.splitext(tmp_docx)[0] + ".pdf"
-            with open(produced_pdf, "rb") as f:
-                return io.BytesIO(f.read())
-
-        # Se não for PDF, retorna o DOCX
-        with open(tmp_docx, "rb") as f:
-            return io.BytesIO(f.read())
+            renderizador = renderizador or renderizador_da_proposta(proposta)
+            if renderizador == renderizadores.NATIVO:
+                alvo, dados, pdf = _gerar_pdf_nativo(proposta, equipamentos, **colaborador)
+                if pdf is not None:
+                    return io.BytesIO(pdf)      # o DOCX nem chega a ser montado
+                buf = _completar_docx(alvo, equipamentos, dados)
+            else:
+                buf = _gerar_docx(proposta, equipamentos, **colaborador)
+            with buf.getbuffer() as docx_bytes:
+                return io.BytesIO(_pdf_convertido(docx_bytes))
+
+        # Se não for PDF, retorna o próprio buffer do DOCX (sem cópia)
+        return _gerar_docx(proposta, equipamentos, **colaborador)
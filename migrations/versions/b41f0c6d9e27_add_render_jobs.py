@@ -0,0 +1,47 @@
+"""add render_jobs (e une as duas heads anteriores)
+
+Revision ID: b41f0c6d9e27
+Revises: 57102aaf6f9c, 6bff8c85f9f4
+Create Date: 2025-08-04 10:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f0c6d9e27'
+down_revision = ('57102aaf6f9c', '6bff8c85f9f4')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'render_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('proposta_id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('formato', sa.String(length=8), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('chave', sa.String(length=64), nullable=True),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['proposta_id'], ['proposals.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['usuario_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('render_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_render_jobs_proposta_id'), ['proposta_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_render_jobs_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('render_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_render_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_render_jobs_proposta_id'))
+
+    op.drop_table('render_jobs')
@@ -0,0 +1,28 @@
+"""add equipment previous image and processing start
+
+Revision ID: b8e4f1a6c2d7
+Revises: f1c7d2e8a9b4
+Create Date: 2025-09-05 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f1a6c2d7'
+down_revision = 'f1c7d2e8a9b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('equipments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('imagem_anterior', sa.String(length=256), nullable=True))
+        batch_op.add_column(sa.Column('imagem_desde', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('equipments', schema=None) as batch_op:
+        batch_op.drop_column('imagem_desde')
+        batch_op.drop_column('imagem_anterior')
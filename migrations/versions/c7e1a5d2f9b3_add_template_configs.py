@@ -0,0 +1,34 @@
+"""add template_configs
+
+Revision ID: c7e1a5d2f9b3
+Revises: b41f0c6d9e27
+Create Date: 2025-08-11 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1a5d2f9b3'
+down_revision = 'b41f0c6d9e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'template_configs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('arquivo', sa.String(length=128), nullable=False),
+        sa.Column('renderizador', sa.String(length=16), nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.Column('atualizado_por_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['atualizado_por_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('arquivo'),
+    )
+
+
+def downgrade():
+    op.drop_table('template_configs')
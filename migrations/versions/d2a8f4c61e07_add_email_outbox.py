@@ -0,0 +1,53 @@
+"""add email_outbox
+
+Revision ID: d2a8f4c61e07
+Revises: c7e1a5d2f9b3
+Create Date: 2025-08-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f4c61e07'
+down_revision = 'c7e1a5d2f9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('proposta_id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('destinatario', sa.String(length=128), nullable=False),
+        sa.Column('cc', sa.Text(), nullable=True),
+        sa.Column('assunto', sa.String(length=255), nullable=True),
+        sa.Column('corpo', sa.Text(), nullable=True),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('proximo_envio_em', sa.DateTime(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('enviado_em', sa.DateTime(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['proposta_id'], ['proposals.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['usuario_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_email_outbox_proposta_id'), ['proposta_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_email_outbox_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_email_outbox_proximo_envio_em'), ['proximo_envio_em'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_email_outbox_proximo_envio_em'))
+        batch_op.drop_index(batch_op.f('ix_email_outbox_status'))
+        batch_op.drop_index(batch_op.f('ix_email_outbox_proposta_id'))
+
+    op.drop_table('email_outbox')
@@ -0,0 +1,83 @@
+"""add clients
+
+Revision ID: e5b3c9a17f42
+Revises: d2a8f4c61e07
+Create Date: 2025-08-25 10:15:00.000000
+
+"""
+import re
+import unicodedata
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3c9a17f42'
+down_revision = 'd2a8f4c61e07'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar(texto):
+    # cópia de utils.clientes.normalizar_busca (migrações não importam o app)
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
+
+
+def _backfill(bind, clients):
+    propostas = bind.execute(sa.text(
+        'SELECT cnpj, company, client_name, email, telefone, data_criacao'
+        ' FROM proposals ORDER BY data_criacao, id'
+    ))
+    por_cnpj = {}
+    for cnpj, *campos, criado in propostas:
+        cnpj = ''.join(filter(str.isdigit, cnpj or ''))
+        if len(cnpj) != 14:
+            continue
+        linha = por_cnpj.setdefault(cnpj, {'cnpj': cnpj, 'company': None, 'client_name': None,
+                                           'email': None, 'telefone': None})
+        for nome, valor in zip(('company', 'client_name', 'email', 'telefone'), campos):
+            if (valor or '').strip():
+                linha[nome] = valor.strip()
+        if isinstance(criado, str):
+            criado = datetime.fromisoformat(criado)
+        linha['ultima_proposta_em'] = criado
+
+    agora = datetime.utcnow()
+    for linha in por_cnpj.values():
+        linha.update(company_busca=_normalizar(linha['company']), criado_em=agora,
+                     atualizado_em=agora)
+    if por_cnpj:
+        op.bulk_insert(clients, list(por_cnpj.values()))
+
+
+def upgrade():
+    clients = op.create_table(
+        'clients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cnpj', sa.String(length=14), nullable=False),
+        sa.Column('company', sa.String(length=128), nullable=True),
+        sa.Column('company_busca', sa.String(length=128), nullable=True),
+        sa.Column('client_name', sa.String(length=128), nullable=True),
+        sa.Column('email', sa.String(length=128), nullable=True),
+        sa.Column('telefone', sa.String(length=32), nullable=True),
+        sa.Column('ultima_proposta_em', sa.DateTime(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cnpj'),
+    )
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_clients_company_busca'), ['company_busca'], unique=False)
+
+    _backfill(op.get_bind(), clients)
+
+
+def downgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_clients_company_busca'))
+
+    op.drop_table('clients')
@@ -0,0 +1,30 @@
+"""add equipment image status
+
+Revision ID: f1c7d2e8a9b4
+Revises: e5b3c9a17f42
+Create Date: 2025-09-01 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7d2e8a9b4'
+down_revision = 'e5b3c9a17f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('equipments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('imagem_status', sa.String(length=16), nullable=True))
+        batch_op.add_column(sa.Column('imagem_original', sa.String(length=512), nullable=True))
+        batch_op.add_column(sa.Column('imagem_erro', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('equipments', schema=None) as batch_op:
+        batch_op.drop_column('imagem_erro')
+        batch_op.drop_column('imagem_original')
+        batch_op.drop_column('imagem_status')
@@ -75,6 +75,13 @@ class Equipment(db.Model):
     unit_price       = db.Column(db.Float)
     quantity         = db.Column(db.Integer)
 
+    # processamento da imagem enviada (ver utils.imagens)
+    imagem_status    = db.Column(db.String(16))    # pronta | processando | falhou
+    imagem_original  = db.Column(db.String(512))   # upload bruto em processamento
+    imagem_anterior  = db.Column(db.String(256))   # volta se o processamento falhar
+    imagem_desde     = db.Column(db.DateTime)      # início (ou retomada) do processamento
+    imagem_erro      = db.Column(db.Text)
+
     @staticmethod
     def _normalize_illustration_path(value):
         """Remove prefixos redundantes e normaliza separadores."""
@@ -153,3 +160,113 @@ class Proposal(db.Model):
 
     # Relacionamento muitos-para-muitos com equipamentos
     equipamentos     = db.relationship('Equipment', secondary=proposal_equipments, backref='propostas', lazy='dynamic')
+
+# ================
+#  Clientes
+# ================
+
+class Client(db.Model):
+    """Cliente (um por CNPJ) mantido a partir das propostas (ver utils.clientes)."""
+    __tablename__ = 'clients'
+
+    id                 = db.Column(db.Integer, primary_key=True)
+    cnpj               = db.Column(db.String(14), unique=True, nullable=False)   # só dígitos
+    company            = db.Column(db.String(128))
+    company_busca      = db.Column(db.String(128), index=True)   # minúsculas, sem acentos
+    client_name        = db.Column(db.String(128))
+    email              = db.Column(db.String(128))
+    telefone           = db.Column(db.String(32))
+    ultima_proposta_em = db.Column(db.DateTime)
+
+    criado_em          = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizado_em      = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'cnpj': self.cnpj,
+            'company': self.company or '',
+            'client_name': self.client_name or '',
+            'email': self.email or '',
+            'telefone': self.telefone or '',
+        }
+
+# ================
+#  Jobs de renderização
+# ================
+
+class RenderJob(db.Model):
+    """Geração de documento executada fora da requisição (ver utils.render_jobs)."""
+    __tablename__ = 'render_jobs'
+
+    PENDENTE   = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDO  = 'concluido'
+    FALHOU     = 'falhou'
+
+    id            = db.Column(db.String(32), primary_key=True)
+    proposta_id   = db.Column(db.Integer, db.ForeignKey('proposals.id', ondelete='CASCADE'), nullable=False, index=True)
+    usuario_id    = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    formato       = db.Column(db.String(8), nullable=False, default='pdf')
+    status        = db.Column(db.String(16), nullable=False, default=PENDENTE, index=True)
+    tentativas    = db.Column(db.Integer, nullable=False, default=0)
+    erro          = db.Column(db.Text)
+    chave         = db.Column(db.String(64))
+    params        = db.Column(db.Text)      # JSON: itens + dados do colaborador
+
+    criado_em     = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    proposta      = db.relationship('Proposal', backref=db.backref('render_jobs', lazy='dynamic', cascade='all, delete-orphan'))
+
+# ================
+#  Fila de e-mails
+# ================
+
+class EmailOutbox(db.Model):
+    """E-mail de proposta aguardando envio (ver utils.email_outbox)."""
+    __tablename__ = 'email_outbox'
+
+    PENDENTE = 'pendente'
+    ENVIANDO = 'enviando'
+    ENVIADO  = 'enviado'
+    FALHOU   = 'falhou'
+
+    id               = db.Column(db.String(32), primary_key=True)
+    proposta_id      = db.Column(db.Integer, db.ForeignKey('proposals.id', ondelete='CASCADE'), nullable=False, index=True)
+    usuario_id       = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    destinatario     = db.Column(db.String(128), nullable=False)
+    cc               = db.Column(db.Text)       # JSON: lista de endereços
+    assunto          = db.Column(db.String(255))
+    corpo            = db.Column(db.Text)
+    params           = db.Column(db.Text)       # JSON: itens + dados do colaborador
+
+    status           = db.Column(db.String(16), nullable=False, default=PENDENTE, index=True)
+    tentativas       = db.Column(db.Integer, nullable=False, default=0)
+    proximo_envio_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    erro             = db.Column(db.Text)
+    enviado_em       = db.Column(db.DateTime)
+
+    criado_em        = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizado_em    = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    proposta         = db.relationship('Proposal', backref=db.backref('emails', lazy='dynamic', cascade='all, delete-orphan'))
+
+# ================
+#  Configuração dos templates
+# ================
+
+class TemplateConfig(db.Model):
+    """Preferências por arquivo de template DOCX (ver utils.renderizadores)."""
+    __tablename__ = 'template_configs'
+
+    LIBREOFFICE = 'libreoffice'
+    NATIVO      = 'nativo'
+
+    id                = db.Column(db.Integer, primary_key=True)
+    arquivo           = db.Column(db.String(128), unique=True, nullable=False)
+    renderizador      = db.Column(db.String(16), nullable=False, default=LIBREOFFICE)
+
+    atualizado_em     = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    atualizado_por_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    atualizado_por    = db.relationship('User')
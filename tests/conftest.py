@@ -0,0 +1,36 @@
+import pytest
+from flask import Flask
+
+from models import db
+from utils import artifact_store, derivados
+
+
+@pytest.fixture
+def criar_app(tmp_path):
+    """Fábrica de apps mínimos: SQLite em ``tmp_path`` e store de artefatos próprio.
+
+    Os singletons dos módulos trocados aqui voltam ao valor anterior no fim
+    do teste.
+    """
+    store_anterior = artifact_store.obter_store()
+    derivados_anterior = derivados.obter_derivados()
+
+    def criar(*blueprints, banco="teste.db", **config):
+        app = Flask(__name__, instance_path=str(tmp_path))
+        app.config.update(
+            TESTING=True,
+            SECRET_KEY="teste",
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / banco}",
+            **config,
+        )
+        db.init_app(app)
+        for bp in blueprints:
+            app.register_blueprint(bp)
+        artifact_store.configurar_store(artifact_store.ArtifactStore(str(tmp_path / "artefatos")))
+        with app.app_context():
+            db.create_all()
+        return app
+
+    yield criar
+    artifact_store.configurar_store(store_anterior)
+    derivados.configurar_derivados(derivados_anterior)
@@ -0,0 +1,92 @@
+"""Servidor SMTP mínimo (sem TLS/AUTH) para os testes de envio de e-mail.
+
+Guarda as mensagens recebidas em ``mensagens`` (``email.message.Message``).
+``falhas`` é uma lista de respostas usadas, em ordem, no lugar do ``250``
+após o DATA (ex.: ``"451 tente depois"``); ``recusar_rcpt`` responde
+``550`` a todo ``RCPT TO``; ``derrubar_apos_data`` fecha a conexão logo
+depois de aceitar cada mensagem (como um relay que corta sessões).
+"""
+
+from __future__ import annotations
+
+import email
+import email.policy
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _responder(self, linha: str):
+        self.wfile.write(linha.encode() + b"\r\n")
+
+    def handle(self):
+        servidor = self.server.smtp
+        servidor.conexoes += 1
+        self._responder("220 smtp-local pronto")
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode(errors="replace").strip()
+            verbo = comando.split(" ", 1)[0].upper()
+            if verbo in ("EHLO", "HELO"):
+                self._responder("250 smtp-local")
+            elif verbo == "MAIL":
+                self._responder("250 OK")
+            elif verbo == "RCPT":
+                self._responder("550 caixa inexistente" if servidor.recusar_rcpt else "250 OK")
+            elif verbo == "DATA":
+                self._responder("354 termine com <CRLF>.<CRLF>")
+                dados = []
+                while True:
+                    l = self.rfile.readline()
+                    if l in (b".\r\n", b".\n", b""):
+                        break
+                    dados.append(l[1:] if l.startswith(b"..") else l)
+                with servidor.lock:
+                    # decidido antes do 250: o cliente pode mudar a flag logo depois
+                    derrubar = servidor.derrubar_apos_data
+                    falha = servidor.falhas.pop(0) if servidor.falhas else None
+                    if falha is None:
+                        servidor.mensagens.append(
+                            email.message_from_bytes(b"".join(dados), policy=email.policy.default)
+                        )
+                self._responder(falha or "250 aceito")
+                if derrubar:
+                    return
+            elif verbo in ("RSET", "NOOP"):
+                servidor.comandos.append(verbo)
+                self._responder("250 OK")
+            elif verbo == "QUIT":
+                self._responder("221 tchau")
+                return
+            else:
+                self._responder("502 comando não implementado")
+
+
+class _Servidor(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ServidorSMTP:
+    def __init__(self):
+        self.mensagens: list = []
+        self.falhas: list[str] = []
+        self.recusar_rcpt = False
+        self.derrubar_apos_data = False
+        self.conexoes = 0
+        self.comandos: list[str] = []   # RSET/NOOP recebidos
+        self.lock = threading.Lock()
+        self._srv = _Servidor(("127.0.0.1", 0), _Handler)
+        self._srv.smtp = self
+        self.host, self.port = self._srv.server_address
+        self._thread = threading.Thread(target=self._srv.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._srv.shutdown()
+        self._srv.server_close()
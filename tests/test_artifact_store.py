@@ -0,0 +1,77 @@
+import os
+import time
+import types
+from datetime import datetime
+
+from gerar_proposta import chave_render
+from utils.artifact_store import ArtifactStore
+
+
+def _envelhecer(store, key, segundos):
+    meta = store._arquivo(key, "json")
+    antigo = time.time() - segundos
+    os.utime(meta, (antigo, antigo))
+
+
+def _esperar_varredura(store):
+    varredura = store._varredura
+    if varredura is not None:
+        varredura.join()
+
+
+def test_store_roundtrip_docx_and_pdf(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.put("ab" * 32, {"docx": b"DOCX", "pdf": b"%PDF"})
+
+    assert store.get("ab" * 32, "pdf") == b"%PDF"
+    assert store.get("ab" * 32, "docx") == b"DOCX"
+    assert store.get("cd" * 32, "pdf") is None
+
+
+def test_store_evicts_least_recently_used_over_size_limit(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=250)
+    store.put("a1" * 32, {"pdf": b"x" * 100})
+    _envelhecer(store, "a1" * 32, 30)
+    store.put("b2" * 32, {"pdf": b"y" * 100})
+    _envelhecer(store, "b2" * 32, 20)
+    store.get("a1" * 32, "pdf")  # acesso recente: a1 sobrevive
+
+    store.put("c3" * 32, {"pdf": b"z" * 100})
+    _esperar_varredura(store)           # a varredura roda fora da requisição
+
+    assert store.get("b2" * 32, "pdf") is None
+    assert store.get("a1" * 32, "pdf") is not None
+    assert store.get("c3" * 32, "pdf") is not None
+
+
+def test_store_drops_entries_past_retention(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_age=60)
+    store.put("a1" * 32, {"pdf": b"x"})
+    _envelhecer(store, "a1" * 32, 120)
+
+    assert store.get("a1" * 32, "pdf") is None
+    assert not os.path.exists(store._arquivo("a1" * 32, "json"))
+
+
+def _proposta(**campos):
+    base = dict(
+        company="ACME", cnpj="04252011000110", client_name="Fulano",
+        email="f@acme.com", telefone="", pagamento="", prazo_entrega="",
+        frete="", validade="", garantia="", garantia_sistema="",
+        data_criacao=datetime(2025, 1, 2), servico_type=None, modalidade_type=None,
+    )
+    base.update(campos)
+    return types.SimpleNamespace(**base)
+
+
+def test_chave_render_changes_with_content():
+    eq = types.SimpleNamespace(id=1, name="Eq", description="", illustration_path=None,
+                               unit_price=10.0, quantity=1, discount_percent=0)
+
+    base = chave_render(_proposta(), [eq], nome_colaborador="Ana")
+    assert base == chave_render(_proposta(), [eq], nome_colaborador="Ana")
+    assert base != chave_render(_proposta(frete="FOB"), [eq], nome_colaborador="Ana")
+    assert base != chave_render(_proposta(), [eq], nome_colaborador="Bia")
+
+    eq.quantity = 2
+    assert base != chave_render(_proposta(), [eq], nome_colaborador="Ana")
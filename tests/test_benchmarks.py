@@ -0,0 +1,49 @@
+import json
+
+from benchmarks import render
+
+
+def test_compare_flags_only_regressions_above_threshold():
+    baseline = {"casos": {
+        "docx/simples/10": {"tempo_ms": 100.0, "memoria_pico_kb": 1000.0},
+        "docx/simples/100": {"tempo_ms": 1.0, "memoria_pico_kb": 1000.0},
+        "pdf_nativo/simples/10": {"tempo_ms": 50.0, "memoria_pico_kb": 1000.0},
+    }}
+    atual = {"casos": {
+        "docx/simples/10": {"tempo_ms": 130.0, "memoria_pico_kb": 1100.0},
+        "docx/simples/100": {"tempo_ms": 2.5, "memoria_pico_kb": 1000.0},   # ruído
+        "pdf_nativo/simples/10": {"tempo_ms": 40.0, "memoria_pico_kb": 2000.0},
+        "tabela/simples/1": {"tempo_ms": 10.0, "memoria_pico_kb": 10.0},    # caso novo
+    }}
+
+    regressoes = render.comparar(atual, baseline, limite=0.2)
+
+    assert [(r["caso"], r["metrica"]) for r in regressoes] == [
+        ("docx/simples/10", "tempo_ms"),
+        ("pdf_nativo/simples/10", "memoria_pico_kb"),
+    ]
+    assert regressoes[0]["variacao"] == 0.3
+
+
+def test_run_saves_baseline_and_detects_regression(tmp_path, capsys):
+    baseline = tmp_path / "render.json"
+    args = ["--alvos", "docx,tabela", "--itens", "2", "--variantes", "completa",
+            "-r", "1", "--baseline", str(baseline)]
+
+    assert render.main(args + ["--salvar-baseline"]) == 0
+    dados = json.loads(baseline.read_text(encoding="utf-8"))
+    assert set(dados["casos"]) == {"docx/completa/2", "tabela/completa/2"}
+    assert dados["casos"]["docx/completa/2"]["tamanho_bytes"] > 0
+
+    for caso in dados["casos"].values():
+        caso["tempo_ms"] = 0.001
+    baseline.write_text(json.dumps(dados), encoding="utf-8")
+    saida = tmp_path / "atual.json"
+    assert render.main(args + ["--saida", str(saida), "--limite", "0.5"]) == 1
+    assert "REGRESSÃO docx/completa/2 tempo_ms" in capsys.readouterr().out
+    assert saida.exists()
+
+
+def test_template_targets_run_once_regardless_of_items():
+    nomes = [c[0] for c in render.casos(["template_clone", "tabela"], [1, 10], ["simples"])]
+    assert nomes == ["template_clone", "tabela/simples/1", "tabela/simples/10"]
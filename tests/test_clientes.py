@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+
+from api import api_bp
+from blueprints.propostas import propostas_bp
+from models import db, Client, Proposal, User
+from utils import clientes
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(api_bp, propostas_bp, banco="clientes.db")
+    clientes.init_app(app)
+    with app.app_context():
+        user = User(usuario="ana", nome_completo="Ana", senha_hash="x", tipo="admin")
+        db.session.add(user)
+        db.session.flush()
+
+        def proposta(company, cnpj, email, dia, **extra):
+            return Proposal(company=company, cnpj=cnpj, client_name="Fulano", email=email,
+                            telefone=extra.get("telefone", ""), usuario_id=user.id,
+                            data_criacao=datetime(2025, 1, dia))
+
+        db.session.add_all([
+            proposta("Açaí Comércio Ltda", "04.252.011/0001-10", "antigo@acai.com", 1),
+            proposta("AÇAÍ COMÉRCIO LTDA", "04252011000110", "novo@acai.com", 5),
+            proposta("Acme Indústria", "11222333000181", "", 3, telefone="2133334444"),
+            proposta("Sem CNPJ", "", "x@y.com", 4),
+        ])
+        db.session.commit()
+    return app
+
+
+def test_backfill_keeps_latest_data_per_cnpj(app):
+    with app.app_context():
+        assert app.test_cli_runner().invoke(args=["clientes", "backfill"]).exit_code == 0
+        assert Client.query.count() == 2
+        acai = Client.query.filter_by(cnpj="04252011000110").one()
+        assert (acai.company, acai.email) == ("AÇAÍ COMÉRCIO LTDA", "novo@acai.com")
+        assert acai.company_busca == "acai comercio ltda"
+        assert acai.ultima_proposta_em == datetime(2025, 1, 5)
+
+        assert clientes.backfill() == 2            # idempotente
+
+
+def test_prefix_search(app):
+    with app.app_context():
+        clientes.backfill()
+        assert [c.cnpj for c in clientes.buscar("aç")] == ["04252011000110", "11222333000181"]
+        assert [c.company for c in clientes.buscar("ACME ind")] == ["Acme Indústria"]
+        assert [c.cnpj for c in clientes.buscar("04.252")] == ["04252011000110"]
+        assert clientes.buscar("zz") == []
+
+    client = app.test_client()
+    assert client.get("/api/clientes?q=ac").status_code == 401
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "admin"
+    dados = client.get("/api/clientes?q=112").get_json()
+    assert dados["clientes"] == [{"id": 2, "cnpj": "11222333000181", "company": "Acme Indústria",
+                                  "client_name": "Fulano", "email": "",
+                                  "telefone": "2133334444"}]
+    assert client.get("/api/clientes?q=a").get_json() == {"clientes": []}
+
+
+def test_editing_a_proposal_updates_the_client(app):
+    with app.app_context():
+        clientes.backfill()
+        prop_id = Proposal.query.filter_by(cnpj="11222333000181").one().id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "admin"
+    resp = client.post(f"/editar_proposta/{prop_id}", data={
+        "company": "Acme Indústria S/A", "cnpj": "11222333000181", "client_name": "Beltrano",
+        "email": "compras@acme.com", "telefone": "",
+        "servico_type": "PONTO", "modalidade_type": "AQUISICAO",
+    })
+    assert resp.get_json() == {"success": True}
+    with app.app_context():
+        acme = Client.query.filter_by(cnpj="11222333000181").one()
+        assert (acme.company, acme.client_name, acme.email) == (
+            "Acme Indústria S/A", "Beltrano", "compras@acme.com")
+        assert acme.telefone == "2133334444"      # campo vazio não apaga o cadastro
+
+
+def test_new_cnpj_registered_twice_yields_one_client(app):
+    with app.app_context():
+        novas = [Proposal(company="Nova Ltda", cnpj="45.997.418/0001-53", email=f"{i}@nova.com",
+                          usuario_id=1) for i in range(2)]
+        db.session.add_all(novas)
+        # consultando antes de inserir, a segunda chamada não veria o cliente
+        # da primeira — o mesmo caso de duas requisições com um CNPJ novo
+        primeiro, segundo = (clientes.registrar_proposta(p) for p in novas)
+        db.session.commit()
+
+        assert primeiro is segundo
+        assert Client.query.filter_by(cnpj="45997418000153").one().email == "1@nova.com"
@@ -0,0 +1,136 @@
+import functools
+import io
+import json
+from urllib.error import HTTPError, URLError
+
+import pytest
+from flask import Flask
+
+import api
+from utils import cnpj_cache
+from utils.cnpj_cache import CacheCNPJ
+
+
+CNPJ = "04252011000110"
+
+
+class OpenerFalso:
+    """Substituto de ``urlopen``: devolve/levanta o próximo item de ``respostas``."""
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.chamadas = 0
+
+    def __call__(self, req, timeout=None):
+        self.chamadas += 1
+        resp = self.respostas.pop(0) if len(self.respostas) > 1 else self.respostas[0]
+        if isinstance(resp, Exception):
+            raise resp
+        return io.BytesIO(json.dumps(resp).encode())
+
+
+def _payload(nome):
+    return {"razao_social": nome, "cnpj": CNPJ, "email": "contato@acme.com",
+            "ddd_telefone_1": "2133334444"}
+
+
+def _nao_encontrado():
+    return HTTPError("https://publica.cnpj.ws", 404, "Not Found", {}, None)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(cnpj_cache.time, "time", lambda: agora[0])
+    return agora
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    opener = OpenerFalso(_payload("ACME LTDA"))
+    monkeypatch.setattr(api, "_fetch_cnpj_payload",
+                        functools.partial(api._fetch_cnpj_payload, opener=opener))
+    anterior = cnpj_cache.obter_cache()
+    cnpj_cache.configurar_cache(CacheCNPJ(str(tmp_path / "cnpj.sqlite")))
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SECRET_KEY="teste")
+    app.register_blueprint(api.api_bp)
+    client = app.test_client()
+    client.opener = opener
+    yield client
+    cnpj_cache.configurar_cache(anterior)
+    api._disjuntor_cnpj.reiniciar()
+
+
+def test_route_serves_repeated_lookups_from_cache(client):
+    r1 = client.get(f"/api/cnpj/{CNPJ}")
+    r2 = client.get("/api/cnpj/04.252.011-000110")
+    assert r1.get_json()["company"] == "ACME LTDA"
+    assert (r1.headers["X-Cache"], r2.headers["X-Cache"]) == ("MISS", "HIT")
+    assert client.opener.chamadas == 1
+
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "admin"
+    stats = client.get("/api/admin/metricas/cnpj").get_json()
+    assert stats["acertos"] == 1 and stats["faltas"] == 1 and stats["taxa_acerto"] == 0.5
+
+
+def test_not_found_is_cached_as_negative(client):
+    client.opener.respostas = [_nao_encontrado()]
+    assert client.get(f"/api/cnpj/{CNPJ}").status_code == 404
+    resp = client.get(f"/api/cnpj/{CNPJ}")
+    assert resp.status_code == 404 and resp.headers["X-Cache"] == "HIT"
+    assert client.opener.chamadas == 1
+
+
+def test_open_circuit_returns_503_without_calling_the_api(client):
+    client.opener.respostas = [URLError("fora do ar")]
+    api._disjuntor_cnpj.configurar(limite_falhas=2, espera=30, sondas=1)
+
+    assert client.get(f"/api/cnpj/{CNPJ}").status_code == 502
+    assert client.get(f"/api/cnpj/{CNPJ}").status_code == 502
+    resp = client.get(f"/api/cnpj/{CNPJ}")
+    assert resp.status_code == 503 and int(resp.headers["Retry-After"]) >= 29
+    assert client.opener.chamadas == 2
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path, relogio):
+    opener = OpenerFalso(_payload("ANTIGA"), _payload("NOVA"))
+    buscar = functools.partial(api._fetch_cnpj_payload, opener=opener)
+    cache = CacheCNPJ(str(tmp_path / "c.sqlite"), ttl=100, janela_stale=1000)
+
+    assert cache.consultar(CNPJ, buscar).origem == "api"
+    relogio[0] += 150
+    res = cache.consultar(CNPJ, buscar)
+    assert res.stale and res.payload["razao_social"] == "ANTIGA"
+    assert cache.aguardar_atualizacoes()
+    res = cache.consultar(CNPJ, buscar)
+    assert not res.stale and res.payload["razao_social"] == "NOVA"
+    assert opener.chamadas == 2
+    assert cache.estatisticas()["contadores"]["atualizacao_ok"] == 1
+
+
+def test_expired_entry_falls_back_to_old_copy_when_api_fails(tmp_path, relogio):
+    opener = OpenerFalso(_payload("ANTIGA"), URLError("fora do ar"))
+    buscar = functools.partial(api._fetch_cnpj_payload, opener=opener)
+    cache = CacheCNPJ(None, ttl=100, janela_stale=100)
+
+    cache.consultar(CNPJ, buscar)
+    relogio[0] += 500
+    res = cache.consultar(CNPJ, buscar)
+    assert res.stale and res.payload["razao_social"] == "ANTIGA"
+    assert cache.estatisticas()["contadores"]["stale_erro"] == 1
+
+    with pytest.raises(api._CNPJServiceError):
+        cache.consultar("11222333000181", buscar)
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    opener = OpenerFalso(_payload("ACME LTDA"))
+    CacheCNPJ(path).consultar(CNPJ, functools.partial(api._fetch_cnpj_payload, opener=opener))
+
+    outro = CacheCNPJ(path)
+    res = outro.consultar(CNPJ, lambda c: pytest.fail("não deveria chamar a API"))
+    assert res.origem == "disco" and res.payload["razao_social"] == "ACME LTDA"
+    assert outro.consultar(CNPJ, None).origem == "memoria"
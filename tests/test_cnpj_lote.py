@@ -0,0 +1,102 @@
+import io
+import json
+import threading
+import time
+from urllib.error import HTTPError, URLError
+
+import pytest
+from flask import Flask
+
+import api
+from utils import cnpj_cache
+from utils.cnpj_cache import CacheCNPJ
+
+
+LENTO, RAPIDO, INEXISTENTE, FORA = "04252011000110", "11222333000181", "11444777000161", "33000167000101"
+
+
+class OpenerPorCNPJ:
+    """Substituto de ``urlopen`` com resposta (e atraso) por CNPJ."""
+
+    def __init__(self, atrasos=None):
+        self.atrasos = atrasos or {}
+        self.lock = threading.Lock()
+        self.chamadas: list[str] = []
+        self.simultaneas = self.pico = 0
+
+    def __call__(self, req, timeout=None):
+        cnpj = req.full_url.rsplit("/", 1)[-1]
+        with self.lock:
+            self.chamadas.append(cnpj)
+            self.simultaneas += 1
+            self.pico = max(self.pico, self.simultaneas)
+        try:
+            time.sleep(self.atrasos.get(cnpj, 0.01))
+        finally:
+            with self.lock:
+                self.simultaneas -= 1
+        if cnpj == INEXISTENTE:
+            raise HTTPError(req.full_url, 404, "Not Found", {}, None)
+        if cnpj == FORA:
+            raise URLError("timeout")
+        return io.BytesIO(json.dumps({"razao_social": f"EMPRESA {cnpj}", "cnpj": cnpj}).encode())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    opener = OpenerPorCNPJ()
+    original = api._fetch_cnpj_payload
+    monkeypatch.setattr(api, "_fetch_cnpj_payload", lambda cnpj: original(cnpj, opener=opener))
+    anterior = cnpj_cache.obter_cache()
+    cnpj_cache.configurar_cache(CacheCNPJ())
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SECRET_KEY="teste", CNPJ_LOTE_CONCORRENCIA=2)
+    app.register_blueprint(api.api_bp)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "vendedor"
+    client.opener = opener
+    yield client
+    cnpj_cache.configurar_cache(anterior)
+    api._disjuntor_cnpj.reiniciar()
+
+
+def _linhas(resp):
+    return [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+
+
+def test_batch_reports_each_entry_without_aborting(client):
+    entradas = ["04.252.011/0001-10", "123", INEXISTENTE, FORA, RAPIDO, LENTO]
+    resp = client.post("/api/cnpj/batch", json={"cnpjs": entradas})
+    assert resp.status_code == 200 and resp.mimetype == "application/x-ndjson"
+
+    linhas = _linhas(resp)
+    assert sorted(l["indice"] for l in linhas) == list(range(len(entradas)))
+    por_indice = {l["indice"]: l for l in linhas}
+    assert linhas[0]["status"] == "invalido" and linhas[0]["entrada"] == "123"
+    assert por_indice[0]["status"] == por_indice[5]["status"] == "ok"
+    assert por_indice[0]["dados"]["company"] == f"EMPRESA {LENTO}"
+    assert por_indice[2]["status"] == "nao_encontrado"
+    assert por_indice[3]["status"] == "erro"
+    assert por_indice[4]["cnpj"] == RAPIDO
+    # repetido no lote: uma consulta só
+    assert client.opener.chamadas.count(LENTO) == 1
+
+
+def test_results_stream_as_they_complete_with_bounded_concurrency(client):
+    client.opener.atrasos = {LENTO: 0.3}
+    resp = client.post("/api/cnpj/batch", json=[LENTO, RAPIDO, INEXISTENTE])
+    ordem = [l["cnpj"] for l in _linhas(resp)]
+    assert ordem[-1] == LENTO
+    assert client.opener.pico <= 2
+
+
+def test_batch_validates_request(client):
+    assert client.post("/api/cnpj/batch", json={"x": 1}).status_code == 400
+    assert client.post("/api/cnpj/batch", json=[]).status_code == 400
+    client.application.config["CNPJ_LOTE_MAX"] = 2
+    assert client.post("/api/cnpj/batch", json=[LENTO, RAPIDO, LENTO]).status_code == 413
+    client.application.config["CNPJ_LOTE_MAX"] = 200
+    # texto colado também é aceito
+    resp = client.post("/api/cnpj/batch", json={"cnpjs": f"{LENTO}\n{RAPIDO}; 999"})
+    assert [l["status"] for l in _linhas(resp)].count("ok") == 2
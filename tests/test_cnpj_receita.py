@@ -0,0 +1,126 @@
+import functools
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from flask import Flask
+
+import api
+from utils import cnpj_cache, cnpj_receita
+from utils.cnpj_cache import CacheCNPJ
+from utils.cnpj_receita import BaseReceita, importar
+
+
+LOCAL, FORA_DA_BASE = "04252011000110", "11222333000181"
+
+
+def _csv(linhas):
+    return "".join(";".join(f'"{c}"' for c in linha) + "\r\n" for linha in linhas).encode("latin-1")
+
+
+def _estabelecimento(basico, ordem, dv, fantasia="", email="", ddd="21", telefone="33334444"):
+    return [basico, ordem, dv, "1", fantasia, "02", "20050101", "00", "", "", "19900101",
+            "4751201", "", "RUA", "DAS FLORES", "100", "SALA 2", "CENTRO", "20000000", "RJ",
+            "6001", ddd, telefone, "", "", "", "", email, "", ""]
+
+
+def _zip(path, membro, linhas):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(membro, _csv(linhas))
+    return str(path)
+
+
+@pytest.fixture
+def dados(tmp_path):
+    pasta = tmp_path / "receita"
+    pasta.mkdir()
+    _zip(pasta / "Empresas0.zip", "K3241.K03200Y0.D40511.EMPRECSV", [
+        ["04252011", "LOJAS AÇAÍ LTDA", "2062", "49", "1000,00", "03", ""],
+        ["99999999", "CURTA"],                     # linha truncada
+    ])
+    _zip(pasta / "Estabelecimentos0.zip", "K3241.K03200Y0.D40511.ESTABELE", [
+        _estabelecimento("04252011", "0001", "10", "AÇAÍ DO RIO", "CONTATO@ACAI.COM.BR"),
+        _estabelecimento("04252011", "0002", "00", telefone=""),
+    ])
+    _zip(pasta / "Municipios.zip", "F.K03200$Z.D40511.MUNICCSV", [["6001", "RIO DE JANEIRO"]])
+    (pasta / "Socios0.zip").write_bytes(b"")
+    return pasta
+
+
+def test_import_and_lookup(tmp_path, dados):
+    path = str(tmp_path / "base.sqlite")
+    resumo = importar(path, [str(dados)], lote=1)
+    assert sorted(resumo["importados"]) == ["Empresas0.zip", "Estabelecimentos0.zip", "Municipios.zip"]
+    assert resumo["ignorados"] == ["Socios0.zip"]
+    assert resumo["linhas"] == 4 and resumo["invalidas"] == 1
+
+    base = BaseReceita(path)
+    dados_cnpj = base.consultar(LOCAL)
+    assert dados_cnpj["razao_social"] == "LOJAS AÇAÍ LTDA"
+    assert dados_cnpj["email"] == "contato@acai.com.br"
+    assert dados_cnpj["ddd_telefone_1"] == "2133334444"
+    assert dados_cnpj["municipio"] == "RIO DE JANEIRO"
+    assert dados_cnpj["logradouro"] == "RUA DAS FLORES"
+    assert base.consultar("04252011000200")["ddd_telefone_1"] == ""
+    assert base.consultar(FORA_DA_BASE) is None
+    assert BaseReceita(str(tmp_path / "nao_existe.sqlite")).consultar(LOCAL) is None
+
+
+def test_reimport_skips_unchanged_files_and_upserts_changes(tmp_path, dados):
+    path = str(tmp_path / "base.sqlite")
+    importar(path, [str(dados)])
+
+    resumo = importar(path, [str(dados)])
+    assert resumo["importados"] == [] and len(resumo["pulados"]) == 3
+
+    _zip(dados / "Estabelecimentos0.zip", "ESTABELE", [
+        _estabelecimento("04252011", "0001", "10", "AÇAÍ DO RIO", "NOVO@ACAI.COM.BR"),
+    ])
+    resumo = importar(path, [str(dados / "Estabelecimentos0.zip")])
+    assert resumo["importados"] == ["Estabelecimentos0.zip"]
+    base = BaseReceita(path)
+    assert base.consultar(LOCAL)["email"] == "novo@acai.com.br"
+    assert base.consultar("04252011000200") is not None    # linha antiga continua
+    assert importar(path, [str(dados)], forcar=True)["pulados"] == []
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    chamadas = []
+
+    def opener(req, timeout=None):
+        chamadas.append(req.full_url)
+        return io.BytesIO(json.dumps({"razao_social": "DA API", "cnpj": FORA_DA_BASE}).encode())
+
+    monkeypatch.setattr(api, "_fetch_cnpj_payload",
+                        functools.partial(api._fetch_cnpj_payload, opener=opener))
+    anterior_cache, anterior_base = cnpj_cache.obter_cache(), cnpj_receita.obter_base()
+    cnpj_cache.configurar_cache(CacheCNPJ())
+    app = Flask(__name__, instance_path=str(tmp_path / "instance"))
+    app.config.update(TESTING=True, SECRET_KEY="teste")
+    app.register_blueprint(api.api_bp)
+    cnpj_receita.init_app(app)
+    app.chamadas = chamadas
+    yield app
+    cnpj_receita.obter_base().fechar()
+    cnpj_cache.configurar_cache(anterior_cache)
+    cnpj_receita.configurar_base(anterior_base)
+
+
+def test_cli_import_and_route_prefers_local_base(app, dados):
+    resultado = app.test_cli_runner().invoke(args=["cnpj", "importar", str(dados), "--lote", "2"])
+    assert resultado.exit_code == 0, resultado.output
+    assert "3 arquivo(s) importado(s)" in resultado.output
+    assert os.path.exists(os.path.join(app.instance_path, "cnpj_receita.sqlite"))
+
+    client = app.test_client()
+    resp = client.get(f"/api/cnpj/{LOCAL}")
+    assert resp.headers["X-Cache"] == "LOCAL"
+    assert resp.get_json()["company"] == "LOJAS AÇAÍ LTDA"
+    assert app.chamadas == []
+
+    resp = client.get(f"/api/cnpj/{FORA_DA_BASE}")
+    assert resp.headers["X-Cache"] == "MISS" and resp.get_json()["company"] == "DA API"
+    assert len(app.chamadas) == 1
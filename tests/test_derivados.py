@@ -0,0 +1,93 @@
+import os
+
+import pytest
+from PIL import Image
+
+from blueprints.equipamentos import equipamentos_bp
+from models import db, Equipment
+from utils import derivados, image_index
+from utils.image_index import ImageIndex
+
+
+def _imagem(path, tamanho, cor=(200, 10, 10), formato="PNG"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", tamanho, cor).save(path, formato)
+    return str(path)
+
+
+@pytest.fixture
+def app(criar_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_index, "index", ImageIndex(str(tmp_path)))
+    app = criar_app(equipamentos_bp, banco="derivados.db",
+                    DERIVADOS_DIR=str(tmp_path / "derivados"))
+    derivados.init_app(app)
+    with app.app_context():
+        db.session.add(Equipment(name="Catraca", unit_price=10.0, quantity=1,
+                                 illustration_path="eq1.png"))
+        db.session.commit()
+    return app
+
+
+def test_profiles_shrink_and_name_by_content(app, tmp_path):
+    origem = _imagem(tmp_path / "static" / "images" / "eq1.png", (1000, 800))
+    gerador = derivados.obter_derivados()
+    perfil = derivados.PERFIS["lista"]
+
+    nome = gerador.nome(origem, perfil)
+    assert nome.endswith(".webp")
+    caminho = gerador.caminho(origem, perfil)
+    assert os.path.basename(caminho) == nome
+    with Image.open(caminho) as img:
+        assert img.format == "WEBP" and img.size == (80, 64)
+
+    _imagem(origem, (1000, 800), cor=(10, 200, 10))
+    os.utime(origem, ns=(1, 1))
+    assert gerador.nome(origem, perfil) != nome
+
+
+def test_docx_profile_reuses_small_images(app, tmp_path):
+    pequena = _imagem(tmp_path / "static" / "images" / "eq1.png", (160, 180))
+    grande = _imagem(tmp_path / "static" / "images" / "foto.jpg", (2000, 2000), formato="JPEG")
+
+    assert derivados.para_docx("eq1.png") == pequena
+    reduzida = derivados.para_docx("static/images/foto.jpg")
+    assert reduzida.endswith(".jpg") and os.path.dirname(reduzida).endswith("docx")
+    with Image.open(reduzida) as img:
+        assert img.size == (320, 320)
+
+
+def test_route_serves_immutable_derivative(app, tmp_path):
+    _imagem(tmp_path / "static" / "images" / "eq1.png", (640, 720))
+    client = app.test_client()
+    with app.test_request_context():
+        url = app.jinja_env.globals["imagem_derivada"]("eq1.png", "lista2x")
+    assert url.startswith("/imagens/lista2x/")
+
+    # outro processo / reinício: init_app registra as imagens dos equipamentos
+    derivados.init_app(app)
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/webp"
+    assert resp.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    assert client.get("/imagens/lista2x/" + "0" * 24 + ".webp").status_code == 404
+    assert client.get("/imagens/gigante/" + url.rsplit("/", 1)[-1]).status_code == 404
+
+
+def test_unknown_name_is_404_without_reading_images(app, tmp_path, monkeypatch):
+    _imagem(tmp_path / "static" / "images" / "eq1.png", (640, 720))
+    gerador = derivados.init_app(app)
+    nome = gerador.nome(str(tmp_path / "static" / "images" / "eq1.png"), derivados.PERFIS["web"])
+
+    def _hash(origem):
+        raise AssertionError("hash calculado numa requisição")
+    monkeypatch.setattr(gerador, "_hash_origem", _hash)
+    client = app.test_client()
+    assert client.get("/imagens/web/" + "f" * 24 + ".webp").status_code == 404
+    assert client.get(f"/imagens/web/{nome}").status_code == 200
+
+
+def test_gerar_writes_every_profile_for_other_processes(app, tmp_path):
+    _imagem(tmp_path / "static" / "images" / "eq1.png", (640, 720))
+    assert derivados.gerar("eq1.png")
+    assert sorted(os.listdir(tmp_path / "derivados")) == ["docx", "lista", "lista2x", "web"]
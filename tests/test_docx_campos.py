@@ -0,0 +1,95 @@
+import io
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from utils.docx_campos import iter_paragrafos, substituir_campos
+from utils.docx_templates import compilar_template
+
+
+def _recarregar(doc):
+    buf = io.BytesIO()
+    doc.save(buf)
+    buf.seek(0)
+    return Document(buf)
+
+
+def test_keeps_run_formatting_when_placeholder_is_in_one_run():
+    doc = Document()
+    p = doc.add_paragraph("Cliente: ")
+    negrito = p.add_run("{{ empresa }}")
+    negrito.bold = True
+    p.add_run(" fim")
+
+    substituir_campos(iter_paragrafos(doc), {"empresa": "ACME"})
+
+    runs = _recarregar(doc).paragraphs[0].runs
+    assert [r.text for r in runs] == ["Cliente: ", "ACME", " fim"]
+    assert runs[1].bold
+
+
+def test_placeholder_split_across_runs_and_line_breaks():
+    doc = Document()
+    p = doc.add_paragraph()
+    for parte in ("Proposta", ": ", "{{ ", "proposta", "_cod", " }}", " / {{ dados }}"):
+        p.add_run(parte)
+
+    substituir_campos(iter_paragrafos(doc), {"proposta_cod": "AB01", "dados": "L1\nL2"})
+
+    p = _recarregar(doc).paragraphs[0]
+    assert p.text == "Proposta: AB01 / L1\nL2"
+    assert len(p._p.findall(f".//{qn('w:br')}")) == 1
+
+
+def test_covers_headers_footers_and_nested_tables():
+    doc = Document()
+    secao = doc.sections[0]
+    secao.header.paragraphs[0].text = "Topo {{ empresa }}"
+    secao.footer.paragraphs[0].text = "{{ data }}"
+    externa = doc.add_table(rows=1, cols=1)
+    interna = externa.cell(0, 0).add_table(rows=1, cols=1)
+    interna.cell(0, 0).paragraphs[0].text = "{{ empresa }} / {{ desconhecido }}"
+
+    substituir_campos(iter_paragrafos(doc), {"empresa": "ACME", "data": "02/01/2025"})
+
+    doc = _recarregar(doc)
+    secao = doc.sections[0]
+    assert secao.header.paragraphs[0].text == "Topo ACME"
+    assert secao.footer.paragraphs[0].text == "02/01/2025"
+    celula = doc.tables[0].cell(0, 0).tables[0].cell(0, 0)
+    assert celula.paragraphs[0].text == "ACME / {{ desconhecido }}"
+
+
+def test_whatsapp_link_applied_in_same_pass():
+    doc = Document()
+    doc.add_paragraph("Telefone: {{ telefone }} (celular)")
+    doc.add_paragraph("Outro: {{ telefone }}")
+
+    substituir_campos(
+        iter_paragrafos(doc),
+        {"telefone": "+55 21 912345678"},
+        link=("+55 21 912345678", "https://wa.me/5521912345678"),
+    )
+
+    doc = _recarregar(doc)
+    primeiro, segundo = doc.paragraphs
+    assert primeiro.text == "Telefone: +55 21 912345678 (celular)"
+    links = primeiro._p.findall(qn("w:hyperlink"))
+    assert len(links) == 1
+    assert doc.part.rels[links[0].get(qn("r:id"))].target_ref == "https://wa.me/5521912345678"
+    assert not segundo._p.findall(qn("w:hyperlink"))
+
+
+def test_compiled_template_indexes_header_placeholders(tmp_path):
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "{{ empresa }}"
+    doc.add_paragraph("{{ cliente }}")
+    path = tmp_path / "proposta_template.docx"
+    doc.save(path)
+
+    instancia = compilar_template(str(path)).clone()
+    substituir_campos(instancia.paragrafos, {"empresa": "ACME", "cliente": "Fulano"})
+
+    doc = _recarregar(instancia.document)
+    assert doc.sections[0].header.paragraphs[0].text == "ACME"
+    assert doc.paragraphs[0].text == "Fulano"
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+from docx import Document
+
+from models import ModalidadeType, ServicoType
+from utils.docx_templates import TemplateRegistry
+
+
+def _salvar_template(path, linhas):
+    doc = Document()
+    for linha in linhas:
+        doc.add_paragraph(linha)
+    doc.save(path)
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    _salvar_template(
+        tmp_path / "proposta_template.docx",
+        ["Cabeçalho", "{{ empresa }}", "INVESTIMENTO:", "Rodapé {{ data }}"],
+    )
+    return tmp_path
+
+
+def test_registry_indexes_placeholders_and_anchor(pasta):
+    compilado = TemplateRegistry(str(pasta)).get()
+    instancia = compilado.clone()
+
+    assert [p.text for p in instancia.paragrafos] == ["{{ empresa }}", "Rodapé {{ data }}"]
+    assert "INVESTIMENTO" in "".join(instancia.ancora.itertext())
+
+
+def test_clone_is_independent_from_cached_template(pasta):
+    registry = TemplateRegistry(str(pasta))
+    primeiro = registry.get().clone()
+    primeiro.paragrafos[0].text = "ACME"
+
+    segundo = registry.get().clone()
+    assert segundo.paragrafos[0].text == "{{ empresa }}"
+
+
+def test_registry_reloads_when_mtime_changes(pasta):
+    registry = TemplateRegistry(str(pasta))
+    antigo = registry.get()
+    assert registry.get() is antigo
+
+    path = pasta / "proposta_template.docx"
+    _salvar_template(path, ["{{ cliente }}"])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, antigo.mtime_ns + 1_000_000))
+
+    novo = registry.get()
+    assert novo is not antigo
+    assert novo.digest != antigo.digest
+    assert [p.text for p in novo.clone().paragrafos] == ["{{ cliente }}"]
+
+
+def test_registry_prefers_specific_template(pasta):
+    _salvar_template(pasta / "proposta_template_acesso_locacao.docx", ["{{ locacao }}"])
+    registry = TemplateRegistry(str(pasta))
+
+    especifico = registry.get(ServicoType.ACESSO, ModalidadeType.LOCACAO)
+    generico = registry.get(ServicoType.PONTO, ModalidadeType.LOCACAO)
+
+    assert especifico.path.endswith("proposta_template_acesso_locacao.docx")
+    assert generico.path.endswith("proposta_template.docx")
+
+
+def test_registry_raises_when_no_template(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TemplateRegistry(str(tmp_path)).get()
@@ -0,0 +1,173 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, EmailOutbox, Equipment, Proposal, User
+from smtp_local import ServidorSMTP
+from utils import email_outbox
+
+
+@pytest.fixture
+def smtp():
+    with ServidorSMTP() as servidor:
+        yield servidor
+
+
+@pytest.fixture
+def app(criar_app, smtp, monkeypatch):
+    app = criar_app(
+        banco="outbox.db",
+        MAIL_SERVER=smtp.host,
+        MAIL_PORT=smtp.port,
+        MAIL_USE_TLS=False,
+        MAIL_SENDER="propostas@exemplo.com",
+        MAIL_OUTBOX_MAX_TENTATIVAS=3,
+        MAIL_OUTBOX_BACKOFF=60,
+        MAIL_OUTBOX_BACKOFF_MAX=120,
+    )
+
+    renders = []
+
+    def _fake(proposta, itens, *, pdf=True, **colab):
+        renders.append([(i.id, i.quantity, i.unit_price) for i in itens])
+        return {"docx": b"DOCX", "pdf": b"%PDF-fake"}
+
+    monkeypatch.setattr(email_outbox, "renderizar_proposta", _fake)
+    app.renders = renders
+
+    with app.app_context():
+        user = User(usuario="ana", nome_completo="Ana", senha_hash="x", tipo="usuario")
+        eq = Equipment(name="Catraca", unit_price=100.0, quantity=1)
+        db.session.add_all([user, eq])
+        db.session.flush()
+        db.session.add(Proposal(
+            company="ACME", cnpj="04252011000110", client_name="Fulano",
+            email="f@acme.com", telefone="", usuario_id=user.id,
+            filename="PROPOSTA COMERCIAL AA01", data_criacao=datetime(2025, 1, 2),
+        ))
+        db.session.commit()
+    yield app
+    email_outbox.parar()
+
+
+def _enfileirar(app, cc=()):
+    with app.test_request_context():
+        prop = Proposal.query.first()
+        eq = Equipment.query.first()
+        eq.quantity, eq.unit_price = 2, 80.0
+        email = email_outbox.enfileirar(prop, [eq], "Segue a proposta.", list(cc),
+                                        usuario_id=prop.usuario_id, nome_colaborador="Ana")
+        db.session.rollback()  # o catálogo não deve ser alterado
+        return email.id
+
+
+def _email(app, email_id):
+    with app.app_context():
+        email = db.session.get(EmailOutbox, email_id)
+        db.session.expunge(email)
+        return email
+
+
+def test_enqueue_does_not_send_until_dispatched(app, smtp):
+    email_id = _enfileirar(app, cc=["copia@acme.com"])
+    assert smtp.mensagens == [] and app.renders == []
+    assert _email(app, email_id).status == EmailOutbox.PENDENTE
+
+    assert email_outbox.processar_pendentes(app) == 1
+
+    [msg] = smtp.mensagens
+    assert msg["To"] == "f@acme.com"
+    assert msg["Cc"] == "copia@acme.com"
+    assert msg["Subject"] == "PROPOSTA COMERCIAL AA01"
+    assert msg.get_body().get_content().strip() == "Segue a proposta."
+    [anexo] = list(msg.iter_attachments())
+    assert anexo.get_filename() == "PROPOSTA COMERCIAL AA01.pdf"
+    assert anexo.get_content() == b"%PDF-fake"
+    assert app.renders == [[(1, 2, 80.0)]]
+
+    email = _email(app, email_id)
+    assert email.status == EmailOutbox.ENVIADO
+    assert email.tentativas == 1 and email.enviado_em is not None
+    assert email_outbox.processar_pendentes(app) == 0  # não reenvia
+
+
+def test_temporary_failure_is_retried_with_backoff(app, smtp):
+    smtp.falhas = ["451 tente mais tarde", "451 tente mais tarde"]
+    email_id = _enfileirar(app)
+
+    antes = datetime.utcnow()
+    assert email_outbox.processar_pendentes(app) == 0
+    email = _email(app, email_id)
+    assert email.status == EmailOutbox.PENDENTE
+    assert email.tentativas == 1 and "451" in email.erro
+    assert email.proximo_envio_em >= antes + timedelta(seconds=60)
+
+    # ainda não venceu: nada acontece
+    assert email_outbox.processar_pendentes(app) == 0
+    assert _email(app, email_id).tentativas == 1
+
+    def _vencer():
+        with app.app_context():
+            db.session.get(EmailOutbox, email_id).proximo_envio_em = datetime.utcnow()
+            db.session.commit()
+
+    _vencer()
+    assert email_outbox.processar_pendentes(app) == 0
+    email = _email(app, email_id)
+    assert email.tentativas == 2
+    assert email.proximo_envio_em >= datetime.utcnow() + timedelta(seconds=110)  # 60 × 2
+
+    _vencer()
+    assert email_outbox.processar_pendentes(app) == 1
+    email = _email(app, email_id)
+    assert email.status == EmailOutbox.ENVIADO and email.erro is None
+    assert len(smtp.mensagens) == 1
+    assert len(app.renders) == 1  # o PDF vem do ArtifactStore nas retentativas
+
+
+def test_permanent_rejection_and_exhausted_retries_fail(app, smtp):
+    smtp.recusar_rcpt = True
+    recusado = _enfileirar(app)
+    assert email_outbox.processar_pendentes(app) == 0
+    email = _email(app, recusado)
+    assert email.status == EmailOutbox.FALHOU and email.tentativas == 1
+
+    smtp.recusar_rcpt = False
+    smtp.falhas = ["451 ocupado"] * 3
+    with app.app_context():
+        db.session.get(EmailOutbox, recusado).status = EmailOutbox.ENVIADO
+        db.session.commit()
+    email_id = _enfileirar(app)
+    for _ in range(3):
+        with app.app_context():
+            db.session.get(EmailOutbox, email_id).proximo_envio_em = datetime.utcnow()
+            db.session.commit()
+        email_outbox.processar_pendentes(app)
+    email = _email(app, email_id)
+    assert email.status == EmailOutbox.FALHOU and email.tentativas == 3
+
+    with app.app_context():
+        email_outbox.reenviar(db.session.get(EmailOutbox, email_id))
+    assert email_outbox.processar_pendentes(app) == 1
+    assert _email(app, email_id).status == EmailOutbox.ENVIADO
+
+
+def test_enqueue_requires_smtp_configuration(app):
+    app.config["MAIL_SERVER"] = None
+    with pytest.raises(RuntimeError):
+        _enfileirar(app)
+    with app.app_context():
+        assert EmailOutbox.query.count() == 0
+
+
+def test_dispatcher_thread_sends_when_woken(app, smtp):
+    app.config["MAIL_OUTBOX_INTERVALO"] = 3600
+    email_outbox.iniciar(app)
+    email_id = _enfileirar(app)
+
+    limite = time.monotonic() + 5
+    while time.monotonic() < limite and _email(app, email_id).status != EmailOutbox.ENVIADO:
+        time.sleep(0.02)
+    assert _email(app, email_id).status == EmailOutbox.ENVIADO
+    assert len(smtp.mensagens) == 1
@@ -0,0 +1,102 @@
+import io
+import types
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from utils import exportacao
+from utils.artifact_store import ArtifactStore
+
+
+def _prop(pid, filename, company="ACME"):
+    return types.SimpleNamespace(
+        id=pid, company=company, cnpj="04252011000110", client_name="Fulano",
+        email="f@acme.com", telefone="", pagamento="", prazo_entrega="",
+        frete="", validade="", garantia="", garantia_sistema="",
+        data_criacao=datetime(2025, 1, 2), servico_type=None,
+        modalidade_type=None, filename=filename,
+    )
+
+
+@pytest.fixture
+def tarefas():
+    props = [
+        _prop(1, "PROPOSTA COMERCIAL AA01"),
+        _prop(2, "PROPOSTA COMERCIAL AA02"),
+        _prop(3, "PROPOSTA COMERCIAL AA01", "Beta"),
+    ]
+    return [
+        exportacao.montar_tarefa(p, [], proposta_cod=p.filename.split()[-1])
+        for p in props
+    ]
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    chamadas = []
+
+    def _fake(tarefa):
+        chamadas.append(tarefa.proposta_id)
+        if tarefa.proposta_id == 2:
+            raise RuntimeError("conversor travou")
+        return {"docx": b"D", "pdf": f"%PDF-{tarefa.proposta_id}".encode()}
+
+    monkeypatch.setattr(exportacao, "renderizar_tarefa", _fake)
+    return chamadas
+
+
+def test_stream_zip_writes_pdfs_report_and_progress(tarefas, renders):
+    prog = exportacao.novo_progresso(len(tarefas))
+    with ThreadPoolExecutor(2) as ex:
+        partes = list(exportacao.stream_zip(tarefas, executor=ex, progresso=prog, janela=2))
+
+    assert len(partes) > 1  # enviado aos poucos, não num bloco só
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(partes)))
+    nomes = set(zf.namelist())
+    assert nomes == {
+        "PROPOSTA COMERCIAL AA01.pdf",
+        "PROPOSTA COMERCIAL AA01 (3).pdf",
+        exportacao.RELATORIO,
+    }
+    relatorio = zf.read(exportacao.RELATORIO).decode("utf-8-sig")
+    assert "2;PROPOSTA COMERCIAL AA02.pdf;erro;conversor travou" in relatorio
+
+    assert prog.finalizado and prog.concluidas == 3
+    assert prog.falhas == [{"proposta_id": 2, "erro": "conversor travou"}]
+    assert exportacao.progresso(prog.id) is prog
+
+
+def test_stream_zip_uses_artifact_store(tmp_path, tarefas, renders):
+    store = ArtifactStore(str(tmp_path))
+    store.put(tarefas[0].chave, {"pdf": b"%PDF-cache"})
+
+    prog = exportacao.novo_progresso(len(tarefas))
+    with ThreadPoolExecutor(2) as ex:
+        dados = b"".join(exportacao.stream_zip(
+            tarefas, executor=ex, progresso=prog, store=store, janela=2
+        ))
+
+    assert sorted(renders) == [2, 3]
+    zf = zipfile.ZipFile(io.BytesIO(dados))
+    assert zf.read("PROPOSTA COMERCIAL AA01.pdf") == b"%PDF-cache"
+    assert store.get(tarefas[2].chave, "pdf") == b"%PDF-3"
+
+
+def test_progress_is_visible_from_another_worker(tmp_path, monkeypatch, tarefas, renders):
+    monkeypatch.setattr(exportacao, "_diretorio", str(tmp_path / "exportacoes"))
+    prog = exportacao.novo_progresso(len(tarefas))
+    with ThreadPoolExecutor(2) as ex:
+        corpo = exportacao.stream_zip(tarefas, executor=ex, progresso=prog, janela=2)
+        next(corpo)
+        # outro worker não tem o objeto em memória: lê o que foi gravado
+        monkeypatch.setattr(exportacao, "_progressos", {})
+        parcial = exportacao.progresso(prog.id)
+        assert parcial is not prog and 1 <= parcial.concluidas < 3
+        assert not parcial.finalizado
+        list(corpo)
+
+    assert exportacao.progresso(prog.id).to_json() == prog.to_json()
+    assert exportacao.progresso("../" + prog.id) is None
+    assert exportacao.progresso("f" * 32) is None
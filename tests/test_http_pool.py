@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.request import Request
+
+import pytest
+
+import api
+from utils.http_pool import OpenerPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.conexoes += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.simultaneas += 1
+            self.server.pico = max(self.server.pico, self.server.simultaneas)
+        try:
+            time.sleep(self.server.atraso)
+            cnpj = self.path.rsplit("/", 1)[-1]
+            if cnpj == "00000000000000":
+                corpo, status = b'{"erro": "not found"}', 404
+            else:
+                corpo, status = json.dumps({"razao_social": "ACME", "cnpj": cnpj}).encode(), 200
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        finally:
+            with self.server.lock:
+                self.server.simultaneas -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    srv.lock = threading.Lock()
+    srv.conexoes = srv.simultaneas = srv.pico = 0
+    srv.atraso = 0.0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    host, port = srv.server_address
+    monkeypatch.setattr(api, "CNPJ_API_URL", f"http://{host}:{port}/cnpj/{{cnpj}}")
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_sequential_lookups_reuse_one_connection(servidor):
+    opener = OpenerPool()
+    for i in range(10):
+        dados = api._fetch_cnpj_payload(f"0425201100011{i}", opener=opener)
+        assert dados == {"razao_social": "ACME", "cnpj": f"0425201100011{i}"}
+    opener.fechar()
+    assert servidor.conexoes == 1
+
+
+def test_errors_match_urlopen(servidor):
+    opener = OpenerPool(timeout_leitura=0.2)
+    with pytest.raises(api._CNPJNotFoundError):
+        api._fetch_cnpj_payload("00000000000000", opener=opener)
+
+    url = api.CNPJ_API_URL.format(cnpj="00000000000000")
+    with pytest.raises(HTTPError) as exc:
+        opener(Request(url), timeout=5)
+    assert exc.value.code == 404
+
+    servidor.atraso = 0.5
+    with pytest.raises(URLError):
+        opener(Request(url), timeout=5)
+    with pytest.raises(api._CNPJServiceError):
+        api._fetch_cnpj_payload("04252011000110", opener=opener)
+    opener.fechar()
+
+
+def test_connections_per_host_are_capped(servidor):
+    servidor.atraso = 0.05
+    opener = OpenerPool(conexoes_por_host=2)
+    threads = [threading.Thread(target=api._fetch_cnpj_payload, args=("04252011000110",),
+                                kwargs={"opener": opener}) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    opener.fechar()
+    assert servidor.pico <= 2 and servidor.conexoes <= 2
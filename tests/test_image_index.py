@@ -0,0 +1,89 @@
+import os
+
+from docx import Document
+from PIL import Image
+
+from utils.image_index import ImageCache, ImageIndex, inserir_imagem
+
+
+def _png(path, tamanho=(16, 18)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", tamanho, (200, 10, 10)).save(path, "PNG")
+    return str(path)
+
+
+def test_index_resolves_normalized_paths(tmp_path):
+    raiz = _png(tmp_path / "static" / "images" / "eq1.png")
+    sub = _png(tmp_path / "static" / "images" / "pasta" / "eq2.png")
+    index = ImageIndex(str(tmp_path))
+
+    assert index.resolver("eq1.png") == raiz
+    assert index.resolver("static\\images\\eq1.png") == raiz
+    assert index.resolver("/static/images/pasta/eq2.png") == sub
+    assert index.resolver("outra/pasta/eq2.png") == sub  # cai no nome do arquivo
+    assert index.resolver("inexistente.png") is None
+    assert index.resolver(None) is None
+
+
+def test_index_sees_new_files_after_invalidation(tmp_path):
+    _png(tmp_path / "static" / "images" / "eq1.png")
+    index = ImageIndex(str(tmp_path), intervalo=3600)
+    index.resolver("eq1.png")
+
+    novo = _png(tmp_path / "static" / "images" / "eq9.png")
+    index.invalidar()
+    assert index.resolver("eq9.png") == novo
+
+
+def test_index_falls_back_to_disk_outside_images_dir(tmp_path):
+    fora = _png(tmp_path / "docs" / "foto.png")
+    (tmp_path / "static" / "images").mkdir(parents=True)
+    index = ImageIndex(str(tmp_path))
+
+    assert index.resolver("docs/foto.png") == os.path.abspath(fora)
+    assert index.resolver(fora) == fora
+
+
+def test_cache_is_lru_bounded_by_size(tmp_path):
+    caminhos = [_png(tmp_path / f"img{i}.png") for i in range(3)]
+    tamanho = os.path.getsize(caminhos[0])
+    cache = ImageCache(max_bytes=tamanho * 2)
+
+    primeiro = cache.get(caminhos[0])
+    assert cache.get(caminhos[0]) is primeiro
+    cache.get(caminhos[1])
+    cache.get(caminhos[0])  # volta a ser o mais recente
+    cache.get(caminhos[2])  # expulsa img1
+
+    assert cache.acertos == 2
+    assert cache.get(caminhos[0]) is primeiro
+    falhas = cache.falhas
+    cache.get(caminhos[1])
+    assert cache.falhas == falhas + 1
+    assert cache.get(str(tmp_path / "nao_existe.png")) is None
+
+
+def test_inserir_imagem_reuses_image_part(tmp_path):
+    item = ImageCache().get(_png(tmp_path / "eq.png"))
+    doc = Document()
+    for _ in range(3):
+        inserir_imagem(doc.add_paragraph().add_run(), item)
+
+    assert len(doc.inline_shapes) == 3
+    assert len(doc.part.package.image_parts) == 1
+    assert doc.inline_shapes[0].width == item.imagem.width
+
+
+def test_cache_rereads_a_file_overwritten_in_place(tmp_path):
+    path = _png(tmp_path / "img.png", (16, 18))
+    cache = ImageCache()
+    antes = cache.get(path)
+
+    _png(path, (32, 18))
+    os.utime(path, ns=(1, 1))               # mtime diferente mesmo em FS de baixa resolução
+    depois = cache.get(path)
+    assert depois is not antes and depois.imagem.px_width == 32
+    assert cache.get(path) is depois
+
+    os.remove(path)
+    assert cache.get(path) is None
@@ -0,0 +1,233 @@
+import io
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from blueprints.equipamentos import equipamentos_bp
+from models import db, Equipment
+from utils import image_index, imagens
+
+
+def _png(w=640, h=480):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), (200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def executor():
+    executor = imagens.configurar_executor(ThreadPoolExecutor(max_workers=1))
+    yield executor
+    executor.shutdown(wait=True)
+    imagens.configurar_executor(None)
+
+
+@pytest.fixture
+def app(criar_app, tmp_path, executor):
+    app = criar_app(equipamentos_bp, banco="imagens.db", IMAGENS_DIR=str(tmp_path / "images"))
+    with app.app_context():
+        db.session.add(Equipment(name="Catraca", unit_price=10.0, quantity=1))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"] = 1
+    return client
+
+
+def _enviar(client, dados, nome="foto.png"):
+    return client.post("/equipamentos/1/upload_imagem",
+                       data={"imagem": (io.BytesIO(dados), nome)},
+                       content_type="multipart/form-data")
+
+
+def test_upload_returns_placeholder_then_letterboxed_image(app, client, executor):
+    resp = _enviar(client, _png())
+    assert resp.status_code == 202
+    assert resp.get_json()["imagem"] == imagens.PLACEHOLDER
+    assert resp.get_json()["imagem_status"] == imagens.PROCESSANDO
+
+    executor.shutdown(wait=True)            # espera o processamento
+
+    dados = client.get("/equipamentos/1").get_json()
+    assert dados["imagem_status"] == imagens.PRONTA
+    assert re.match(r"^[0-9a-f]{2}/[0-9a-f]{32}\.png$", dados["imagem"])
+    with Image.open(f"{app.config['IMAGENS_DIR']}/{dados['imagem']}") as img:
+        assert img.size == (imagens.TARGET_W, imagens.TARGET_H)
+    assert os.listdir(imagens.diretorio_uploads(app)) == []     # original descartado
+
+
+def test_failed_replacement_keeps_previous_image(app, client, executor, tmp_path):
+    antiga = _gerada(tmp_path, "c" * 32)
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = antiga
+        db.session.commit()
+
+    # cabeçalho PNG válido, mas sem os dados da imagem
+    resp = _enviar(client, _png()[:64])
+    assert (resp.status_code, resp.get_json()["imagem"]) == (202, imagens.PLACEHOLDER)
+    executor.shutdown(wait=True)
+
+    dados = client.get("/equipamentos/1").get_json()
+    assert dados["imagem_status"] == imagens.FALHOU
+    assert dados["imagem_erro"]
+    assert dados["imagem"] == antiga
+    assert (tmp_path / "images" / antiga).exists()
+
+    assert _enviar(client, b"nada a ver", "foto.png").status_code == 400
+
+
+def test_previous_image_is_removed_once_the_new_one_is_ready(app, client, executor, tmp_path):
+    antiga = _gerada(tmp_path, "c" * 32)
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = antiga
+        db.session.commit()
+
+    assert _enviar(client, _png()).status_code == 202
+    executor.shutdown(wait=True)
+
+    assert client.get("/equipamentos/1").get_json()["imagem_status"] == imagens.PRONTA
+    assert not (tmp_path / "images" / antiga).exists()
+    with app.app_context():
+        eq = db.session.get(Equipment, 1)
+        assert (eq.imagem_original, eq.imagem_anterior, eq.imagem_desde) == (None, None, None)
+
+
+def test_recovery_only_takes_stale_rows_once(app, tmp_path, monkeypatch):
+    agendadas = []
+    monkeypatch.setattr(imagens, "agendar", lambda app, eq_id, origem: agendadas.append(eq_id))
+    original = tmp_path / "bruto.png"
+    original.write_bytes(_png())
+    with app.app_context():
+        velha = db.session.get(Equipment, 1)
+        nova = Equipment(name="Outra", unit_price=1.0, quantity=1)
+        sumida = Equipment(name="Sumida", unit_price=1.0, quantity=1,
+                           imagem_anterior="logo.png")
+        db.session.add_all([nova, sumida])
+        for eq, desde in ((velha, datetime(2020, 1, 1)), (nova, datetime.utcnow()),
+                          (sumida, datetime(2020, 1, 1))):
+            eq.imagem_status, eq.imagem_desde = imagens.PROCESSANDO, desde
+            eq.imagem_original = str(original) if eq is not sumida else "/nao/existe.png"
+        db.session.commit()
+
+    assert imagens.recuperar_pendentes(app) == 1
+    assert imagens.recuperar_pendentes(app) == 0    # outro processo: já reservada
+    assert agendadas == [1]
+    with app.app_context():
+        sumida = Equipment.query.filter_by(name="Sumida").one()
+        assert (sumida.imagem_status, sumida.illustration_path) == (imagens.FALHOU, "logo.png")
+
+
+def test_stale_result_is_discarded(app, tmp_path):
+    with app.app_context():
+        eq = db.session.get(Equipment, 1)
+        eq.imagem_original, eq.imagem_status = "/uploads/segundo.png", imagens.PROCESSANDO
+        db.session.commit()
+
+    velho = _gerada(tmp_path, "ab" * 16)
+    futuro = Future()
+    futuro.set_result(velho)
+    imagens._concluir(app, 1, "/uploads/primeiro.png", futuro)
+
+    assert not (tmp_path / "images" / velho).exists()
+    with app.app_context():
+        eq = db.session.get(Equipment, 1)
+        assert (eq.illustration_path, eq.imagem_status) == (None, imagens.PROCESSANDO)
+
+
+def _gerada(tmp_path, digest, dados=b"x", ext="png"):
+    rel = f"{digest[:2]}/{digest}.{ext}" if len(digest) == 32 else digest
+    path = tmp_path / "images" / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(dados)
+    os.utime(path, (1, 1))
+    return rel
+
+
+def test_same_picture_is_stored_once_and_removed_with_its_last_user(app, client, tmp_path):
+    origem = tmp_path / "foto.png"
+    origem.write_bytes(_png())
+    rel = imagens.letterbox(str(origem), app.config["IMAGENS_DIR"])
+    assert imagens.letterbox(str(origem), app.config["IMAGENS_DIR"]) == rel
+    assert len(os.listdir(tmp_path / "images" / rel.split("/")[0])) == 1
+
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = rel
+        db.session.add(Equipment(name="Outra", unit_price=1.0, quantity=1,
+                                 illustration_path=f"static/images/{rel}"))
+        db.session.commit()
+
+    assert client.delete("/equipamentos/1").get_json()["success"]
+    assert (tmp_path / "images" / rel).exists()         # ainda usada pelo equipamento 2
+    client.delete("/equipamentos/2")
+    assert not (tmp_path / "images" / rel).exists()
+    assert not (tmp_path / "images" / rel.split("/")[0]).exists()
+
+
+def test_reuploading_the_same_photo_keeps_the_file(app, client, executor, tmp_path):
+    origem = tmp_path / "foto.png"
+    origem.write_bytes(_png())
+    atual = imagens.letterbox(str(origem), app.config["IMAGENS_DIR"])
+    (tmp_path / "images" / atual).write_bytes(b"truncado")
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = atual
+        db.session.commit()
+
+    assert _enviar(client, _png()).status_code == 202
+    executor.shutdown(wait=True)
+
+    dados = client.get("/equipamentos/1").get_json()
+    assert (dados["imagem_status"], dados["imagem"]) == (imagens.PRONTA, atual)
+    with Image.open(tmp_path / "images" / atual) as img:     # republicado por inteiro
+        assert img.size == (imagens.TARGET_W, imagens.TARGET_H)
+
+
+def test_gc_removes_only_unreferenced_generated_files(app, tmp_path):
+    imagens.init_app(app)
+    em_uso = _gerada(tmp_path, "1" * 32)
+    orfa = _gerada(tmp_path, "2" * 32)
+    antiga = _gerada(tmp_path, "eq6_" + "3" * 32 + ".png")
+    recente = _gerada(tmp_path, "4" * 32)
+    os.utime(tmp_path / "images" / recente)
+    logo = _gerada(tmp_path, "logo.png")
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = em_uso
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    simulado = runner.invoke(args=["imagens", "gc", "--dry-run"])
+    assert simulado.exit_code == 0
+    assert f"{orfa}\n{antiga}\n" in simulado.output
+    assert (tmp_path / "images" / orfa).exists()
+
+    assert runner.invoke(args=["imagens", "gc"]).exit_code == 0
+    restantes = {p.relative_to(tmp_path / "images").as_posix()
+                 for p in (tmp_path / "images").rglob("*") if p.is_file()}
+    assert restantes == {em_uso, recente, logo}
+
+
+def test_deduplicar_moves_identical_images_to_one_file(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_index, "index",
+                        image_index.ImageIndex(str(tmp_path), str(tmp_path / "images")))
+    imagens.init_app(app)
+    a = _gerada(tmp_path, "eq1_" + "a" * 32 + ".png", dados=_png())
+    b = _gerada(tmp_path, "eq2_" + "b" * 32 + ".png", dados=_png())
+    with app.app_context():
+        db.session.get(Equipment, 1).illustration_path = a
+        db.session.add(Equipment(name="Outra", unit_price=1.0, quantity=1, illustration_path=b))
+        db.session.commit()
+
+        assert imagens.deduplicar(app) == 2
+        caminhos = {eq.illustration_path for eq in Equipment.query}
+    assert len(caminhos) == 1 and (tmp_path / "images" / caminhos.pop()).exists()
+
+    assert app.test_cli_runner().invoke(args=["imagens", "gc", "--idade-minima", "0"]).exit_code == 0
+    assert not (tmp_path / "images" / a).exists() and not (tmp_path / "images" / b).exists()
@@ -0,0 +1,125 @@
+import types
+
+import dns.name
+import dns.resolver
+import pytest
+from flask import Flask
+
+from api import api_bp
+from utils import mx_cache
+from utils.mx_cache import CacheMX, normalizar_dominio
+
+
+class ResolvedorStub:
+    """Respostas fixas por domínio, no formato do ``dns.resolver``."""
+
+    def __init__(self, respostas):
+        self.respostas = respostas
+        self.consultas = []
+
+    def resolve(self, nome, tipo, lifetime=None):
+        self.consultas.append((nome, tipo, lifetime))
+        resp = self.respostas[nome]
+        if isinstance(resp, Exception):
+            raise resp
+        return _Resposta(*resp)
+
+
+class _Resposta:
+    def __init__(self, ttl, registros):
+        self.rrset = types.SimpleNamespace(ttl=ttl)
+        self._registros = [
+            types.SimpleNamespace(preference=p, exchange=dns.name.from_text(h))
+            for p, h in registros
+        ]
+
+    def __iter__(self):
+        return iter(self._registros)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(mx_cache.time, "time", lambda: agora[0])
+    return agora
+
+
+def test_positive_answer_is_cached_for_record_ttl(relogio):
+    stub = ResolvedorStub({"acme.com": (120, [(20, "mx2.acme.com."), (10, "mx1.acme.com.")])})
+    cache = CacheMX(resolver=stub, lifetime=1.5, ttl_min=30)
+
+    res = cache.consultar("acme.com")
+    assert res.tem_mx and res.hosts == ["mx1.acme.com", "mx2.acme.com"]
+    assert res.origem == "dns" and res.expira_em == relogio[0] + 120
+    assert stub.consultas == [("acme.com", "MX", 1.5)]
+
+    relogio[0] += 119
+    assert cache.consultar("acme.com").origem == "memoria"
+    relogio[0] += 2
+    assert cache.consultar("acme.com").origem == "dns"
+    assert len(stub.consultas) == 2
+
+
+def test_negative_answers_are_cached_briefly_and_errors_not_at_all(relogio):
+    stub = ResolvedorStub({
+        "naoexiste.com": dns.resolver.NXDOMAIN(),
+        "semmx.com": dns.resolver.NoAnswer(),
+        "nullmx.com": (3600, [(0, ".")]),
+        "lento.com": dns.resolver.LifetimeTimeout(timeout=4.0, errors={}),
+    })
+    cache = CacheMX(resolver=stub, ttl_negativo=60)
+
+    for dominio in ("naoexiste.com", "semmx.com", "nullmx.com"):
+        res = cache.consultar(dominio)
+        assert not res.tem_mx and res.expira_em == relogio[0] + 60
+        assert cache.consultar(dominio).origem == "memoria"
+
+    assert cache.consultar("lento.com").erro == "LifetimeTimeout"
+    cache.consultar("lento.com")
+    assert [n for n, *_ in stub.consultas].count("lento.com") == 2
+
+
+def test_shared_store_serves_other_workers(tmp_path, relogio):
+    db = str(tmp_path / "mx.sqlite")
+    stub = ResolvedorStub({"acme.com": (600, [(10, "mx.acme.com.")])})
+    CacheMX(db, resolver=stub).consultar("acme.com")
+
+    outro_worker = CacheMX(db, resolver=ResolvedorStub({}))
+    res = outro_worker.consultar("acme.com")
+    assert res.origem == "compartilhado" and res.hosts == ["mx.acme.com"]
+    assert outro_worker.consultar("acme.com").origem == "memoria"
+
+
+def test_normalizes_emails_and_rejects_garbage():
+    assert normalizar_dominio("Fulano@ACME.com.br ") == "acme.com.br"
+    assert normalizar_dominio("exemplo.com.") == "exemplo.com"
+    assert normalizar_dominio("joão@açaí.com.br") == "xn--aa-4iaz.com.br"
+    assert normalizar_dominio("fulano@localhost") is None
+    assert normalizar_dominio("a@b..com") is None
+
+
+def test_prefetch_endpoint(relogio):
+    stub = ResolvedorStub({
+        "acme.com": (300, [(10, "mx.acme.com.")]),
+        "lento.com": dns.resolver.LifetimeTimeout(timeout=4.0, errors={}),
+    })
+    anterior = mx_cache.obter_cache()
+    mx_cache.configurar_cache(CacheMX(resolver=stub))
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SECRET_KEY="teste")
+    app.register_blueprint(api_bp)
+    client = app.test_client()
+    try:
+        assert client.get("/api/mx/acme.com").status_code == 401   # exige login
+        with client.session_transaction() as sess:
+            sess["usuario_id"] = 1
+
+        dados = client.get("/api/mx/ACME.com").get_json()
+        assert dados == {"dominio": "acme.com", "mx": True, "hosts": ["mx.acme.com"],
+                         "ttl": 300, "origem": "dns", "erro": None}
+        assert client.get("/api/mx/acme.com").get_json()["origem"] == "memoria"
+        assert client.get("/api/mx/nada").status_code == 400
+        assert client.get("/api/mx/lento.com").status_code == 503
+        assert mx_cache.dominio_tem_mx("vendas@acme.com")
+    finally:
+        mx_cache.configurar_cache(anterior)
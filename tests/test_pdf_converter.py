@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+import types
+
+import pytest
+from flask import Flask
+
+from utils import pdf_converter
+from utils.pdf_converter import ConversionError, ConversionTimeout, ConverterPool, _Worker
+
+
+class _FakeWorker(_Worker):
+    inicios = 0
+
+    def start(self, timeout):
+        super().start(timeout)
+        type(self).inicios += 1
+
+    def convert(self, docx_bytes, timeout):
+        if docx_bytes == b"trava":
+            raise ConversionTimeout("travou")
+        if docx_bytes == b"cai":
+            raise ConversionError("soffice caiu")
+        self.conversoes += 1
+        return b"%PDF-" + docx_bytes
+
+
+@pytest.fixture(autouse=True)
+def _zera_contador():
+    _FakeWorker.inicios = 0
+
+
+def _pool(tmp_path, **kwargs):
+    kwargs.setdefault("worker_cls", _FakeWorker)
+    return ConverterPool(base_dir=str(tmp_path), soffice="soffice", **kwargs)
+
+
+def test_pool_converts_and_warms_every_worker(tmp_path):
+    pool = _pool(tmp_path, size=3)
+    pool.start()
+
+    assert _FakeWorker.inicios == 3
+    assert pool.convert(b"doc") == b"%PDF-doc"
+    assert _FakeWorker.inicios == 3  # já aquecido, não reinicia
+
+
+def test_pool_gives_each_worker_its_own_profile(tmp_path):
+    pool = _pool(tmp_path, size=2)
+    pool.start()
+
+    perfis = {w.profile_dir for w in pool._workers}
+    assert len(perfis) == 2
+
+
+def test_pool_recycles_worker_after_max_conversions(tmp_path):
+    pool = _pool(tmp_path, size=1, max_conversoes=2)
+
+    for _ in range(5):
+        pool.convert(b"x")
+
+    # 1ª partida + reciclagens após a 2ª e a 4ª conversão
+    assert _FakeWorker.inicios == 3
+
+
+def test_pool_restarts_worker_after_timeout(tmp_path):
+    pool = _pool(tmp_path, size=1)
+
+    with pytest.raises(ConversionTimeout):
+        pool.convert(b"trava")
+    assert pool.convert(b"ok") == b"%PDF-ok"
+    assert _FakeWorker.inicios == 2
+
+
+def test_pool_restarts_worker_after_failed_conversion(tmp_path):
+    pool = _pool(tmp_path, size=1)
+
+    with pytest.raises(ConversionError):
+        pool.convert(b"cai")
+    assert pool.convert(b"ok") == b"%PDF-ok"
+    assert _FakeWorker.inicios == 2
+
+
+def test_pool_times_out_waiting_for_free_worker(tmp_path):
+    liberar = threading.Event()
+
+    class _Lento(_FakeWorker):
+        def convert(self, docx_bytes, timeout):
+            liberar.wait(2)
+            return b"%PDF-"
+
+    pool = _pool(tmp_path, size=1, timeout=0.1, worker_cls=_Lento)
+    t = threading.Thread(target=pool.convert, args=(b"a",))
+    t.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(ConversionTimeout):
+            pool.convert(b"b")
+    finally:
+        liberar.set()
+        t.join()
+
+
+def test_pool_keeps_conversion_files_in_io_dir(tmp_path):
+    io_dir = tmp_path / "shm"
+    pool = _pool(tmp_path / "perfis", size=2, io_dir=str(io_dir))
+    pool.start()
+
+    dirs = {w.io_dir for w in pool._workers}
+    assert len(dirs) == 2
+    assert all(d.startswith(str(io_dir)) and os.path.isdir(d) for d in dirs)
+
+    pool.shutdown()
+    assert not any(os.path.exists(d) for d in dirs)
+
+
+class _FakeUno:
+    """Ponte UNO falsa: o "soffice" copia o DOCX para o PDF com um prefixo."""
+
+    def __init__(self):
+        self.processos = []
+        self.cair = False
+        uno = self
+
+        class _Proc:
+            def __init__(self, cmd, **kwargs):
+                self.cmd, self.codigo = cmd, None
+                uno.processos.append(self)
+
+            def poll(self):
+                return self.codigo
+
+            def kill(self):
+                self.codigo = -9
+
+            def wait(self, timeout=None):
+                return self.codigo
+
+        class _Doc:
+            def __init__(self, src):
+                self.src = src
+
+            def storeToURL(self, url, props):
+                assert dict((p.Name, p.Value) for p in props) == {"FilterName": "writer_pdf_Export"}
+                with open(self.src, "rb") as fp, open(url[len("file://"):], "wb") as out:
+                    out.write(b"%PDF-" + fp.read())
+
+            def close(self, forcar):
+                pass
+
+        class _Desktop:
+            def loadComponentFromURL(self, url, alvo, flags, props):
+                if uno.cair:
+                    uno.processos[-1].codigo = 1
+                    raise RuntimeError("DisposedException")
+                return _Doc(url[len("file://"):])
+
+        class _Servicos:
+            def createInstanceWithContext(self, nome, ctx):
+                return {"com.sun.star.bridge.UnoUrlResolver": self,
+                        "com.sun.star.frame.Desktop": _Desktop()}[nome]
+
+            def resolve(self, url):
+                assert uno.processos[-1].poll() is None
+                return types.SimpleNamespace(ServiceManager=self)
+
+        self.Popen = _Proc
+        self._contexto = types.SimpleNamespace(ServiceManager=_Servicos())
+
+    def getComponentContext(self):
+        return self._contexto
+
+    @staticmethod
+    def systemPathToFileUrl(path):
+        return "file://" + path
+
+
+class _PropertyValue:
+    Name = Value = None
+
+
+def test_uno_worker_converts_through_resident_soffice(tmp_path, monkeypatch):
+    uno = _FakeUno()
+    monkeypatch.setattr(pdf_converter, "uno", uno)
+    monkeypatch.setattr(pdf_converter, "PropertyValue", _PropertyValue)
+    monkeypatch.setattr(pdf_converter.subprocess, "Popen", uno.Popen)
+    pool = _pool(tmp_path, size=1, worker_cls=pdf_converter._UnoWorker)
+
+    assert pool.convert(b"a") == b"%PDF-a"
+    assert pool.convert(b"b") == b"%PDF-b"
+    assert len(uno.processos) == 1          # um soffice para as duas conversões
+    assert any(a.startswith("--accept=pipe,name=") for a in uno.processos[0].cmd)
+
+    uno.cair = True
+    with pytest.raises(ConversionError):
+        pool.convert(b"c")
+    uno.cair = False
+    assert pool.convert(b"d") == b"%PDF-d"
+    assert len(uno.processos) == 2          # o que caiu foi substituído
+    pool.shutdown()
+    assert uno.processos[1].poll() is not None
+
+
+def test_init_app_warns_when_falling_back_to_cli(monkeypatch, caplog):
+    app = Flask(__name__)
+    monkeypatch.setattr(pdf_converter, "_pool", None)     # volta ao anterior no fim
+    monkeypatch.setattr(pdf_converter, "_UNO_AVAILABLE", False)
+    monkeypatch.setattr(pdf_converter, "_soffice_bin", lambda: "/usr/bin/soffice")
+    with caplog.at_level("WARNING"):
+        pool = pdf_converter.init_app(app)
+    assert pool.worker_cls is pdf_converter._CliWorker
+    assert "python3-uno" in caplog.text
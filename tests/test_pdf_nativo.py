@@ -0,0 +1,141 @@
+import re
+import types
+import zlib
+from datetime import datetime
+
+import pytest
+from docx import Document
+from PIL import Image
+
+import gerar_proposta
+from models import db, TemplateConfig
+from utils import pdf_nativo, renderizadores
+from utils.image_index import ImageCache
+
+
+def _textos(pdf: bytes) -> str:
+    """Conteúdo descomprimido de todos os streams de página."""
+    out = []
+    for bruto in re.findall(rb"/FlateDecode >>\nstream\n(.*?)\nendstream", pdf, re.S):
+        try:
+            out.append(zlib.decompress(bruto).decode("latin-1"))
+        except zlib.error:
+            pass
+    return "\n".join(out)
+
+
+def _prop(telefone="+55 21 912345678"):
+    return types.SimpleNamespace(
+        id=1, company="ACME", cnpj="04252011000110", client_name="Fulano",
+        email="f@acme.com", telefone=telefone, pagamento="À vista",
+        prazo_entrega="10 dias", frete="CIF", validade="30 dias", garantia="1 ano",
+        garantia_sistema="6 meses", data_criacao=datetime(2025, 1, 2),
+        servico_type=None, modalidade_type=None, filename="PROPOSTA COMERCIAL AA01",
+    )
+
+
+def _item(pid, preco, qtd=1, desconto=0.0, imagem=None):
+    return types.SimpleNamespace(
+        id=pid, name=f"Eq {pid}", description=f"Equipamento {pid}",
+        illustration_path=imagem, unit_price=preco, quantity=qtd,
+        discount_percent=desconto,
+    )
+
+
+def test_renders_paragraphs_table_images_and_pages(tmp_path):
+    png = tmp_path / "eq.png"
+    Image.new("RGBA", (16, 18), (200, 10, 10, 128)).save(png)
+    imagem = ImageCache().get(str(png))
+
+    doc = Document()
+    doc.add_paragraph("Proposta ").add_run("AA01").bold = True
+    ancora = doc.add_paragraph("INVESTIMENTO:")
+    doc.add_paragraph("Depois da tabela")
+    linhas = [[f"Item {i}", imagem if i % 2 else None, "1", "R$ 1,00", "R$ 1,00"]
+              for i in range(60)]
+    tabela = (["Descrição", "Imagem", "Quantidade", "Preço Unitário", "Total"],
+              linhas, (1, 2, 3, 4))
+
+    pdf = pdf_nativo.renderizar_pdf(doc, tabela, ancora._p)
+
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    texto = _textos(pdf)
+    assert "/F2" in texto and "(AA01) Tj" in texto
+    assert texto.index("(INVESTIMENTO:)") < texto.index("(Item 0)") < texto.index("(Depois")
+    assert texto.count("(Descri\xe7\xe3o) Tj") > 1          # cabeçalho repetido
+    assert int(re.search(rb"/Count (\d+)", pdf).group(1)) > 1
+    assert pdf.count(b"/Subtype /Image") == 2                 # imagem + máscara alfa, uma vez
+
+
+def test_native_pdf_follows_docx_table_rules():
+    itens = [_item(1, 1000.0), _item(2, 500.0, qtd=2, desconto=10)]
+
+    pdf = gerar_proposta.gerar_proposta_docx(
+        _prop(), itens, "pdf", proposta_cod="AA01", renderizador="nativo",
+    ).getvalue()
+
+    assert pdf.startswith(b"%PDF")
+    texto = _textos(pdf)
+    for celula in ("Pre\xe7o c/ desconto", "R$ 1.000,00", "R$ 450,00", "R$ 900,00", "\x97"):
+        assert f"({celula})" in texto
+    assert b"/URI (https://wa.me/5521912345678)" in pdf
+
+    sem_desconto = _textos(gerar_proposta.gerar_proposta_docx(
+        _prop(), itens[:1], "pdf", renderizador="nativo",
+    ).getvalue())
+    assert "desconto)" not in sem_desconto
+
+
+def test_native_pdf_does_not_build_the_docx(monkeypatch):
+    def _sem_docx(*args, **kwargs):
+        raise AssertionError("DOCX montado sem necessidade")
+
+    monkeypatch.setattr(gerar_proposta, "_inserir_tabela_equipamentos", _sem_docx)
+    monkeypatch.setattr(gerar_proposta, "_salvar", _sem_docx)
+    pdf = gerar_proposta.gerar_proposta_docx(
+        _prop(), [_item(1, 10.0)], "pdf", renderizador="nativo",
+    ).getvalue()
+    assert pdf.startswith(b"%PDF")
+
+
+def test_falls_back_to_libreoffice(monkeypatch):
+    def _quebra(*args, **kwargs):
+        raise pdf_nativo.RenderizacaoNativaError("não suportado")
+
+    monkeypatch.setattr(pdf_nativo, "renderizar_pdf", _quebra)
+    monkeypatch.setattr(gerar_proposta, "_converter_pdf", lambda docx: b"%PDF-libreoffice")
+
+    artefatos = gerar_proposta.renderizar_proposta(
+        _prop(), [_item(1, 10.0)], renderizador="nativo",
+    )
+    assert artefatos["pdf"] == b"%PDF-libreoffice"
+    assert artefatos["docx"].startswith(b"PK")
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(banco="cfg.db")
+    with app.app_context():
+        yield app
+    renderizadores.preferencias.invalidar()
+
+
+def test_renderer_is_chosen_per_template(app, monkeypatch):
+    prop = _prop()
+    chamadas = []
+    monkeypatch.setattr(gerar_proposta, "_converter_pdf", lambda docx: b"%PDF-libreoffice")
+    monkeypatch.setattr(pdf_nativo, "renderizar_pdf",
+                        lambda *a: chamadas.append(a) or b"%PDF-nativo")
+
+    antes = gerar_proposta.chave_render(prop, [])
+    assert gerar_proposta.renderizar_proposta(prop, [])["pdf"] == b"%PDF-libreoffice"
+
+    renderizadores.definir_renderizador("proposta_template.docx", TemplateConfig.NATIVO)
+    assert renderizadores.renderizador_do_template("proposta_template.docx") == "nativo"
+    assert renderizadores.renderizador_do_template("outro.docx") == "libreoffice"
+    assert gerar_proposta.renderizar_proposta(prop, [])["pdf"] == b"%PDF-nativo"
+    assert gerar_proposta.chave_render(prop, []) != antes
+    assert len(chamadas) == 1
+
+    with pytest.raises(ValueError):
+        renderizadores.definir_renderizador("proposta_template.docx", "word")
@@ -0,0 +1,138 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from api import api_bp
+from models import db, Equipment, Proposal, RenderJob, User
+from utils import render_jobs
+
+
+@pytest.fixture
+def app(criar_app, monkeypatch):
+    app = criar_app(api_bp, banco="jobs.db")
+
+    # executa os jobs na própria thread do teste
+    monkeypatch.setattr(render_jobs, "_agendar", render_jobs.executar)
+
+    with app.app_context():
+        user = User(usuario="ana", nome_completo="Ana", senha_hash="x", tipo="usuario")
+        eq = Equipment(name="Catraca", unit_price=100.0, quantity=1)
+        db.session.add_all([user, eq])
+        db.session.flush()
+        db.session.add(Proposal(
+            company="ACME", cnpj="04252011000110", client_name="Fulano",
+            email="f@acme.com", telefone="", usuario_id=user.id,
+            filename="PROPOSTA COMERCIAL AA01", data_criacao=datetime(2025, 1, 2),
+        ))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    chamadas = []
+
+    def _fake(proposta, itens, *, pdf=True, **colab):
+        chamadas.append([(i.id, i.quantity, i.unit_price) for i in itens])
+        return {"docx": b"DOCX", "pdf": b"%PDF-fake"}
+
+    monkeypatch.setattr(render_jobs, "renderizar_proposta", _fake)
+    return chamadas
+
+
+def _enfileirar(app, qtd=3):
+    with app.test_request_context():
+        prop = Proposal.query.first()
+        eq = Equipment.query.first()
+        eq.quantity, eq.unit_price = qtd, 80.0
+        job = render_jobs.enfileirar(prop, [eq], usuario_id=prop.usuario_id,
+                                     nome_colaborador="Ana")
+        db.session.rollback()  # o catálogo não deve ser alterado
+        return job.id
+
+
+def test_job_renders_in_background_and_serves_result(app, renders):
+    job_id = _enfileirar(app)
+
+    assert renders == [[(1, 3, 80.0)]]
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "usuario"
+
+    status = client.get(f"/api/render_jobs/{job_id}").get_json()
+    assert status["status"] == RenderJob.CONCLUIDO
+    resp = client.get(status["result_url"] + "?download=1")
+    assert resp.data == b"%PDF-fake"
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+
+def test_identical_job_reuses_stored_document(app, renders):
+    _enfileirar(app)
+    job_id = _enfileirar(app)
+
+    assert len(renders) == 1
+    with app.app_context():
+        assert db.session.get(RenderJob, job_id).status == RenderJob.CONCLUIDO
+
+
+def test_failed_job_can_be_retried(app, renders, monkeypatch):
+    def _quebra(*a, **kw):
+        raise RuntimeError("LibreOffice indisponível")
+
+    monkeypatch.setattr(render_jobs, "renderizar_proposta", _quebra)
+    job_id = _enfileirar(app)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "usuario"
+    status = client.get(f"/api/render_jobs/{job_id}").get_json()
+    assert status["status"] == RenderJob.FALHOU
+    assert "LibreOffice" in status["erro"]
+
+    monkeypatch.undo()
+    monkeypatch.setattr(render_jobs, "_agendar", render_jobs.executar)
+    monkeypatch.setattr(render_jobs, "renderizar_proposta",
+                        lambda *a, **kw: {"docx": b"D", "pdf": b"%PDF"})
+    resp = client.post(f"/api/render_jobs/{job_id}/retry")
+    assert resp.status_code == 202
+    status = client.get(f"/api/render_jobs/{job_id}").get_json()
+    assert status["status"] == RenderJob.CONCLUIDO
+    assert status["tentativas"] == 2
+
+
+def test_stale_jobs_are_recovered_after_restart(app, renders, monkeypatch):
+    monkeypatch.setattr(render_jobs, "_agendar", lambda app, job_id: None)
+    travado, em_curso = _enfileirar(app), _enfileirar(app, qtd=4)
+    with app.app_context():
+        for job_id, quando in ((travado, datetime(2020, 1, 1)), (em_curso, datetime.utcnow())):
+            db.session.execute(update(RenderJob).where(RenderJob.id == job_id)
+                               .values(status=RenderJob.EXECUTANDO, atualizado_em=quando))
+        db.session.commit()
+
+    monkeypatch.setattr(render_jobs, "_agendar", render_jobs.executar)
+    assert render_jobs.recuperar_pendentes(app) == 1
+    with app.app_context():
+        assert db.session.get(RenderJob, travado).status == RenderJob.CONCLUIDO
+        # ainda rodando em outro processo: não é executado de novo
+        assert db.session.get(RenderJob, em_curso).status == RenderJob.EXECUTANDO
+    assert len(renders) == 1
+
+
+def test_job_is_executed_once_when_scheduled_twice(app, renders, monkeypatch):
+    monkeypatch.setattr(render_jobs, "_agendar", lambda app, job_id: None)
+    job_id = _enfileirar(app)
+    render_jobs.executar(app, job_id)
+    render_jobs.executar(app, job_id)
+    assert len(renders) == 1
+    with app.app_context():
+        assert db.session.get(RenderJob, job_id).tentativas == 1
+
+
+def test_other_users_cannot_read_job(app, renders):
+    job_id = _enfileirar(app)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 99, "usuario"
+
+    assert client.get(f"/api/render_jobs/{job_id}").status_code == 403
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from utils import resiliencia
+from utils.resiliencia import CircuitoAbertoError, Disjuntor, SingleFlight
+
+
+class Falha(Exception):
+    pass
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    voos = SingleFlight()
+    liberar = threading.Event()
+    chamadas, resultados = [], []
+
+    def lento():
+        chamadas.append(1)
+        liberar.wait(2)
+        return {"razao_social": "ACME"}
+
+    threads = [threading.Thread(target=lambda: resultados.append(voos.executar("x", lento)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    while voos.estatisticas()["em_andamento"] == 0 or voos.compartilhadas < 4:
+        time.sleep(0.005)
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert len(chamadas) == 1
+    assert resultados == [{"razao_social": "ACME"}] * 5
+    assert voos.estatisticas() == {"execucoes": 1, "compartilhadas": 4, "em_andamento": 0}
+
+
+def test_single_flight_propagates_errors_and_forgets_the_key():
+    voos = SingleFlight()
+    with pytest.raises(Falha):
+        voos.executar("x", lambda: (_ for _ in ()).throw(Falha()))
+    assert voos.executar("x", lambda: 42) == 42
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(resiliencia.time, "monotonic", lambda: agora[0])
+    return agora
+
+
+def _falhar():
+    raise Falha()
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast(relogio):
+    disj = Disjuntor("api", limite_falhas=3, espera=30, erros=(Falha,))
+    assert disj.chamar(lambda: "ok") == "ok"
+    for _ in range(3):
+        with pytest.raises(Falha):
+            disj.chamar(_falhar)
+    assert disj.estado == Disjuntor.ABERTO
+
+    chamadas = []
+    with pytest.raises(CircuitoAbertoError) as exc:
+        disj.chamar(chamadas.append, 1)
+    assert chamadas == [] and exc.value.tentar_em == 30
+    assert disj.estatisticas()["rejeitadas"] == 1
+
+
+def test_errors_outside_the_list_do_not_trip_the_breaker(relogio):
+    disj = Disjuntor("api", limite_falhas=1, erros=(Falha,))
+    with pytest.raises(KeyError):
+        disj.chamar(lambda: {}["x"])
+    assert disj.estado == Disjuntor.FECHADO
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit(relogio):
+    disj = Disjuntor("api", limite_falhas=1, espera=30, sondas=1, erros=(Falha,))
+    with pytest.raises(Falha):
+        disj.chamar(_falhar)
+
+    relogio[0] += 31
+    assert disj.estado == Disjuntor.MEIO_ABERTO
+    with pytest.raises(Falha):
+        disj.chamar(_falhar)           # sonda falhou: reabre
+    with pytest.raises(CircuitoAbertoError):
+        disj.chamar(lambda: "ok")
+
+    relogio[0] += 31
+    resultado = []
+
+    def sonda():
+        # durante a sonda, outras chamadas continuam sendo rejeitadas
+        with pytest.raises(CircuitoAbertoError):
+            disj.chamar(lambda: "outra")
+        resultado.append("ok")
+        return "ok"
+
+    assert disj.chamar(sonda) == "ok" and resultado == ["ok"]
+    assert disj.estado == Disjuntor.FECHADO
+    assert disj.chamar(lambda: "livre") == "livre"
@@ -1,4 +1,7 @@
-from app import create_app
+import click
+from click.testing import CliRunner
+
+from app import create_app, em_comando_cli
 
 
 def _make_client():
@@ -20,3 +23,24 @@ def test_tickets_dashboard_redirects_to_login_when_anonymous():
     assert response.status_code == 302
     assert "/auth/login" in response.headers.get("Location", "")
     assert "next=/tickets/dashboard" in response.headers.get("Location", "")
+
+
+def test_cli_commands_skip_server_side_effects():
+    configs = {}
+
+    @click.command("upgrade")
+    def upgrade():
+        configs["upgrade"] = create_app().config
+
+    @click.command("run")
+    def run():
+        configs["run"] = em_comando_cli()
+
+    assert CliRunner().invoke(upgrade).exit_code == 0
+    assert CliRunner().invoke(run).exit_code == 0
+    cfg = configs["upgrade"]
+    assert not any(cfg[k] for k in ("PDF_POOL_WARMUP", "MAIL_OUTBOX_DISPATCHER",
+                                    "RENDER_JOBS_RECOVER", "IMAGENS_RECUPERAR",
+                                    "DERIVADOS_REGISTRAR"))
+    assert configs["run"] is False
+    assert em_comando_cli() is False
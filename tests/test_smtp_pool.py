@@ -0,0 +1,98 @@
+import socket
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from smtp_local import ServidorSMTP
+from utils.smtp_pool import SMTPPool, config_smtp
+
+
+@pytest.fixture
+def smtp():
+    with ServidorSMTP() as servidor:
+        yield servidor
+
+
+def _pool(servidor, **kw):
+    cfg = config_smtp({"MAIL_SERVER": servidor.host, "MAIL_PORT": servidor.port,
+                       "MAIL_USE_TLS": False, "MAIL_SENDER": "propostas@exemplo.com"})
+    return SMTPPool(cfg, **kw)
+
+
+def _msg(i):
+    msg = EmailMessage()
+    msg["From"], msg["To"], msg["Subject"] = "propostas@exemplo.com", f"c{i}@acme.com", f"Proposta {i}"
+    msg.set_content("corpo")
+    return msg
+
+
+def test_many_messages_share_one_connection(smtp):
+    pool = _pool(smtp)
+    for i in range(5):
+        pool.enviar(_msg(i))
+    pool.fechar()
+
+    assert [m["Subject"] for m in smtp.mensagens] == [f"Proposta {i}" for i in range(5)]
+    assert smtp.conexoes == 1 and pool.abertas == 1
+
+
+def test_concurrent_senders_never_exceed_pool_size(smtp):
+    pool = _pool(smtp, tamanho=2)
+    threads = [threading.Thread(target=pool.enviar, args=(_msg(i),)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.fechar()
+
+    assert len(smtp.mensagens) == 8
+    assert smtp.conexoes <= 2
+
+
+def test_dropped_session_is_detected_with_noop_and_replaced(smtp):
+    pool = _pool(smtp, verificar_apos=0)
+    smtp.derrubar_apos_data = True
+    pool.enviar(_msg(1))
+    time.sleep(0.05)
+    pool.enviar(_msg(2))
+
+    assert len(smtp.mensagens) == 2
+    assert smtp.conexoes == 2   # o NOOP falhou na sessão derrubada
+
+    smtp.derrubar_apos_data = False
+    pool.enviar(_msg(3))
+    pool.enviar(_msg(4))   # sessão viva: NOOP responde 250 e ela é reaproveitada
+    assert smtp.conexoes == 3 and smtp.comandos == ["NOOP"]
+    pool.fechar()
+
+
+def test_rejected_message_keeps_session_after_rset(smtp):
+    pool = _pool(smtp)
+    smtp.falhas = ["554 conteúdo recusado"]
+    with pytest.raises(Exception):
+        pool.enviar(_msg(1))
+    pool.enviar(_msg(2))
+    pool.fechar()
+
+    assert [m["Subject"] for m in smtp.mensagens] == ["Proposta 2"]
+    assert smtp.conexoes == 1 and "RSET" in smtp.comandos
+
+
+def test_connect_timeout_applies_to_silent_server():
+    mudo = socket.socket()
+    mudo.bind(("127.0.0.1", 0))
+    mudo.listen(1)
+    host, port = mudo.getsockname()
+    cfg = config_smtp({"MAIL_SERVER": host, "MAIL_PORT": port, "MAIL_USE_TLS": False,
+                       "MAIL_SENDER": "propostas@exemplo.com"})
+    pool = SMTPPool(cfg, timeout_conexao=0.2)
+
+    inicio = time.monotonic()
+    try:
+        with pytest.raises(OSError):   # socket.timeout é um OSError
+            pool.enviar(_msg(1))
+    finally:
+        mudo.close()
+    assert time.monotonic() - inicio < 2
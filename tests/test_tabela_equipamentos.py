@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+from docx import Document
+
+import gerar_proposta
+from benchmarks.fixtures import criar_imagens, itens_sinteticos
+from utils import image_index
+
+# Meta documentada em gerar_proposta._inserir_tabela_equipamentos; o tempo
+# depende da máquina, então só é cobrado com PROPOSTAS_BENCH=1
+LIMITE_1000_LINHAS_S = 1.0
+
+
+@pytest.fixture
+def imagens(tmp_path, monkeypatch):
+    nomes = criar_imagens(str(tmp_path))
+    monkeypatch.setattr(image_index, "index", image_index.ImageIndex(str(tmp_path)))
+    image_index.cache.descartar()
+    yield nomes
+    image_index.cache.descartar()
+
+
+def _tabela(itens):
+    doc = Document()
+    gerar_proposta._inserir_tabela_equipamentos(doc, itens, ancora=None)
+    return doc, doc.tables[-1]
+
+
+def test_rows_are_filled_from_the_model_row(imagens):
+    itens = itens_sinteticos(4, desconto=True, imagens=imagens)
+    itens[3].illustration_path = None
+    doc, tabela = _tabela(itens)
+
+    assert len(tabela.rows) == 5
+    linha = [c.text for c in tabela.rows[1].cells]
+    assert linha[0].startswith("Relógio de ponto modelo 1")
+    assert linha[1] == ""                       # célula só com a imagem
+    assert linha[2:] == ["1", "R$ 1.500,00", "R$ 1.350,00", "R$ 1.350,00"]
+    assert tabela.rows[4].cells[1].text == "—"
+    assert tabela.rows[2].cells[4].text == ""   # sem desconto no item
+
+    body = doc.element.body
+    ids = [int(i) for i in body.xpath(".//wp:docPr/@id")]
+    assert len(ids) == 3 and len(set(ids)) == 3
+    # uma part por imagem distinta, mesmo com vários itens usando a mesma
+    assert len(set(body.xpath(".//a:blip/@r:embed"))) == 2
+
+
+def test_builds_1000_rows(imagens):
+    itens = itens_sinteticos(1000, desconto=True, imagens=imagens)
+    _, tabela = _tabela(itens)
+
+    assert len(tabela.rows) == 1001
+    assert tabela.rows[1000].cells[0].text.startswith("Relógio de ponto modelo 1000")
+
+
+@pytest.mark.skipif(not os.environ.get("PROPOSTAS_BENCH"), reason="defina PROPOSTAS_BENCH=1")
+def test_builds_1000_rows_within_target(imagens):
+    itens = itens_sinteticos(1000, desconto=True, imagens=imagens)
+    _tabela(itens[:10])  # aquecimento (template vazio, cache de imagens)
+
+    melhor = float("inf")
+    for _ in range(3):
+        inicio = time.perf_counter()
+        _tabela(itens)
+        melhor = min(melhor, time.perf_counter() - inicio)
+
+    assert melhor < LIMITE_1000_LINHAS_S, f"1000 linhas em {melhor:.2f}s"
@@ -0,0 +1,91 @@
+import time
+import types
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+import gerar_proposta
+from api import api_bp
+from utils import tempos_render
+from utils.tempos_render import Histograma, etapa, medir_render
+
+
+@pytest.fixture(autouse=True)
+def limpar_histogramas():
+    tempos_render.histogramas.limpar()
+    yield
+    tempos_render.histogramas.limpar()
+
+
+def test_nested_stages_are_exclusive_and_summed():
+    with medir_render() as tempos:
+        with etapa("tabela"):
+            time.sleep(0.01)
+            for _ in range(2):
+                with etapa("imagens"):
+                    time.sleep(0.01)
+        with medir_render() as interna:   # aninhada: mesma coleta
+            assert interna is tempos
+
+    assert tempos["imagens"] >= 20
+    assert 10 <= tempos["tabela"] < 20
+    assert tempos["total"] >= tempos["tabela"] + tempos["imagens"]
+    assert tempos_render.server_timing({"template": 1.234, "pdf": 830}) == \
+        "template;dur=1.2, pdf;dur=830.0"
+
+    with etapa("fora"):   # sem medir_render nada é registrado
+        pass
+    etapas = tempos_render.histogramas.to_json()["etapas"]
+    assert list(etapas) == ["tabela", "imagens", "total"]
+    assert etapas["imagens"]["contagem"] == 1
+
+
+def test_histogram_buckets_and_percentiles():
+    hist = Histograma(limites=(10, 100))
+    for ms in (1, 5, 50, 500):
+        hist.registrar(ms)
+
+    dados = hist.to_json()
+    assert dados["buckets"] == {"le_10": 2, "le_100": 1, "le_inf": 1}
+    assert dados["p50_ms"] == 10.0
+    assert dados["p99_ms"] == 500.0
+    assert dados["media_ms"] == 139.0
+
+
+def test_render_pipeline_records_each_stage():
+    prop = types.SimpleNamespace(
+        id=1, company="ACME", cnpj="04252011000110", client_name="Fulano",
+        email="f@acme.com", telefone="", pagamento="", prazo_entrega="",
+        frete="", validade="", garantia="", garantia_sistema="",
+        data_criacao=datetime(2025, 1, 2), servico_type=None,
+        modalidade_type=None, filename="PROPOSTA COMERCIAL AA01",
+    )
+    item = types.SimpleNamespace(
+        id=1, name="Catraca", description="", illustration_path="nao_existe.png",
+        unit_price=10.0, quantity=1, discount_percent=0,
+    )
+
+    gerar_proposta.renderizar_proposta(prop, [item], pdf=False, renderizador="libreoffice")
+
+    etapas = tempos_render.histogramas.to_json()["etapas"]
+    assert list(etapas) == ["template", "campos", "tabela", "imagens", "salvar_docx", "total"]
+    assert all(e["contagem"] == 1 for e in etapas.values())
+
+
+def test_metrics_endpoint_is_admin_only():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="teste")
+    app.register_blueprint(api_bp)
+    tempos_render.histogramas.registrar({"pdf": 900.0, "total": 950.0})
+    client = app.test_client()
+
+    with client.session_transaction() as sess:
+        sess["usuario_id"], sess["tipo"] = 1, "gestor"
+    assert client.get("/api/admin/metricas/render").status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["tipo"] = "admin"
+    dados = client.get("/api/admin/metricas/render").get_json()
+    assert dados["etapas"]["pdf"]["buckets"]["le_1000"] == 1
+    assert client.delete("/api/admin/metricas/render").get_json()["etapas"] == {}
@@ -0,0 +1,105 @@
+import functools
+import io
+import json
+import time
+import types
+
+import dns.name
+import pytest
+from flask import Flask
+
+import api
+from blueprints.propostas.propostas import _mx_validado
+from utils import cnpj_cache, mx_cache
+from utils.cnpj_cache import CacheCNPJ
+from utils.mx_cache import CacheMX
+
+
+CNPJ = "04252011000110"
+
+
+class _Resposta(list):
+    """Resposta MX no formato do ``dns.resolver`` (iterável + ``rrset.ttl``)."""
+    rrset = types.SimpleNamespace(ttl=300)
+
+
+class ResolvedorLento:
+    def __init__(self, atraso):
+        self.atraso = atraso
+        self.consultas = 0
+
+    def resolve(self, nome, tipo, lifetime=None):
+        self.consultas += 1
+        time.sleep(self.atraso)
+        return _Resposta([types.SimpleNamespace(preference=10,
+                                                exchange=dns.name.from_text(f"mx.{nome}."))])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    atrasos = {"cnpj": 0.3}
+
+    def opener(req, timeout=None):
+        time.sleep(atrasos["cnpj"])
+        return io.BytesIO(json.dumps({"razao_social": "ACME", "cnpj": CNPJ,
+                                      "email": "contato@acme.com"}).encode())
+
+    monkeypatch.setattr(api, "_fetch_cnpj_payload",
+                        functools.partial(api._fetch_cnpj_payload, opener=opener))
+    resolvedor = ResolvedorLento(0.3)
+    anteriores = cnpj_cache.obter_cache(), mx_cache.obter_cache()
+    cnpj_cache.configurar_cache(CacheCNPJ())
+    mx_cache.configurar_cache(CacheMX(resolver=resolvedor))
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SECRET_KEY="teste", VALIDACAO_CLIENTE_PRAZO=2.0)
+    app.register_blueprint(api.api_bp)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["usuario_id"] = 1
+    client.atrasos, client.resolvedor = atrasos, resolvedor
+    yield client
+    cnpj_cache.configurar_cache(anteriores[0])
+    mx_cache.configurar_cache(anteriores[1])
+    api._disjuntor_cnpj.reiniciar()
+
+
+def test_cnpj_and_mx_run_in_parallel(client):
+    inicio = time.monotonic()
+    dados = client.get(f"/api/validar_cliente?cnpj={CNPJ}&email=vendas@acme.com").get_json()
+    assert time.monotonic() - inicio < 0.55     # 0,3 s + 0,3 s em série
+    assert dados["completo"] is True
+    assert dados["cnpj"]["valido"] and dados["cnpj"]["dados"]["company"] == "ACME"
+    assert dados["email"]["mx"] is True and dados["email"]["hosts"] == ["mx.acme.com"]
+    with client.session_transaction() as sess:
+        assert sess["validacao_cliente"]["dominio"] == "acme.com"
+
+
+def test_deadline_returns_partial_result(client):
+    client.application.config["VALIDACAO_CLIENTE_PRAZO"] = 0.1
+    client.resolvedor.atraso = 1.0
+    client.atrasos["cnpj"] = 0.0
+    dados = client.get(f"/api/validar_cliente?cnpj={CNPJ}&email=vendas@lento.com").get_json()
+    assert dados["completo"] is False
+    assert dados["cnpj"]["status"] == "ok"
+    assert dados["email"] == {"status": "timeout"}
+    with client.session_transaction() as sess:
+        assert "validacao_cliente" not in sess
+
+
+def test_invalid_input_is_reported_without_lookups(client):
+    dados = client.get("/api/validar_cliente?cnpj=11111111111111&email=sem-arroba").get_json()
+    assert dados["cnpj"] == {"status": "invalido", "error": "CNPJ inválido.", "valido": False}
+    assert dados["email"]["status"] == "invalido"
+    assert client.resolvedor.consultas == 0
+    assert client.get("/api/validar_cliente").status_code == 400
+
+
+def test_submit_reuses_fresh_validation(client):
+    app = client.application
+    with app.test_request_context():
+        from flask import session
+        session["validacao_cliente"] = {"dominio": "acme.com", "mx": False, "em": time.time()}
+        assert _mx_validado("Vendas@ACME.com") is False
+        assert _mx_validado("vendas@outra.com") is None
+        session["validacao_cliente"]["em"] = time.time() - 301
+        assert _mx_validado("vendas@acme.com") is None
@@ -0,0 +1,252 @@
+"""Armazenamento em disco dos documentos já gerados (DOCX/PDF).
+
+As entradas são endereçadas pelo conteúdo: a chave é um hash de tudo o que
+influencia a renderização (ver ``gerar_proposta.chave_render``). Assim, uma
+proposta que não mudou é servida direto do disco, e qualquer alteração gera
+naturalmente outra chave. As entradas que deixam de ser usadas (proposta
+editada ou excluída, imagem trocada) nunca mais são pedidas e saem pela
+retenção em ``limpar``; as rotas não precisam apagar nada.
+
+Layout::
+
+    <base_dir>/<ab>/<abcdef...>.docx
+    <base_dir>/<ab>/<abcdef...>.pdf
+    <base_dir>/<ab>/<abcdef...>.json   ← metadados; o mtime marca o último acesso
+
+A política de retenção remove entradas sem acesso há mais de ``max_age``
+segundos e, acima de ``max_bytes``, as menos usadas recentemente. A
+varredura percorre o diretório inteiro, então ``put`` só a dispara numa
+thread à parte (uma por vez), nunca na requisição que gravou.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+def hash_conteudo(dados) -> str:
+    """SHA-256 estável de uma estrutura serializável em JSON."""
+    bruto = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    def __init__(
+        self,
+        base_dir: str,
+        *,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+        sweep_interval: float = 3600,
+    ):
+        self.base_dir = base_dir
+        self.max_bytes = int(max_bytes)
+        self.max_age = float(max_age)
+        self.sweep_interval = float(sweep_interval)
+        self._lock = threading.Lock()
+        self._total: int | None = None
+        self._ultima_varredura = 0.0
+        self._varredura: threading.Thread | None = None
+        self._gravados_na_varredura = 0     # bytes que a varredura em curso pode não ver
+
+    # ------------------------------------------------------------------ #
+    # Caminhos
+    # ------------------------------------------------------------------ #
+    def _arquivo(self, key: str, tipo: str) -> str:
+        return os.path.join(self.base_dir, key[:2], f"{key}.{tipo}")
+
+    def path(self, key: str, tipo: str) -> str | None:
+        """Caminho do artefato ``tipo`` (``"pdf"``/``"docx"``) se existir."""
+        meta = self._arquivo(key, "json")
+        arq = self._arquivo(key, tipo)
+        try:
+            st = os.stat(meta)
+        except FileNotFoundError:
+            return None
+        if time.time() - st.st_mtime > self.max_age:
+            self.remove(key)
+            return None
+        if not os.path.exists(arq):
+            return None
+        try:
+            os.utime(meta)  # marca acesso (LRU)
+        except OSError:
+            pass
+        return arq
+
+    # ------------------------------------------------------------------ #
+    # Leitura / escrita
+    # ------------------------------------------------------------------ #
+    def get(self, key: str, tipo: str) -> bytes | None:
+        arq = self.path(key, tipo)
+        if arq is None:
+            return None
+        try:
+            with open(arq, "rb") as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _gravar(path: str, dados: bytes):
+        pasta = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(dir=pasta, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(dados)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def put(self, key: str, artefatos: dict):
+        """Grava ``{"docx": bytes, "pdf": bytes}`` e os metadados da entrada."""
+        os.makedirs(os.path.join(self.base_dir, key[:2]), exist_ok=True)
+        novos = 0
+        for tipo, dados in artefatos.items():
+            if dados is None:
+                continue
+            self._gravar(self._arquivo(key, tipo), bytes(dados))
+            novos += len(dados)
+        meta = {"tipos": sorted(t for t, d in artefatos.items() if d is not None)}
+        self._gravar(self._arquivo(key, "json"), json.dumps(meta).encode("utf-8"))
+
+        with self._lock:
+            if self._total is not None:
+                self._total += novos
+            if self._varredura is not None:
+                self._gravados_na_varredura += novos
+        self._talvez_limpar()
+
+    def remove(self, key: str):
+        pasta = os.path.join(self.base_dir, key[:2])
+        try:
+            nomes = [n for n in os.listdir(pasta) if n.startswith(key + ".")]
+        except FileNotFoundError:
+            return
+        liberado = 0
+        for nome in nomes:
+            arq = os.path.join(pasta, nome)
+            try:
+                liberado += os.path.getsize(arq)
+                os.remove(arq)
+            except OSError:
+                pass
+        with self._lock:
+            if self._total is not None:
+                self._total = max(0, self._total - liberado)
+
+    # ------------------------------------------------------------------ #
+    # Retenção
+    # ------------------------------------------------------------------ #
+    def _entradas(self):
+        """Gera ``(key, meta_path, tamanho, ultimo_acesso)`` de cada entrada."""
+        try:
+            pastas = list(os.scandir(self.base_dir))
+        except FileNotFoundError:
+            return
+        for pasta in pastas:
+            if not pasta.is_dir():
+                continue
+            grupos: dict[str, list] = {}
+            for arq in os.scandir(pasta.path):
+                if arq.name.startswith("."):
+                    continue
+                key, _, tipo = arq.name.partition(".")
+                grupos.setdefault(key, []).append((tipo, arq))
+            for key, arquivos in grupos.items():
+                meta = next((a for t, a in arquivos if t == "json"), None)
+                if meta is None:
+                    continue
+                try:
+                    tamanho = sum(a.stat().st_size for _, a in arquivos)
+                    acesso = meta.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                yield key, meta.path, tamanho, acesso
+
+    def limpar(self) -> int:
+        """Aplica retenção por idade e, depois, o limite de tamanho (LRU)."""
+        agora = time.time()
+        vivas, removidas, total = [], 0, 0
+        for key, _, tamanho, acesso in self._entradas():
+            if agora - acesso > self.max_age:
+                self.remove(key)
+                removidas += 1
+            else:
+                vivas.append((acesso, key, tamanho))
+                total += tamanho
+
+        vivas.sort()
+        while total > self.max_bytes and vivas:
+            _, key, tamanho = vivas.pop(0)
+            self.remove(key)
+            total -= tamanho
+            removidas += 1
+
+        with self._lock:
+            # na dúvida conta a mais: no pior caso, adianta a próxima varredura
+            self._total = total + self._gravados_na_varredura
+            self._gravados_na_varredura = 0
+            self._ultima_varredura = agora
+        return removidas
+
+    def _talvez_limpar(self):
+        with self._lock:
+            precisa = (
+                self._total is None
+                or self._total > self.max_bytes
+                or time.time() - self._ultima_varredura > self.sweep_interval
+            )
+            if not precisa or self._varredura is not None:
+                return
+            varredura = self._varredura = threading.Thread(
+                target=self._varrer, name="artifact-store-limpar", daemon=True
+            )
+            self._gravados_na_varredura = 0
+        varredura.start()
+
+    def _varrer(self):
+        try:
+            self.limpar()
+        except Exception:
+            log.exception("Falha na limpeza do cache de documentos em %s", self.base_dir)
+            with self._lock:
+                self._ultima_varredura = time.time()
+        finally:
+            with self._lock:
+                self._varredura = None
+
+
+_store: ArtifactStore | None = None
+
+
+def obter_store() -> ArtifactStore | None:
+    return _store
+
+
+def configurar_store(store: ArtifactStore | None) -> ArtifactStore | None:
+    global _store
+    _store = store
+    return store
+
+
+def init_app(app):
+    if not app.config.get("ARTIFACT_STORE_ENABLED", True):
+        return configurar_store(None)
+    return configurar_store(ArtifactStore(
+        app.config.get("ARTIFACT_STORE_DIR") or os.path.join(app.instance_path, "artefatos"),
+        max_bytes=app.config.get("ARTIFACT_STORE_MAX_BYTES", 512 * 1024 * 1024),
+        max_age=app.config.get("ARTIFACT_STORE_MAX_AGE", 30 * 24 * 3600),
+    ))
@@ -0,0 +1,126 @@
+"""Cadastro de clientes derivado das propostas.
+
+Cada proposta repete empresa, CNPJ, contato, e-mail e telefone do cliente.
+A tabela ``clients`` guarda uma linha por CNPJ com os dados mais recentes:
+``registrar_proposta`` é chamado ao criar/editar propostas e ``backfill``
+reconstrói tudo a partir do histórico (a migração que cria a tabela faz o
+mesmo; ``flask clientes backfill`` roda de novo).
+
+``buscar`` atende o autocompletar do formulário (``/api/clientes``) com
+buscas por prefixo que usam os índices de ``cnpj`` e ``company_busca`` —
+intervalos ``>= prefixo AND < prefixo + U+10FFFF`` em vez de ``LIKE``, que
+no SQLite só usa índice com collation NOCASE.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Client, Proposal
+
+
+_FIM = "\U0010ffff"     # maior code point: limite superior das buscas por prefixo
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def normalizar_busca(texto: str | None) -> str:
+    """Minúsculas, sem acentos e com espaços simples (``"Açaí  Ltda"`` → ``"acai ltda"``)."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+
+def _digitos(valor: str | None) -> str:
+    return "".join(filter(str.isdigit, valor or ""))
+
+
+def _aplicar(cliente: Client, proposta: Proposal):
+    for campo in ("company", "client_name", "email", "telefone"):
+        valor = (getattr(proposta, campo) or "").strip()
+        if valor:                       # campo vazio na proposta não apaga o cadastro
+            setattr(cliente, campo, valor)
+    cliente.company_busca = normalizar_busca(cliente.company)
+    quando = proposta.data_criacao or datetime.utcnow()
+    if cliente.ultima_proposta_em is None or quando > cliente.ultima_proposta_em:
+        cliente.ultima_proposta_em = quando
+
+
+def registrar_proposta(proposta: Proposal) -> Client | None:
+    """Cria/atualiza o cliente da proposta na sessão atual (sem commit).
+
+    Propostas sem CNPJ de 14 dígitos não geram cliente.
+    """
+    cnpj = _digitos(proposta.cnpj)
+    if len(cnpj) != 14:
+        return None
+    with db.session.no_autoflush:
+        insert = _INSERTS.get(db.session.get_bind().dialect.name)
+        if insert is not None:
+            # duas propostas do mesmo CNPJ novo ao mesmo tempo: a segunda
+            # espera a primeira e reaproveita a linha em vez de violar o UNIQUE
+            db.session.execute(
+                insert(Client).values(cnpj=cnpj).on_conflict_do_nothing(index_elements=["cnpj"])
+            )
+        cliente = Client.query.filter_by(cnpj=cnpj).first()
+    if cliente is None:
+        cliente = Client(cnpj=cnpj)
+        db.session.add(cliente)
+    _aplicar(cliente, proposta)
+    return cliente
+
+
+def backfill(lote: int = 500) -> int:
+    """Recria os clientes a partir de todas as propostas; devolve quantos existem."""
+    clientes = {c.cnpj: c for c in Client.query}
+    consulta = (
+        db.session.query(Proposal.cnpj, Proposal.company, Proposal.client_name, Proposal.email,
+                         Proposal.telefone, Proposal.data_criacao)
+        .order_by(Proposal.data_criacao, Proposal.id)
+        .execution_options(yield_per=lote)
+    )
+    for proposta in consulta:           # linhas com os mesmos atributos da proposta
+        cnpj = _digitos(proposta.cnpj)
+        if len(cnpj) != 14:
+            continue
+        cliente = clientes.get(cnpj)
+        if cliente is None:
+            cliente = clientes[cnpj] = Client(cnpj=cnpj)
+            db.session.add(cliente)
+        _aplicar(cliente, proposta)
+    db.session.commit()
+    return len(clientes)
+
+
+def buscar(termo: str, limite: int = 10) -> list[Client]:
+    """Clientes cujo CNPJ (só dígitos no termo) ou razão social começam com ``termo``."""
+    termo = (termo or "").strip()
+    digitos = _digitos(termo)
+    if digitos and not re.search(r"[^\d\s./-]", termo):
+        filtro = (Client.cnpj >= digitos) & (Client.cnpj < digitos + _FIM)
+        ordem = Client.cnpj
+    else:
+        prefixo = normalizar_busca(termo)
+        if not prefixo:
+            return []
+        filtro = (Client.company_busca >= prefixo) & (Client.company_busca < prefixo + _FIM)
+        ordem = Client.company_busca
+    return Client.query.filter(filtro).order_by(ordem).limit(limite).all()
+
+
+clientes_cli = AppGroup("clientes", help="Cadastro de clientes derivado das propostas.")
+
+
+@clientes_cli.command("backfill")
+def backfill_comando():
+    """Recria/atualiza a tabela de clientes a partir de todas as propostas."""
+    click.echo(f"{backfill()} cliente(s) atualizados a partir das propostas.")
+
+
+def init_app(app):
+    app.cli.add_command(clientes_cli)
@@ -0,0 +1,267 @@
+"""Cache em dois níveis das consultas de CNPJ (``/api/cnpj/<cnpj>``).
+
+Dados cadastrais mudam pouco e os vendedores consultam os mesmos CNPJs
+várias vezes, mas cada consulta ia até a API pública (até 6 s segurando um
+worker). ``CacheCNPJ`` guarda as respostas num LRU em memória na frente de
+um arquivo SQLite compartilhado entre os workers (``CNPJ_CACHE_DB``):
+
+- até ``ttl`` segundos a resposta é servida direto do cache;
+- entre ``ttl`` e ``ttl + janela_stale`` ela ainda é servida, mas uma
+  atualização é disparada em segundo plano (stale-while-revalidate);
+- depois disso a consulta volta a ser síncrona — e, se a API falhar, a
+  cópia antiga é servida no lugar do erro;
+- CNPJ inexistente (404) fica em cache por ``ttl_negativo``.
+
+A busca é injetada em ``consultar(cnpj, buscar)``: ``buscar(cnpj)`` devolve
+o JSON da API, ``None`` se o CNPJ não existir, ou levanta exceção em falhas
+do serviço. Os contadores de acertos/faltas ficam em ``estatisticas()``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable
+
+
+log = logging.getLogger(__name__)
+
+CONTADORES = ("memoria", "disco", "stale", "miss", "negativo", "stale_erro",
+              "atualizacao_ok", "atualizacao_erro")
+
+
+@dataclass
+class _Entrada:
+    payload: dict | None          # None = CNPJ não encontrado
+    atualizado_em: float
+
+
+@dataclass
+class ResultadoCNPJ:
+    payload: dict | None
+    origem: str                   # "memoria", "disco", "api" ou "local" (base da Receita)
+    idade: float = 0.0
+    stale: bool = False
+
+
+class CacheCNPJ:
+    def __init__(self, path: str | None = None, *, ttl: float = 7 * 24 * 3600,
+                 ttl_negativo: float = 24 * 3600, janela_stale: float = 30 * 24 * 3600,
+                 max_memoria: int = 2048, workers: int = 2):
+        self.path = path
+        self.ttl = float(ttl)
+        self.ttl_negativo = float(ttl_negativo)
+        self.janela_stale = float(janela_stale)
+        self.max_memoria = int(max_memoria)
+        self._lock = threading.Lock()
+        self._memoria: OrderedDict[str, _Entrada] = OrderedDict()
+        self._tabela_criada = False
+        self._atualizando: set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                            thread_name_prefix="cnpj-cache")
+        self._contadores = dict.fromkeys(CONTADORES, 0)
+
+    # ------------------------------------------------------------------ #
+    # Níveis do cache
+    # ------------------------------------------------------------------ #
+    @contextmanager
+    def _banco(self):
+        if not self._tabela_criada:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=5)
+        try:
+            with con:
+                if not self._tabela_criada:
+                    con.execute(
+                        "CREATE TABLE IF NOT EXISTS cnpj_cache ("
+                        " cnpj TEXT PRIMARY KEY, payload TEXT, atualizado_em REAL NOT NULL)"
+                    )
+                    self._tabela_criada = True
+                yield con
+        finally:
+            con.close()
+
+    def _da_memoria(self, cnpj: str) -> _Entrada | None:
+        with self._lock:
+            entrada = self._memoria.get(cnpj)
+            if entrada is not None:
+                self._memoria.move_to_end(cnpj)
+            return entrada
+
+    def _na_memoria(self, cnpj: str, entrada: _Entrada):
+        with self._lock:
+            self._memoria[cnpj] = entrada
+            self._memoria.move_to_end(cnpj)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _do_disco(self, cnpj: str) -> _Entrada | None:
+        if not self.path:
+            return None
+        try:
+            with self._banco() as con:
+                linha = con.execute(
+                    "SELECT payload, atualizado_em FROM cnpj_cache WHERE cnpj = ?", (cnpj,)
+                ).fetchone()
+        except sqlite3.Error:
+            log.warning("Cache de CNPJ em disco indisponível", exc_info=True)
+            return None
+        if linha is None:
+            return None
+        return _Entrada(json.loads(linha[0]) if linha[0] is not None else None, linha[1])
+
+    def _gravar(self, cnpj: str, entrada: _Entrada):
+        self._na_memoria(cnpj, entrada)
+        if not self.path:
+            return
+        try:
+            with self._banco() as con:
+                con.execute(
+                    "INSERT OR REPLACE INTO cnpj_cache (cnpj, payload, atualizado_em) VALUES (?, ?, ?)",
+                    (cnpj, json.dumps(entrada.payload) if entrada.payload is not None else None,
+                     entrada.atualizado_em),
+                )
+        except sqlite3.Error:
+            log.warning("Não foi possível gravar o CNPJ %s no cache", cnpj, exc_info=True)
+
+    # ------------------------------------------------------------------ #
+    # Consulta
+    # ------------------------------------------------------------------ #
+    def _contar(self, nome: str):
+        with self._lock:
+            self._contadores[nome] += 1
+
+    def _buscar(self, cnpj: str, buscar: Callable[[str], dict | None]) -> _Entrada:
+        entrada = _Entrada(buscar(cnpj), time.time())
+        self._gravar(cnpj, entrada)
+        return entrada
+
+    def _atualizar(self, cnpj: str, buscar):
+        try:
+            self._buscar(cnpj, buscar)
+            self._contar("atualizacao_ok")
+        except Exception:
+            self._contar("atualizacao_erro")
+            log.warning("Falha ao atualizar o CNPJ %s em segundo plano", cnpj, exc_info=True)
+        finally:
+            with self._lock:
+                self._atualizando.discard(cnpj)
+
+    def _agendar_atualizacao(self, cnpj: str, buscar):
+        with self._lock:
+            if cnpj in self._atualizando:
+                return
+            self._atualizando.add(cnpj)
+        self._executor.submit(self._atualizar, cnpj, buscar)
+
+    def consultar(self, cnpj: str, buscar: Callable[[str], dict | None]) -> ResultadoCNPJ:
+        """Resposta do cache (ou da API via ``buscar``); ``payload`` ``None`` = 404."""
+        origem = "memoria"
+        entrada = self._da_memoria(cnpj)
+        if entrada is None:
+            origem = "disco"
+            entrada = self._do_disco(cnpj)
+            if entrada is not None:
+                self._na_memoria(cnpj, entrada)
+
+        if entrada is not None:
+            idade = time.time() - entrada.atualizado_em
+            if entrada.payload is None:
+                if idade < self.ttl_negativo:
+                    self._contar("negativo")
+                    return ResultadoCNPJ(None, origem, idade)
+            elif idade < self.ttl:
+                self._contar(origem)
+                return ResultadoCNPJ(entrada.payload, origem, idade)
+            elif idade < self.ttl + self.janela_stale:
+                self._contar("stale")
+                self._agendar_atualizacao(cnpj, buscar)
+                return ResultadoCNPJ(entrada.payload, origem, idade, stale=True)
+
+        self._contar("miss")
+        try:
+            nova = self._buscar(cnpj, buscar)
+        except Exception:
+            if entrada is None or entrada.payload is None:
+                raise
+            # API fora do ar: melhor a cópia antiga que um erro
+            self._contar("stale_erro")
+            return ResultadoCNPJ(entrada.payload, origem, time.time() - entrada.atualizado_em,
+                                 stale=True)
+        return ResultadoCNPJ(nova.payload, "api")
+
+    # ------------------------------------------------------------------ #
+    def estatisticas(self) -> dict:
+        with self._lock:
+            cont = dict(self._contadores)
+            itens = len(self._memoria)
+        acertos = cont["memoria"] + cont["disco"] + cont["stale"] + cont["negativo"]
+        total = acertos + cont["miss"]
+        return {
+            "contadores": cont,
+            "acertos": acertos,
+            "faltas": cont["miss"],
+            "taxa_acerto": round(acertos / total, 4) if total else None,
+            "itens_memoria": itens,
+        }
+
+    def zerar_estatisticas(self):
+        with self._lock:
+            self._contadores = dict.fromkeys(CONTADORES, 0)
+
+    def limpar(self):
+        with self._lock:
+            self._memoria.clear()
+        if self.path:
+            try:
+                with self._banco() as con:
+                    con.execute("DELETE FROM cnpj_cache")
+            except sqlite3.Error:
+                pass
+
+    def aguardar_atualizacoes(self, timeout: float = 5.0) -> bool:
+        """Espera as atualizações em segundo plano terminarem (testes/desligamento)."""
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            with self._lock:
+                if not self._atualizando:
+                    return True
+            time.sleep(0.01)
+        return False
+
+
+_cache: CacheCNPJ | None = None
+
+
+def obter_cache() -> CacheCNPJ:
+    global _cache
+    if _cache is None:
+        _cache = CacheCNPJ()
+    return _cache
+
+
+def configurar_cache(cache: CacheCNPJ | None) -> CacheCNPJ | None:
+    global _cache
+    _cache = cache
+    return cache
+
+
+def init_app(app):
+    path = app.config.get("CNPJ_CACHE_DB")
+    if path is None:
+        path = os.path.join(app.instance_path, "cnpj_cache.sqlite")
+    return configurar_cache(CacheCNPJ(
+        path or None,
+        ttl=app.config.get("CNPJ_CACHE_TTL", 7 * 24 * 3600),
+        ttl_negativo=app.config.get("CNPJ_CACHE_TTL_NEGATIVO", 24 * 3600),
+        janela_stale=app.config.get("CNPJ_CACHE_JANELA_STALE", 30 * 24 * 3600),
+        max_memoria=app.config.get("CNPJ_CACHE_MAX_MEMORIA", 2048),
+    ))
@@ -0,0 +1,341 @@
+"""Base local de CNPJs a partir dos dados abertos da Receita Federal.
+
+A Receita publica todo mês o cadastro completo de CNPJs em CSVs compactados
+(``Empresas*.zip``, ``Estabelecimentos*.zip``, ``Municipios.zip`` — sem
+cabeçalho, ``;`` como separador, latin-1). ``importar`` lê esses arquivos
+em streaming e grava num SQLite indexado pelo CNPJ, em transações de
+``lote`` linhas: a memória usada não depende do tamanho dos arquivos.
+
+Reimportações são incrementais: cada arquivo importado fica registrado com
+tamanho e data de modificação, e arquivos iguais aos já importados são
+pulados (``forcar=True`` reimporta). As linhas entram com upsert, então
+uma reimportação só atualiza o que mudou de um mês para o outro.
+
+``BaseReceita.consultar(cnpj)`` devolve um dict no mesmo formato usado da
+API pública (``razao_social``, ``cnpj``, ``email``, ``ddd_telefone_1``...)
+ou ``None`` quando o CNPJ não está na base — quem chama recorre à API.
+Linha de comando::
+
+    flask cnpj importar /dados/receita/*.zip
+    flask cnpj importar /dados/receita --forcar --lote 20000
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+
+log = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS empresas (
+    cnpj_basico TEXT PRIMARY KEY,
+    razao_social TEXT,
+    natureza_juridica TEXT,
+    capital_social TEXT,
+    porte TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS estabelecimentos (
+    cnpj TEXT PRIMARY KEY,
+    cnpj_basico TEXT NOT NULL,
+    matriz_filial TEXT,
+    nome_fantasia TEXT,
+    situacao_cadastral TEXT,
+    cnae_fiscal TEXT,
+    logradouro TEXT,
+    numero TEXT,
+    complemento TEXT,
+    bairro TEXT,
+    cep TEXT,
+    uf TEXT,
+    municipio TEXT,
+    ddd_telefone_1 TEXT,
+    email TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS municipios (
+    codigo TEXT PRIMARY KEY,
+    nome TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arquivos_importados (
+    nome TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    modificado_em REAL NOT NULL,
+    linhas INTEGER NOT NULL,
+    importado_em TEXT NOT NULL
+);
+"""
+
+
+def _empresa(c: list[str]) -> tuple:
+    return (c[0], c[1], c[2], c[4], c[5])
+
+
+def _estabelecimento(c: list[str]) -> tuple:
+    logradouro = " ".join(p for p in (c[13].strip(), c[14].strip()) if p)
+    telefone = (c[21].strip() + c[22].strip()) if c[22].strip() else ""
+    return (c[0] + c[1] + c[2], c[0], c[3], c[4], c[5], c[11], logradouro, c[15], c[16],
+            c[17], c[18], c[19], c[20], telefone, c[27].strip().lower())
+
+
+def _municipio(c: list[str]) -> tuple:
+    return (c[0], c[1])
+
+
+# tipo → (prefixo do arquivo .zip, sufixo do CSV interno, colunas mínimas, conversão, INSERT)
+TIPOS: dict[str, tuple[str, str, int, Callable[[list[str]], tuple], str]] = {
+    "empresas": ("empresas", "emprecsv", 6, _empresa,
+                 "INSERT OR REPLACE INTO empresas VALUES (?, ?, ?, ?, ?)"),
+    "estabelecimentos": ("estabelecimentos", "estabele", 28, _estabelecimento,
+                         "INSERT OR REPLACE INTO estabelecimentos VALUES "
+                         "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+    "municipios": ("municipios", "municcsv", 2, _municipio,
+                   "INSERT OR REPLACE INTO municipios VALUES (?, ?)"),
+}
+
+
+def tipo_do_arquivo(path: str) -> str | None:
+    """``empresas``, ``estabelecimentos``, ``municipios`` ou ``None`` (ignorado)."""
+    nomes = [os.path.basename(path).lower()]
+    if zipfile.is_zipfile(path):     # arquivo renomeado: vale o nome do CSV interno
+        with zipfile.ZipFile(path) as zf:
+            nomes += [n.lower() for n in zf.namelist()]
+    for nome in nomes:
+        for tipo, (prefixo, sufixo, *_resto) in TIPOS.items():
+            if nome.startswith(prefixo) or sufixo in nome:
+                return tipo
+    return None
+
+
+def _expandir(caminhos: Iterable[str]) -> list[str]:
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos.extend(sorted(
+                os.path.join(caminho, n) for n in os.listdir(caminho)
+                if os.path.isfile(os.path.join(caminho, n))
+            ))
+        else:
+            arquivos.append(caminho)
+    return arquivos
+
+
+def _linhas_csv(path: str) -> Iterator[list[str]]:
+    """Linhas de um CSV da Receita, lido em streaming (direto do .zip se for o caso)."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for membro in zf.infolist():
+                if membro.is_dir():
+                    continue
+                with zf.open(membro) as bruto:
+                    texto = io.TextIOWrapper(bruto, encoding="latin-1", newline="")
+                    yield from csv.reader(texto, delimiter=";")
+    else:
+        with open(path, encoding="latin-1", newline="") as texto:
+            yield from csv.reader(texto, delimiter=";")
+
+
+def _conectar(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")       # consultas continuam durante a importação
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(ESQUEMA)
+    return con
+
+
+def importar(path: str, arquivos: Iterable[str], *, lote: int = 50_000, forcar: bool = False,
+             progresso: Callable[[str], None] | None = None) -> dict:
+    """Importa os arquivos (ou diretórios) da Receita na base ``path``.
+
+    Devolve ``{"importados": [...], "pulados": [...], "ignorados": [...],
+    "linhas": n, "invalidas": n}``.
+    """
+    avisar = progresso or (lambda _msg: None)
+    lote = max(1, int(lote))
+    resumo = {"importados": [], "pulados": [], "ignorados": [], "linhas": 0, "invalidas": 0}
+    con = _conectar(path)
+    try:
+        for arquivo in _expandir(arquivos):
+            nome = os.path.basename(arquivo)
+            tipo = tipo_do_arquivo(arquivo)
+            if tipo is None:
+                resumo["ignorados"].append(nome)
+                continue
+            st = os.stat(arquivo)
+            anterior = con.execute(
+                "SELECT tamanho, modificado_em FROM arquivos_importados WHERE nome = ?", (nome,)
+            ).fetchone()
+            if not forcar and anterior == (st.st_size, st.st_mtime):
+                resumo["pulados"].append(nome)
+                avisar(f"{nome}: sem alterações desde a última importação")
+                continue
+
+            _prefixo, _sufixo, minimo, converter, sql = TIPOS[tipo]
+            linhas = invalidas = 0
+            inicio = time.monotonic()
+            bloco: list[tuple] = []
+            for colunas in _linhas_csv(arquivo):
+                if len(colunas) < minimo:
+                    invalidas += 1
+                    continue
+                bloco.append(converter(colunas))
+                if len(bloco) >= lote:
+                    with con:
+                        con.executemany(sql, bloco)
+                    linhas += len(bloco)
+                    bloco = []
+                    avisar(f"{nome}: {linhas} linhas")
+            if bloco:
+                with con:
+                    con.executemany(sql, bloco)
+                linhas += len(bloco)
+            with con:
+                con.execute(
+                    "INSERT OR REPLACE INTO arquivos_importados VALUES (?, ?, ?, ?, ?, ?)",
+                    (nome, tipo, st.st_size, st.st_mtime, linhas,
+                     datetime.now(timezone.utc).isoformat(timespec="seconds")),
+                )
+            avisar(f"{nome}: {linhas} linhas importadas em {time.monotonic() - inicio:.1f}s"
+                   + (f" ({invalidas} inválidas)" if invalidas else ""))
+            resumo["importados"].append(nome)
+            resumo["linhas"] += linhas
+            resumo["invalidas"] += invalidas
+    finally:
+        con.close()
+    return resumo
+
+
+class BaseReceita:
+    """Consultas à base importada; uma conexão somente leitura por thread."""
+
+    RECHECAR_AUSENTE = 60.0     # segundos até tentar abrir de novo uma base ausente
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._local = threading.local()
+        self._ausente_ate = 0.0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def _conexao(self) -> sqlite3.Connection | None:
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            return con
+        if not self.path or time.monotonic() < self._ausente_ate:
+            return None
+        if not os.path.exists(self.path):
+            self._ausente_ate = time.monotonic() + self.RECHECAR_AUSENTE
+            return None
+        try:
+            con = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        except sqlite3.Error:
+            self._ausente_ate = time.monotonic() + self.RECHECAR_AUSENTE
+            return None
+        self._local.con = con
+        return con
+
+    def consultar(self, cnpj: str) -> dict | None:
+        con = self._conexao()
+        if con is None:
+            return None
+        try:
+            linha = con.execute(
+                "SELECT e.cnpj, emp.razao_social, e.nome_fantasia, e.email, e.ddd_telefone_1,"
+                "       e.situacao_cadastral, e.matriz_filial, e.cnae_fiscal, e.logradouro,"
+                "       e.numero, e.complemento, e.bairro, e.cep, e.uf,"
+                "       COALESCE(m.nome, e.municipio), emp.natureza_juridica, emp.porte"
+                "  FROM estabelecimentos e"
+                "  LEFT JOIN empresas emp ON emp.cnpj_basico = e.cnpj_basico"
+                "  LEFT JOIN municipios m ON m.codigo = e.municipio"
+                " WHERE e.cnpj = ?",
+                (cnpj,),
+            ).fetchone()
+        except sqlite3.Error:    # base ainda sem tabelas ou corrompida: usa a API
+            log.warning("Base local de CNPJ indisponível", exc_info=True)
+            return None
+        with self._lock:
+            if linha is None:
+                self.faltas += 1
+            else:
+                self.acertos += 1
+        if linha is None:
+            return None
+        chaves = ("cnpj", "razao_social", "nome_fantasia", "email", "ddd_telefone_1",
+                  "situacao_cadastral", "matriz_filial", "cnae_fiscal", "logradouro", "numero",
+                  "complemento", "bairro", "cep", "uf", "municipio", "natureza_juridica", "porte")
+        payload = {k: (v or "") for k, v in zip(chaves, linha)}
+        payload["fonte"] = "receita_federal"
+        return payload
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"acertos": self.acertos, "faltas": self.faltas,
+                    "disponivel": self._conexao() is not None}
+
+    def fechar(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+
+_base: BaseReceita | None = None
+
+
+def obter_base() -> BaseReceita:
+    global _base
+    if _base is None:
+        _base = BaseReceita(None)
+    return _base
+
+
+def configurar_base(base: BaseReceita | None) -> BaseReceita | None:
+    global _base
+    _base = base
+    return base
+
+
+def caminho_base(app) -> str:
+    path = app.config.get("CNPJ_BASE_DB")
+    if path is None:
+        path = os.path.join(app.instance_path, "cnpj_receita.sqlite")
+    return path
+
+
+cnpj_cli = AppGroup("cnpj", help="Base local de CNPJs (dados abertos da Receita Federal).")
+
+
+@cnpj_cli.command("importar")
+@click.argument("arquivos", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--lote", default=50_000, show_default=True, help="Linhas por transação.")
+@click.option("--forcar", is_flag=True, help="Reimporta arquivos que não mudaram.")
+def importar_comando(arquivos, lote, forcar):
+    """Importa os .zip/.csv da Receita (ou diretórios com eles) na base local."""
+    path = caminho_base(current_app)
+    if not path:
+        raise click.UsageError("CNPJ_BASE_DB está vazio: a base local está desativada.")
+    resumo = importar(path, arquivos, lote=lote, forcar=forcar, progresso=click.echo)
+    for nome in resumo["ignorados"]:
+        click.echo(f"{nome}: tipo de arquivo não reconhecido, ignorado", err=True)
+    click.echo(f"{len(resumo['importados'])} arquivo(s) importado(s), "
+               f"{len(resumo['pulados'])} sem alterações, {resumo['linhas']} linhas em {path}")
+
+
+def init_app(app):
+    app.cli.add_command(cnpj_cli)
+    return configurar_base(BaseReceita(caminho_base(app) or None))
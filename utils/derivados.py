@@ -0,0 +1,303 @@
+"""Derivados das imagens de equipamentos (tamanhos nomeados, nome por hash).
+
+A imagem de cada equipamento existe num único tamanho em ``static/images``
+e o navegador a reduz para a listagem. ``Derivados`` gera, sob demanda,
+versões por perfil (``PERFIS``): a do DOCX, as miniaturas da listagem (1× e
+2×, WebP) e uma WebP maior para a web. Nenhum perfil amplia a imagem.
+
+O nome de cada derivado é o hash do conteúdo da imagem de origem somado à
+especificação do perfil::
+
+    <base_dir>/<perfil>/<chave>.<ext>
+
+Trocar a imagem muda a chave e, portanto, a URL; por isso as respostas
+podem levar ``Cache-Control: immutable`` e o navegador nunca busca a mesma
+miniatura duas vezes. O hash da origem fica memorizado por
+``(mtime, tamanho)``: montar a URL de uma imagem já vista custa um ``stat``.
+
+A rota ``/imagens/<perfil>/<nome>`` só gera derivados de origens conhecidas:
+as imagens cadastradas são registradas uma vez em ``init_app`` e cada imagem
+nova ao fim do processamento (``gerar``, que já grava os arquivos para os
+outros processos). Um nome desconhecido é 404, sem varrer nada.
+
+Quando a origem já cabe no perfil e o formato é o mesmo, o "derivado" é a
+própria origem e nada é gravado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from models import db, Equipment
+from utils import image_index
+
+
+@dataclass(frozen=True)
+class Perfil:
+    nome: str
+    largura: int
+    altura: int
+    formato: str | None = None      # None → mantém PNG/JPEG da origem
+    qualidade: int = 85
+
+    @property
+    def assinatura(self) -> str:
+        return f"{self.nome}:{self.largura}x{self.altura}:{self.formato}:{self.qualidade}:v1"
+
+
+PERFIS = {
+    # 1,67" no DOCX (gerar_proposta) a ~190 dpi
+    "docx": Perfil("docx", 320, 360),
+    # <img> de 80×90 na listagem de equipamentos, e o srcset 2×
+    "lista": Perfil("lista", 80, 90, "WEBP", 80),
+    "lista2x": Perfil("lista2x", 160, 180, "WEBP", 80),
+    "web": Perfil("web", 320, 360, "WEBP", 85),
+}
+
+_EXTENSOES = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+_NOME_VALIDO = re.compile(r"^[0-9a-f]{24}\.(png|jpg|webp)$")
+_MIMETYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp"}
+
+
+def mimetype(nome: str) -> str:
+    return _MIMETYPES.get(nome.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+class Derivados:
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+        self._origens: dict[tuple[str, str], str] = {}   # (perfil, nome) → origem
+
+    # ----------------------------------------------------------------- chaves
+    def _hash_origem(self, origem: str) -> str | None:
+        try:
+            st = os.stat(origem)
+        except OSError:
+            return None
+        with self._lock:
+            memo = self._hashes.get(origem)
+        if memo and memo[:2] == (st.st_mtime_ns, st.st_size):
+            return memo[2]
+
+        h = hashlib.sha256()
+        try:
+            with open(origem, "rb") as fh:
+                for bloco in iter(lambda: fh.read(1024 * 1024), b""):
+                    h.update(bloco)
+        except OSError:
+            return None
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[origem] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def chave(self, origem: str, perfil: Perfil) -> str | None:
+        digest = self._hash_origem(origem)
+        if digest is None:
+            return None
+        return hashlib.sha256(f"{digest}|{perfil.assinatura}".encode()).hexdigest()[:24]
+
+    def nome(self, origem: str, perfil: Perfil) -> str | None:
+        """``<chave>.<ext>`` do derivado (sem gerar nada)."""
+        chave = self.chave(origem, perfil)
+        if chave is None:
+            return None
+        nome = f"{chave}.{self._extensao(origem, perfil)}"
+        with self._lock:
+            self._origens[(perfil.nome, nome)] = origem
+        return nome
+
+    def registrar(self, origens) -> int:
+        """Memoriza os nomes dos derivados das ``origens``; devolve quantas existem."""
+        total = 0
+        for origem in origens:
+            if all(self.nome(origem, perfil) for perfil in PERFIS.values()):
+                total += 1
+        return total
+
+    @staticmethod
+    def _extensao(origem: str, perfil: Perfil) -> str:
+        if perfil.formato:
+            return _EXTENSOES[perfil.formato]
+        ext = os.path.splitext(origem)[1].lower().lstrip(".")
+        return "jpg" if ext in ("jpg", "jpeg") else "png"
+
+    # ---------------------------------------------------------------- geração
+    def caminho(self, origem: str, perfil: Perfil, nome: str | None = None) -> str | None:
+        """Caminho do derivado, gerado se ainda não existir (``None`` se a origem não abrir)."""
+        nome = nome or self.nome(origem, perfil)
+        if nome is None:
+            return None
+        destino = os.path.join(self.base_dir, perfil.nome, nome)
+        if os.path.exists(destino):
+            return destino
+        try:
+            dados = self._gerar(origem, perfil, nome.rsplit(".", 1)[-1])
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            return None
+        if dados is None:
+            return origem           # a origem já serve como está
+
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        tmp = f"{destino}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(dados)
+        os.replace(tmp, destino)
+        return destino
+
+    def localizar(self, perfil: Perfil, nome: str) -> str | None:
+        """Arquivo do derivado ``nome`` — gerado agora se a origem for conhecida."""
+        destino = os.path.join(self.base_dir, perfil.nome, nome)
+        if os.path.exists(destino):
+            return destino
+        with self._lock:
+            origem = self._origens.get((perfil.nome, nome))
+        if origem is None:
+            return None
+        return self.caminho(origem, perfil, nome)
+
+    def coletar(self, origens, *, simular: bool = False, idade_minima: float = 3600) -> int:
+        """Remove derivados que não pertencem a nenhuma das ``origens``; devolve quantos."""
+        validos = {
+            (perfil.nome, self.nome(origem, perfil))
+            for origem in origens
+            for perfil in PERFIS.values()
+        }
+        limite = time.time() - idade_minima
+        removidos = 0
+        for perfil in PERFIS:
+            pasta = os.path.join(self.base_dir, perfil)
+            try:
+                arquivos = os.listdir(pasta)
+            except FileNotFoundError:
+                continue
+            for nome in arquivos:
+                path = os.path.join(pasta, nome)
+                try:
+                    if (perfil, nome) in validos or os.path.getmtime(path) > limite:
+                        continue
+                    if not simular:
+                        os.remove(path)
+                except OSError:
+                    continue
+                removidos += 1
+        return removidos
+
+    @staticmethod
+    def _gerar(origem: str, perfil: Perfil, ext: str) -> bytes | None:
+        with Image.open(origem) as img:
+            formato_origem = img.format
+            cabe = img.width <= perfil.largura and img.height <= perfil.altura
+            if cabe and formato_origem == {"jpg": "JPEG", "png": "PNG"}.get(ext):
+                return None
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((perfil.largura, perfil.altura), Image.LANCZOS)
+
+            formato = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}[ext]
+            if formato == "JPEG":
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+
+            buf = io.BytesIO()
+            if formato == "PNG":
+                img.save(buf, format="PNG", optimize=True)
+            elif formato == "WEBP":
+                img.save(buf, format="WEBP", quality=perfil.qualidade, method=4)
+            else:
+                img.save(buf, format="JPEG", quality=perfil.qualidade, optimize=True)
+            return buf.getvalue()
+
+
+# --------------------------------------------------------------------------- #
+# Instância global
+# --------------------------------------------------------------------------- #
+_derivados: Derivados | None = None
+
+
+def obter_derivados() -> Derivados | None:
+    return _derivados
+
+
+def configurar_derivados(derivados: Derivados | None) -> Derivados | None:
+    global _derivados
+    _derivados = derivados
+    return derivados
+
+
+def nome(pth, perfil: str) -> str | None:
+    """Nome do derivado da imagem ``pth`` (``illustration_path``) no perfil."""
+    if _derivados is None:
+        return None
+    origem = image_index.resolver(pth)
+    if origem is None:
+        return None
+    return _derivados.nome(origem, PERFIS[perfil])
+
+
+def arquivo(perfil: str, nome_arquivo: str) -> str | None:
+    """Arquivo a servir para ``/imagens/<perfil>/<nome>`` (``None`` → 404)."""
+    if _derivados is None or perfil not in PERFIS or not _NOME_VALIDO.match(nome_arquivo):
+        return None
+    return _derivados.localizar(PERFIS[perfil], nome_arquivo)
+
+
+def gerar(pth) -> bool:
+    """Gera os derivados da imagem ``pth`` (ex.: recém-processada) em todos os perfis."""
+    if _derivados is None:
+        return False
+    origem = image_index.resolver(pth)
+    if origem is None:
+        return False
+    return all([_derivados.caminho(origem, p) for p in PERFIS.values()])
+
+
+def coletar(caminhos, *, simular: bool = False, idade_minima: float = 3600) -> int:
+    """``Derivados.coletar`` para os ``illustration_path`` em uso (0 sem derivados)."""
+    if _derivados is None:
+        return 0
+    origens = {o for o in map(image_index.resolver, caminhos) if o}
+    return _derivados.coletar(origens, simular=simular, idade_minima=idade_minima)
+
+
+def para_docx(pth):
+    """Imagem a embutir no DOCX: o derivado ``docx`` ou, sem derivados, ``pth``."""
+    if _derivados is None:
+        return pth
+    origem = image_index.resolver(pth)
+    if origem is None:
+        return pth
+    return _derivados.caminho(origem, PERFIS["docx"]) or origem
+
+
+def _registrar_cadastradas(gerador: Derivados) -> int:
+    caminhos = db.session.query(Equipment._illustration_path).filter(
+        Equipment._illustration_path.isnot(None)
+    )
+    origens = {o for o in (image_index.resolver(pth) for (pth,) in caminhos) if o}
+    return gerador.registrar(origens)
+
+
+def init_app(app):
+    if not app.config.get("DERIVADOS_ENABLED", True):
+        return configurar_derivados(None)
+    gerador = configurar_derivados(Derivados(app.config["DERIVADOS_DIR"]))
+    if not app.config.get("DERIVADOS_REGISTRAR", True):
+        return gerador
+    try:
+        with app.app_context():
+            _registrar_cadastradas(gerador)
+    except Exception:
+        app.logger.exception("Não foi possível registrar as imagens dos equipamentos")
+    return gerador
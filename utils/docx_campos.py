@@ -0,0 +1,200 @@
+"""Substituição de ``{{ campos }}`` em DOCX numa única passada.
+
+Cada parágrafo é lido uma vez: o texto das runs é concatenado, uma única
+regex encontra todos os campos e o valor é gravado de volta nos ``w:t``
+afetados — sem reconstruir o parágrafo. Assim:
+
+    • o custo cresce com o tamanho do documento, não com ``parágrafos × campos``;
+    • um campo contido numa só run mantém a formatação dessa run; um campo
+      partido em várias runs herda a formatação da primeira;
+    • ``\\n``/``\\t`` nos valores viram ``w:br``/``w:tab`` (como ``run.text``);
+    • corpo, cabeçalhos, rodapés e tabelas aninhadas são cobertos;
+    • o link do WhatsApp é aplicado na mesma passada (opcional).
+"""
+
+from __future__ import annotations
+
+import copy
+import re
+from bisect import bisect_right
+
+import docx.opc.constants
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+
+CAMPO_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_QUEBRAS_RE = re.compile(r"(\r\n|\n|\r|\t)")
+
+RT = docx.opc.constants.RELATIONSHIP_TYPE
+W_P = qn("w:p")
+W_R = qn("w:r")
+W_T = qn("w:t")
+W_RPR = qn("w:rPr")
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# w:t das runs do próprio parágrafo (ignora parágrafos aninhados em caixas de texto)
+_XPATH_TEXTOS = (
+    "./w:r/w:t | ./w:hyperlink/w:r/w:t | ./w:ins/w:r/w:t | ./w:smartTag/w:r/w:t"
+)
+
+
+# --------------------------------------------------------------------------- #
+# Travessia
+# --------------------------------------------------------------------------- #
+def partes_de_texto(doc) -> list:
+    """Parte principal + cabeçalhos e rodapés (sem repetições)."""
+    partes = [doc.part]
+    vistos = {id(doc.part)}
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in (RT.HEADER, RT.FOOTER):
+            continue
+        parte = rel.target_part
+        if id(parte) not in vistos:
+            vistos.add(id(parte))
+            partes.append(parte)
+    return partes
+
+
+def iter_paragrafos(doc):
+    """Todos os parágrafos do documento, inclusive de tabelas aninhadas."""
+    for parte in partes_de_texto(doc):
+        for p_el in parte.element.iter(W_P):
+            yield Paragraph(p_el, parte)
+
+
+# --------------------------------------------------------------------------- #
+# Edição de runs
+# --------------------------------------------------------------------------- #
+def _definir_texto(t, texto: str):
+    t.text = texto
+    if texto[:1].isspace() or texto[-1:].isspace():
+        t.set(XML_SPACE, "preserve")
+
+
+def _expandir_quebras(t) -> list:
+    """Converte ``\\n``/``\\t`` do texto em ``w:br``/``w:tab``; retorna os w:t."""
+    partes = _QUEBRAS_RE.split(t.text or "")
+    if len(partes) == 1:
+        return [t]
+    _definir_texto(t, partes[0])
+    textos, anterior = [t], t
+    for parte in partes[1:]:
+        if not parte:
+            continue
+        if parte == "\t":
+            novo = OxmlElement("w:tab")
+        elif parte in ("\n", "\r", "\r\n"):
+            novo = OxmlElement("w:br")
+        else:
+            novo = OxmlElement("w:t")
+            _definir_texto(novo, parte)
+            textos.append(novo)
+        anterior.addnext(novo)
+        anterior = novo
+    return textos
+
+
+def _nova_run(rpr, texto: str | None = None):
+    r = OxmlElement("w:r")
+    if rpr is not None:
+        r.append(copy.deepcopy(rpr))
+    if texto:
+        t = OxmlElement("w:t")
+        _definir_texto(t, texto)
+        r.append(t)
+    return r
+
+
+def _inserir_link(t, trecho: str, url: str, parte):
+    """Troca ``trecho`` dentro de ``t`` por um hyperlink com a mesma formatação."""
+    r = t.getparent()
+    rpr = r.find(W_RPR)
+    texto = t.text or ""
+    i = texto.index(trecho)
+    antes, depois = texto[:i], texto[i + len(trecho):]
+
+    # tudo o que vem depois de ``t`` na run vai para uma run nova
+    resto = _nova_run(rpr, depois)
+    for filho in list(t.itersiblings()):
+        resto.append(filho)
+
+    r_id = parte.relate_to(url, RT.HYPERLINK, is_external=True)
+    link = OxmlElement("w:hyperlink")
+    link.set(qn("r:id"), r_id)
+    link.append(_nova_run(rpr, trecho))
+
+    if antes:
+        _definir_texto(t, antes)
+    else:
+        r.remove(t)
+    r.addnext(link)
+    if len(resto) > (1 if rpr is not None else 0):
+        link.addnext(resto)
+
+
+# --------------------------------------------------------------------------- #
+# Motor
+# --------------------------------------------------------------------------- #
+def _substituir_paragrafo(p_el, mapa: dict) -> list:
+    """Substitui os campos de um parágrafo; retorna os w:t (para o link)."""
+    ts = p_el.xpath(_XPATH_TEXTOS)
+    if not ts:
+        return ts
+    textos = [t.text or "" for t in ts]
+    completo = "".join(textos)
+    if "{{" not in completo:
+        return ts
+    achados = [m for m in CAMPO_RE.finditer(completo) if m.group(1) in mapa]
+    if not achados:
+        return ts
+
+    inicios, pos = [], 0
+    for tx in textos:
+        inicios.append(pos)
+        pos += len(tx)
+
+    # da direita para a esquerda: os offsets anteriores continuam válidos
+    for m in reversed(achados):
+        a, b = m.span()
+        i = bisect_right(inicios, a) - 1
+        j = bisect_right(inicios, b - 1) - 1
+        valor = str(mapa[m.group(1)])
+        prefixo = textos[i][: a - inicios[i]]
+        sufixo = textos[j][b - inicios[j]:]
+        if i == j:
+            textos[i] = prefixo + valor + sufixo
+        else:
+            textos[i] = prefixo + valor
+            for k in range(i + 1, j):
+                textos[k] = ""
+            textos[j] = sufixo
+
+    resultado = []
+    for t, tx in zip(ts, textos):
+        if tx != (t.text or ""):
+            _definir_texto(t, tx)
+            resultado.extend(_expandir_quebras(t))
+        else:
+            resultado.append(t)
+    return resultado
+
+
+def substituir_campos(paragrafos, mapa: dict, *, link: tuple[str, str] | None = None):
+    """Aplica ``mapa`` aos ``paragrafos`` (objetos ``Paragraph``).
+
+    ``link=(texto, url)`` transforma a primeira ocorrência de ``texto`` num
+    hyperlink para ``url`` (usado para o telefone/WhatsApp).
+    """
+    pendente = link
+    for p in paragrafos:
+        ts = _substituir_paragrafo(p._p, mapa)
+        if pendente is None:
+            continue
+        trecho, url = pendente
+        for t in ts:
+            if trecho and trecho in (t.text or ""):
+                _inserir_link(t, trecho, url, p.part)
+                pendente = None
+                break
@@ -0,0 +1,217 @@
+"""Registro em memória dos templates DOCX de proposta.
+
+Cada template é lido e interpretado uma única vez; na mesma passada
+registramos quais parágrafos (do corpo, cabeçalhos e rodapés) contêm
+``{{ campos }}`` e onde fica a âncora ``INVESTIMENTO``. Cada geração recebe
+um clone do pacote já interpretado, evitando ``copyfile`` + ``Document()`` +
+varreduras completas a cada pedido.
+
+O template é recarregado automaticamente quando o ``mtime`` do arquivo muda.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from utils.docx_campos import partes_de_texto
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "docs_templates")
+TEMPLATE_PREFIX = "proposta_template"
+
+PLACEHOLDER_MARK = "{{"
+ANCHOR_TEXTS = ("INVESTIMENTO:", "INVESTIMENTO (AQUISIÇÃO):")
+
+
+def _texto_paragrafo(p_el) -> str:
+    return "".join(t.text or "" for t in p_el.iter(qn("w:t")))
+
+
+def _slug(valor) -> str:
+    """Nome usado no arquivo para um ``ServicoType``/``ModalidadeType``."""
+    if valor is None:
+        return ""
+    return str(getattr(valor, "name", valor)).strip().lower()
+
+
+@dataclass
+class TemplateInstance:
+    """Cópia de trabalho de um template, pronta para ser preenchida."""
+
+    document: object
+    paragrafos: list
+    ancora: object | None
+
+
+@dataclass
+class CompiledTemplate:
+    """Template interpretado + posições dos campos e da âncora."""
+
+    path: str
+    mtime_ns: int
+    digest: str
+    placeholders: tuple[tuple[str, int], ...]  # (partname, índice do w:p)
+    anchor: int | None
+    _document: object
+
+    def clone(self) -> TemplateInstance:
+        # o clone completo (cópia da árvore + parágrafos localizados) sai mais
+        # barato que só reabrir os bytes com ``Document()``, que ainda aloca
+        # ~1 MB em objetos Python por geração; ver ``python -m
+        # benchmarks.render --alvos template_clone,template_reabrir``
+        doc = copy.deepcopy(self._document)
+        partes = {str(p.partname): p for p in partes_de_texto(doc)}
+        p_els = {}
+
+        def _p(partname, i):
+            if partname not in p_els:
+                p_els[partname] = list(partes[partname].element.iter(qn("w:p")))
+            return p_els[partname][i]
+
+        paragrafos = [Paragraph(_p(nome, i), partes[nome]) for nome, i in self.placeholders]
+        ancora = None
+        if self.anchor is not None:
+            ancora = _p(str(doc.part.partname), self.anchor)
+        return TemplateInstance(document=doc, paragrafos=paragrafos, ancora=ancora)
+
+
+def compilar_template(path: str) -> CompiledTemplate:
+    """Lê o DOCX em ``path`` e indexa campos e âncora."""
+    st = os.stat(path)
+    with open(path, "rb") as fp:
+        blob = fp.read()
+
+    doc = Document(io.BytesIO(blob))
+    body = doc.element.body
+
+    placeholders = []
+    anchor = None
+    principal = str(doc.part.partname)
+    for i, p_el in enumerate(body.iter(qn("w:p"))):
+        texto = _texto_paragrafo(p_el)
+        if PLACEHOLDER_MARK in texto:
+            placeholders.append((principal, i))
+        # a âncora só vale para parágrafos do corpo (fora de tabelas)
+        if (
+            anchor is None
+            and p_el.getparent() is body
+            and any(t in texto.upper() for t in ANCHOR_TEXTS)
+        ):
+            anchor = i
+
+    for parte in partes_de_texto(doc)[1:]:  # cabeçalhos e rodapés
+        for i, p_el in enumerate(parte.element.iter(qn("w:p"))):
+            if PLACEHOLDER_MARK in _texto_paragrafo(p_el):
+                placeholders.append((str(parte.partname), i))
+
+    return CompiledTemplate(
+        path=path,
+        mtime_ns=st.st_mtime_ns,
+        digest=hashlib.sha256(blob).hexdigest(),
+        placeholders=tuple(placeholders),
+        anchor=anchor,
+        _document=doc,
+    )
+
+
+class TemplateRegistry:
+    """Mantém um ``CompiledTemplate`` por combinação serviço/modalidade.
+
+    Procura, nesta ordem, dentro de ``base_dir``::
+
+        proposta_template_<servico>_<modalidade>.docx
+        proposta_template_<servico>.docx
+        proposta_template_<modalidade>.docx
+        proposta_template.docx
+
+    com ``<servico>``/``<modalidade>`` sendo o nome do enum em minúsculas
+    (ex.: ``proposta_template_ponto_locacao.docx``).
+    """
+
+    def __init__(self, base_dir: str = TEMPLATES_DIR, prefix: str = TEMPLATE_PREFIX):
+        self.base_dir = base_dir
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._cache: dict[str, CompiledTemplate] = {}
+        self._dir_mtime_ns: int | None = None
+        self._arquivos: frozenset[str] = frozenset()
+
+    def _listar(self) -> frozenset[str]:
+        """Lista o diretório apenas quando o ``mtime`` dele muda."""
+        try:
+            mtime = os.stat(self.base_dir).st_mtime_ns
+        except FileNotFoundError:
+            return frozenset()
+        if mtime != self._dir_mtime_ns:
+            self._arquivos = frozenset(
+                e.name for e in os.scandir(self.base_dir) if e.is_file()
+            )
+            self._dir_mtime_ns = mtime
+        return self._arquivos
+
+    def arquivos(self) -> list[str]:
+        """Nomes dos templates disponíveis (``proposta_template*.docx``)."""
+        with self._lock:
+            arquivos = self._listar()
+        return sorted(
+            n for n in arquivos
+            if n.startswith(self.prefix) and n.lower().endswith(".docx")
+        )
+
+    def candidatos(self, servico=None, modalidade=None) -> list[str]:
+        s, m = _slug(servico), _slug(modalidade)
+        nomes = []
+        if s and m:
+            nomes.append(f"{self.prefix}_{s}_{m}.docx")
+        if s:
+            nomes.append(f"{self.prefix}_{s}.docx")
+        if m:
+            nomes.append(f"{self.prefix}_{m}.docx")
+        nomes.append(f"{self.prefix}.docx")
+        return nomes
+
+    def resolve(self, servico=None, modalidade=None) -> str:
+        with self._lock:
+            arquivos = self._listar()
+        for nome in self.candidatos(servico, modalidade):
+            if nome in arquivos:
+                return os.path.join(self.base_dir, nome)
+        raise FileNotFoundError("Template DOCX não encontrado.")
+
+    def get(self, servico=None, modalidade=None) -> CompiledTemplate:
+        path = self.resolve(servico, modalidade)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError("Template DOCX não encontrado.") from None
+
+        with self._lock:
+            atual = self._cache.get(path)
+            if atual is None or atual.mtime_ns != mtime:
+                atual = compilar_template(path)
+                self._cache[path] = atual
+            return atual
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._dir_mtime_ns = None
+            self._arquivos = frozenset()
+
+
+registry = TemplateRegistry()
+
+
+def obter_template(servico_type=None, modalidade_type=None) -> CompiledTemplate:
+    """Atalho para o registro global usado por ``gerar_proposta_docx``."""
+    return registry.get(servico_type, modalidade_type)
@@ -0,0 +1,312 @@
+"""Fila persistente dos e-mails de proposta.
+
+``enfileirar`` grava um ``EmailOutbox`` (destinatários, corpo e a foto dos
+itens da proposta) e acorda o despachante; a requisição termina logo após
+o commit. O despachante — uma thread por processo — pega as mensagens
+vencidas, gera o PDF (reaproveitando o ``ArtifactStore``), monta a
+mensagem e envia pelo pool de conexões SMTP (``utils.smtp_pool``).
+
+Falhas temporárias voltam para a fila com espera exponencial
+(``MAIL_OUTBOX_BACKOFF`` × 2^(tentativas-1), limitada a
+``MAIL_OUTBOX_BACKOFF_MAX``) até ``MAIL_OUTBOX_MAX_TENTATIVAS``; recusas
+definitivas do servidor (5xx para remetente/destinatários) e o esgotamento
+das tentativas deixam a mensagem como ``falhou``, com o erro registrado.
+Mensagens que falharam podem ser reenviadas com ``reenviar``.
+
+Como tudo fica no banco, pendências sobrevivem a reinícios, e vários
+processos podem despachar a mesma fila: cada mensagem é reservada com um
+``UPDATE ... WHERE status = 'pendente'`` antes do envio.
+"""
+
+from __future__ import annotations
+
+import json
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import inspect, update
+
+from gerar_proposta import chave_render, renderizar_proposta
+from models import db, EmailOutbox, Proposal
+from utils import render_jobs, smtp_pool
+from utils.smtp_pool import config_smtp
+
+
+_despachante: "Despachante | None" = None
+_despachante_lock = threading.Lock()
+
+
+# --------------------------------------------------------------------------- #
+# SMTP
+# --------------------------------------------------------------------------- #
+def _erro_definitivo(exc: Exception) -> bool:
+    """Recusas que não mudam com uma nova tentativa."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in exc.recipients.values())
+    if isinstance(exc, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return exc.smtp_code >= 500
+    return isinstance(exc, LookupError)
+
+
+# --------------------------------------------------------------------------- #
+# Mensagem
+# --------------------------------------------------------------------------- #
+def corpo_padrao(proposta) -> str:
+    return (
+        f"Olá {proposta.client_name},\n\n"
+        "Segue em anexo a proposta comercial referente ao nosso atendimento.\n\n"
+        "Fico à disposição para dúvidas."
+    )
+
+
+def _anexo_pdf(app, proposta, params: dict) -> bytes:
+    """PDF da proposta, do ``ArtifactStore`` quando já gerado."""
+    itens = render_jobs.itens_de_params(params.get("itens", []))
+    colab = params.get("colaborador", {})
+    store = render_jobs.obter_store(app)
+
+    chave = chave_render(proposta, itens, **colab)
+    caminho = store.path(chave, "pdf")
+    if caminho is not None:
+        with open(caminho, "rb") as fp:
+            return fp.read()
+
+    artefatos = renderizar_proposta(proposta, itens, **colab)
+    try:
+        store.put(chave, artefatos)
+    except OSError:
+        app.logger.warning("Não foi possível gravar o PDF no cache", exc_info=True)
+    return artefatos["pdf"]
+
+
+def montar_mensagem(email: EmailOutbox, proposta, anexo: bytes, cfg: dict) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = email.assunto or "Proposta Comercial"
+    msg["From"] = cfg["sender"]
+    msg["To"] = email.destinatario
+    cc = json.loads(email.cc or "[]")
+    if cc:
+        msg["Cc"] = ", ".join(cc)
+    if cfg["reply_to"]:
+        msg["Reply-To"] = cfg["reply_to"]
+
+    msg.set_content(email.corpo or corpo_padrao(proposta))
+    msg.add_attachment(
+        anexo,
+        maintype="application",
+        subtype="pdf",
+        filename=f"{proposta.filename}.pdf",
+    )
+    return msg
+
+
+# --------------------------------------------------------------------------- #
+# Envio
+# --------------------------------------------------------------------------- #
+def espera_retentativa(config, tentativas: int) -> timedelta:
+    base = float(config.get("MAIL_OUTBOX_BACKOFF", 60))
+    maximo = float(config.get("MAIL_OUTBOX_BACKOFF_MAX", 3600))
+    return timedelta(seconds=min(base * 2 ** max(tentativas - 1, 0), maximo))
+
+
+def _reservar(email_id: str) -> bool:
+    """Marca a mensagem como ``enviando`` se ainda estiver pendente."""
+    res = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email_id, EmailOutbox.status == EmailOutbox.PENDENTE)
+        .values(status=EmailOutbox.ENVIANDO,
+                tentativas=EmailOutbox.tentativas + 1,
+                atualizado_em=datetime.utcnow())
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def enviar(app, email_id: str) -> bool:
+    """Tenta enviar a mensagem ``email_id``; devolve ``True`` se foi enviada."""
+    if not _reservar(email_id):
+        return False  # outro processo já pegou (ou não está mais pendente)
+
+    email = db.session.get(EmailOutbox, email_id)
+    try:
+        proposta = db.session.get(Proposal, email.proposta_id)
+        if proposta is None:
+            raise LookupError("Proposta não encontrada.")
+        cfg = config_smtp(app.config)
+        anexo = _anexo_pdf(app, proposta, json.loads(email.params or "{}"))
+        smtp_pool.obter_pool(app).enviar(montar_mensagem(email, proposta, anexo, cfg))
+    except Exception as exc:
+        db.session.rollback()
+        email = db.session.get(EmailOutbox, email_id)
+        email.erro = str(exc)[:2000] or exc.__class__.__name__
+        maximo = int(app.config.get("MAIL_OUTBOX_MAX_TENTATIVAS", 5))
+        if _erro_definitivo(exc) or email.tentativas >= maximo:
+            app.logger.error("E-mail %s não enviado após %s tentativa(s): %s",
+                             email_id, email.tentativas, email.erro)
+            email.status = EmailOutbox.FALHOU
+        else:
+            app.logger.warning("Falha ao enviar e-mail %s (tentativa %s): %s",
+                               email_id, email.tentativas, email.erro)
+            email.status = EmailOutbox.PENDENTE
+            email.proximo_envio_em = (
+                datetime.utcnow() + espera_retentativa(app.config, email.tentativas)
+            )
+        db.session.commit()
+        return False
+
+    email.status = EmailOutbox.ENVIADO
+    email.enviado_em = datetime.utcnow()
+    email.erro = None
+    db.session.commit()
+    return True
+
+
+def processar_pendentes(app, limite: int | None = None) -> int:
+    """Envia as mensagens vencidas; devolve quantas foram enviadas."""
+    enviadas = 0
+    with app.app_context():
+        try:
+            if "email_outbox" not in inspect(db.engine).get_table_names():
+                return 0  # migração ainda não aplicada
+
+            agora = datetime.utcnow()
+            # "enviando" há muito tempo = processo caiu no meio do envio
+            travadas = agora - timedelta(seconds=float(app.config.get("MAIL_OUTBOX_TIMEOUT", 600)))
+            db.session.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.status == EmailOutbox.ENVIANDO,
+                       EmailOutbox.atualizado_em < travadas)
+                .values(status=EmailOutbox.PENDENTE)
+            )
+            db.session.commit()
+
+            q = (db.session.query(EmailOutbox.id)
+                 .filter(EmailOutbox.status == EmailOutbox.PENDENTE,
+                         EmailOutbox.proximo_envio_em <= agora)
+                 .order_by(EmailOutbox.proximo_envio_em))
+            if limite:
+                q = q.limit(limite)
+            for (email_id,) in q.all():
+                enviadas += enviar(app, email_id)
+        finally:
+            db.session.remove()
+    return enviadas
+
+
+class Despachante(threading.Thread):
+    """Thread que esvazia a fila a cada ``intervalo`` ou quando acordada."""
+
+    def __init__(self, app, intervalo: float = 30.0):
+        super().__init__(name="email-outbox", daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self, timeout: float | None = 5.0):
+        self._parar.set()
+        self._acordar.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                processar_pendentes(self.app)
+                smtp_pool.fechar_ociosas()
+            except Exception:
+                self.app.logger.exception("Falha no despachante de e-mails")
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+
+def iniciar(app) -> Despachante:
+    global _despachante
+    with _despachante_lock:
+        if _despachante is None or not _despachante.is_alive():
+            _despachante = Despachante(app, float(app.config.get("MAIL_OUTBOX_INTERVALO", 30)))
+            _despachante.start()
+        return _despachante
+
+
+def parar():
+    global _despachante
+    with _despachante_lock:
+        if _despachante is not None:
+            _despachante.parar()
+            _despachante = None
+    smtp_pool.fechar_pool()
+
+
+def _acordar_despachante():
+    if _despachante is not None:
+        _despachante.acordar()
+
+
+# --------------------------------------------------------------------------- #
+# API usada pelas rotas
+# --------------------------------------------------------------------------- #
+def enfileirar(proposta, equipamentos, corpo: str, cc_list, *, usuario_id: int,
+               **colaborador) -> EmailOutbox:
+    """Grava a mensagem na fila; o envio acontece fora da requisição.
+
+    ``RuntimeError`` se o SMTP não estiver configurado (nada é gravado).
+    """
+    from flask import current_app
+    config_smtp(current_app.config)
+
+    email = EmailOutbox(
+        id=uuid.uuid4().hex,
+        proposta_id=proposta.id,
+        usuario_id=usuario_id,
+        destinatario=proposta.email,
+        cc=json.dumps(list(cc_list or [])),
+        assunto=proposta.filename or "Proposta Comercial",
+        corpo=(corpo or "").strip() or corpo_padrao(proposta),
+        params=json.dumps({
+            "itens": render_jobs.itens_para_params(equipamentos),
+            "colaborador": colaborador,
+        }),
+        status=EmailOutbox.PENDENTE,
+        tentativas=0,
+        proximo_envio_em=datetime.utcnow(),
+    )
+    db.session.add(email)
+    db.session.commit()
+    _acordar_despachante()
+    return email
+
+
+def reenviar(email: EmailOutbox) -> EmailOutbox:
+    """Recoloca na fila uma mensagem que falhou (zera as tentativas)."""
+    email.status = EmailOutbox.PENDENTE
+    email.tentativas = 0
+    email.erro = None
+    email.proximo_envio_em = datetime.utcnow()
+    db.session.commit()
+    _acordar_despachante()
+    return email
+
+
+def ultimos_por_proposta(ids) -> dict[int, EmailOutbox]:
+    """E-mail mais recente de cada proposta (para o histórico)."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    out: dict[int, EmailOutbox] = {}
+    for email in (EmailOutbox.query
+                  .filter(EmailOutbox.proposta_id.in_(ids))
+                  .order_by(EmailOutbox.criado_em)):
+        out[email.proposta_id] = email
+    return out
+
+
+def init_app(app):
+    if not app.config.get("MAIL_OUTBOX_DISPATCHER", True):
+        return
+    iniciar(app)
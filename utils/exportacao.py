@@ -0,0 +1,355 @@
+"""Exportação em lote do histórico: ZIP de PDFs gerado em streaming.
+
+As propostas são fotografadas (objetos simples, sem ORM) e renderizadas em
+paralelo num pool de processos. Cada PDF entra no ZIP assim que fica pronto
+e os bytes seguem para o cliente na hora — o arquivo completo nunca fica em
+memória. PDFs já presentes no ``ArtifactStore`` não são renderizados de novo.
+
+O andamento de cada exportação (total, concluídas, falhas) fica disponível
+em ``progresso(export_id)`` e, ao final, o ZIP recebe um
+``relatorio_exportacao.csv`` com o resultado de cada proposta. Com
+``init_app``, o andamento também é gravado em ``EXPORT_PROGRESSO_DIR``
+(``<export_id>.json``), então a consulta funciona em qualquer worker, não só
+no que está gerando o ZIP.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import types
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from gerar_proposta import renderizador_da_proposta, chave_render, renderizar_proposta
+from utils import pdf_converter, tempos_render
+
+
+RELATORIO = "relatorio_exportacao.csv"
+
+_CAMPOS_SNAPSHOT = (
+    "id", "company", "cnpj", "client_name", "email", "telefone",
+    "pagamento", "prazo_entrega", "frete", "validade", "garantia",
+    "garantia_sistema", "data_criacao", "servico_type", "modalidade_type",
+    "filename",
+)
+
+
+# --------------------------------------------------------------------------- #
+# Tarefas (serializáveis para o pool de processos)
+# --------------------------------------------------------------------------- #
+@dataclass
+class TarefaExportacao:
+    proposta_id: int
+    nome_arquivo: str
+    proposta: types.SimpleNamespace
+    itens: list
+    colaborador: dict
+    chave: str = ""
+    renderizador: str = "libreoffice"   # resolvido na requisição (o filho não vê o banco)
+
+
+def montar_tarefa(prop, equipamentos, **colaborador) -> TarefaExportacao:
+    """Copia os dados da proposta/itens para objetos simples (picklable)."""
+    snap = types.SimpleNamespace(**{c: getattr(prop, c, None) for c in _CAMPOS_SNAPSHOT})
+    itens = [
+        types.SimpleNamespace(
+            id=eq.id,
+            name=eq.name,
+            description=eq.description,
+            illustration_path=eq.illustration_path,
+            unit_price=getattr(eq, "unit_price", 0) or 0.0,
+            quantity=getattr(eq, "quantity", None) or 1,
+            discount_percent=getattr(eq, "discount_percent", None) or 0.0,
+        )
+        for eq in equipamentos
+    ]
+    renderizador = renderizador_da_proposta(snap)
+    return TarefaExportacao(
+        proposta_id=prop.id,
+        nome_arquivo=f"{prop.filename or f'proposta_{prop.id}'}.pdf",
+        proposta=snap,
+        itens=itens,
+        colaborador=colaborador,
+        chave=chave_render(snap, itens, renderizador=renderizador, **colaborador),
+        renderizador=renderizador,
+    )
+
+
+def renderizar_tarefa(tarefa: TarefaExportacao) -> dict:
+    """Executada no processo filho; os tempos voltam junto para o processo web."""
+    with tempos_render.medir_render(registrar=False) as tempos:
+        artefatos = renderizar_proposta(
+            tarefa.proposta, tarefa.itens, renderizador=tarefa.renderizador, **tarefa.colaborador
+        )
+    return dict(artefatos, tempos=tempos)
+
+
+def _inicializar_processo(pool_dir: str | None, timeout: float, io_dir: str | None = None):
+    # cada processo filho usa um único conversor LibreOffice, com perfil próprio
+    base = os.path.join(pool_dir, f"export{os.getpid()}") if pool_dir else None
+    pdf_converter.configurar_pool(
+        pdf_converter.ConverterPool(1, timeout=timeout, base_dir=base, io_dir=io_dir)
+    )
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def num_processos(app) -> int:
+    return int(app.config.get("EXPORT_PROCESSOS") or os.cpu_count() or 2)
+
+
+def obter_executor(app) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=num_processos(app),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_processo,
+                initargs=(
+                    app.config.get("PDF_POOL_DIR"),
+                    app.config.get("PDF_POOL_TIMEOUT", 60),
+                    app.config.get("PDF_POOL_IO_DIR"),
+                ),
+            )
+        return _executor
+
+
+# --------------------------------------------------------------------------- #
+# Progresso
+# --------------------------------------------------------------------------- #
+@dataclass
+class Progresso:
+    id: str
+    total: int
+    concluidas: int = 0
+    falhas: list = field(default_factory=list)
+    finalizado: bool = False
+    atualizado: float = field(default_factory=time.time)
+    diretorio: str | None = None        # onde ``salvar`` grava o andamento
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "total": self.total,
+            "concluidas": self.concluidas,
+            "falhas": list(self.falhas),
+            "finalizado": self.finalizado,
+        }
+
+    def salvar(self):
+        """Marca a atualização e, com diretório, grava o JSON (troca atômica)."""
+        self.atualizado = time.time()
+        if self.diretorio is None:
+            return
+        tmp = None
+        try:       # falhar aqui não interrompe o ZIP: só a consulta fica defasada
+            fd, tmp = tempfile.mkstemp(dir=self.diretorio, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(self.to_json(), fp)
+            os.replace(tmp, _arquivo_progresso(self.diretorio, self.id))
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+
+_progressos: dict[str, Progresso] = {}
+_progressos_lock = threading.Lock()
+_RETENCAO_PROGRESSO = 3600
+_ID_VALIDO = re.compile(r"^[0-9a-f]{32}$")
+_diretorio: str | None = None
+
+
+def _arquivo_progresso(diretorio: str, export_id: str) -> str:
+    return os.path.join(diretorio, f"{export_id}.json")
+
+
+def configurar_diretorio(diretorio: str | None) -> str | None:
+    global _diretorio
+    _diretorio = diretorio
+    return diretorio
+
+
+def _descartar_antigos(diretorio: str, agora: float):
+    try:
+        nomes = os.listdir(diretorio)
+    except OSError:
+        return
+    for nome in nomes:
+        path = os.path.join(diretorio, nome)
+        try:
+            if agora - os.path.getmtime(path) > _RETENCAO_PROGRESSO:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def novo_progresso(total: int, export_id: str | None = None) -> Progresso:
+    """Registra o andamento de uma exportação.
+
+    ``export_id`` permite que a própria página gere o id e consulte o
+    progresso enquanto o download ainda está em andamento.
+    """
+    agora = time.time()
+    diretorio = _diretorio
+    if diretorio is not None:
+        os.makedirs(diretorio, exist_ok=True)
+        _descartar_antigos(diretorio, agora)
+    prog = Progresso(id=export_id or uuid.uuid4().hex, total=total, diretorio=diretorio)
+    with _progressos_lock:
+        for k in [k for k, p in _progressos.items()
+                  if p.finalizado and agora - p.atualizado > _RETENCAO_PROGRESSO]:
+            del _progressos[k]
+        _progressos[prog.id] = prog
+    prog.salvar()
+    return prog
+
+
+def progresso(export_id: str) -> Progresso | None:
+    """Andamento da exportação: o deste processo ou, se houver, o gravado em disco."""
+    with _progressos_lock:
+        prog = _progressos.get(export_id)
+    if prog is not None or _diretorio is None or not _ID_VALIDO.match(export_id):
+        return prog
+    path = _arquivo_progresso(_diretorio, export_id)
+    try:
+        with open(path, encoding="utf-8") as fp:
+            dados = json.load(fp)
+        atualizado = os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None
+    return Progresso(
+        id=export_id,
+        total=dados["total"],
+        concluidas=dados["concluidas"],
+        falhas=dados["falhas"],
+        finalizado=dados["finalizado"],
+        atualizado=atualizado,
+    )
+
+
+# --------------------------------------------------------------------------- #
+# ZIP em streaming
+# --------------------------------------------------------------------------- #
+class _BufferZip:
+    """Destino não-posicionável do ``ZipFile``: acumula até ser drenado."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _nome_unico(nome: str, usados: set, proposta_id: int) -> str:
+    if nome not in usados:
+        usados.add(nome)
+        return nome
+    base, ext = os.path.splitext(nome)
+    nome = f"{base} ({proposta_id}){ext}"
+    usados.add(nome)
+    return nome
+
+
+def _resultados(tarefas, executor, store, janela: int):
+    """Gera ``(tarefa, pdf | None, erro | None)`` na ordem em que terminam.
+
+    Mantém no máximo ``janela`` renderizações em andamento, para que um
+    cliente lento não faça os PDFs se acumularem em memória.
+    """
+    pendentes = iter(tarefas)
+    em_voo = {}
+
+    def _submeter():
+        for tarefa in pendentes:
+            pdf = store.get(tarefa.chave, "pdf") if store is not None else None
+            if pdf is not None:
+                return tarefa, pdf
+            em_voo[executor.submit(renderizar_tarefa, tarefa)] = tarefa
+            if len(em_voo) >= janela:
+                break
+        return None
+
+    while True:
+        pronto = _submeter()
+        if pronto is not None:
+            yield pronto[0], pronto[1], None
+            continue
+        if not em_voo:
+            return
+        feitos, _ = wait(list(em_voo), return_when=FIRST_COMPLETED)
+        for fut in feitos:
+            tarefa = em_voo.pop(fut)
+            try:
+                artefatos = fut.result()
+            except Exception as exc:
+                yield tarefa, None, str(exc) or exc.__class__.__name__
+                continue
+            tempos = artefatos.pop("tempos", None)
+            if tempos:
+                tempos_render.histogramas.registrar(tempos)
+            if store is not None:
+                try:
+                    store.put(tarefa.chave, artefatos)
+                except OSError:
+                    pass
+            yield tarefa, artefatos["pdf"], None
+
+
+def stream_zip(tarefas, *, executor, progresso: Progresso, store=None, janela: int = 4):
+    """Gerador de bytes do ZIP; cada PDF é enviado assim que fica pronto."""
+    buf = _BufferZip()
+    usados: set = set()
+    linhas = []
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for tarefa, pdf, erro in _resultados(tarefas, executor, store, janela):
+            if erro is None:
+                nome = _nome_unico(tarefa.nome_arquivo, usados, tarefa.proposta_id)
+                zf.writestr(nome, pdf)
+                linhas.append((tarefa.proposta_id, nome, "ok", ""))
+            else:
+                progresso.falhas.append({"proposta_id": tarefa.proposta_id, "erro": erro})
+                linhas.append((tarefa.proposta_id, tarefa.nome_arquivo, "erro", erro))
+            progresso.concluidas += 1
+            progresso.salvar()
+            dados = buf.drenar()
+            if dados:
+                yield dados
+
+        relatorio = io.StringIO()
+        writer = csv.writer(relatorio, delimiter=";")
+        writer.writerow(("proposta_id", "arquivo", "status", "erro"))
+        writer.writerows(linhas)
+        zf.writestr(RELATORIO, relatorio.getvalue().encode("utf-8-sig"))
+
+    progresso.finalizado = True
+    progresso.salvar()
+    yield buf.drenar()
+
+
+def init_app(app):
+    configurar_diretorio(app.config.get("EXPORT_PROGRESSO_DIR"))
@@ -0,0 +1,115 @@
+"""Cliente HTTP com conexões persistentes, no formato de ``urlopen``.
+
+``urllib.request.urlopen`` abre uma conexão nova a cada chamada — DNS, TCP
+e TLS de novo a cada consulta de CNPJ. ``OpenerPool`` usa um
+``urllib3.PoolManager`` (keep-alive, até ``conexoes_por_host`` conexões
+por host, ``hosts`` pools guardados) e se comporta como ``urlopen``: recebe
+um ``urllib.request.Request`` e ``timeout=``, devolve uma resposta usável
+em ``with`` com ``read()`` e ``headers.get_content_charset()`` e levanta
+``HTTPError``/``URLError`` do ``urllib``. Assim ele entra direto no
+parâmetro ``opener`` de ``_fetch_cnpj_payload``.
+
+``timeout_conexao`` e ``timeout_leitura`` valem para cada requisição; o
+``timeout`` passado na chamada limita o tempo total.
+"""
+
+from __future__ import annotations
+
+import email.message
+import io
+from urllib.error import HTTPError, URLError
+from urllib.request import Request
+
+import urllib3
+
+
+class _Resposta:
+    def __init__(self, url: str, status: int, headers, dados: bytes):
+        self.url = url
+        self.status = status
+        self.headers = email.message.Message()
+        for nome, valor in headers.items():
+            self.headers[nome] = valor
+        self._corpo = io.BytesIO(dados)
+
+    def read(self, *args) -> bytes:
+        return self._corpo.read(*args)
+
+    def getcode(self) -> int:
+        return self.status
+
+    def close(self):
+        self._corpo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpenerPool:
+    def __init__(self, *, hosts: int = 4, conexoes_por_host: int = 4,
+                 timeout_conexao: float = 3.0, timeout_leitura: float = 6.0):
+        self.timeout_conexao = float(timeout_conexao)
+        self.timeout_leitura = float(timeout_leitura)
+        self._pool = urllib3.PoolManager(
+            num_pools=int(hosts),
+            maxsize=int(conexoes_por_host),
+            block=True,            # limite real por host: quem excede espera a vez
+            retries=False,
+        )
+
+    def __call__(self, req: Request | str, timeout: float | None = None, data=None):
+        if isinstance(req, str):
+            req = Request(req, data=data)
+        url = req.full_url
+        limite = urllib3.Timeout(
+            connect=self.timeout_conexao, read=self.timeout_leitura, total=timeout
+        )
+        try:
+            resp = self._pool.request(
+                req.get_method(), url,
+                body=req.data,
+                headers=dict(req.header_items()),
+                timeout=limite,
+                pool_timeout=timeout or self.timeout_conexao,
+                redirect=True,
+            )
+        except urllib3.exceptions.HTTPError as exc:
+            raise URLError(exc) from exc
+
+        if resp.status >= 400:
+            raise HTTPError(url, resp.status, resp.reason or "", resp.headers,
+                            io.BytesIO(resp.data))
+        return _Resposta(url, resp.status, resp.headers, resp.data)
+
+    def fechar(self):
+        self._pool.clear()
+
+
+_opener: OpenerPool | None = None
+
+
+def obter_opener() -> OpenerPool:
+    global _opener
+    if _opener is None:
+        _opener = OpenerPool()
+    return _opener
+
+
+def configurar_opener(opener: OpenerPool | None) -> OpenerPool | None:
+    global _opener
+    if _opener is not None and _opener is not opener:
+        _opener.fechar()
+    _opener = opener
+    return opener
+
+
+def init_app(app):
+    return configurar_opener(OpenerPool(
+        hosts=app.config.get("HTTP_POOL_HOSTS", 4),
+        conexoes_por_host=app.config.get("HTTP_POOL_CONEXOES_POR_HOST", 4),
+        timeout_conexao=app.config.get("HTTP_TIMEOUT_CONEXAO", 3.0),
+        timeout_leitura=app.config.get("HTTP_TIMEOUT_LEITURA", 6.0),
+    ))
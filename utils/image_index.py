@@ -0,0 +1,350 @@
+"""Índice das imagens de equipamentos e cache dos bytes já lidos.
+
+``ImageIndex`` varre ``static/images`` uma vez e mapeia caminhos
+normalizados (``sub/arquivo.png``) e nomes de arquivo para o caminho
+absoluto; resolver a imagem de um item vira uma consulta em dicionário, em
+vez de até dez ``os.path.exists``. O índice é refeito quando o ``mtime`` de
+alguma pasta muda (verificado no máximo a cada ``intervalo`` segundos) ou
+quando as rotas de equipamentos chamam ``invalidar`` após upload/exclusão.
+Caminhos fora de ``static/images`` caem na busca antiga, e o resultado fica
+memorizado até a próxima invalidação.
+
+``ImageCache`` guarda, em LRU limitado pelo total de bytes, o conteúdo de
+cada imagem junto com o cabeçalho já interpretado pelo python-docx
+(dimensões, DPI, tipo, SHA-1), para que a mesma foto não seja lida e
+analisada de novo a cada proposta.
+"""
+
+from __future__ import annotations
+
+import copy
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from docx.image.image import Image as DocxImage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.shape import CT_Inline
+from docx.text.run import Run
+from sqlalchemy import inspect
+
+from models import db, Equipment
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _partes(texto: str) -> tuple[list[str], list[str]]:
+    """Partes do caminho com e sem o prefixo ``static/images``."""
+    normalizado = texto.replace("\\", "/").lstrip("/")
+    partes = [p for p in normalizado.split("/") if p and p not in (".", "..")]
+    sem_prefixo = partes[:]
+    if sem_prefixo and sem_prefixo[0].lower() == "static":
+        sem_prefixo = sem_prefixo[1:]
+    if sem_prefixo and sem_prefixo[0].lower() == "images":
+        sem_prefixo = sem_prefixo[1:]
+    return partes, sem_prefixo
+
+
+def _buscar_no_disco(texto: str, base_dir: str) -> str | None:
+    """Busca original: tenta CWD, ``base_dir`` e ``base_dir/static[/images]``."""
+    if os.path.isabs(texto) and os.path.exists(texto):
+        return texto
+
+    partes, sem_prefixo = _partes(texto)
+    junto = os.path.join(*partes) if partes else ""
+    sem_prefixo_junto = os.path.join(*sem_prefixo) if sem_prefixo else ""
+    nome = sem_prefixo[-1] if sem_prefixo else (partes[-1] if partes else "")
+
+    candidatos = []
+    for rel in dict.fromkeys(r for r in (junto, sem_prefixo_junto) if r):
+        candidatos.extend([rel, os.path.join(os.getcwd(), rel), os.path.join(base_dir, rel)])
+    if sem_prefixo_junto:
+        candidatos.extend([
+            os.path.join(base_dir, "static", sem_prefixo_junto),
+            os.path.join(base_dir, "static", "images", sem_prefixo_junto),
+        ])
+    if nome:
+        candidatos.append(os.path.join(base_dir, "static", "images", nome))
+
+    for candidato in dict.fromkeys(os.path.normpath(c) for c in candidatos):
+        if os.path.exists(candidato):
+            return os.path.abspath(candidato)
+    return None
+
+
+# --------------------------------------------------------------------------- #
+# Índice de caminhos
+# --------------------------------------------------------------------------- #
+class ImageIndex:
+    def __init__(self, base_dir: str = BASE_DIR, images_dir: str | None = None,
+                 *, intervalo: float = 2.0):
+        self.base_dir = base_dir
+        self.images_dir = images_dir or os.path.join(base_dir, "static", "images")
+        self.intervalo = float(intervalo)
+        self._lock = threading.Lock()
+        self._por_caminho: dict[str, str] = {}
+        self._por_nome: dict[str, str] = {}
+        self._memo: dict[str, str] = {}
+        self._mtimes: dict[str, int] | None = None
+        self._verificado = 0.0
+
+    def _construir(self):
+        por_caminho, por_nome, mtimes = {}, {}, {}
+        for raiz, pastas, arquivos in os.walk(self.images_dir):
+            pastas.sort()
+            try:
+                mtimes[raiz] = os.stat(raiz).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            rel_raiz = os.path.relpath(raiz, self.images_dir)
+            for nome in sorted(arquivos):
+                rel = nome if rel_raiz == "." else f"{rel_raiz}/{nome}".replace(os.sep, "/")
+                absoluto = os.path.join(raiz, nome)
+                por_caminho[rel] = absoluto
+                por_nome.setdefault(nome, absoluto)  # a raiz vem antes das subpastas
+        self._por_caminho, self._por_nome, self._mtimes = por_caminho, por_nome, mtimes
+        self._memo = {}
+
+    def _mudou(self) -> bool:
+        for pasta, mtime in self._mtimes.items():
+            try:
+                if os.stat(pasta).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return not self._mtimes and os.path.isdir(self.images_dir)
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if self._mtimes is not None and agora - self._verificado < self.intervalo:
+            return
+        self._verificado = agora
+        if self._mtimes is None or self._mudou():
+            self._construir()
+
+    def invalidar(self):
+        """Descarta o índice; a próxima consulta varre a pasta de novo."""
+        with self._lock:
+            self._mtimes = None
+
+    def resolver(self, pth) -> str | None:
+        """Caminho absoluto da imagem ``pth`` (ou ``None`` se não existir)."""
+        if not pth:
+            return None
+        texto = str(pth).strip()
+        if not texto:
+            return None
+
+        with self._lock:
+            self._atualizar()
+            if not os.path.isabs(texto):
+                _, sem_prefixo = _partes(texto)
+                if sem_prefixo:
+                    achado = (self._por_caminho.get("/".join(sem_prefixo))
+                              or self._por_nome.get(sem_prefixo[-1]))
+                    if achado:
+                        return achado
+            memorizado = self._memo.get(texto)
+        if memorizado:
+            return memorizado
+
+        # fora do índice (caminho absoluto, outra pasta…): busca no disco
+        achado = _buscar_no_disco(texto, self.base_dir)
+        if achado:
+            with self._lock:
+                self._memo[texto] = achado
+        return achado
+
+    def preaquecer(self, caminhos) -> int:
+        """Resolve de antemão os caminhos (ex.: todos os ``illustration_path``)."""
+        return sum(1 for c in caminhos if self.resolver(c))
+
+
+# --------------------------------------------------------------------------- #
+# Cache de imagens
+# --------------------------------------------------------------------------- #
+@dataclass(frozen=True)
+class ImagemCacheada:
+    path: str
+    imagem: DocxImage  # bytes + cabeçalho já interpretado
+    assinatura: tuple = ()  # (mtime_ns, tamanho) do arquivo quando foi lido
+
+    @property
+    def tamanho(self) -> int:
+        return len(self.imagem.blob)
+
+
+class ImageCache:
+    """LRU de ``ImagemCacheada`` limitado por ``max_bytes``.
+
+    Cada acerto confere ``(mtime, tamanho)`` com um ``stat``: um arquivo
+    regravado no lugar (ou por outro worker) é relido em vez de servido velho.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._itens: OrderedDict[str, ImagemCacheada] = OrderedDict()
+        self._total = 0
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def _assinatura(path: str) -> tuple | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _carregar(self, path: str, assinatura: tuple) -> ImagemCacheada | None:
+        try:
+            return ImagemCacheada(path, DocxImage.from_file(path), assinatura)
+        except FileNotFoundError:
+            return None
+
+    def get(self, path: str) -> ImagemCacheada | None:
+        assinatura = self._assinatura(path)
+        if assinatura is None:
+            self.descartar(path)
+            return None
+        with self._lock:
+            item = self._itens.get(path)
+            if item is not None and item.assinatura == assinatura:
+                self._itens.move_to_end(path)
+                self.acertos += 1
+                return item
+            self.falhas += 1
+
+        item = self._carregar(path, assinatura)
+        if item is None or item.tamanho > self.max_bytes:
+            return item
+        with self._lock:
+            antigo = self._itens.pop(path, None)
+            if antigo is not None:
+                self._total -= antigo.tamanho
+            self._itens[path] = item
+            self._total += item.tamanho
+            while self._total > self.max_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self._total -= removido.tamanho
+        return item
+
+    def descartar(self, path: str | None = None):
+        with self._lock:
+            if path is None:
+                self._itens.clear()
+                self._total = 0
+            else:
+                item = self._itens.pop(path, None)
+                if item is not None:
+                    self._total -= item.tamanho
+
+
+def inserir_imagem(run, item: ImagemCacheada, width=None, height=None):
+    """Equivalente a ``run.add_picture`` reaproveitando o cabeçalho já lido."""
+    part = run.part
+    imagem = item.imagem
+    image_parts = part.package.image_parts
+    try:
+        image_part = (image_parts._get_by_sha1(imagem.sha1)
+                      or image_parts._add_image_part(imagem))
+    except AttributeError:  # API interna do python-docx mudou
+        return run.add_picture(io.BytesIO(imagem.blob), width=width, height=height)
+    r_id = part.relate_to(image_part, RT.IMAGE)
+    cx, cy = imagem.scaled_dimensions(width, height)
+    inline = CT_Inline.new_pic_inline(part.next_id, r_id, imagem.filename, cx, cy)
+    run._r.add_drawing(inline)
+
+
+class InseridorImagens:
+    """``inserir_imagem`` para muitas imagens no mesmo documento.
+
+    ``part.next_id`` varre o XML inteiro a cada chamada, o que deixa a
+    inserção de N imagens O(N²). Aqui o ``next_id`` é lido uma vez e os ids
+    seguintes são numerados localmente; part, ``rId`` e o ``wp:inline`` de
+    cada imagem distinta são montados uma vez e copiados. O XML gerado é o
+    mesmo de ``inserir_imagem`` chamado em sequência.
+    """
+
+    def __init__(self, story, width=None, height=None):
+        self.story = story          # Document (ou outro objeto com ``.part``)
+        self.width, self.height = width, height
+        self._proximo_id: int | None = None
+        self._modelos: dict[str, CT_Inline] = {}
+
+    def _modelo(self, imagem: DocxImage) -> CT_Inline:
+        modelo = self._modelos.get(imagem.sha1)
+        if modelo is None:
+            part = self.story.part
+            image_parts = part.package.image_parts
+            image_part = (image_parts._get_by_sha1(imagem.sha1)
+                          or image_parts._add_image_part(imagem))
+            r_id = part.relate_to(image_part, RT.IMAGE)
+            cx, cy = imagem.scaled_dimensions(self.width, self.height)
+            modelo = self._modelos[imagem.sha1] = CT_Inline.new_pic_inline(
+                0, r_id, imagem.filename, cx, cy
+            )
+        return modelo
+
+    def inserir(self, r, item: ImagemCacheada):
+        """Acrescenta a imagem ao ``w:r`` ``r``."""
+        try:
+            modelo = self._modelo(item.imagem)
+        except AttributeError:  # API interna do python-docx mudou
+            Run(r, self.story).add_picture(
+                io.BytesIO(item.imagem.blob), width=self.width, height=self.height
+            )
+            return
+        if self._proximo_id is None:
+            self._proximo_id = self.story.part.next_id
+        inline = copy.deepcopy(modelo)
+        inline.docPr.id = self._proximo_id
+        inline.docPr.name = f"Picture {self._proximo_id}"
+        self._proximo_id += 1
+        r.add_drawing(inline)
+
+
+# --------------------------------------------------------------------------- #
+# Instâncias globais
+# --------------------------------------------------------------------------- #
+index = ImageIndex()
+cache = ImageCache()
+
+
+def resolver(pth) -> str | None:
+    return index.resolver(pth)
+
+
+def carregar(pth) -> ImagemCacheada | None:
+    """Resolve ``pth`` e devolve a imagem em cache (``None`` se não existir)."""
+    path = index.resolver(pth)
+    if path is None:
+        return None
+    item = cache.get(path)
+    if item is None:  # sumiu do disco depois de indexada
+        index.invalidar()
+    return item
+
+
+def invalidar():
+    """Chamado após upload/exclusão de imagens de equipamentos."""
+    index.invalidar()
+    cache.descartar()
+
+
+def init_app(app):
+    cache.max_bytes = int(app.config.get("IMAGE_CACHE_MAX_BYTES", cache.max_bytes))
+    try:
+        with app.app_context():
+            if Equipment.__tablename__ not in inspect(db.engine).get_table_names():
+                return
+            caminhos = [p for (p,) in db.session.query(Equipment._illustration_path) if p]
+            db.session.remove()
+        index.preaquecer(Equipment._normalize_illustration_path(p) for p in caminhos)
+    except Exception:
+        app.logger.exception("Não foi possível indexar as imagens de equipamentos")
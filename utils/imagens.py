@@ -0,0 +1,467 @@
+"""Processamento das imagens de equipamentos fora da requisição.
+
+Decodificar uma foto de celular, reduzir com LANCZOS, compor o letterbox
+160×180 e salvar um PNG otimizado levava centenas de milissegundos dentro
+da requisição de upload. Agora a requisição só confere a extensão e o
+cabeçalho da imagem e grava o arquivo original como veio
+(``IMAGENS_UPLOAD_DIR``); o equipamento passa a apontar para
+``PLACEHOLDER`` com ``imagem_status = "processando"`` e o trabalho pesado
+(``letterbox``) roda num pool de processos.
+
+Quando o processo termina, ``_concluir`` (no processo web) troca o
+placeholder pelo PNG gerado, marca ``pronta`` e só então apaga a imagem
+anterior. Se a imagem não decodificar, o equipamento volta para a imagem
+anterior (``imagem_anterior``) e fica ``falhou``, com a mensagem em
+``imagem_erro``. Um resultado só é aplicado se o equipamento ainda espera
+aquele upload (``imagem_original``): dois uploads seguidos não se
+atropelam. Ao subir a aplicação, imagens ``processando`` há mais de
+``IMAGENS_TIMEOUT`` segundos voltam para a fila.
+
+As imagens processadas são endereçadas pelo conteúdo, em subpastas pelos
+dois primeiros dígitos do hash::
+
+    static/images/<ab>/<abcdef...>.png
+
+Reenviar a mesma foto reaproveita o arquivo existente; por isso um arquivo
+pode ser de mais de um equipamento, e ``remover_se_orfa`` só apaga o que
+nenhum equipamento usa. ``flask imagens deduplicar`` traz as imagens
+antigas para esse layout e ``flask imagens gc`` remove os arquivos gerados
+que ficaram sem dono (e os derivados de imagens que não existem mais).
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import inspect, or_, update
+
+from models import db, Equipment
+from utils import derivados, image_index
+
+
+ALLOWED_EXTS = {"png", "jpg", "jpeg", "webp"}
+TARGET_W, TARGET_H = 160, 180
+PLACEHOLDER = "sem-imagem.png"      # em static/images
+
+PRONTA = "pronta"
+PROCESSANDO = "processando"
+FALHOU = "falhou"
+
+# Nomes que o sistema gera (os demais arquivos de static/images — logos,
+# cabeçalhos… — nunca são apagados): <ab>/<hash>.ext, eq<id>_<uuid>.ext, <uuid>.ext
+_GERADA = re.compile(
+    r"^(?:[0-9a-f]{2}/[0-9a-f]{32}|(?:eq\d*_)?[0-9a-f]{32})\.(?:png|jpe?g|webp)$"
+)
+
+
+def caminho_por_conteudo(dados: bytes, ext: str) -> str:
+    """``<ab>/<hash>.<ext>`` relativo a static/images."""
+    digest = hashlib.sha256(dados).hexdigest()[:32]
+    return f"{digest[:2]}/{digest}.{ext}"
+
+
+def eh_gerada(rel: str | None) -> bool:
+    return bool(rel) and bool(_GERADA.match(rel))
+
+
+# --------------------------------------------------------------------------- #
+# Na requisição: validação leve e gravação do original
+# --------------------------------------------------------------------------- #
+def validar_upload(file_storage) -> str:
+    """Confere extensão e cabeçalho (sem decodificar); devolve a extensão."""
+    if not file_storage or not getattr(file_storage, "filename", ""):
+        raise ValueError("Nenhuma imagem enviada.")
+
+    _, ext = os.path.splitext(file_storage.filename)
+    ext = ext.lower().lstrip(".")
+    if ext not in ALLOWED_EXTS:
+        raise ValueError(
+            "Formato de imagem não aceito. Use PNG, JPG, JPEG ou WEBP."
+        )
+
+    try:
+        with Image.open(file_storage.stream):    # lê só o cabeçalho
+            pass
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValueError("Arquivo de imagem inválido ou corrompido.")
+    finally:
+        file_storage.stream.seek(0)
+    return ext
+
+
+def receber_upload(app, eq: Equipment, file_storage, filename_hint: str = "eq") -> str:
+    """Valida e grava o upload bruto; o equipamento fica com o placeholder.
+
+    Não faz commit nem agenda: quem chama faz o commit (o equipamento novo
+    precisa de id) e depois chama ``agendar``. Devolve o caminho do original.
+    """
+    ext = validar_upload(file_storage)
+    pasta = diretorio_uploads(app)
+    os.makedirs(pasta, exist_ok=True)
+    origem = os.path.join(pasta, f"{filename_hint}_{uuid.uuid4().hex}.{ext}")
+    file_storage.save(origem)
+
+    if eq.illustration_path != PLACEHOLDER:     # upload sobre outro ainda em processamento
+        eq.imagem_anterior = eq.illustration_path
+    eq.illustration_path = PLACEHOLDER
+    eq.imagem_original = origem
+    eq.imagem_status = PROCESSANDO
+    eq.imagem_desde = datetime.utcnow()
+    eq.imagem_erro = None
+    return origem
+
+
+def status_json(eq: Equipment) -> dict:
+    return {
+        "imagem_status": eq.imagem_status or (PRONTA if eq.illustration_path else None),
+        "imagem_erro": eq.imagem_erro,
+    }
+
+
+# --------------------------------------------------------------------------- #
+# No processo filho
+# --------------------------------------------------------------------------- #
+def letterbox(origem: str, destino_dir: str) -> str:
+    """Gera o PNG 160×180 (contain, fundo transparente); devolve o caminho relativo."""
+    try:
+        img = Image.open(origem)
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError("Arquivo de imagem inválido ou corrompido.")
+
+    # Converte para RGBA para manter transparência (se houver)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+
+    # Redimensiona para CABER (contain), sem cortar
+    img.thumbnail((TARGET_W, TARGET_H), Image.LANCZOS)
+    canvas = Image.new("RGBA", (TARGET_W, TARGET_H), (255, 255, 255, 0))
+    off_x = (TARGET_W - img.width) // 2
+    off_y = (TARGET_H - img.height) // 2
+    canvas.paste(img, (off_x, off_y), img if img.mode == "RGBA" else None)
+
+    # PNG compatível com Word/Docx; a mesma foto gera os mesmos bytes e o mesmo nome
+    buf = io.BytesIO()
+    canvas.save(buf, format="PNG", optimize=True)
+    dados = buf.getvalue()
+    rel = caminho_por_conteudo(dados, "png")
+    destino = os.path.join(destino_dir, rel)
+    # Publica sempre, mesmo se o nome já existir: o arquivo antigo pode estar
+    # sendo removido como órfão enquanto este resultado não foi aplicado
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tmp = f"{destino}.{uuid.uuid4().hex}.tmp"     # nunca meio arquivo
+    with open(tmp, "wb") as fh:
+        fh.write(dados)
+    os.replace(tmp, destino)
+    return rel
+
+
+# --------------------------------------------------------------------------- #
+# Pool de processos e conclusão
+# --------------------------------------------------------------------------- #
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+
+def diretorio_imagens(app) -> str:
+    return app.config.get("IMAGENS_DIR") or os.path.join(app.static_folder, "images")
+
+
+def diretorio_uploads(app) -> str:
+    return app.config.get("IMAGENS_UPLOAD_DIR") or os.path.join(
+        app.instance_path, "uploads", "imagens"
+    )
+
+
+def obter_executor(app) -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=int(app.config.get("IMAGENS_PROCESSOS", 2)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def configurar_executor(executor: Executor | None) -> Executor | None:
+    """Troca o executor (ex.: threads nos testes); ``None`` recria o pool no próximo uso."""
+    global _executor
+    with _executor_lock:
+        _executor = executor
+    return executor
+
+
+def agendar(app, eq_id: int, origem: str):
+    futuro = obter_executor(app).submit(letterbox, origem, diretorio_imagens(app))
+    futuro.add_done_callback(functools.partial(_concluir, app, eq_id, origem))
+
+
+def _concluir(app, eq_id: int, origem: str, futuro):
+    """Aplica o resultado do processamento (roda no processo web)."""
+    with app.app_context():
+        try:
+            try:
+                nome, erro = futuro.result(), None
+            except Exception as exc:
+                nome, erro = None, str(exc) or exc.__class__.__name__
+                if not isinstance(exc, ValueError):
+                    app.logger.error("Falha ao processar a imagem %s", origem, exc_info=exc)
+
+            eq = db.session.get(Equipment, eq_id)
+            if eq is None or eq.imagem_original != origem:
+                # equipamento excluído ou novo upload no meio do caminho
+                remover_se_orfa(app, nome)
+                _remover(origem)
+                return
+            anterior = eq.imagem_anterior
+            if nome:
+                eq.illustration_path = nome
+                eq.imagem_status = PRONTA
+                eq.imagem_erro = None
+            else:
+                eq.illustration_path = anterior     # a imagem antiga continua valendo
+                eq.imagem_status = FALHOU
+                eq.imagem_erro = erro[:2000]
+            eq.imagem_original = eq.imagem_anterior = eq.imagem_desde = None
+            db.session.commit()
+            _remover(origem)        # o original só serve até o processamento
+            if nome and anterior != nome:
+                remover_se_orfa(app, anterior)
+            image_index.invalidar()
+            if nome:
+                derivados.gerar(nome)
+        except Exception:
+            app.logger.exception("Não foi possível concluir a imagem do equipamento %s", eq_id)
+        finally:
+            db.session.remove()
+
+
+def _remover(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def remover_se_orfa(app, rel: str | None) -> bool:
+    """Apaga a imagem gerada ``rel`` se nenhum equipamento a usa mais.
+
+    Chamar depois do commit que troca/remove a referência.
+    """
+    rel = Equipment._normalize_illustration_path(rel)
+    if not eh_gerada(rel) or _referenciadas(rel):
+        return False
+    base = os.path.abspath(diretorio_imagens(app))
+    path = os.path.join(base, *rel.split("/"))
+    if not os.path.exists(path):
+        return False
+    _remover(path)
+    pasta = os.path.dirname(path)
+    if pasta != base:
+        try:
+            os.rmdir(pasta)             # subpasta vazia
+        except OSError:
+            pass
+    image_index.invalidar()
+    return True
+
+
+def _referenciadas(rel: str | None = None) -> set[str]:
+    """Caminhos normalizados em uso (só ``rel``, se informado).
+
+    Conta também ``imagem_anterior``: ela volta se o processamento falhar.
+    """
+    usados = set()
+    for coluna in (Equipment._illustration_path, Equipment.imagem_anterior):
+        consulta = db.session.query(coluna).filter(coluna.isnot(None))
+        if rel is not None:
+            consulta = consulta.filter(coluna.like(f"%{os.path.basename(rel)}"))
+        usados.update(Equipment._normalize_illustration_path(p) for (p,) in consulta)
+    return usados & {rel} if rel is not None else usados
+
+
+def _reservar(eq_id: int, origem: str, limite: datetime) -> bool:
+    """Retoma o processamento de ``eq_id`` se ninguém o fez depois de ``limite``."""
+    res = db.session.execute(
+        update(Equipment)
+        .where(Equipment.id == eq_id,
+               Equipment.imagem_status == PROCESSANDO,
+               Equipment.imagem_original == origem,
+               or_(Equipment.imagem_desde.is_(None), Equipment.imagem_desde < limite))
+        .values(imagem_desde=datetime.utcnow())
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def recuperar_pendentes(app) -> int:
+    """Reagenda imagens ``processando`` há mais de ``IMAGENS_TIMEOUT`` segundos.
+
+    Com vários processos web, cada um roda isto ao subir: as imagens que
+    outro processo ainda está tratando são mais novas que o limite, e a
+    retomada é reservada com um ``UPDATE`` condicional (só um processo
+    reagenda cada imagem).
+    """
+    with app.app_context():
+        insp = inspect(db.engine)
+        if not insp.has_table("equipments") or "imagem_desde" not in {
+            c["name"] for c in insp.get_columns("equipments")
+        }:
+            return 0  # migração ainda não aplicada
+        limite = datetime.utcnow() - timedelta(
+            seconds=float(app.config.get("IMAGENS_TIMEOUT", 600))
+        )
+        travadas = [
+            (eq_id, origem)
+            for eq_id, origem in db.session.query(Equipment.id, Equipment.imagem_original)
+            .filter(Equipment.imagem_status == PROCESSANDO,
+                    or_(Equipment.imagem_desde.is_(None), Equipment.imagem_desde < limite))
+        ]
+        reservadas = []
+        for eq_id, origem in travadas:
+            if not _reservar(eq_id, origem, limite):
+                continue            # outro processo pegou antes
+            if origem and os.path.exists(origem):
+                reservadas.append((eq_id, origem))
+                continue
+            eq = db.session.get(Equipment, eq_id)
+            eq.illustration_path = eq.imagem_anterior
+            eq.imagem_status = FALHOU
+            eq.imagem_erro = "Arquivo original não encontrado."
+            eq.imagem_original = eq.imagem_anterior = eq.imagem_desde = None
+            db.session.commit()
+        db.session.remove()
+
+    for eq_id, origem in reservadas:
+        agendar(app, eq_id, origem)
+    return len(reservadas)
+
+
+# --------------------------------------------------------------------------- #
+# Deduplicação e coleta de órfãs
+# --------------------------------------------------------------------------- #
+_SHARD = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{32}\.")
+
+
+def deduplicar(app, simular: bool = False) -> int:
+    """Leva as imagens dos equipamentos para ``<ab>/<hash>.ext``; devolve quantos mudaram.
+
+    Os arquivos antigos ficam onde estão — ``gc`` os remove depois.
+    """
+    base = diretorio_imagens(app)
+    movidos = 0
+    for eq in Equipment.query.filter(Equipment._illustration_path.isnot(None)):
+        rel = eq.illustration_path
+        if not rel or rel == PLACEHOLDER or _SHARD.match(rel):
+            continue
+        origem = image_index.resolver(rel)
+        if origem is None:
+            continue
+        with open(origem, "rb") as fh:
+            dados = fh.read()
+        ext = os.path.splitext(origem)[1].lower().lstrip(".").replace("jpeg", "jpg") or "png"
+        novo = caminho_por_conteudo(dados, ext)
+        movidos += 1
+        if simular:
+            continue
+        destino = os.path.join(base, novo)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            tmp = f"{destino}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(origem, tmp)
+            os.replace(tmp, destino)
+        eq.illustration_path = novo
+    if not simular:
+        db.session.commit()
+        image_index.invalidar()
+    return movidos
+
+
+def coletar_orfas(app, simular: bool = False, idade_minima: float = 3600) -> list[str]:
+    """Remove as imagens geradas que nenhum equipamento usa; devolve os caminhos.
+
+    Arquivos mais novos que ``idade_minima`` segundos ficam (processamento
+    que ainda não fez o commit).
+    """
+    base = os.path.abspath(diretorio_imagens(app))
+    usados = _referenciadas() | {PLACEHOLDER}
+    limite = time.time() - idade_minima
+    orfas = []
+    for raiz, _, arquivos in os.walk(base):
+        for nome in arquivos:
+            path = os.path.join(raiz, nome)
+            rel = os.path.relpath(path, base).replace(os.sep, "/")
+            if not eh_gerada(rel) or rel in usados:
+                continue
+            try:
+                if os.path.getmtime(path) > limite:
+                    continue
+            except OSError:
+                continue
+            orfas.append(rel)
+            if not simular:
+                _remover(path)
+
+    if not simular and orfas:
+        for raiz, _, _ in os.walk(base, topdown=False):
+            if raiz != base:
+                try:
+                    os.rmdir(raiz)      # só sai se estiver vazia
+                except OSError:
+                    pass
+        image_index.invalidar()
+    return sorted(orfas)
+
+
+imagens_cli = AppGroup("imagens", help="Imagens dos equipamentos (static/images).")
+
+
+@imagens_cli.command("deduplicar")
+@click.option("--dry-run", is_flag=True, help="Só mostra quantas imagens mudariam.")
+def deduplicar_comando(dry_run):
+    """Move as imagens em uso para o layout por hash (arquivos iguais viram um)."""
+    n = deduplicar(current_app._get_current_object(), simular=dry_run)
+    click.echo(f"{n} equipamento(s) {'seriam apontados' if dry_run else 'apontados'} "
+               "para o layout por hash.")
+
+
+@imagens_cli.command("gc")
+@click.option("--dry-run", is_flag=True, help="Lista o que seria removido sem apagar nada.")
+@click.option("--idade-minima", default=3600, show_default=True,
+              help="Segundos: arquivos mais novos que isso são mantidos.")
+def gc_comando(dry_run, idade_minima):
+    """Remove imagens geradas (e derivados) que nenhum equipamento usa."""
+    app = current_app._get_current_object()
+    orfas = coletar_orfas(app, simular=dry_run, idade_minima=idade_minima)
+    for rel in orfas:
+        click.echo(rel)
+    em_uso = [p for p in _referenciadas() if p]
+    extras = derivados.coletar(em_uso, simular=dry_run, idade_minima=idade_minima)
+    verbo = "seriam removidos" if dry_run else "removidos"
+    click.echo(f"{len(orfas)} imagem(ns) e {extras} derivado(s) {verbo}.")
+
+
+def init_app(app):
+    app.cli.add_command(imagens_cli)
+    if not app.config.get("IMAGENS_RECUPERAR", True):
+        return
+    try:
+        recuperar_pendentes(app)
+    except Exception:
+        app.logger.exception("Não foi possível recuperar imagens pendentes")
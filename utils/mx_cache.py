@@ -0,0 +1,238 @@
+"""Cache das consultas MX usadas para validar o e-mail das propostas.
+
+``email_domain_has_mx`` consultava o DNS a cada envio do formulário, sem
+limite de tempo e sem cache — e os domínios dos clientes se repetem muito.
+``CacheMX`` guarda cada resposta pelo TTL do próprio registro (limitado a
+``ttl_min``/``ttl_max``) e as respostas negativas (NXDOMAIN, domínio sem
+MX ou só com o "null MX" da RFC 7505) por ``ttl_negativo``. Falhas do
+resolvedor (timeout, servidores sem resposta) não entram no cache.
+
+São dois níveis: um LRU em memória e, opcionalmente, um arquivo SQLite
+compartilhado entre os workers (``MX_CACHE_DB``) — o que um processo
+resolve os outros já encontram pronto. A rota ``/api/mx/<dominio>`` deixa
+o formulário aquecer o cache enquanto o usuário digita.
+
+O resolvedor é injetável (``resolver=``): qualquer objeto com
+``resolve(nome, "MX", lifetime=...)`` no formato do ``dns.resolver``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import dns.exception
+import dns.resolver
+
+
+DOMINIO_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z0-9-]{2,63}$")
+
+
+@dataclass
+class ResultadoMX:
+    dominio: str
+    tem_mx: bool
+    hosts: list[str] = field(default_factory=list)
+    expira_em: float = 0.0          # time.time(); 0 = não cacheado
+    origem: str = "dns"             # "memoria", "compartilhado" ou "dns"
+    erro: str | None = None         # falha do resolvedor (resultado não cacheado)
+
+    def to_json(self) -> dict:
+        return {
+            "dominio": self.dominio,
+            "mx": self.tem_mx,
+            "hosts": self.hosts,
+            "ttl": max(0, int(self.expira_em - time.time())) if self.expira_em else 0,
+            "origem": self.origem,
+            "erro": self.erro,
+        }
+
+
+def normalizar_dominio(valor: str) -> str | None:
+    """Domínio em minúsculas/IDNA a partir de um e-mail ou domínio; ``None`` se inválido."""
+    dominio = (valor or "").rsplit("@", 1)[-1].strip().rstrip(".").lower()
+    try:
+        dominio = dominio.encode("idna").decode("ascii")
+    except UnicodeError:
+        return None
+    return dominio if DOMINIO_RE.match(dominio) else None
+
+
+class CacheMX:
+    def __init__(self, path: str | None = None, *, resolver=None, timeout: float = 2.0,
+                 lifetime: float = 4.0, ttl_min: float = 60, ttl_max: float = 86400,
+                 ttl_negativo: float = 300, max_memoria: int = 4096):
+        self.path = path
+        self.timeout = float(timeout)
+        self.lifetime = float(lifetime)
+        self.ttl_min = float(ttl_min)
+        self.ttl_max = float(ttl_max)
+        self.ttl_negativo = float(ttl_negativo)
+        self.max_memoria = int(max_memoria)
+        self._resolver = resolver
+        self._lock = threading.Lock()
+        self._memoria: OrderedDict[str, ResultadoMX] = OrderedDict()
+        self._tabela_criada = False
+
+    # ------------------------------------------------------------------ #
+    # Níveis do cache
+    # ------------------------------------------------------------------ #
+    @contextmanager
+    def _banco(self):
+        if not self._tabela_criada:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with con:
+                if not self._tabela_criada:
+                    con.execute(
+                        "CREATE TABLE IF NOT EXISTS mx_cache ("
+                        " dominio TEXT PRIMARY KEY, hosts TEXT NOT NULL, expira_em REAL NOT NULL)"
+                    )
+                    self._tabela_criada = True
+                yield con
+        finally:
+            con.close()
+
+    def _da_memoria(self, dominio: str, agora: float) -> ResultadoMX | None:
+        with self._lock:
+            res = self._memoria.get(dominio)
+            if res is None:
+                return None
+            if res.expira_em <= agora:
+                del self._memoria[dominio]
+                return None
+            self._memoria.move_to_end(dominio)
+            return res
+
+    def _na_memoria(self, res: ResultadoMX):
+        with self._lock:
+            self._memoria[res.dominio] = res
+            self._memoria.move_to_end(res.dominio)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _do_compartilhado(self, dominio: str, agora: float) -> ResultadoMX | None:
+        if not self.path:
+            return None
+        try:
+            with self._banco() as con:
+                linha = con.execute(
+                    "SELECT hosts, expira_em FROM mx_cache WHERE dominio = ? AND expira_em > ?",
+                    (dominio, agora),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if linha is None:
+            return None
+        hosts = json.loads(linha[0])
+        return ResultadoMX(dominio, bool(hosts), hosts, linha[1], "compartilhado")
+
+    def _no_compartilhado(self, res: ResultadoMX):
+        if not self.path:
+            return
+        try:
+            with self._banco() as con:
+                con.execute(
+                    "INSERT OR REPLACE INTO mx_cache (dominio, hosts, expira_em) VALUES (?, ?, ?)",
+                    (res.dominio, json.dumps(res.hosts), res.expira_em),
+                )
+        except sqlite3.Error:
+            pass  # o cache compartilhado é só uma otimização
+
+    # ------------------------------------------------------------------ #
+    # DNS
+    # ------------------------------------------------------------------ #
+    @property
+    def resolver(self):
+        if self._resolver is None:
+            r = dns.resolver.Resolver()
+            r.timeout, r.lifetime = self.timeout, self.lifetime
+            self._resolver = r
+        return self._resolver
+
+    def _resolver_dns(self, dominio: str, agora: float) -> ResultadoMX:
+        try:
+            resposta = self.resolver.resolve(dominio, "MX", lifetime=self.lifetime)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return ResultadoMX(dominio, False, [], agora + self.ttl_negativo)
+        except dns.exception.DNSException as exc:
+            return ResultadoMX(dominio, False, [], 0.0, erro=exc.__class__.__name__)
+
+        registros = sorted(resposta, key=lambda r: r.preference)
+        hosts = [str(r.exchange).rstrip(".") for r in registros]
+        hosts = [h for h in hosts if h]          # "null MX" (RFC 7505): não recebe e-mail
+        if not hosts:
+            return ResultadoMX(dominio, False, [], agora + self.ttl_negativo)
+        ttl = min(max(float(resposta.rrset.ttl), self.ttl_min), self.ttl_max)
+        return ResultadoMX(dominio, True, hosts, agora + ttl)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def consultar(self, dominio: str) -> ResultadoMX:
+        agora = time.time()
+        res = self._da_memoria(dominio, agora)
+        if res is not None:
+            return ResultadoMX(res.dominio, res.tem_mx, res.hosts, res.expira_em, "memoria")
+
+        res = self._do_compartilhado(dominio, agora)
+        if res is None:
+            res = self._resolver_dns(dominio, agora)
+            if res.expira_em:
+                self._no_compartilhado(res)
+        if res.expira_em:
+            self._na_memoria(res)
+        return res
+
+    def limpar(self):
+        with self._lock:
+            self._memoria.clear()
+        if self.path:
+            try:
+                with self._banco() as con:
+                    con.execute("DELETE FROM mx_cache")
+            except sqlite3.Error:
+                pass
+
+
+_cache: CacheMX | None = None
+
+
+def obter_cache() -> CacheMX:
+    global _cache
+    if _cache is None:
+        _cache = CacheMX()
+    return _cache
+
+
+def configurar_cache(cache: CacheMX | None) -> CacheMX | None:
+    global _cache
+    _cache = cache
+    return cache
+
+
+def dominio_tem_mx(email_ou_dominio: str) -> bool:
+    dominio = normalizar_dominio(email_ou_dominio)
+    return bool(dominio) and obter_cache().consultar(dominio).tem_mx
+
+
+def init_app(app):
+    path = app.config.get("MX_CACHE_DB")
+    if path is None:
+        path = os.path.join(app.instance_path, "mx_cache.sqlite")
+    return configurar_cache(CacheMX(
+        path or None,
+        timeout=app.config.get("MX_TIMEOUT", 2.0),
+        lifetime=app.config.get("MX_LIFETIME", 4.0),
+        ttl_min=app.config.get("MX_TTL_MIN", 60),
+        ttl_max=app.config.get("MX_TTL_MAX", 86400),
+        ttl_negativo=app.config.get("MX_TTL_NEGATIVO", 300),
+    ))
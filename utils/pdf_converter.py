@@ -0,0 +1,410 @@
+"""Pool de conversores DOCX → PDF baseados no LibreOffice headless.
+
+Cada worker possui o próprio diretório de perfil (``-env:UserInstallation``),
+de modo que conversões concorrentes não disputam o mesmo perfil. Quando o
+módulo ``uno`` (pyuno) está disponível, o worker mantém um ``soffice``
+residente e converte pela ponte UNO, sem pagar a partida do LibreOffice a
+cada PDF. Sem ``uno``, o worker cai para ``soffice --convert-to`` usando o
+perfil já aquecido.
+
+Os arquivos temporários de cada conversão (DOCX de entrada, PDF de saída)
+ficam em ``PDF_POOL_IO_DIR`` — por padrão ``/dev/shm`` (tmpfs) quando
+existe, para que o LibreOffice leia e grave em memória e não no disco.
+
+O pool:
+    • é dimensionado por configuração (``PDF_POOL_SIZE``);
+    • aquece os workers na inicialização (``PDF_POOL_WARMUP``);
+    • recicla um worker após ``PDF_POOL_MAX_CONVERSOES`` conversões ou
+      quando uma conversão falha (timeout, ``soffice`` que caiu etc.).
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+try:  # pyuno vem com o LibreOffice (python3-uno no Debian/Ubuntu)
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+    _UNO_AVAILABLE = True
+except ImportError:
+    uno = None
+    PropertyValue = None
+    _UNO_AVAILABLE = False
+
+
+class ConversionError(RuntimeError):
+    """Falha ao converter DOCX → PDF."""
+
+
+class ConversionTimeout(ConversionError):
+    """A conversão (ou a espera por um worker livre) excedeu o tempo limite."""
+
+
+MSG_SEM_LIBREOFFICE = (
+    "Conversão para PDF indisponível. Instale o LibreOffice e a ponte UNO:\n"
+    "sudo apt-get install -y libreoffice-core libreoffice-writer python3-uno\n"
+    "(num virtualenv, crie-o com --system-site-packages para enxergar o uno)"
+)
+
+MSG_SEM_UNO = (
+    "Módulo uno (python3-uno) não encontrado: cada PDF vai iniciar um soffice "
+    "novo (--convert-to). Instale python3-uno e, num virtualenv, use "
+    "--system-site-packages."
+)
+
+
+def _soffice_bin():
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def diretorio_io_padrao() -> str | None:
+    """``/dev/shm`` (tmpfs) se disponível e gravável; senão ``None``."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK | os.X_OK):
+        return shm
+    return None
+
+
+def _perfil_url(path: str) -> str:
+    return "file://" + os.path.abspath(path).replace("\\", "/")
+
+
+# --------------------------------------------------------------------------- #
+# Workers
+# --------------------------------------------------------------------------- #
+class _Worker:
+    """Interface comum: ``start``/``stop``/``convert`` e contagem de uso."""
+
+    def __init__(self, idx: int, soffice: str, base_dir: str, io_dir: str | None = None):
+        self.idx = idx
+        self.soffice = soffice
+        self.dir = os.path.join(base_dir, f"worker{idx}")
+        self.profile_dir = os.path.join(self.dir, "perfil")
+        # cada conversão usa um TemporaryDirectory próprio dentro de io_dir
+        self.io_dir = io_dir or os.path.join(self.dir, "io")
+        self.conversoes = 0
+        self.ativo = False
+
+    def _base_cmd(self):
+        return [
+            self.soffice,
+            f"-env:UserInstallation={_perfil_url(self.profile_dir)}",
+            "--headless", "--invisible", "--nologo",
+            "--norestore", "--nodefault", "--nolockcheck",
+        ]
+
+    def start(self, timeout: float):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        os.makedirs(self.io_dir, exist_ok=True)
+        self.conversoes = 0
+        self.ativo = True
+
+    def stop(self):
+        self.ativo = False
+
+    def convert(self, docx_bytes: bytes, timeout: float) -> bytes:
+        raise NotImplementedError
+
+
+class _CliWorker(_Worker):
+    """Um ``soffice --convert-to`` por PDF, com perfil isolado e aquecido."""
+
+    def start(self, timeout: float):
+        primeira_vez = not os.path.isdir(self.profile_dir)
+        super().start(timeout)
+        if primeira_vez:
+            # a 1ª execução cria o perfil — é a parte mais lenta da partida
+            try:
+                subprocess.run(
+                    self._base_cmd() + ["--terminate_after_init"],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    timeout=timeout,
+                )
+            except subprocess.TimeoutExpired:
+                pass
+
+    def convert(self, docx_bytes: bytes, timeout: float) -> bytes:
+        with tempfile.TemporaryDirectory(dir=self.io_dir) as tmp:
+            src = os.path.join(tmp, "proposta.docx")
+            with open(src, "wb") as fp:
+                fp.write(docx_bytes)
+            cmd = self._base_cmd() + [
+                "--convert-to", "pdf:writer_pdf_Export", "--outdir", tmp, src,
+            ]
+            try:
+                proc = subprocess.run(
+                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    timeout=timeout,
+                )
+            except subprocess.TimeoutExpired as exc:
+                raise ConversionTimeout(
+                    f"LibreOffice não respondeu em {timeout:.0f}s."
+                ) from exc
+            pdf = os.path.join(tmp, "proposta.pdf")
+            if proc.returncode != 0 or not os.path.exists(pdf):
+                raise ConversionError(
+                    "Falha ao converter DOCX → PDF via LibreOffice.\n"
+                    f"stdout:\n{proc.stdout.decode(errors='ignore')}\n\n"
+                    f"stderr:\n{proc.stderr.decode(errors='ignore')}"
+                )
+            self.conversoes += 1
+            with open(pdf, "rb") as fp:
+                return fp.read()
+
+
+class _UnoWorker(_Worker):
+    """``soffice`` residente, acessado pela ponte UNO via pipe nomeado."""
+
+    def __init__(self, idx, soffice, base_dir, io_dir=None):
+        super().__init__(idx, soffice, base_dir, io_dir)
+        self.pipe = f"propostas_{os.getpid()}_{idx}_{uuid.uuid4().hex[:8]}"
+        self.proc = None
+        self.desktop = None
+
+    def start(self, timeout: float):
+        super().start(timeout)
+        self.proc = subprocess.Popen(
+            self._base_cmd() + [
+                f"--accept=pipe,name={self.pipe};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local
+        )
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f"uno:pipe,name={self.pipe};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.monotonic() > limite:
+                    self.stop()
+                    raise ConversionError("Não foi possível iniciar o LibreOffice.")
+                time.sleep(0.2)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", ctx
+        )
+
+    def stop(self):
+        super().stop()
+        self.desktop = None
+        proc, self.proc = self.proc, None
+        if proc and proc.poll() is None:
+            proc.kill()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+
+    @staticmethod
+    def _props(**kwargs):
+        props = []
+        for nome, valor in kwargs.items():
+            pv = PropertyValue()
+            pv.Name, pv.Value = nome, valor
+            props.append(pv)
+        return tuple(props)
+
+    def _converter_arquivo(self, src: str, dst: str):
+        doc = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(src), "_blank", 0, self._props(Hidden=True)
+        )
+        try:
+            doc.storeToURL(
+                uno.systemPathToFileUrl(dst),
+                self._props(FilterName="writer_pdf_Export"),
+            )
+        finally:
+            doc.close(True)
+
+    def convert(self, docx_bytes: bytes, timeout: float) -> bytes:
+        with tempfile.TemporaryDirectory(dir=self.io_dir) as tmp:
+            src = os.path.join(tmp, "proposta.docx")
+            dst = os.path.join(tmp, "proposta.pdf")
+            with open(src, "wb") as fp:
+                fp.write(docx_bytes)
+
+            erro = []
+
+            def _run():
+                try:
+                    self._converter_arquivo(src, dst)
+                except Exception as exc:  # propaga para a thread chamadora
+                    erro.append(exc)
+
+            t = threading.Thread(target=_run, daemon=True)
+            t.start()
+            t.join(timeout)
+            if t.is_alive():
+                # travou: derruba o processo (a chamada UNO aborta junto)
+                self.stop()
+                raise ConversionTimeout(f"LibreOffice não respondeu em {timeout:.0f}s.")
+            if erro:
+                raise ConversionError(f"Falha ao converter DOCX → PDF: {erro[0]}") from erro[0]
+
+            self.conversoes += 1
+            with open(dst, "rb") as fp:
+                return fp.read()
+
+
+# --------------------------------------------------------------------------- #
+# Pool
+# --------------------------------------------------------------------------- #
+class ConverterPool:
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        max_conversoes: int = 200,
+        timeout: float = 60.0,
+        base_dir: str | None = None,
+        io_dir: str | None = None,
+        soffice: str | None = None,
+        worker_cls=None,
+    ):
+        self.size = max(1, int(size))
+        self.max_conversoes = max(1, int(max_conversoes))
+        self.timeout = float(timeout)
+        self.base_dir = base_dir or os.path.join(tempfile.gettempdir(), "propostas_soffice")
+        self.io_dir = io_dir
+        self.soffice = soffice
+        self.worker_cls = worker_cls or (_UnoWorker if _UNO_AVAILABLE else _CliWorker)
+        self._livres: queue.Queue = queue.Queue()
+        self._workers: list = []
+        self._lock = threading.Lock()
+
+    def _criar_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            soffice = self.soffice or _soffice_bin()
+            if not soffice:
+                raise ConversionError(MSG_SEM_LIBREOFFICE)
+            self._workers = [
+                self.worker_cls(i, soffice, self.base_dir, self._io_dir(i))
+                for i in range(self.size)
+            ]
+            for w in self._workers:
+                self._livres.put(w)
+
+    def _io_dir(self, idx: int) -> str | None:
+        if not self.io_dir:
+            return None
+        return os.path.join(self.io_dir, f"propostas_{os.getpid()}_worker{idx}")
+
+    def start(self):
+        """Cria e aquece todos os workers (chamado no boot da aplicação)."""
+        self._criar_workers()
+        pegos = []
+        try:
+            for _ in range(self.size):
+                w = self._livres.get(timeout=self.timeout)
+                pegos.append(w)
+                if not w.ativo:
+                    w.start(self.timeout)
+        finally:
+            for w in pegos:
+                self._livres.put(w)
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        self._criar_workers()
+        try:
+            worker = self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ConversionTimeout("Nenhum conversor de PDF livre no momento.") from None
+
+        try:
+            if not worker.ativo:
+                worker.start(self.timeout)
+            try:
+                return worker.convert(docx_bytes, self.timeout)
+            except Exception:
+                # travado ou morto: um soffice residente que caiu faria todas
+                # as conversões seguintes deste worker falharem
+                worker.stop()  # reinicia na próxima vez
+                raise
+            finally:
+                if worker.ativo and worker.conversoes >= self.max_conversoes:
+                    worker.stop()
+        finally:
+            self._livres.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for w in self._workers:
+                try:
+                    w.stop()
+                except Exception:
+                    pass
+                if self.io_dir:
+                    shutil.rmtree(w.io_dir, ignore_errors=True)
+            self._workers = []
+            self._livres = queue.Queue()
+
+
+_pool: ConverterPool | None = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool() -> ConverterPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConverterPool()
+        return _pool
+
+
+def configurar_pool(pool: ConverterPool) -> ConverterPool:
+    """Troca o pool global (encerrando o anterior)."""
+    global _pool
+    with _pool_lock:
+        antigo, _pool = _pool, pool
+    if antigo is not None and antigo is not pool:
+        antigo.shutdown()
+    return pool
+
+
+def converter_docx_para_pdf(docx_bytes: bytes) -> bytes:
+    """Converte o conteúdo de um DOCX em bytes de PDF usando o pool global."""
+    return obter_pool().convert(docx_bytes)
+
+
+def init_app(app):
+    """Configura o pool a partir de ``app.config`` e aquece em segundo plano."""
+    pool = configurar_pool(ConverterPool(
+        app.config.get("PDF_POOL_SIZE", 2),
+        max_conversoes=app.config.get("PDF_POOL_MAX_CONVERSOES", 200),
+        timeout=app.config.get("PDF_POOL_TIMEOUT", 60),
+        base_dir=app.config.get("PDF_POOL_DIR"),
+        io_dir=app.config.get("PDF_POOL_IO_DIR"),
+    ))
+    if pool.worker_cls is _CliWorker and _soffice_bin():
+        app.logger.warning(MSG_SEM_UNO)
+    if app.config.get("PDF_POOL_WARMUP") and _soffice_bin():
+        threading.Thread(target=_aquecer, args=(pool, app.logger), daemon=True).start()
+    return pool
+
+
+def _aquecer(pool: ConverterPool, logger):
+    try:
+        pool.start()
+    except Exception:
+        logger.exception("Falha ao aquecer o pool de conversão PDF")
+
+
+@atexit.register
+def _encerrar():
+    if _pool is not None:
+        _pool.shutdown()
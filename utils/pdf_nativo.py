@@ -0,0 +1,842 @@
+"""Renderizador de PDF nativo (sem LibreOffice) para o layout padrão.
+
+Desenha direto em PDF o documento já preenchido (``{{ campos }}``
+substituídos no clone do template) e a tabela de investimento, com as
+mesmas regras de ``gerar_proposta`` (``_fmt``, coluna de desconto,
+imagens). Não há dependências além do Pillow, já usado no projeto:
+
+    • texto em Helvetica/Helvetica-Bold (fontes padrão do PDF, WinAnsi),
+      com quebra de linha, alinhamento, recuos e espaçamentos do DOCX;
+    • imagens dos equipamentos e do template (JPEG é embutido sem
+      recodificar; os demais formatos viram RGB + máscara alfa);
+    • links (ex.: WhatsApp) viram anotações clicáveis;
+    • tabela de investimento com cabeçalho repetido a cada página.
+
+É uma aproximação do layout do Word — por isso o uso é escolhido por
+template pelo administrador (ver ``utils.renderizadores``); o caminho via
+LibreOffice continua sendo o padrão e o fallback em caso de erro.
+"""
+
+from __future__ import annotations
+
+import io
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Length
+from docx.text.paragraph import Paragraph
+from PIL import Image
+
+
+class RenderizacaoNativaError(RuntimeError):
+    """O documento usa algo que o renderizador nativo não suporta."""
+
+
+EMU_POR_PT = 12700
+PADDING_CELULA = 5.4     # margem interna padrão das células do Word (0,08")
+ESPESSURA_GRADE = 0.5
+
+# Larguras (1/1000 em) dos caracteres 32..255 em WinAnsi (AFM padrão Adobe)
+_LARGURAS_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 350,
+    556, 350, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 350, 611, 350,
+    350, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 350, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+_LARGURAS_HELVETICA_BOLD = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584, 350,
+    556, 350, 278, 556, 500, 1000, 556, 556, 333, 1000, 667, 333, 1000, 350, 611, 350,
+    350, 278, 278, 500, 500, 350, 556, 1000, 333, 1000, 556, 333, 944, 350, 500, 667,
+    278, 333, 556, 556, 556, 556, 280, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 611, 556, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    722, 722, 722, 722, 722, 722, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 556, 556, 556, 556, 556, 278, 278, 278, 278,
+    611, 611, 611, 611, 611, 611, 611, 584, 611, 611, 611, 611, 611, 556, 611, 556,
+)
+_FONTES = {False: ("F1", _LARGURAS_HELVETICA), True: ("F2", _LARGURAS_HELVETICA_BOLD)}
+
+
+def _codificar(texto: str) -> bytes:
+    return texto.encode("cp1252", errors="replace")
+
+
+def largura_texto(texto: str, negrito: bool, tamanho: float) -> float:
+    larguras = _FONTES[bool(negrito)][1]
+    total = 0
+    for b in _codificar(texto):
+        if b >= 32:
+            total += larguras[b - 32]
+    return total * tamanho / 1000.0
+
+
+def _escapar(dados: bytes) -> bytes:
+    return dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _num(v: float) -> str:
+    return f"{v:.2f}".rstrip("0").rstrip(".") or "0"
+
+
+# --------------------------------------------------------------------------- #
+# Imagens (codificadas uma vez por processo, indexadas pelo SHA-1)
+# --------------------------------------------------------------------------- #
+@dataclass(frozen=True)
+class _ImagemPdf:
+    largura_px: int
+    altura_px: int
+    filtro: str
+    espaco_cor: str
+    dados: bytes
+    mascara: bytes | None = None
+
+
+_imagens_cache: OrderedDict[str, _ImagemPdf] = OrderedDict()
+_imagens_lock = threading.Lock()
+_MAX_IMAGENS_CACHE = 256
+
+
+def _preparar_imagem(blob: bytes, chave: str) -> _ImagemPdf:
+    with _imagens_lock:
+        pronta = _imagens_cache.get(chave)
+        if pronta is not None:
+            _imagens_cache.move_to_end(chave)
+            return pronta
+
+    img = Image.open(io.BytesIO(blob))
+    if img.format == "JPEG" and img.mode in ("RGB", "L"):
+        pronta = _ImagemPdf(
+            img.width, img.height, "DCTDecode",
+            "DeviceRGB" if img.mode == "RGB" else "DeviceGray", blob,
+        )
+    else:
+        mascara = None
+        if img.mode in ("RGBA", "LA", "P") or "transparency" in img.info:
+            rgba = img.convert("RGBA")
+            alfa = rgba.getchannel("A")
+            if alfa.getextrema() != (255, 255):
+                mascara = zlib.compress(alfa.tobytes(), 6)
+            img = rgba.convert("RGB")
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        pronta = _ImagemPdf(
+            img.width, img.height, "FlateDecode", "DeviceRGB",
+            zlib.compress(img.tobytes(), 6), mascara,
+        )
+
+    with _imagens_lock:
+        _imagens_cache[chave] = pronta
+        while len(_imagens_cache) > _MAX_IMAGENS_CACHE:
+            _imagens_cache.popitem(last=False)
+    return pronta
+
+
+# --------------------------------------------------------------------------- #
+# Escrita do arquivo PDF
+# --------------------------------------------------------------------------- #
+@dataclass
+class _Pagina:
+    largura: float
+    altura: float
+    fundo: list = field(default_factory=list)      # desenhos atrás do texto
+    conteudo: list = field(default_factory=list)
+    links: list = field(default_factory=list)      # (x0, y0, x1, y1, url)
+    imagens: dict = field(default_factory=dict)    # nome → chave
+
+
+class PdfWriter:
+    def __init__(self):
+        self.paginas: list[_Pagina] = []
+        self._imagens: dict[str, tuple[str, _ImagemPdf]] = {}
+
+    def nova_pagina(self, largura: float, altura: float) -> _Pagina:
+        pagina = _Pagina(largura, altura)
+        self.paginas.append(pagina)
+        return pagina
+
+    def registrar_imagem(self, blob: bytes, chave: str) -> tuple[str, _ImagemPdf]:
+        if chave not in self._imagens:
+            self._imagens[chave] = (f"Im{len(self._imagens) + 1}", _preparar_imagem(blob, chave))
+        return self._imagens[chave]
+
+    def salvar(self) -> bytes:
+        objetos: list[bytes | None] = [None, None]  # 1 = catálogo, 2 = árvore de páginas
+
+        def novo(corpo: bytes | None = None) -> int:
+            objetos.append(corpo)
+            return len(objetos)
+
+        f1 = novo(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                  b"/Encoding /WinAnsiEncoding >>")
+        f2 = novo(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+                  b"/Encoding /WinAnsiEncoding >>")
+
+        xobjs = {}
+        for chave, (nome, img) in self._imagens.items():
+            smask = ""
+            if img.mascara is not None:
+                m = novo(
+                    b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                    b"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+                    b"/Length %d >>\nstream\n" % (img.largura_px, img.altura_px, len(img.mascara))
+                    + img.mascara + b"\nendstream"
+                )
+                smask = f" /SMask {m} 0 R"
+            xobjs[nome] = novo(
+                (f"<< /Type /XObject /Subtype /Image /Width {img.largura_px} "
+                 f"/Height {img.altura_px} /ColorSpace /{img.espaco_cor} "
+                 f"/BitsPerComponent 8 /Filter /{img.filtro}{smask} "
+                 f"/Length {len(img.dados)} >>\nstream\n").encode("ascii")
+                + img.dados + b"\nendstream"
+            )
+
+        kids = []
+        for pagina in self.paginas:
+            stream = zlib.compress("\n".join(pagina.fundo + pagina.conteudo).encode("latin-1"), 6)
+            cont = novo(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+                        + stream + b"\nendstream")
+            annots = []
+            for x0, y0, x1, y1, url in pagina.links:
+                uri = _escapar(url.encode("latin-1", errors="replace")).decode("latin-1")
+                annots.append(novo(
+                    (f"<< /Type /Annot /Subtype /Link /Rect [{_num(x0)} {_num(y0)} "
+                     f"{_num(x1)} {_num(y1)}] /Border [0 0 0] "
+                     f"/A << /S /URI /URI ({uri}) >> >>").encode("latin-1")
+                ))
+            xo = " ".join(f"/{n} {xobjs[n]} 0 R" for n in sorted(pagina.imagens))
+            anot = f" /Annots [{' '.join(f'{a} 0 R' for a in annots)}]" if annots else ""
+            kids.append(novo(
+                (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(pagina.largura)} "
+                 f"{_num(pagina.altura)}] /Resources << /Font << /F1 {f1} 0 R /F2 {f2} 0 R >> "
+                 f"/XObject << {xo} >> >> /Contents {cont} 0 R{anot} >>").encode("latin-1")
+            ))
+
+        objetos[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        objetos[1] = (f"<< /Type /Pages /Count {len(kids)} "
+                      f"/Kids [{' '.join(f'{k} 0 R' for k in kids)}] >>").encode("ascii")
+
+        out = io.BytesIO()
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, corpo in enumerate(objetos, start=1):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n" % i + corpo + b"\nendobj\n")
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for off in offsets:
+            out.write(b"%010d 00000 n \n" % off)
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                  % (len(objetos) + 1, xref))
+        return out.getvalue()
+
+
+# --------------------------------------------------------------------------- #
+# Estilos do DOCX
+# --------------------------------------------------------------------------- #
+def _pt(valor) -> float | None:
+    return None if valor is None else valor / EMU_POR_PT
+
+
+def _na_cadeia(estilo, obter):
+    while estilo is not None:
+        valor = obter(estilo)
+        if valor is not None:
+            return valor
+        estilo = estilo.base_style
+    return None
+
+
+class _Estilos:
+    """Resolve tamanho, negrito e espaçamentos seguindo a herança do Word."""
+
+    def __init__(self, doc):
+        self.tamanho, self.antes, self.depois, self.linha = 11.0, 0.0, 0.0, 1.0
+        padroes = doc.styles.element.find(qn("w:docDefaults"))
+        if padroes is not None:
+            sz = padroes.find(f"{qn('w:rPrDefault')}/{qn('w:rPr')}/{qn('w:sz')}")
+            if sz is not None:
+                self.tamanho = int(sz.get(qn("w:val"))) / 2
+            esp = padroes.find(f"{qn('w:pPrDefault')}/{qn('w:pPr')}/{qn('w:spacing')}")
+            if esp is not None:
+                self.antes = int(esp.get(qn("w:before"), 0)) / 20
+                self.depois = int(esp.get(qn("w:after"), 0)) / 20
+                if esp.get(qn("w:lineRule"), "auto") == "auto" and esp.get(qn("w:line")):
+                    self.linha = int(esp.get(qn("w:line"))) / 240
+        normal = _na_cadeia(doc.styles["Normal"], lambda s: s.font.size) \
+            if "Normal" in doc.styles else None
+        self.tamanho_normal = self.tamanho if normal is None else _pt(normal)
+        self._doc = doc
+        self._cache = {}
+        self._estilos = {}
+        self._formatos = {}
+
+    def estilo(self, paragrafo):
+        """Estilo do parágrafo, resolvido uma vez por id (``p.style`` é lento)."""
+        style_id = paragrafo._p.style
+        if style_id not in self._estilos:
+            self._estilos[style_id] = paragrafo.style
+        return self._estilos[style_id]
+
+    def fonte(self, run, paragrafo) -> tuple[bool, float]:
+        negrito = run.font.bold
+        tamanho = run.font.size
+        if negrito is None or tamanho is None:
+            rpr = run._r.rPr
+            r_estilo = rpr.rStyle.val if rpr is not None and rpr.rStyle is not None else None
+            chave = (paragrafo._p.style, r_estilo)
+            herdado = self._cache.get(chave)
+            if herdado is None:
+                estilos = [run.style, self.estilo(paragrafo)] if r_estilo else [self.estilo(paragrafo)]
+                h_neg = h_tam = None
+                for est in estilos:
+                    if h_neg is None:
+                        h_neg = _na_cadeia(est, lambda s: s.font.bold)
+                    if h_tam is None:
+                        h_tam = _na_cadeia(est, lambda s: s.font.size)
+                herdado = self._cache[chave] = (
+                    bool(h_neg), _pt(h_tam) if h_tam is not None else self.tamanho,
+                )
+            negrito = herdado[0] if negrito is None else negrito
+            tamanho = herdado[1] if tamanho is None else _pt(tamanho)
+        else:
+            tamanho = _pt(tamanho)
+        return bool(negrito), float(tamanho)
+
+    _ATRIBUTOS = (
+        "alignment", "space_before", "space_after", "line_spacing", "left_indent",
+        "right_indent", "first_line_indent", "page_break_before",
+    )
+
+    def paragrafo(self, p) -> dict:
+        pf = p.paragraph_format
+        style_id = p._p.style
+        do_estilo = self._formatos.get(style_id)
+        if do_estilo is None:
+            estilo = self.estilo(p)
+            do_estilo = self._formatos[style_id] = {
+                nome: _na_cadeia(estilo, lambda s, n=nome: getattr(s.paragraph_format, n))
+                for nome in self._ATRIBUTOS
+            }
+
+        def valor(nome):
+            v = getattr(pf, nome) if p._p.pPr is not None else None
+            return do_estilo[nome] if v is None else v
+
+        antes, depois, linha = valor("space_before"), valor("space_after"), valor("line_spacing")
+        return {
+            "alinhamento": valor("alignment"),
+            "antes": self.antes if antes is None else _pt(antes),
+            "depois": self.depois if depois is None else _pt(depois),
+            # float = múltiplo; Length = altura exata em pontos
+            "linha": self.linha if linha is None else (
+                ("exata", _pt(linha)) if isinstance(linha, Length) else float(linha)
+            ),
+            "esquerda": _pt(valor("left_indent")) or 0.0,
+            "direita": _pt(valor("right_indent")) or 0.0,
+            "primeira": _pt(valor("first_line_indent")) or 0.0,
+            "quebra_antes": bool(valor("page_break_before")),
+        }
+
+
+# --------------------------------------------------------------------------- #
+# Composição de parágrafos
+# --------------------------------------------------------------------------- #
+@dataclass
+class _Trecho:
+    texto: str
+    negrito: bool
+    tamanho: float
+    url: str | None = None
+
+
+@dataclass
+class _Linha:
+    trechos: list
+    largura: float
+    tamanho: float
+    final: bool = False   # última linha do parágrafo (não justifica)
+
+
+@dataclass
+class _Desenho:
+    blob: bytes
+    chave: str
+    largura: float
+    altura: float
+    ancorado: bool
+    atras: bool = False
+    h_rel: str = "column"
+    h_pos: float = 0.0
+    h_alinhar: str | None = None
+    v_rel: str = "paragraph"
+    v_pos: float = 0.0
+
+
+@dataclass
+class _Bloco:
+    linhas: list
+    fmt: dict
+    desenhos: list
+    quebra_pagina: bool = False
+
+    def altura_linha(self, linha: _Linha) -> float:
+        regra = self.fmt["linha"]
+        if isinstance(regra, tuple):
+            return regra[1]
+        return linha.tamanho * 1.15 * regra
+
+    @property
+    def altura_texto(self) -> float:
+        return sum(self.altura_linha(l) for l in self.linhas)
+
+
+_TOKENS_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _desenhos_do_run(r_el, parte) -> list:
+    desenhos = []
+    for dw in r_el.iter(qn("w:drawing")):
+        for el in dw:
+            ancorado = el.tag == qn("wp:anchor")
+            if not ancorado and el.tag != qn("wp:inline"):
+                continue
+            blip = el.find(".//" + qn("a:blip"))
+            ext = el.find(qn("wp:extent"))
+            if blip is None or ext is None:
+                continue
+            parte_img = parte.related_parts.get(blip.get(qn("r:embed")))
+            if parte_img is None:
+                continue
+            d = _Desenho(
+                blob=parte_img.blob,
+                chave=str(parte_img.partname) + ":" + str(id(parte_img.package)),
+                largura=int(ext.get("cx")) / EMU_POR_PT,
+                altura=int(ext.get("cy")) / EMU_POR_PT,
+                ancorado=ancorado,
+            )
+            if ancorado:
+                d.atras = el.get("behindDoc") in ("1", "true")
+                ph, pv = el.find(qn("wp:positionH")), el.find(qn("wp:positionV"))
+                if ph is not None:
+                    d.h_rel = ph.get("relativeFrom", "column")
+                    off, alin = ph.find(qn("wp:posOffset")), ph.find(qn("wp:align"))
+                    d.h_pos = int(off.text) / EMU_POR_PT if off is not None else 0.0
+                    d.h_alinhar = alin.text if alin is not None else None
+                if pv is not None:
+                    d.v_rel = pv.get("relativeFrom", "paragraph")
+                    off = pv.find(qn("wp:posOffset"))
+                    d.v_pos = int(off.text) / EMU_POR_PT if off is not None else 0.0
+            desenhos.append(d)
+    return desenhos
+
+
+def _conteudo_paragrafo(p: Paragraph, estilos: _Estilos):
+    """Gera ``_Trecho``/``"\\n"``/``"pagina"`` e a lista de desenhos."""
+    itens, desenhos = [], []
+    parte = p.part
+    for item in p.iter_inner_content():
+        runs = item.runs if hasattr(item, "runs") else [item]
+        url = getattr(item, "url", None) or None if hasattr(item, "runs") else None
+        for run in runs:
+            negrito, tamanho = estilos.fonte(run, p)
+            for filho in run._r:
+                tag = filho.tag
+                if tag == qn("w:t"):
+                    if filho.text:
+                        itens.append(_Trecho(filho.text, negrito, tamanho, url))
+                elif tag == qn("w:tab"):
+                    itens.append(_Trecho("    ", negrito, tamanho, url))
+                elif tag in (qn("w:br"), qn("w:cr")):
+                    itens.append("pagina" if filho.get(qn("w:type")) == "page" else "\n")
+                elif tag == qn("w:drawing"):
+                    desenhos.extend(_desenhos_do_run(run._r, parte))
+    return itens, desenhos
+
+
+def _quebrar_linhas(itens, largura_max: float, primeira: float, tamanho_vazio: float):
+    linhas, atual, larg = [], [], 0.0
+    limite = largura_max - primeira
+
+    def fechar(final=False):
+        nonlocal atual, larg, limite
+        # espaços no fim da linha não contam para o alinhamento
+        if atual:
+            ultimo = atual[-1]
+            sem_espaco = ultimo.texto.rstrip(" ")
+            larg -= largura_texto(ultimo.texto[len(sem_espaco):], ultimo.negrito, ultimo.tamanho)
+        tam = max((t.tamanho for t in atual), default=tamanho_vazio)
+        linhas.append(_Linha(atual, larg, tam, final))
+        atual, larg, limite = [], 0.0, largura_max
+
+    for item in itens:
+        if item == "\n":
+            fechar(final=True)
+            continue
+        if item == "pagina":
+            continue
+        tamanho_vazio = item.tamanho
+        for token in _TOKENS_RE.findall(item.texto):
+            w = largura_texto(token, item.negrito, item.tamanho)
+            w_visivel = largura_texto(token.rstrip(" "), item.negrito, item.tamanho)
+            if atual and larg + w_visivel > limite:
+                fechar()
+                if not token.strip():
+                    continue
+            while w_visivel > limite and len(token) > 1:
+                # palavra maior que a linha: corta por caractere
+                corte = len(token)
+                while corte > 1 and largura_texto(token[:corte], item.negrito, item.tamanho) > limite:
+                    corte -= 1
+                atual.append(_Trecho(token[:corte], item.negrito, item.tamanho, item.url))
+                larg += largura_texto(token[:corte], item.negrito, item.tamanho)
+                fechar()
+                token = token[corte:]
+                w = largura_texto(token, item.negrito, item.tamanho)
+                w_visivel = largura_texto(token.rstrip(" "), item.negrito, item.tamanho)
+            if atual and atual[-1].negrito == item.negrito and atual[-1].tamanho == item.tamanho \
+                    and atual[-1].url == item.url:
+                atual[-1] = _Trecho(atual[-1].texto + token, item.negrito, item.tamanho, item.url)
+            else:
+                atual.append(_Trecho(token, item.negrito, item.tamanho, item.url))
+            larg += w
+    fechar(final=True)
+    return linhas
+
+
+def compor_paragrafo(p: Paragraph, estilos: _Estilos, largura: float) -> _Bloco:
+    fmt = estilos.paragrafo(p)
+    itens, desenhos = _conteudo_paragrafo(p, estilos)
+    util = largura - fmt["esquerda"] - fmt["direita"]
+    tamanho = estilos.fonte(p.runs[0], p)[1] if p.runs else estilos.tamanho
+    linhas = _quebrar_linhas(itens, util, fmt["primeira"], tamanho)
+    return _Bloco(linhas, fmt, desenhos, quebra_pagina="pagina" in itens)
+
+
+# --------------------------------------------------------------------------- #
+# Layout / paginação
+# --------------------------------------------------------------------------- #
+class _Layout:
+    def __init__(self, doc, estilos: _Estilos):
+        secao = doc.sections[0]
+        self.doc = doc
+        self.estilos = estilos
+        self.secao = secao
+        self.largura = _pt(secao.page_width)
+        self.altura = _pt(secao.page_height)
+        self.esq = _pt(secao.left_margin)
+        self.dir = _pt(secao.right_margin)
+        self.topo = _pt(secao.top_margin)
+        self.base = _pt(secao.bottom_margin)
+        self.util = self.largura - self.esq - self.dir
+        self.pdf = PdfWriter()
+        self.pagina: _Pagina | None = None
+        self.y = 0.0
+        self._margens = self._compor_margens()
+        self.nova_pagina()
+
+    # -- páginas ----------------------------------------------------------- #
+    def _compor_margens(self):
+        margens = []
+        for story, em_cima in ((self.secao.header, True), (self.secao.footer, False)):
+            if story.is_linked_to_previous:  # seção única: sem cabeçalho/rodapé
+                continue
+            paragrafos = story.paragraphs
+            blocos = [compor_paragrafo(p, self.estilos, self.util) for p in paragrafos]
+            margens.append((em_cima, blocos))
+        return margens
+
+    def nova_pagina(self):
+        self.pagina = self.pdf.nova_pagina(self.largura, self.altura)
+        self.y = self.topo
+        for em_cima, blocos in self._margens:
+            altura = sum(b.altura_texto for b in blocos)
+            if em_cima:
+                y = _pt(self.secao.header_distance) or 0.0
+            else:
+                y = self.altura - (_pt(self.secao.footer_distance) or 0.0) - altura
+            for bloco in blocos:
+                y = self._desenhar_bloco(bloco, y)
+            if em_cima:
+                self.y = max(self.y, y)
+
+    def garantir(self, altura: float):
+        if self.y + altura > self.altura - self.base and self.y > self.topo + 0.01:
+            self.nova_pagina()
+
+    # -- primitivas --------------------------------------------------------- #
+    def _pdf_y(self, y: float) -> float:
+        return self.altura - y
+
+    def texto(self, x: float, y_base: float, trecho: _Trecho, tw: float = 0.0):
+        fonte = _FONTES[trecho.negrito][0]
+        dados = _escapar(_codificar(trecho.texto)).decode("latin-1")
+        ops = f"BT /{fonte} {_num(trecho.tamanho)} Tf "
+        if tw:
+            ops += f"{tw:.3f} Tw "
+        ops += f"1 0 0 1 {_num(x)} {_num(self._pdf_y(y_base))} Tm ({dados}) Tj ET"
+        self.pagina.conteudo.append(ops)
+
+    def imagem(self, blob: bytes, chave: str, x: float, y: float, w: float, h: float,
+               atras: bool = False):
+        nome, _ = self.pdf.registrar_imagem(blob, chave)
+        self.pagina.imagens[nome] = chave
+        destino = self.pagina.fundo if atras else self.pagina.conteudo
+        destino.append(
+            f"q {_num(w)} 0 0 {_num(h)} {_num(x)} {_num(self._pdf_y(y + h))} cm /{nome} Do Q"
+        )
+
+    def retangulo(self, x: float, y: float, w: float, h: float):
+        self.pagina.conteudo.append(
+            f"{ESPESSURA_GRADE} w {_num(x)} {_num(self._pdf_y(y + h))} {_num(w)} {_num(h)} re S"
+        )
+
+    # -- desenhos ancorados ---------------------------------------------- #
+    def _ancorado(self, d: _Desenho, y_paragrafo: float, x_coluna: float):
+        if d.h_rel == "page":
+            base_x, area = 0.0, self.largura
+        elif d.h_rel == "column":
+            base_x, area = x_coluna, self.util
+        else:
+            base_x, area = self.esq, self.util
+        if d.h_alinhar == "center":
+            x = base_x + (area - d.largura) / 2
+        elif d.h_alinhar == "right":
+            x = base_x + area - d.largura
+        else:
+            x = base_x + d.h_pos
+        if d.v_rel == "page":
+            y = d.v_pos
+        elif d.v_rel in ("margin", "topMargin"):
+            y = self.topo + d.v_pos
+        else:
+            y = y_paragrafo + d.v_pos
+        self.imagem(d.blob, d.chave, x, y, d.largura, d.altura, atras=d.atras)
+
+    # -- blocos de texto ---------------------------------------------------- #
+    def _desenhar_linha(self, linha: _Linha, x0: float, y: float, util: float,
+                        alinhamento, altura: float):
+        sobra = util - linha.largura
+        tw = 0.0
+        if alinhamento == WD_ALIGN_PARAGRAPH.CENTER:
+            x = x0 + sobra / 2
+        elif alinhamento == WD_ALIGN_PARAGRAPH.RIGHT:
+            x = x0 + sobra
+        else:
+            x = x0
+            if alinhamento == WD_ALIGN_PARAGRAPH.JUSTIFY and not linha.final and sobra > 0:
+                espacos = sum(t.texto.count(" ") for t in linha.trechos)
+                espacos -= len(linha.trechos[-1].texto) - len(linha.trechos[-1].texto.rstrip(" "))
+                if espacos > 0:
+                    tw = sobra / espacos
+        base = y + (altura - linha.tamanho) / 2 + linha.tamanho * 0.8
+        for trecho in linha.trechos:
+            w = largura_texto(trecho.texto, trecho.negrito, trecho.tamanho)
+            w += tw * trecho.texto.count(" ")
+            if trecho.texto.strip():
+                self.texto(x, base, trecho, tw)
+                if trecho.url:
+                    self.pagina.links.append((
+                        x, self._pdf_y(base + trecho.tamanho * 0.25),
+                        x + w, self._pdf_y(base - trecho.tamanho * 0.8), trecho.url,
+                    ))
+            x += w
+
+    def _desenhar_bloco(self, bloco: _Bloco, y: float, *,
+                        x0: float | None = None, util: float | None = None) -> float:
+        """Desenha ``bloco`` a partir de ``y`` sem paginar; retorna o novo ``y``."""
+        fmt = bloco.fmt
+        x0 = self.esq if x0 is None else x0
+        util = self.util if util is None else util
+        y += fmt["antes"]
+        for d in bloco.desenhos:
+            if d.ancorado:
+                self._ancorado(d, y, x0)
+            else:
+                self.imagem(d.blob, d.chave, x0 + fmt["esquerda"], y, d.largura, d.altura)
+                y += d.altura
+        for i, linha in enumerate(bloco.linhas):
+            altura = bloco.altura_linha(linha)
+            recuo = fmt["esquerda"] + (fmt["primeira"] if i == 0 else 0.0)
+            self._desenhar_linha(linha, x0 + recuo, y, util - recuo - fmt["direita"],
+                                 fmt["alinhamento"], altura)
+            y += altura
+        return y + fmt["depois"]
+
+    def paragrafo(self, p: Paragraph):
+        bloco = compor_paragrafo(p, self.estilos, self.util)
+        fmt = bloco.fmt
+        if fmt["quebra_antes"]:
+            self.nova_pagina()
+        self.y += fmt["antes"]
+
+        for d in bloco.desenhos:
+            if d.ancorado:
+                self._ancorado(d, self.y, self.esq)
+            else:
+                self.garantir(d.altura)
+                x = self.esq + fmt["esquerda"]
+                if fmt["alinhamento"] == WD_ALIGN_PARAGRAPH.CENTER:
+                    x = self.esq + (self.util - d.largura) / 2
+                self.imagem(d.blob, d.chave, x, self.y, d.largura, d.altura)
+                self.y += d.altura
+
+        texto_vazio = not any(t.texto.strip() for l in bloco.linhas for t in l.trechos)
+        if not (texto_vazio and any(not d.ancorado for d in bloco.desenhos)):
+            for i, linha in enumerate(bloco.linhas):
+                altura = bloco.altura_linha(linha)
+                self.garantir(altura)
+                recuo = fmt["esquerda"] + (fmt["primeira"] if i == 0 else 0.0)
+                self._desenhar_linha(linha, self.esq + recuo, self.y,
+                                     self.util - recuo - fmt["direita"],
+                                     fmt["alinhamento"], altura)
+                self.y += altura
+        self.y += fmt["depois"]
+        if bloco.quebra_pagina:
+            self.nova_pagina()
+
+    # -- tabelas ------------------------------------------------------------ #
+    def _linha_tabela(self, celulas, larguras, centralizadas=(), cabecalho=None):
+        """``celulas``: lista de listas de blocos (ou ``("imagem", ...)``)."""
+        alturas = []
+        for conteudo, w in zip(celulas, larguras):
+            h = 0.0
+            for item in conteudo:
+                if isinstance(item, _Bloco):
+                    h += item.fmt["antes"] + item.altura_texto + item.fmt["depois"]
+                else:
+                    h += item[3]
+            alturas.append(h)
+        altura = max(alturas, default=0.0) + 2 * 1.0
+        if self.y + altura > self.altura - self.base and self.y > self.topo + 0.01:
+            self.nova_pagina()
+            if cabecalho is not None:
+                self._linha_tabela(*cabecalho)
+
+        x = self.esq
+        for i, (conteudo, w, h) in enumerate(zip(celulas, larguras, alturas)):
+            self.retangulo(x, self.y, w, altura)
+            y = self.y + 1.0
+            if i in centralizadas:
+                y += (altura - 2.0 - h) / 2
+            for item in conteudo:
+                if isinstance(item, _Bloco):
+                    y = self._desenhar_bloco(item, y, x0=x + PADDING_CELULA,
+                                             util=w - 2 * PADDING_CELULA)
+                else:
+                    _, blob, chave, ih, iw = item
+                    self.imagem(blob, chave, x + (w - iw) / 2, y, iw, ih)
+                    y += ih
+            x += w
+        self.y += altura
+
+    def _bloco_simples(self, texto: str, centralizado: bool, largura: float) -> _Bloco:
+        tamanho = self.estilos.tamanho_normal
+        itens = [_Trecho(texto, False, tamanho)]
+        fmt = {
+            "alinhamento": WD_ALIGN_PARAGRAPH.CENTER if centralizado else None,
+            "antes": 0.0, "depois": 0.0, "linha": 1.0,
+            "esquerda": 0.0, "direita": 0.0, "primeira": 0.0, "quebra_antes": False,
+        }
+        return _Bloco(_quebrar_linhas(itens, largura, 0.0, tamanho), fmt, [])
+
+    def tabela_equipamentos(self, cabecalho, linhas, centralizadas):
+        """Mesma tabela de ``_inserir_tabela_equipamentos`` (colunas iguais)."""
+        larguras = [self.util / len(cabecalho)] * len(cabecalho)
+        interna = larguras[0] - 2 * PADDING_CELULA
+
+        def celulas(valores):
+            out = []
+            for i, valor in enumerate(valores):
+                if valor is None or isinstance(valor, str):
+                    out.append([self._bloco_simples("—" if valor is None else valor,
+                                                      i in centralizadas, interna)])
+                else:  # ImagemCacheada
+                    img = valor.imagem
+                    iw = min(120.24, interna)  # 1,67" como no DOCX, limitado à célula
+                    ih = iw * img.px_height / max(img.px_width, 1)
+                    out.append([("imagem", img.blob, img.sha1, ih, iw)])
+            return out
+
+        cab = (celulas(cabecalho), larguras, tuple(range(len(cabecalho))))
+        self._linha_tabela(*cab)
+        for valores in linhas:
+            self._linha_tabela(celulas(valores), larguras, centralizadas, cabecalho=cab)
+
+    def tabela(self, tbl_el, parte):
+        """Tabelas do próprio template: colunas do ``w:tblGrid``, texto simples."""
+        grade = [int(g.get(qn("w:w"), 0)) / 20 for g in tbl_el.iter(qn("w:gridCol"))]
+        if not grade or sum(grade) <= 0:
+            raise RenderizacaoNativaError("Tabela sem grade definida.")
+        fator = min(1.0, self.util / sum(grade))
+        larguras = [g * fator for g in grade]
+        for tr in tbl_el.iterchildren(qn("w:tr")):
+            celulas, larg_celulas, i = [], [], 0
+            for tc in tr.iterchildren(qn("w:tc")):
+                span = tc.find(f"{qn('w:tcPr')}/{qn('w:gridSpan')}")
+                n = int(span.get(qn("w:val"))) if span is not None else 1
+                w = sum(larguras[i:i + n])
+                larg_celulas.append(w)
+                i += n
+                blocos = [
+                    compor_paragrafo(Paragraph(p_el, parte), self.estilos, w - 2 * PADDING_CELULA)
+                    for p_el in tc.iterchildren(qn("w:p"))
+                ]
+                celulas.append(blocos)
+            self._linha_tabela(celulas, larg_celulas)
+
+
+# --------------------------------------------------------------------------- #
+# Entrada
+# --------------------------------------------------------------------------- #
+def _elementos_do_corpo(body):
+    for el in body.iterchildren():
+        if el.tag == qn("w:sdt"):
+            conteudo = el.find(qn("w:sdtContent"))
+            if conteudo is not None:
+                yield from _elementos_do_corpo(conteudo)
+        else:
+            yield el
+
+
+def renderizar_pdf(doc, tabela, ancora=None) -> bytes:
+    """Desenha ``doc`` (já preenchido) com a tabela de investimento.
+
+    ``tabela`` = ``(cabecalho, linhas, colunas_centralizadas)``; cada célula
+    é texto ou uma ``ImagemCacheada`` (coluna de imagem). ``ancora`` é o
+    ``w:p`` após o qual a tabela entra; ``None`` → fim do documento.
+    """
+    estilos = _Estilos(doc)
+    layout = _Layout(doc, estilos)
+    parte = doc.part
+    inserida = False
+    for el in _elementos_do_corpo(doc.element.body):
+        if el.tag == qn("w:p"):
+            layout.paragrafo(Paragraph(el, parte))
+            if el is ancora:
+                layout.tabela_equipamentos(*tabela)
+                inserida = True
+        elif el.tag == qn("w:tbl"):
+            layout.tabela(el, parte)
+    if not inserida:
+        layout.tabela_equipamentos(*tabela)
+    return layout.pdf.salvar()
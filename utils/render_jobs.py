@@ -0,0 +1,256 @@
+"""Renderização de propostas em segundo plano.
+
+``enfileirar`` grava um ``RenderJob`` e agenda a geração num executor; a
+requisição web volta imediatamente com o id do job. O resultado vai para o
+``ArtifactStore`` (a mesma chave de conteúdo usada pelas rotas síncronas),
+então um job cujo documento já existe é concluído sem renderizar nada.
+
+Os jobs ficam no banco: ao subir a aplicação, os pendentes (e os que estão
+``executando`` há mais de ``RENDER_JOBS_TIMEOUT`` segundos, ou seja, cujo
+processo caiu) voltam para a fila. Com vários processos web, cada job é
+reservado por um ``UPDATE`` condicional antes de rodar, então só um deles o
+executa. Jobs que falharam podem ser reenviados com ``reenviar``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, update
+
+from gerar_proposta import chave_render, renderizar_proposta
+from models import db, Equipment, Proposal, RenderJob
+from utils import artifact_store
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_store_local: artifact_store.ArtifactStore | None = None
+
+
+# --------------------------------------------------------------------------- #
+# Parâmetros do job
+# --------------------------------------------------------------------------- #
+def itens_para_params(equipamentos) -> list[dict]:
+    """Fotografa os atributos efêmeros (qtd/desconto/preço) de cada item."""
+    return [
+        {
+            "id": eq.id,
+            "quantity": int(getattr(eq, "quantity", 1) or 1),
+            "discount_percent": float(getattr(eq, "discount_percent", 0) or 0.0),
+            "unit_price": float(getattr(eq, "unit_price", 0) or 0.0),
+        }
+        for eq in equipamentos
+    ]
+
+
+def itens_de_params(itens: list[dict]) -> list:
+    """Reconstrói os itens sem alterar as instâncias ORM do catálogo."""
+    por_id = {
+        e.id: e for e in Equipment.query.filter(Equipment.id.in_([i["id"] for i in itens]))
+    }
+    out = []
+    for item in itens:
+        eq = por_id.get(item["id"])
+        if not eq:
+            continue
+        out.append(types.SimpleNamespace(
+            id=eq.id,
+            name=eq.name,
+            description=eq.description,
+            illustration_path=eq.illustration_path,
+            unit_price=item["unit_price"],
+            quantity=item["quantity"],
+            discount_percent=item["discount_percent"],
+        ))
+    return out
+
+
+# --------------------------------------------------------------------------- #
+# Armazenamento do resultado
+# --------------------------------------------------------------------------- #
+def obter_store(app=None) -> artifact_store.ArtifactStore:
+    """Store global de artefatos ou, se desativado, um store só dos jobs."""
+    global _store_local
+    store = artifact_store.obter_store()
+    if store is not None:
+        return store
+    if _store_local is None:
+        from flask import current_app
+        app = app or current_app
+        _store_local = artifact_store.ArtifactStore(
+            os.path.join(app.instance_path, "render_jobs")
+        )
+    return _store_local
+
+
+def caminho_resultado(job: RenderJob) -> str | None:
+    if job.status != RenderJob.CONCLUIDO or not job.chave:
+        return None
+    return obter_store().path(job.chave, job.formato)
+
+
+# --------------------------------------------------------------------------- #
+# Execução
+# --------------------------------------------------------------------------- #
+def _obter_executor(app) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(app.config.get("RENDER_JOBS_WORKERS", 2)),
+                thread_name_prefix="render-job",
+            )
+        return _executor
+
+
+def _agendar(app, job_id: str):
+    _obter_executor(app).submit(executar, app, job_id)
+
+
+def _reservar(job_id: str) -> bool:
+    """Marca o job como ``executando`` se ainda estiver pendente."""
+    res = db.session.execute(
+        update(RenderJob)
+        .where(RenderJob.id == job_id, RenderJob.status == RenderJob.PENDENTE)
+        .values(status=RenderJob.EXECUTANDO,
+                tentativas=RenderJob.tentativas + 1,
+                atualizado_em=datetime.utcnow())
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def executar(app, job_id: str):
+    """Executa o job ``job_id`` (roda no executor, fora da requisição)."""
+    with app.app_context():
+        try:
+            if not _reservar(job_id):
+                return  # outro processo já pegou (ou não está mais pendente)
+            job = db.session.get(RenderJob, job_id)
+
+            try:
+                proposta = db.session.get(Proposal, job.proposta_id)
+                if proposta is None:
+                    raise LookupError("Proposta não encontrada.")
+                params = json.loads(job.params or "{}")
+                itens = itens_de_params(params.get("itens", []))
+                colab = params.get("colaborador", {})
+
+                # recalcula: o template pode ter mudado desde o enfileiramento
+                chave = chave_render(proposta, itens, **colab)
+                store = obter_store(app)
+                if store.path(chave, job.formato) is None:
+                    artefatos = renderizar_proposta(
+                        proposta, itens, pdf=(job.formato == "pdf"), **colab
+                    )
+                    store.put(chave, artefatos)
+                job.chave = chave
+                job.status = RenderJob.CONCLUIDO
+                job.erro = None
+            except Exception as exc:
+                app.logger.exception("Falha no job de renderização %s", job_id)
+                db.session.rollback()
+                job = db.session.get(RenderJob, job_id)
+                job.status = RenderJob.FALHOU
+                job.erro = str(exc)[:2000] or exc.__class__.__name__
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+# --------------------------------------------------------------------------- #
+# API usada pelas rotas
+# --------------------------------------------------------------------------- #
+def enfileirar(proposta, equipamentos, *, usuario_id: int, formato: str = "pdf",
+               **colaborador) -> RenderJob:
+    """Cria o job e agenda a renderização; não bloqueia a requisição."""
+    from flask import current_app
+    app = current_app._get_current_object()
+
+    chave = chave_render(proposta, equipamentos, **colaborador)
+    job = RenderJob(
+        id=uuid.uuid4().hex,
+        proposta_id=proposta.id,
+        usuario_id=usuario_id,
+        formato=formato,
+        chave=chave,
+        params=json.dumps({
+            "itens": itens_para_params(equipamentos),
+            "colaborador": colaborador,
+        }),
+    )
+    # documento idêntico já gerado antes → nada a fazer
+    if obter_store(app).path(chave, formato) is not None:
+        job.status = RenderJob.CONCLUIDO
+    else:
+        job.status = RenderJob.PENDENTE
+
+    db.session.add(job)
+    db.session.commit()
+    if job.status == RenderJob.PENDENTE:
+        _agendar(app, job.id)
+    return job
+
+
+def reenviar(job: RenderJob) -> RenderJob:
+    """Recoloca na fila um job que falhou (ou cujo resultado expirou)."""
+    from flask import current_app
+    job.status = RenderJob.PENDENTE
+    job.erro = None
+    db.session.commit()
+    _agendar(current_app._get_current_object(), job.id)
+    return job
+
+
+def status_json(job: RenderJob) -> dict:
+    return {
+        "id": job.id,
+        "proposta_id": job.proposta_id,
+        "formato": job.formato,
+        "status": job.status,
+        "tentativas": job.tentativas or 0,
+        "erro": job.erro,
+    }
+
+
+def recuperar_pendentes(app) -> int:
+    """Reagenda os jobs pendentes e os travados após um reinício do processo."""
+    with app.app_context():
+        if "render_jobs" not in inspect(db.engine).get_table_names():
+            return 0  # migração ainda não aplicada
+        # "executando" há muito tempo = processo caiu no meio da renderização
+        travados = datetime.utcnow() - timedelta(
+            seconds=float(app.config.get("RENDER_JOBS_TIMEOUT", 900))
+        )
+        db.session.execute(
+            update(RenderJob)
+            .where(RenderJob.status == RenderJob.EXECUTANDO,
+                   RenderJob.atualizado_em < travados)
+            .values(status=RenderJob.PENDENTE)
+        )
+        db.session.commit()
+        ids = [
+            job_id for (job_id,) in db.session.query(RenderJob.id)
+            .filter(RenderJob.status == RenderJob.PENDENTE)
+        ]
+        db.session.remove()
+
+    for job_id in ids:
+        _agendar(app, job_id)
+    return len(ids)
+
+
+def init_app(app):
+    if not app.config.get("RENDER_JOBS_RECOVER", True):
+        return
+    try:
+        recuperar_pendentes(app)
+    except Exception:
+        app.logger.exception("Não foi possível recuperar jobs de renderização")
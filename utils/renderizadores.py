@@ -0,0 +1,81 @@
+"""Escolha do renderizador de PDF por template.
+
+O administrador define, para cada arquivo de ``docs_templates``, se o PDF é
+gerado pelo LibreOffice (conversão do DOCX, padrão) ou pelo renderizador
+nativo (``utils.pdf_nativo``). As preferências ficam em ``TemplateConfig`` e
+são lidas do banco no máximo a cada ``ttl`` segundos; fora de um contexto
+de aplicação (ex.: processos da exportação) vale o padrão, por isso a
+exportação resolve o renderizador ainda na requisição.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import has_app_context
+from sqlalchemy import inspect
+
+from models import db, TemplateConfig
+
+
+LIBREOFFICE = TemplateConfig.LIBREOFFICE
+NATIVO = TemplateConfig.NATIVO
+PADRAO = LIBREOFFICE
+
+OPCOES = {
+    LIBREOFFICE: "LibreOffice (conversão do DOCX)",
+    NATIVO: "Nativo (PDF direto, mais rápido)",
+}
+
+
+class Preferencias:
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._mapa: dict[str, str] | None = None
+        self._lido_em = 0.0
+
+    def _carregar(self) -> dict[str, str]:
+        if TemplateConfig.__tablename__ not in inspect(db.engine).get_table_names():
+            return {}
+        return dict(db.session.query(TemplateConfig.arquivo, TemplateConfig.renderizador))
+
+    def mapa(self) -> dict[str, str]:
+        if not has_app_context():
+            return {}
+        with self._lock:
+            if self._mapa is None or time.monotonic() - self._lido_em >= self.ttl:
+                self._mapa = self._carregar()
+                self._lido_em = time.monotonic()
+            return self._mapa
+
+    def invalidar(self):
+        with self._lock:
+            self._mapa = None
+
+
+preferencias = Preferencias()
+
+
+def renderizador_do_template(arquivo: str) -> str:
+    """``"libreoffice"`` ou ``"nativo"`` para o arquivo de template."""
+    valor = preferencias.mapa().get(arquivo, PADRAO)
+    return valor if valor in OPCOES else PADRAO
+
+
+def definir_renderizador(arquivo: str, renderizador: str, usuario_id: int | None = None):
+    if renderizador not in OPCOES:
+        raise ValueError(f"Renderizador inválido: {renderizador!r}")
+    cfg = TemplateConfig.query.filter_by(arquivo=arquivo).first()
+    if cfg is None:
+        cfg = TemplateConfig(arquivo=arquivo)
+        db.session.add(cfg)
+    cfg.renderizador = renderizador
+    cfg.atualizado_por_id = usuario_id
+    db.session.commit()
+    preferencias.invalidar()
+
+
+def init_app(app):
+    preferencias.ttl = float(app.config.get("RENDERIZADOR_CACHE_TTL", preferencias.ttl))
@@ -0,0 +1,176 @@
+"""Proteções para chamadas a serviços externos (ex.: API pública de CNPJ).
+
+``SingleFlight``
+    Chamadas simultâneas com a mesma chave compartilham uma única execução:
+    a primeira faz o trabalho e as demais esperam pelo mesmo resultado (ou
+    exceção). Evita que N vendedores consultando o mesmo CNPJ gerem N
+    requisições lentas ao mesmo tempo.
+
+``Disjuntor`` (circuit breaker)
+    Depois de ``limite_falhas`` falhas seguidas, o circuito abre e as
+    chamadas falham na hora com ``CircuitoAbertoError`` em vez de esperar
+    pelo timeout. Passados ``espera`` segundos, o circuito fica meio-aberto:
+    até ``sondas`` chamadas passam para testar o serviço — sucesso fecha o
+    circuito, falha o reabre por mais ``espera`` segundos. Só as exceções
+    listadas em ``erros`` contam como falha.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class CircuitoAbertoError(RuntimeError):
+    """O serviço está marcado como indisponível; a chamada nem foi feita."""
+
+    def __init__(self, nome: str, tentar_em: float):
+        super().__init__(f"Circuito '{nome}' aberto; nova tentativa em {tentar_em:.0f}s.")
+        self.tentar_em = tentar_em
+
+
+class _Voo:
+    __slots__ = ("evento", "resultado", "erro", "seguidores")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro: BaseException | None = None
+        self.seguidores = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voos: dict[object, _Voo] = {}
+        self.execucoes = 0
+        self.compartilhadas = 0
+
+    def executar(self, chave, fn: Callable[[], T]) -> T:
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+                self.execucoes += 1
+            else:
+                voo.seguidores += 1
+                self.compartilhadas += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = fn()
+            return voo.resultado
+        except BaseException as exc:
+            voo.erro = exc
+            raise
+        finally:
+            with self._lock:
+                del self._voos[chave]
+            voo.evento.set()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"execucoes": self.execucoes, "compartilhadas": self.compartilhadas,
+                    "em_andamento": len(self._voos)}
+
+
+class Disjuntor:
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, nome: str, *, limite_falhas: int = 5, espera: float = 30.0,
+                 sondas: int = 1, erros: tuple[type[BaseException], ...] = (Exception,)):
+        self.nome = nome
+        self.erros = erros
+        self.configurar(limite_falhas=limite_falhas, espera=espera, sondas=sondas)
+        self._lock = threading.Lock()
+        self._estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._sondando = 0
+        self.rejeitadas = 0
+
+    def configurar(self, *, limite_falhas: int, espera: float, sondas: int):
+        self.limite_falhas = max(1, int(limite_falhas))
+        self.espera = float(espera)
+        self.sondas = max(1, int(sondas))
+
+    # ------------------------------------------------------------------ #
+    def _permitir(self) -> bool:
+        """Decide se a chamada passa; devolve ``True`` se ela for uma sonda."""
+        with self._lock:
+            if self._estado == self.ABERTO:
+                restante = self._aberto_em + self.espera - time.monotonic()
+                if restante > 0:
+                    self.rejeitadas += 1
+                    raise CircuitoAbertoError(self.nome, restante)
+                self._estado = self.MEIO_ABERTO
+                self._sondando = 0
+            if self._estado == self.MEIO_ABERTO:
+                if self._sondando >= self.sondas:
+                    self.rejeitadas += 1
+                    raise CircuitoAbertoError(self.nome, self.espera)
+                self._sondando += 1
+                return True
+            return False
+
+    def _abrir(self):
+        self._estado = self.ABERTO
+        self._aberto_em = time.monotonic()
+
+    def chamar(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        sonda = self._permitir()
+        try:
+            resultado = fn(*args, **kwargs)
+        except self.erros:
+            with self._lock:
+                if sonda:
+                    self._sondando -= 1
+                    self._abrir()
+                else:
+                    self._falhas += 1
+                    if self._estado == self.FECHADO and self._falhas >= self.limite_falhas:
+                        self._abrir()
+            raise
+        except BaseException:
+            if sonda:   # erro que não indica indisponibilidade: libera a vaga da sonda
+                with self._lock:
+                    self._sondando -= 1
+            raise
+        with self._lock:
+            if sonda:
+                self._sondando -= 1
+            self._estado = self.FECHADO
+            self._falhas = 0
+        return resultado
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._estado == self.ABERTO and time.monotonic() >= self._aberto_em + self.espera:
+                return self.MEIO_ABERTO
+            return self._estado
+
+    def estatisticas(self) -> dict:
+        estado = self.estado
+        with self._lock:
+            return {"estado": estado, "falhas_seguidas": self._falhas,
+                    "rejeitadas": self.rejeitadas, "limite_falhas": self.limite_falhas,
+                    "espera": self.espera}
+
+    def reiniciar(self):
+        with self._lock:
+            self._estado = self.FECHADO
+            self._falhas = 0
+            self._sondando = 0
@@ -0,0 +1,246 @@
+"""Pool de conexões SMTP reaproveitáveis para o envio das propostas.
+
+Abrir uma conexão por mensagem repete o handshake TCP, o STARTTLS e o
+login a cada e-mail — em dia de campanha é isso que domina o tempo de
+envio. O pool mantém até ``tamanho`` sessões já autenticadas e as empresta
+para um envio por vez::
+
+    pool = obter_pool(app)
+    pool.enviar(msg)
+
+Antes de reaproveitar uma sessão parada há mais de ``verificar_apos``
+segundos, o pool manda um ``NOOP``; se o servidor tiver derrubado a
+conexão, ela é descartada e outra é aberta. Sessões ociosas por mais de
+``max_ocioso`` segundos ou que já enviaram ``max_mensagens`` (limite comum
+dos relays) são fechadas. ``timeout_conexao`` vale para conexão, STARTTLS e
+login; ``timeout_envio`` para cada comando depois disso.
+
+As configurações vêm de ``MAIL_*`` (ver ``config_smtp`` e ``obter_pool``).
+"""
+
+from __future__ import annotations
+
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+
+class PoolEsgotadoError(RuntimeError):
+    """Nenhuma conexão liberada dentro do tempo de espera."""
+
+
+def config_smtp(config) -> dict:
+    """Lê as configurações ``MAIL_*``; ``RuntimeError`` se faltar o essencial."""
+    host = config.get("MAIL_SERVER") or config.get("EMAIL_SMTP_SERVER")
+    if not host:
+        raise RuntimeError("Configuração MAIL_SERVER ausente para envio de e-mail.")
+
+    sender = config.get("MAIL_SENDER") or config.get("MAIL_DEFAULT_SENDER")
+    if not sender:
+        raise RuntimeError("Configuração MAIL_SENDER ausente para envio de e-mail.")
+
+    use_ssl = bool(config.get("MAIL_USE_SSL", False))
+    use_tls = bool(config.get("MAIL_USE_TLS", not use_ssl))
+    port = config.get("MAIL_PORT")
+    if not port:
+        port = 465 if use_ssl else (587 if use_tls else 25)
+
+    return {
+        "host": host,
+        "port": int(port),
+        "use_ssl": use_ssl,
+        "use_tls": use_tls,
+        "username": config.get("MAIL_USERNAME"),
+        "password": config.get("MAIL_PASSWORD"),
+        "sender": sender,
+        "reply_to": config.get("MAIL_REPLY_TO"),
+    }
+
+
+class _Conexao:
+    __slots__ = ("smtp", "usada_em", "enviadas")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.usada_em = time.monotonic()
+        self.enviadas = 0
+
+    def fechar(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    def __init__(self, cfg: dict, tamanho: int = 2, *, timeout_conexao: float = 10.0,
+                 timeout_envio: float = 60.0, max_ocioso: float = 60.0,
+                 verificar_apos: float = 5.0, max_mensagens: int = 100,
+                 espera: float | None = None):
+        self.cfg = cfg
+        self.tamanho = max(1, int(tamanho))
+        self.timeout_conexao = timeout_conexao
+        self.timeout_envio = timeout_envio
+        self.max_ocioso = max_ocioso
+        self.verificar_apos = verificar_apos
+        self.max_mensagens = max_mensagens
+        self.espera = timeout_envio if espera is None else espera
+
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(self.tamanho)
+        self._livres: list[_Conexao] = []   # pilha: a mais recente é reusada primeiro
+        self.abertas = 0                    # conexões criadas desde o início (métrica)
+
+    # ------------------------------------------------------------------ #
+    def _abrir(self) -> _Conexao:
+        cfg = self.cfg
+        classe = smtplib.SMTP_SSL if cfg["use_ssl"] else smtplib.SMTP
+        smtp = classe(cfg["host"], cfg["port"], timeout=self.timeout_conexao)
+        try:
+            if cfg["use_tls"] and not cfg["use_ssl"]:
+                smtp.starttls()
+            if cfg["username"]:
+                smtp.login(cfg["username"], cfg["password"] or "")
+            smtp.sock.settimeout(self.timeout_envio)
+        except BaseException:
+            smtp.close()
+            raise
+        with self._lock:
+            self.abertas += 1
+        return _Conexao(smtp)
+
+    def _viva(self, conn: _Conexao) -> bool:
+        agora = time.monotonic()
+        if agora - conn.usada_em > self.max_ocioso:
+            return False
+        if agora - conn.usada_em < self.verificar_apos:
+            return True
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _retirar(self) -> _Conexao:
+        while True:
+            with self._lock:
+                conn = self._livres.pop() if self._livres else None
+            if conn is None:
+                return self._abrir()
+            if self._viva(conn):
+                return conn
+            conn.fechar()
+
+    def _devolver(self, conn: _Conexao):
+        conn.usada_em = time.monotonic()
+        if conn.enviadas >= self.max_mensagens:
+            conn.fechar()
+            return
+        with self._lock:
+            self._livres.append(conn)
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma sessão autenticada (``smtplib.SMTP``)."""
+        if not self._vagas.acquire(timeout=self.espera):
+            raise PoolEsgotadoError("Nenhuma conexão SMTP livre no pool.")
+        try:
+            conn = self._retirar()
+            try:
+                yield conn
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # recusa do servidor: a sessão continua válida depois de um RSET
+                try:
+                    conn.smtp.rset()
+                except Exception:
+                    conn.fechar()
+                else:
+                    self._devolver(conn)
+                raise
+            except BaseException:
+                conn.fechar()   # estado desconhecido (timeout, conexão caída...)
+                raise
+            else:
+                self._devolver(conn)
+        finally:
+            self._vagas.release()
+
+    def enviar(self, msg: EmailMessage):
+        with self.conexao() as conn:
+            conn.smtp.send_message(msg)
+            conn.enviadas += 1
+
+    def fechar_ociosas(self):
+        """Fecha as sessões paradas há mais de ``max_ocioso`` segundos."""
+        limite = time.monotonic() - self.max_ocioso
+        with self._lock:
+            velhas = [c for c in self._livres if c.usada_em < limite]
+            self._livres = [c for c in self._livres if c.usada_em >= limite]
+        for conn in velhas:
+            conn.fechar()
+
+    def fechar(self):
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for conn in livres:
+            conn.fechar()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"tamanho": self.tamanho, "livres": len(self._livres), "abertas": self.abertas}
+
+
+# --------------------------------------------------------------------------- #
+# Pool do processo
+# --------------------------------------------------------------------------- #
+_pool: SMTPPool | None = None
+_pool_chave: tuple | None = None
+_pool_lock = threading.Lock()
+
+
+def _parametros(config) -> dict:
+    return {
+        "tamanho": int(config.get("MAIL_POOL_TAMANHO", 2)),
+        "timeout_conexao": float(config.get("MAIL_TIMEOUT_CONEXAO", 10)),
+        "timeout_envio": float(config.get("MAIL_TIMEOUT_ENVIO", 60)),
+        "max_ocioso": float(config.get("MAIL_POOL_OCIOSIDADE", 60)),
+        "verificar_apos": float(config.get("MAIL_POOL_VERIFICAR_APOS", 5)),
+        "max_mensagens": int(config.get("MAIL_POOL_MAX_MENSAGENS", 100)),
+    }
+
+
+def obter_pool(app) -> SMTPPool:
+    """Pool do processo para a configuração ``MAIL_*`` atual de ``app``.
+
+    Se a configuração mudar, as sessões antigas são fechadas e um pool novo
+    é criado.
+    """
+    global _pool, _pool_chave
+    cfg = config_smtp(app.config)
+    params = _parametros(app.config)
+    chave = (tuple(sorted(cfg.items())), tuple(sorted(params.items())))
+    with _pool_lock:
+        if _pool is None or _pool_chave != chave:
+            if _pool is not None:
+                _pool.fechar()
+            _pool, _pool_chave = SMTPPool(cfg, **params), chave
+        return _pool
+
+
+def fechar_ociosas():
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.fechar_ociosas()
+
+
+def fechar_pool():
+    global _pool, _pool_chave
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+        _pool, _pool_chave = None, None
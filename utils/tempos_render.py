@@ -0,0 +1,155 @@
+"""Tempo gasto em cada etapa da renderização de propostas.
+
+``gerar_proposta`` marca as etapas com ``etapa("nome")``; quem inicia uma
+renderização abre ``medir_render()`` e recebe o dicionário
+``{etapa: ms}`` daquela renderização (usado no cabeçalho ``Server-Timing``
+das rotas de PDF). Ao fechar a medição mais externa, os tempos entram nos
+histogramas em memória do processo, expostos em
+``/api/admin/metricas/render``.
+
+Os tempos são exclusivos: uma etapa aninhada em outra (ex.: ``imagens``
+dentro de ``tabela``) é descontada da externa, então a soma das etapas
+fica próxima de ``total``. Etapas repetidas na mesma renderização (uma
+imagem por item) são somadas. Fora de ``medir_render`` nada é medido.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Etapas marcadas em gerar_proposta (na ordem em que acontecem)
+ETAPAS = ("cache", "template", "campos", "tabela", "imagens", "salvar_docx", "pdf")
+
+# Limites superiores (ms) dos buckets; o último bucket é "+Inf"
+LIMITES_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_coleta: ContextVar[dict | None] = ContextVar("tempos_render_coleta", default=None)
+_filhos: ContextVar[list | None] = ContextVar("tempos_render_filhos", default=None)
+
+
+class Histograma:
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = tuple(limites)
+        self.buckets = [0] * (len(self.limites) + 1)
+        self.contagem = 0
+        self.soma_ms = 0.0
+        self.max_ms = 0.0
+
+    def registrar(self, ms: float):
+        self.buckets[bisect_left(self.limites, ms)] += 1
+        self.contagem += 1
+        self.soma_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentil(self, p: float) -> float | None:
+        """Limite superior do bucket que contém o percentil ``p`` (0–100)."""
+        if not self.contagem:
+            return None
+        alvo = self.contagem * p / 100.0
+        acumulado = 0
+        for i, n in enumerate(self.buckets):
+            acumulado += n
+            if acumulado >= alvo and n:
+                return float(self.limites[i]) if i < len(self.limites) else self.max_ms
+        return self.max_ms
+
+    def to_json(self) -> dict:
+        rotulos = [f"le_{l}" for l in self.limites] + ["le_inf"]
+        return {
+            "contagem": self.contagem,
+            "soma_ms": round(self.soma_ms, 3),
+            "media_ms": round(self.soma_ms / self.contagem, 3) if self.contagem else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentil(50),
+            "p95_ms": self.percentil(95),
+            "p99_ms": self.percentil(99),
+            "buckets": dict(zip(rotulos, self.buckets)),
+        }
+
+
+class Histogramas:
+    """Um ``Histograma`` por etapa (mais ``total``), seguro entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_etapa: dict[str, Histograma] = {}
+        self.desde = time.time()
+
+    def registrar(self, tempos: dict):
+        with self._lock:
+            for nome, ms in tempos.items():
+                hist = self._por_etapa.get(nome)
+                if hist is None:
+                    hist = self._por_etapa[nome] = Histograma()
+                hist.registrar(float(ms))
+
+    def to_json(self) -> dict:
+        with self._lock:
+            ordem = {n: i for i, n in enumerate(ETAPAS + ("total",))}
+            nomes = sorted(self._por_etapa, key=lambda n: (ordem.get(n, len(ordem)), n))
+            return {
+                "desde": self.desde,
+                "limites_ms": list(LIMITES_MS),
+                "etapas": {n: self._por_etapa[n].to_json() for n in nomes},
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._por_etapa.clear()
+            self.desde = time.time()
+
+
+histogramas = Histogramas()
+
+
+@contextmanager
+def medir_render(*, registrar: bool = True):
+    """Abre (ou reaproveita, se aninhada) a medição de uma renderização.
+
+    ``registrar=False`` só coleta (ex.: processo filho da exportação, que
+    devolve os tempos para o processo web registrar).
+    """
+    atual = _coleta.get()
+    if atual is not None:
+        yield atual
+        return
+    coleta: dict[str, float] = {}
+    token = _coleta.set(coleta)
+    inicio = time.perf_counter()
+    try:
+        yield coleta
+    finally:
+        _coleta.reset(token)
+        coleta["total"] = (time.perf_counter() - inicio) * 1000
+        if registrar:
+            histogramas.registrar(coleta)
+
+
+@contextmanager
+def etapa(nome: str):
+    coleta = _coleta.get()
+    if coleta is None:
+        yield
+        return
+    filhos = [0.0]
+    token = _filhos.set(filhos)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _filhos.reset(token)
+        decorrido = (time.perf_counter() - inicio) * 1000
+        pai = _filhos.get()
+        if pai is not None:
+            pai[0] += decorrido
+        coleta[nome] = coleta.get(nome, 0.0) + decorrido - filhos[0]
+
+
+def server_timing(tempos: dict) -> str:
+    """Valor do cabeçalho ``Server-Timing`` (ex.: ``template;dur=1.2, pdf;dur=830.0``)."""
+    return ", ".join(f"{nome};dur={ms:.1f}" for nome, ms in tempos.items())